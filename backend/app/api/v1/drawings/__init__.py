@@ -8,10 +8,11 @@
 - status.py: 任务状态查询API
 - export.py: 导出相关API
 - delete.py: 删除操作API
+- tiles.py: 图纸瓦片金字塔API
 """
 
 from fastapi import APIRouter
-from . import upload, list, process, status, export, delete
+from . import upload, list, process, status, export, delete, tiles
 
 # 创建主路由器
 router = APIRouter()
@@ -22,4 +23,6 @@ router.include_router(list.router, prefix="", tags=["图纸列表"])
 router.include_router(process.router, prefix="", tags=["图纸处理"])
 router.include_router(status.router, prefix="", tags=["任务状态"])
 router.include_router(export.router, prefix="", tags=["结果导出"])
-router.include_router(delete.router, prefix="", tags=["图纸删除"]) 
\ No newline at end of file
+router.include_router(delete.router, prefix="", tags=["图纸删除"])
+router.include_router(tiles.router, prefix="", tags=["图纸瓦片"])
+ 
\ No newline at end of file
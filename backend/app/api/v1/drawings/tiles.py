@@ -0,0 +1,104 @@
+"""
+图纸瓦片金字塔API
+供查看器按视口和缩放级别按需拉取瓦片，避免下载整页大图
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import Response
+from sqlalchemy.orm import Session
+import io
+import json
+import logging
+
+from ....database import get_db
+from ....models.drawing import Drawing
+from ...deps import get_current_user
+from ....models.user import User
+from ....services.tile_pyramid import tile_pyramid_store
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# 瓦片内容以哈希寻址，内容不变，可长期缓存（仅限当前用户的浏览器缓存）
+_TILE_CACHE_HEADERS = {"Cache-Control": "private, max-age=31536000, immutable"}
+
+
+def get_owned_pyramid(
+    drawing_id: int,
+    content_hash: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+) -> str:
+    """
+    校验图纸属于当前用户，且瓦片金字塔由该图纸生成，返回内容哈希
+    """
+    drawing = db.query(Drawing).filter(
+        Drawing.id == drawing_id,
+        Drawing.user_id == current_user.id
+    ).first()
+
+    if not drawing:
+        raise HTTPException(status_code=404, detail="图纸不存在")
+
+    processing_data = drawing.processing_result or {}
+    if isinstance(processing_data, str):
+        try:
+            processing_data = json.loads(processing_data)
+        except json.JSONDecodeError:
+            processing_data = {}
+
+    pyramid_hashes = {pyramid.get("content_hash") for pyramid in processing_data.get("tile_pyramids") or []}
+    if content_hash not in pyramid_hashes:
+        raise HTTPException(status_code=404, detail="瓦片金字塔不存在")
+    return content_hash
+
+
+@router.get("/{drawing_id}/pyramids/{content_hash}/manifest")
+async def get_pyramid_manifest(
+    content_hash: str = Depends(get_owned_pyramid)
+):
+    """
+    获取瓦片金字塔清单（原图尺寸、瓦片尺寸及各级行列数）
+    """
+    manifest = tile_pyramid_store.get_manifest(content_hash)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="瓦片金字塔不存在")
+    return manifest
+
+
+@router.get("/{drawing_id}/pyramids/{content_hash}/{level}/{col}/{row}.png")
+async def get_pyramid_tile(
+    level: int,
+    col: int,
+    row: int,
+    content_hash: str = Depends(get_owned_pyramid)
+):
+    """
+    获取单个瓦片
+    """
+    tile_bytes = tile_pyramid_store.get_tile(content_hash, level, col, row)
+    if tile_bytes is None:
+        raise HTTPException(status_code=404, detail="瓦片不存在")
+    return Response(content=tile_bytes, media_type="image/png", headers=_TILE_CACHE_HEADERS)
+
+
+@router.get("/{drawing_id}/pyramids/{content_hash}/region")
+async def get_pyramid_region(
+    x1: int = Query(..., ge=0),
+    y1: int = Query(..., ge=0),
+    x2: int = Query(..., gt=0),
+    y2: int = Query(..., gt=0),
+    max_dim: int = Query(1024, gt=0, le=4096),
+    content_hash: str = Depends(get_owned_pyramid)
+):
+    """
+    获取原图坐标系下的区域图像，自动选择合适的金字塔级别
+    """
+    region = tile_pyramid_store.get_region(content_hash, (x1, y1, x2, y2), max_dim=max_dim)
+    if region is None:
+        raise HTTPException(status_code=404, detail="区域无效或瓦片金字塔不存在")
+
+    buffer = io.BytesIO()
+    region.save(buffer, format="PNG")
+    return Response(content=buffer.getvalue(), media_type="image/png", headers=_TILE_CACHE_HEADERS)
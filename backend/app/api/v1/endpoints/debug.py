@@ -101,4 +101,13 @@ async def force_recalculate(
         
     except Exception as e:
         logger.error(f"重新计算失败: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"重新计算失败: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"重新计算失败: {str(e)}") 
+
+@router.get("/llm-metrics")
+async def get_llm_metrics(current_user: User = Depends(get_current_user)):
+    """获取当前进程LLM调用的延迟直方图与熔断状态"""
+    from app.services.llm_client import llm_client
+    return {
+        "success": True,
+        "data": llm_client.get_metrics()
+    }
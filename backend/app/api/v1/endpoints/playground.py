@@ -105,7 +105,7 @@ async def playground_chat(
             )
         
         # 创建 OpenAI 客户端
-        client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL or None)
         
         # 准备消息
         messages = [{"role": msg.role, "content": msg.content} for msg in request.messages]
@@ -188,7 +188,7 @@ async def get_available_models(
                 "recommended": ModelConfig.get_recommended_models()
             }
         
-        client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL or None)
         models_response = await client.models.list()
         
         # 过滤出聊天模型
@@ -240,7 +240,7 @@ async def validate_api_key(
                 "model_accessible": False
             }
         
-        client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL or None)
         
         # 发送一个简单的请求来验证 API 密钥
         response = await client.chat.completions.create(
@@ -322,7 +322,7 @@ async def playground_stream_chat(
                 yield f"data: {json.dumps(error_data)}\n\n"
                 return
             
-            client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+            client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL or None)
             messages = [{"role": msg.role, "content": msg.content} for msg in request.messages]
             
             stream = await client.chat.completions.create(
@@ -78,9 +78,19 @@ class Settings(BaseSettings):
     
     # OpenAI API配置
     OPENAI_API_KEY: str = Field("", env="OPENAI_API_KEY")
+    OPENAI_BASE_URL: str = Field("", env="OPENAI_BASE_URL")  # 留空使用官方接口，可指向本地录制/回放服务
     OPENAI_MODEL: str = Field("gpt-4o-2024-11-20", env="OPENAI_MODEL")  # 使用指定的GPT-4o模型
     OPENAI_MAX_TOKENS: int = Field(4000, env="OPENAI_MAX_TOKENS")  # 增加token限制以支持复杂图纸分析
     OPENAI_TEMPERATURE: float = Field(0.1, env="OPENAI_TEMPERATURE")
+    OPENAI_STREAM_ENABLED: bool = Field(False, env="OPENAI_STREAM_ENABLED")  # 流式输出并增量解析构件
+
+    # LLM调用尾延迟控制
+    LLM_CALL_TIMEOUT: float = Field(120.0, env="LLM_CALL_TIMEOUT")  # 单次调用超时（秒）
+    LLM_MAX_RETRIES: int = Field(3, env="LLM_MAX_RETRIES")
+    LLM_HEDGE_ENABLED: bool = Field(False, env="LLM_HEDGE_ENABLED")  # 超过p95时补发对冲请求
+    LLM_BREAKER_FAILURE_THRESHOLD: int = Field(5, env="LLM_BREAKER_FAILURE_THRESHOLD")
+    LLM_BREAKER_COOLDOWN: float = Field(60.0, env="LLM_BREAKER_COOLDOWN")  # 熔断冷却（秒）
+    LLM_DEADLINE_MARGIN: float = Field(120.0, env="LLM_DEADLINE_MARGIN")  # 为软超时前的收尾预留（秒）
     
     # OCR 配置
     TESSERACT_PATH: str = Field("", env="TESSERACT_PATH")  # Tesseract可执行文件路径
@@ -90,12 +100,18 @@ class Settings(BaseSettings):
     # PaddleOCR图像自动调整配置
     PADDLE_OCR_AUTO_RESIZE: bool = Field(True, env="PADDLE_OCR_AUTO_RESIZE")  # 是否启用自动resize
     PADDLE_OCR_TARGET_DPI: int = Field(300, env="PADDLE_OCR_TARGET_DPI")  # 目标DPI
-    PADDLE_OCR_MIN_HEIGHT: int = Field(32, env="PADDLE_OCR_MIN_HEIGHT")  # 最小文字高度像素
+    PADDLE_OCR_TARGET_TEXT_HEIGHT: int = Field(32, env="PADDLE_OCR_TARGET_TEXT_HEIGHT")  # 缩放/栅格化时文字高度的目标像素
+    PADDLE_OCR_MIN_HEIGHT: int = Field(20, env="PADDLE_OCR_MIN_HEIGHT")  # 最小文字高度像素，受尺寸上限限制低于此值时告警
     PADDLE_OCR_MAX_SIZE: int = Field(4096, env="PADDLE_OCR_MAX_SIZE")  # 最大边长限制
     PADDLE_OCR_SMART_SCALE: bool = Field(True, env="PADDLE_OCR_SMART_SCALE")  # 智能缩放
     PADDLE_OCR_CONTRAST_ENHANCE: bool = Field(True, env="PADDLE_OCR_CONTRAST_ENHANCE")  # 对比度增强
     PADDLE_OCR_NOISE_REDUCTION: bool = Field(True, env="PADDLE_OCR_NOISE_REDUCTION")  # 降噪处理
     
+    # OCR结果GPT分析分块配置（超大图纸按区域map-reduce）
+    OCR_GPT_CHUNKING_ENABLED: bool = Field(True, env="OCR_GPT_CHUNKING_ENABLED")  # 是否启用分块分析
+    OCR_GPT_CHUNK_TOKEN_BUDGET: int = Field(6000, env="OCR_GPT_CHUNK_TOKEN_BUDGET")  # 单块OCR文本token预算
+    OCR_GPT_CHUNK_CONCURRENCY: int = Field(3, env="OCR_GPT_CHUNK_CONCURRENCY")  # 分块并发调用上限
+    
     # 图像处理配置
     MAX_IMAGE_SIZE: int = Field(0, env="MAX_IMAGE_SIZE")  # 图像尺寸无限制 (0=无限制，支持超高分辨率建筑图纸)
     IMAGE_QUALITY: int = Field(98, env="IMAGE_QUALITY")  # 图像质量 (提升到98%)
@@ -133,6 +149,61 @@ class Settings(BaseSettings):
     VISION_SLICE_OVERLAP_RATIO: float = Field(0.1, env="VISION_SLICE_OVERLAP_RATIO")
     VISION_SLICE_MIN_SIZE: int = Field(512, env="VISION_SLICE_MIN_SIZE")
     VISION_SLICE_QUALITY: int = Field(95, env="VISION_SLICE_QUALITY")
+    VISION_SLICE_SEAM_AWARE: bool = Field(True, env="VISION_SLICE_SEAM_AWARE")  # 沿空白缝隙选取切线
+    VISION_SLICE_PERSIST_MODE: str = Field("background", env="VISION_SLICE_PERSIST_MODE")  # background/on_demand/none
+    VISION_SLICE_PERSIST_WORKERS: int = Field(8, env="VISION_SLICE_PERSIST_WORKERS")  # 切片并行上传线程数
+
+    # 图纸瓦片金字塔
+    TILE_PYRAMID_ENABLED: bool = Field(True, env="TILE_PYRAMID_ENABLED")
+    TILE_PYRAMID_DIR: str = Field("tile_pyramids", env="TILE_PYRAMID_DIR")
+    TILE_PYRAMID_TILE_SIZE: int = Field(512, env="TILE_PYRAMID_TILE_SIZE")
+    TILE_PYRAMID_UPLOAD_S3: bool = Field(False, env="TILE_PYRAMID_UPLOAD_S3")  # 后台镜像到对象存储
+    TILE_PYRAMID_MAX_MB: int = Field(2048, env="TILE_PYRAMID_MAX_MB")  # 本地金字塔目录容量上限，按LRU淘汰
+    TILE_PYRAMID_BUILD_WORKERS: int = Field(2, env="TILE_PYRAMID_BUILD_WORKERS")  # 后台构建线程数
+
+    # PDF栅格化
+    PDF_RASTER_PAGE_WINDOW: int = Field(2, env="PDF_RASTER_PAGE_WINDOW")  # 每次渲染的页数，决定峰值内存
+    PDF_RASTER_THREADS: int = Field(2, env="PDF_RASTER_THREADS")  # poppler 渲染线程数（不超过页窗口）
+    PDF_ADAPTIVE_DPI: bool = Field(True, env="PDF_ADAPTIVE_DPI")  # 按幅面和文字高度逐页选择DPI
+    PDF_MIN_DPI: int = Field(150, env="PDF_MIN_DPI")
+    PDF_MAX_DPI: int = Field(300, env="PDF_MAX_DPI")
+    PDF_MAX_PAGE_MEGAPIXELS: int = Field(64, env="PDF_MAX_PAGE_MEGAPIXELS")  # 单页像素预算（百万像素）
+    PDF_DPI_PROBE: int = Field(72, env="PDF_DPI_PROBE")  # 文字高度探测渲染DPI
+
+    # 页面栅格表示：gray（8位灰度，默认）、bilevel（1位二值）、color（保留彩色，用于颜色编码图纸）
+    RASTER_PAGE_MODE: str = Field("gray", env="RASTER_PAGE_MODE")
+    RASTER_BILEVEL_THRESHOLD: int = Field(160, env="RASTER_BILEVEL_THRESHOLD")  # 二值化阈值
+    PDF_VECTOR_TEXT_ENABLED: bool = Field(True, env="PDF_VECTOR_TEXT_ENABLED")  # 有矢量文本的页面跳过OCR
+    PDF_VECTOR_TEXT_MIN_CHARS: int = Field(20, env="PDF_VECTOR_TEXT_MIN_CHARS")  # 少于该字符数视为扫描页
+    PDF_VECTOR_TEXT_MAX_GARBLED: float = Field(0.2, env="PDF_VECTOR_TEXT_MAX_GARBLED")  # 乱码字形比例上限
+    PDF_VECTOR_TEXT_VERIFY_OCR: bool = Field(False, env="PDF_VECTOR_TEXT_VERIFY_OCR")  # 矢量页同时跑OCR并统计一致性
+
+    # DXF栅格化
+    DXF_RASTER_DPI: int = Field(200, env="DXF_RASTER_DPI")  # 按出图比例换算到图纸毫米后的分辨率
+    DXF_RASTER_MAX_MEGAPIXELS: int = Field(64, env="DXF_RASTER_MAX_MEGAPIXELS")  # 单个图框像素预算（百万像素）
+    DXF_RASTER_LINE_WIDTH: int = Field(1, env="DXF_RASTER_LINE_WIDTH")  # 线宽（像素）
+
+    # 大DXF流式读取
+    DXF_STREAMING_ENABLED: bool = Field(True, env="DXF_STREAMING_ENABLED")
+    DXF_STREAMING_THRESHOLD_MB: int = Field(100, env="DXF_STREAMING_THRESHOLD_MB")  # 超过该大小按列式流式读取
+    DXF_STREAM_CURVE_TOLERANCE: float = Field(1.0, env="DXF_STREAM_CURVE_TOLERANCE")  # 曲线离散弦高（图形单位）
+
+    # DWG多图框并行处理
+    DWG_FRAME_PARALLEL: bool = Field(True, env="DWG_FRAME_PARALLEL")
+    DWG_FRAME_WORKERS: int = Field(4, env="DWG_FRAME_WORKERS")  # 工作进程数，每个进程同时只处理一个图框
+    DWG_FRAME_PARALLEL_MIN_FRAMES: int = Field(2, env="DWG_FRAME_PARALLEL_MIN_FRAMES")  # 少于该图框数时串行
+    DWG_FRAME_MIN_SCORE: float = Field(2.0, env="DWG_FRAME_MIN_SCORE")  # 图框标准符合度最低分，低于该分的图幅尺寸矩形不作为图框
+    VECTOR_TAKEOFF_ENABLED: bool = Field(True, env="VECTOR_TAKEOFF_ENABLED")  # 按图层/块直接从几何提取工程量
+    VECTOR_TAKEOFF_WALL_HEIGHT: float = Field(3000.0, env="VECTOR_TAKEOFF_WALL_HEIGHT")  # 墙面积计算用层高(mm)
+
+    # DWG→DXF转换
+    DWG_CACHE_ENABLED: bool = Field(True, env="DWG_CACHE_ENABLED")  # 按DWG内容哈希缓存转换结果
+    DWG_CACHE_DIR: str = Field("dwg_cache", env="DWG_CACHE_DIR")
+    DWG_CACHE_MAX_MB: int = Field(2048, env="DWG_CACHE_MAX_MB")  # 本地缓存容量，超出后按最近使用淘汰
+    DWG_CACHE_S3: bool = Field(False, env="DWG_CACHE_S3")  # 缓存镜像到对象存储，多实例共享
+    DWG_CONVERT_WORKERS: int = Field(4, env="DWG_CONVERT_WORKERS")  # 批量转换并行数
+    DWG_CONVERT_MAX_PROCESSES: int = Field(2, env="DWG_CONVERT_MAX_PROCESSES")  # 同时运行的ODA子进程上限
+    DWG_CONVERT_TIMEOUT: int = Field(300, env="DWG_CONVERT_TIMEOUT")  # 单个ODA转换超时(秒)
 
     class Config:
         case_sensitive = True
@@ -5,6 +5,7 @@
 
 import os
 import json
+import math
 import time
 from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass, asdict
@@ -59,6 +60,127 @@ class AdaptiveSliceInfo:
     priority: str  # high, medium, low
     base64_data: Optional[str] = None
 
+class InkIntegralImage:
+    """
+    墨迹掩码积分图（summed-area table）
+    
+    构建一次后，任意矩形内的墨迹像素数均可 O(1) 查询；超大图按块累加降采样后再建表，
+    查询坐标仍使用原图像素坐标。
+    """
+    
+    def __init__(self, mask: np.ndarray, max_dim: int = 2048):
+        height, width = mask.shape[:2]
+        self.height = height
+        self.width = width
+        self.scale = max(1, int(math.ceil(max(height, width) / max_dim)))
+        
+        f = self.scale
+        if f > 1:
+            padded = np.pad(mask.astype(np.uint8), ((0, -height % f), (0, -width % f)))
+            cells = padded.reshape(padded.shape[0] // f, f, padded.shape[1] // f, f).sum(
+                axis=(1, 3), dtype=np.int64)
+        else:
+            cells = mask.astype(np.int64)
+        
+        self.integral = np.zeros((cells.shape[0] + 1, cells.shape[1] + 1), dtype=np.int64)
+        np.cumsum(np.cumsum(cells, axis=0), axis=1, out=self.integral[1:, 1:])
+    
+    @classmethod
+    def from_gray(cls, gray: np.ndarray, use_edges: bool = False, ink_threshold: int = 160,
+                  max_dim: int = 2048) -> "InkIntegralImage":
+        """由灰度图构建：use_edges 时以Canny边缘为墨迹，否则以暗像素为墨迹"""
+        if use_edges:
+            mask = cv2.Canny(gray, 50, 150) > 0
+        else:
+            mask = gray < ink_threshold
+        return cls(mask, max_dim=max_dim)
+    
+    def _cell(self, value: float, limit: int) -> int:
+        return int(min(max(round(value / self.scale), 0), limit))
+    
+    def ink(self, x0: int, y0: int, x1: int, y1: int) -> int:
+        """矩形 [x0, x1) × [y0, y1) 内的墨迹像素数"""
+        rows, cols = self.integral.shape
+        cx0, cx1 = self._cell(x0, cols - 1), self._cell(x1, cols - 1)
+        cy0, cy1 = self._cell(y0, rows - 1), self._cell(y1, rows - 1)
+        ii = self.integral
+        return int(ii[cy1, cx1] - ii[cy0, cx1] - ii[cy1, cx0] + ii[cy0, cx0])
+    
+    def density(self, x0: int, y0: int, x1: int, y1: int) -> float:
+        """矩形内墨迹像素占比"""
+        area = max(1, (x1 - x0) * (y1 - y0))
+        return self.ink(x0, y0, x1, y1) / area
+    
+    def grid_density(self, x0: int, y0: int, x1: int, y1: int, cells: int) -> np.ndarray:
+        """将矩形均分为 cells×cells 网格，向量化返回各格墨迹占比"""
+        rows, cols = self.integral.shape
+        xs = np.array([self._cell(v, cols - 1) for v in np.linspace(x0, x1, cells + 1)])
+        ys = np.array([self._cell(v, rows - 1) for v in np.linspace(y0, y1, cells + 1)])
+        ii = self.integral
+        sums = (ii[np.ix_(ys[1:], xs[1:])] - ii[np.ix_(ys[:-1], xs[1:])]
+                - ii[np.ix_(ys[1:], xs[:-1])] + ii[np.ix_(ys[:-1], xs[:-1])])
+        areas = np.outer(np.diff(ys), np.diff(xs)) * self.scale * self.scale
+        return sums / np.maximum(areas, 1)
+    
+    def line_profile(self, axis: int, band_start: int, band_end: int) -> np.ndarray:
+        """
+        沿指定轴的墨迹分布（按降采样单元），只统计 [band_start, band_end) 范围内的墨迹
+        
+        axis=0: 返回每一行的墨迹（用于选水平切线）；axis=1: 返回每一列的墨迹（用于选竖直切线）
+        """
+        ii = self.integral
+        if axis == 0:
+            c0, c1 = self._cell(band_start, ii.shape[1] - 1), self._cell(band_end, ii.shape[1] - 1)
+            cumulative = ii[:, c1] - ii[:, c0]
+        else:
+            c0, c1 = self._cell(band_start, ii.shape[0] - 1), self._cell(band_end, ii.shape[0] - 1)
+            cumulative = ii[c1, :] - ii[c0, :]
+        return np.diff(cumulative)
+    
+    def find_cuts(self, axis: int, start: int, end: int, band_start: int, band_end: int,
+                  tile_size: int, overlap: int, min_overlap: int = 0,
+                  search_ratio: float = 0.25) -> List[Tuple[int, int]]:
+        """
+        在名义切分位置附近寻找墨迹最少的缝隙作为切线，返回各切片的 (起点, 终点)
+        
+        重叠区以切线为中心：切线落在空白缝隙上时只保留 min_overlap 重叠，
+        否则保留完整 overlap；每个切片长度不超过 tile_size。
+        """
+        min_overlap = min(min_overlap, overlap)
+        search = max(self.scale, int(tile_size * search_ratio))
+        profile = self.line_profile(axis, band_start, band_end)
+        prefix = np.concatenate(([0], np.cumsum(profile)))
+        seam_cells = max(1, int(math.ceil(4 / self.scale)))
+        
+        spans = []
+        span_start = start
+        while end - span_start > tile_size:
+            limit = span_start + tile_size
+            lo = max(span_start + tile_size // 2, limit - overlap - search)
+            hi = limit - (min_overlap - min_overlap // 2)
+            candidates = np.arange(int(math.ceil(lo / self.scale)), int(hi // self.scale) + 1)
+            
+            cut, cut_overlap = limit - (overlap - overlap // 2), overlap
+            if len(candidates):
+                left = np.clip(candidates - seam_cells, 0, len(profile))
+                right = np.clip(candidates + seam_cells, 0, len(profile))
+                seam_ink = prefix[right] - prefix[left]
+                required = np.where(seam_ink == 0, min_overlap, overlap)
+                positions = candidates * self.scale
+                valid = positions + (required - required // 2) <= limit
+                if valid.any():
+                    # 墨迹最少优先，其次尽量靠后（减少切片数）
+                    order = np.lexsort((-positions[valid], seam_ink[valid]))
+                    best = np.flatnonzero(valid)[order[0]]
+                    cut, cut_overlap = int(positions[best]), int(required[best])
+            
+            spans.append((span_start, min(end, cut + cut_overlap - cut_overlap // 2)))
+            span_start = max(span_start + 1, cut - cut_overlap // 2)
+        
+        spans.append((span_start, end))
+        return spans
+
+
 class AdaptiveSlicingEngine:
     """自适应切片引擎"""
     
@@ -72,8 +194,12 @@ class AdaptiveSlicingEngine:
         try:
             logger.info(f"🔄 开始自适应切片分析: {image_path}")
             
+            gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+            if gray is None:
+                return {"success": False, "error": "无法读取图像"}
+            
             # 1. 图框检测与边界提取
-            frame_result = self._detect_drawing_frame(image_path)
+            frame_result = self._detect_drawing_frame(image_path, gray=gray)
             if frame_result["success"]:
                 content_bounds = frame_result["frame_bounds"]
                 logger.info(f"📐 检测到图框边界: {content_bounds['width']}x{content_bounds['height']}")
@@ -81,8 +207,9 @@ class AdaptiveSlicingEngine:
                 logger.error(f"❌ 图框检测失败: {frame_result.get('error')}")
                 return {"success": False, "error": "图框检测失败"}
                 
-            # 2. 内容密度分析
-            density_map = self._analyze_content_density(image_path, content_bounds)
+            # 2. 内容密度分析（图框内墨迹积分图只构建一次，后续密度查询与切线选择复用）
+            ink_index = self._build_ink_index(gray, content_bounds)
+            density_map = self._analyze_content_density(image_path, content_bounds, ink_index=ink_index)
             logger.info(f"📊 内容密度分析完成: {density_map.density_ratio:.3f}")
             
             # 3. 动态切片策略
@@ -91,7 +218,7 @@ class AdaptiveSlicingEngine:
             
             # 4. 生成自适应切片
             slices = self._generate_adaptive_slices(
-                image_path, content_bounds, slice_strategy, output_dir
+                image_path, content_bounds, slice_strategy, output_dir, ink_index=ink_index
             )
             
             logger.info(f"✅ 自适应切片完成: 生成 {len(slices)} 个切片")
@@ -103,21 +230,21 @@ class AdaptiveSlicingEngine:
                 "slices": [asdict(s) for s in slices],
                 "frame_detected": frame_result["success"],
                 "content_density": asdict(density_map),
-                "adaptive_method": "frame_and_density_based"
+                "adaptive_method": "frame_and_density_based_seam_aware"
             }
             
         except Exception as e:
             logger.error(f"❌ 自适应切片失败: {e}")
             return {"success": False, "error": str(e)}
     
-    def _detect_drawing_frame(self, image_path: str) -> Dict[str, Any]:
+    def _detect_drawing_frame(self, image_path: str, gray: np.ndarray = None) -> Dict[str, Any]:
         """检测图纸图框边界"""
         try:
-            image = cv2.imread(image_path)
-            if image is None:
+            if gray is None:
+                gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+            if gray is None:
                 return {"success": False, "error": "无法读取图像"}
             
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             height, width = gray.shape
             
             # 边缘检测 + 矩形轮廓查找
@@ -173,41 +300,44 @@ class AdaptiveSlicingEngine:
             logger.error(f"❌ 图框检测失败: {e}")
             return {"success": False, "error": str(e)}
     
-    def _analyze_content_density(self, image_path: str, bounds: Dict) -> ContentDensity:
+    def _build_ink_index(self, gray: np.ndarray, bounds: Dict) -> InkIntegralImage:
+        """对图框区域做一次Canny，构建边缘墨迹积分图（坐标相对图框左上角）"""
+        x, y, w, h = bounds["x"], bounds["y"], bounds["width"], bounds["height"]
+        return InkIntegralImage.from_gray(gray[y:y+h, x:x+w], use_edges=True)
+    
+    def _analyze_content_density(self, image_path: str, bounds: Dict,
+                                 ink_index: InkIntegralImage = None) -> ContentDensity:
         """分析指定区域的内容密度"""
         try:
-            image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+            if ink_index is None:
+                gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+                ink_index = self._build_ink_index(gray, bounds)
             
             x, y, w, h = bounds["x"], bounds["y"], bounds["width"], bounds["height"]
-            roi = image[y:y+h, x:x+w]
-            
-            edges = cv2.Canny(roi, 50, 150)
             total_pixels = w * h
-            content_pixels = np.count_nonzero(edges)
+            content_pixels = ink_index.ink(0, 0, w, h)
             overall_density = content_pixels / total_pixels
             
-            # 网格密度分析
+            # 网格密度分析（积分图向量化查询）
             high_density_regions = []
             low_density_regions = []
             
-            grid_h = h // self.grid_size
-            grid_w = w // self.grid_size
+            grid_w = w / self.grid_size
+            grid_h = h / self.grid_size
+            grid = ink_index.grid_density(0, 0, w, h, self.grid_size)
             
-            for i in range(0, h, grid_h):
-                for j in range(0, w, grid_w):
-                    grid_roi = edges[i:i+grid_h, j:j+grid_w]
-                    grid_density = np.count_nonzero(grid_roi) / (grid_h * grid_w)
-                    
-                    region_info = {
-                        "x": x + j, "y": y + i,
-                        "width": grid_w, "height": grid_h,
-                        "density": grid_density
-                    }
-                    
-                    if grid_density > overall_density * 1.5:
-                        high_density_regions.append(region_info)
-                    elif grid_density < overall_density * 0.5:
-                        low_density_regions.append(region_info)
+            for (i, j), grid_density in np.ndenumerate(grid):
+                if overall_density * 0.5 <= grid_density <= overall_density * 1.5:
+                    continue
+                region_info = {
+                    "x": x + int(j * grid_w), "y": y + int(i * grid_h),
+                    "width": int(grid_w), "height": int(grid_h),
+                    "density": float(grid_density)
+                }
+                if grid_density > overall_density * 1.5:
+                    high_density_regions.append(region_info)
+                else:
+                    low_density_regions.append(region_info)
             
             return ContentDensity(
                 total_area=total_pixels,
@@ -280,45 +410,41 @@ class AdaptiveSlicingEngine:
             )
     
     def _generate_adaptive_slices(self, image_path: str, bounds: Dict, strategy: SliceStrategy, 
-                                output_dir: str) -> List[AdaptiveSliceInfo]:
-        """生成自适应切片"""
+                                output_dir: str, ink_index: InkIntegralImage = None) -> List[AdaptiveSliceInfo]:
+        """生成自适应切片（切线沿名义边界附近的低墨迹缝隙选取）"""
         
         os.makedirs(output_dir, exist_ok=True)
         
         image = Image.open(image_path)
         x, y, w, h = bounds["x"], bounds["y"], bounds["width"], bounds["height"]
         roi = image.crop((x, y, x + w, y + h))
+        if ink_index is None:
+            ink_index = self._build_ink_index(np.array(image.convert('L')), bounds)
         
         slices = []
         slice_size = strategy.slice_size
         overlap = strategy.overlap
-        step = slice_size - overlap
+        # 切线落在空白缝隙上时，重叠区可缩小到原来的1/4
+        min_overlap = overlap // 4
         
-        rows = max(1, (h - overlap) // step)
-        cols = max(1, (w - overlap) // step)
+        row_spans = ink_index.find_cuts(0, 0, h, 0, w, slice_size, overlap, min_overlap)
         
         slice_id = 0
-        for row in range(rows):
-            for col in range(cols):
-                slice_x = col * step
-                slice_y = row * step
-                
-                slice_w = min(slice_size, w - slice_x)
-                slice_h = min(slice_size, h - slice_y)
-                
-                if slice_w < slice_size // 2 or slice_h < slice_size // 2:
-                    continue
+        for row, (slice_y, slice_y_end) in enumerate(row_spans):
+            col_spans = ink_index.find_cuts(1, 0, w, slice_y, slice_y_end,
+                                            slice_size, overlap, min_overlap)
+            for col, (slice_x, slice_x_end) in enumerate(col_spans):
+                slice_w = slice_x_end - slice_x
+                slice_h = slice_y_end - slice_y
                 
-                slice_img = roi.crop((slice_x, slice_y, slice_x + slice_w, slice_y + slice_h))
+                slice_img = roi.crop((slice_x, slice_y, slice_x_end, slice_y_end))
                 
                 filename = f"adaptive_slice_{row}_{col}.png"
                 slice_path = os.path.join(output_dir, filename)
                 slice_img.save(slice_path)
                 
-                # 计算切片内容密度
-                slice_array = np.array(slice_img.convert('L'))
-                edges = cv2.Canny(slice_array, 50, 150)
-                content_density = np.count_nonzero(edges) / (slice_w * slice_h)
+                # 计算切片内容密度（O(1) 积分图查询）
+                content_density = ink_index.density(slice_x, slice_y, slice_x_end, slice_y_end)
                 
                 # 确定优先级
                 if content_density > 0.1:
@@ -348,4 +474,4 @@ class AdaptiveSlicingEngine:
         # 按优先级排序
         slices.sort(key=lambda s: (s.priority == "low", s.priority == "medium", s.priority == "high"))
         
-        return slices 
\ No newline at end of file
+        return slices
@@ -29,7 +29,7 @@ class AIAnalyzerCore:
             self.client = None
             logger.warning("⚠️ OpenAI或配置不可用，AI分析服务将处于禁用状态。")
         else:
-            self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+            self.client = OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL or None)
             logger.info("✅ AI Analyzer Core initialized successfully with OpenAI client.")
         
         # 简化交互记录器初始化
@@ -10,6 +10,7 @@ AI分析模块 - 智能分析服务的模块化实现
 - VisionAnalyzer: 视觉分析器
 - ResponseProcessor: 响应处理器
 - ContextManager: 上下文管理器
+- IncrementalComponentParser: 流式响应增量解析器
 - AIAnalyzerCore: 核心协调器
 
 使用示例:
@@ -24,6 +25,7 @@ from .prompt_builder import PromptBuilder
 from .vision_analyzer import VisionAnalyzer
 from .response_processor import ResponseProcessor
 from .context_manager import ContextManager
+from .streaming_parser import IncrementalComponentParser, stream_chat_completion, stream_component_sink
 from .ai_analyzer_core import AIAnalyzerCore
 
 __all__ = [
@@ -32,6 +34,9 @@ __all__ = [
     'VisionAnalyzer',
     'ResponseProcessor',
     'ContextManager',
+    'IncrementalComponentParser',
+    'stream_chat_completion',
+    'stream_component_sink',
     'AIAnalyzerCore'
 ]
 
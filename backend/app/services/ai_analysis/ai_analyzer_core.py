@@ -4,6 +4,7 @@
 AI分析器核心 - 整合所有AI分析功能的核心协调器
 """
 import logging
+import json
 import asyncio
 from typing import Dict, Any, List, Optional
 
@@ -13,6 +14,8 @@ from .prompt_builder import PromptBuilder
 from .vision_analyzer import VisionAnalyzer
 from .response_processor import ResponseProcessor
 from .context_manager import ContextManager
+from .streaming_parser import stream_chat_completion
+from app.services.llm_client import llm_client
 
 logger = logging.getLogger(__name__)
 
@@ -67,6 +70,8 @@ class AIAnalyzerCore:
             
             # 3. 处理响应
             result = self.response_processor.process_qto_response(response["content"])
+            if "stream_metrics" in response:
+                result["stream_metrics"] = response["stream_metrics"]
             
             logger.info("✅ 基于OCR数据的QTO生成完成")
             return result
@@ -191,12 +196,12 @@ class AIAnalyzerCore:
             logger.error(f"❌ 异步文本分析异常: {e}")
             return {"error": str(e)}
     
-    def _make_api_call(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
-        """执行标准API调用"""
+    def _make_api_call(self, system_prompt: str, user_prompt: str, stream: bool = None) -> Dict[str, Any]:
+        """执行标准API调用（stream=True 时增量解析构件）"""
         try:
             from app.core.config import settings
             
-            response = self.client.chat.completions.create(
+            request_kwargs = dict(
                 model=settings.OPENAI_MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -207,6 +212,33 @@ class AIAnalyzerCore:
                 response_format={"type": "json_object"}
             )
             
+            if stream is None:
+                stream = getattr(settings, "OPENAI_STREAM_ENABLED", False)
+            
+            if stream:
+                # 流式调用不做对冲
+                streamed = llm_client.call(
+                    "qto_from_data",
+                    lambda timeout: stream_chat_completion(
+                        llm_client.with_timeout(self.client, timeout),
+                        call_name="qto_from_data",
+                        **request_kwargs
+                    ),
+                    hedge=False
+                )
+                content = streamed["content"]
+                # 被截断时以已闭合的构件重建可解析的JSON
+                if streamed["parsed"].get("_truncated"):
+                    content = json.dumps(streamed["parsed"], ensure_ascii=False)
+                return {
+                    "success": True,
+                    "content": content,
+                    "finish_reason": streamed["finish_reason"],
+                    "stream_metrics": streamed["stream_metrics"]
+                }
+            
+            response = llm_client.create(self.client, "qto_from_data", **request_kwargs)
+            
             return {"success": True, "content": response.choices[0].message.content}
             
         except Exception as e:
@@ -227,8 +259,11 @@ class AIAnalyzerCore:
                     max_tokens=2048  # 增加max_tokens确保输出完整
                 )
             else:
-                # 回退到同步调用
-                response = self.client.chat.completions.create(
+                # 回退到同步调用（放入线程执行，避免阻塞事件循环，便于并发分块分析）
+                response = await asyncio.to_thread(
+                    llm_client.create,
+                    self.client,
+                    "analyze_text",
                     model=settings.OPENAI_MODEL,
                     messages=[{"role": "user", "content": prompt}],
                     temperature=settings.OPENAI_TEMPERATURE,
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式响应解析器 - 负责GPT流式输出的增量JSON解析
+
+在模型仍在生成时，逐个识别并输出 components 数组中已闭合的构件对象，
+使下游合并与WebSocket进度推送可以提前开始；即使响应因 max_tokens 被截断，
+也能保留所有已完整输出的构件。
+"""
+import contextvars
+import logging
+import json
+import re
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, List, Optional, Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StreamMetrics:
+    """单次流式调用的耗时统计"""
+    call_name: str = ""
+    time_to_first_token: float = 0.0
+    time_to_first_component: float = 0.0
+    total_latency: float = 0.0
+    chunk_count: int = 0
+    component_count: int = 0
+    finish_reason: str = ""
+    truncated: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+# 当前任务的流式构件回调（如WebSocket进度推送），分析器层层构造时无需逐级传递
+_component_sink: contextvars.ContextVar = contextvars.ContextVar("stream_component_sink", default=None)
+
+
+@contextmanager
+def stream_component_sink(callback: Optional[Callable[[Dict[str, Any]], None]]):
+    """
+    在上下文中注册流式构件回调
+
+    上下文内未显式传入 on_component 的流式调用，都会把新闭合的构件交给该回调。
+    """
+    token = _component_sink.set(callback)
+    try:
+        yield
+    finally:
+        _component_sink.reset(token)
+
+
+class IncrementalComponentParser:
+    """
+    增量JSON解析器
+
+    按字符维护字符串/转义状态和容器栈，当目标数组（默认 ``components``）
+    中的某个对象闭合时立即解析并返回该对象。
+    """
+
+    def __init__(self, array_key: str = "components"):
+        self.array_key = array_key
+        self.components: List[Dict[str, Any]] = []
+
+        self._pos = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._last_string = None
+        self._pending_key = None
+        # 容器栈：每项为 (开括号字符, 是否为目标数组)
+        self._stack: List[tuple] = []
+        self._element_start = -1
+        self._text = ""
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """追加一段增量文本，返回本次新闭合的构件"""
+        if not chunk:
+            return []
+
+        self._text += chunk
+        new_components = []
+
+        text = self._text
+        while self._pos < len(text):
+            ch = text[self._pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start + 1:self._pos]
+            elif ch == '"':
+                self._in_string = True
+                self._string_start = self._pos
+            elif ch == ':':
+                self._pending_key = self._last_string
+            elif ch in '{[':
+                is_target = ch == '[' and self._pending_key == self.array_key
+                # 目标数组的直接子对象开始
+                if self._stack and self._stack[-1][1] and ch == '{':
+                    self._element_start = self._pos
+                self._stack.append((ch, is_target))
+                self._pending_key = None
+            elif ch in '}]':
+                if self._stack:
+                    self._stack.pop()
+                    if (ch == '}' and self._element_start >= 0
+                            and self._stack and self._stack[-1][1]):
+                        component = self._parse_element(text[self._element_start:self._pos + 1])
+                        if component is not None:
+                            self.components.append(component)
+                            new_components.append(component)
+                        self._element_start = -1
+                self._pending_key = None
+            elif ch == ',':
+                self._pending_key = None
+
+            self._pos += 1
+
+        return new_components
+
+    def get_text(self) -> str:
+        """返回已接收的完整文本"""
+        return self._text
+
+    def finish(self) -> Dict[str, Any]:
+        """
+        结束解析，返回最终结果
+
+        完整JSON可解析时返回原始结构；被截断时返回已闭合的构件，并标记 ``_truncated``。
+        """
+        parsed = self._try_parse_full(self._text)
+        if parsed is not None:
+            return parsed
+
+        logger.warning(f"⚠️ 流式响应不完整，保留已闭合构件 {len(self.components)} 个")
+        return {self.array_key: list(self.components), "_truncated": True}
+
+    @staticmethod
+    def _parse_element(fragment: str) -> Optional[Dict[str, Any]]:
+        try:
+            value = json.loads(fragment)
+            return value if isinstance(value, dict) else None
+        except json.JSONDecodeError as e:
+            logger.debug(f"构件片段解析失败: {e}")
+            return None
+
+    @staticmethod
+    def _try_parse_full(text: str) -> Optional[Dict[str, Any]]:
+        cleaned = text.strip()
+        json_match = re.search(r'```json\s*(.*?)\s*```', cleaned, re.DOTALL)
+        if json_match:
+            cleaned = json_match.group(1).strip()
+        try:
+            value = json.loads(cleaned)
+            return value if isinstance(value, dict) else None
+        except json.JSONDecodeError:
+            return None
+
+
+def stream_chat_completion(client, call_name: str = "",
+                           on_component: Optional[Callable[[Dict[str, Any]], None]] = None,
+                           array_key: str = "components",
+                           **request_kwargs) -> Dict[str, Any]:
+    """
+    以 ``stream=True`` 执行一次 chat completion，并增量解析构件
+
+    Returns:
+        {"content": 原始文本, "parsed": 最终JSON, "components": 已闭合构件,
+         "finish_reason": ..., "stream_metrics": {...}}
+    """
+    on_component = on_component or _component_sink.get()
+    metrics = StreamMetrics(call_name=call_name)
+    parser = IncrementalComponentParser(array_key=array_key)
+    start_time = time.time()
+
+    stream = client.chat.completions.create(stream=True, **request_kwargs)
+
+    for chunk in _iter_stream(stream):
+        choices = getattr(chunk, "choices", None) or []
+        if not choices:
+            continue
+
+        choice = choices[0]
+        if getattr(choice, "finish_reason", None):
+            metrics.finish_reason = choice.finish_reason
+
+        delta = getattr(choice, "delta", None)
+        content = getattr(delta, "content", None) if delta is not None else None
+        if not content:
+            continue
+
+        metrics.chunk_count += 1
+        if metrics.chunk_count == 1:
+            metrics.time_to_first_token = time.time() - start_time
+
+        for component in parser.feed(content):
+            if not metrics.time_to_first_component:
+                metrics.time_to_first_component = time.time() - start_time
+            if on_component:
+                try:
+                    on_component(component)
+                except Exception as e:
+                    logger.warning(f"⚠️ 构件回调执行失败: {e}")
+
+    parsed = parser.finish()
+    metrics.total_latency = time.time() - start_time
+    metrics.component_count = len(parser.components)
+    metrics.truncated = bool(parsed.get("_truncated")) or metrics.finish_reason == "length"
+
+    logger.info(
+        f"⚡ 流式调用 {call_name}: 首token {metrics.time_to_first_token:.2f}s, "
+        f"首构件 {metrics.time_to_first_component:.2f}s, 总耗时 {metrics.total_latency:.2f}s, "
+        f"构件 {metrics.component_count} 个, finish_reason={metrics.finish_reason}"
+    )
+
+    return {
+        "content": parser.get_text(),
+        "parsed": parsed,
+        "components": list(parser.components),
+        "finish_reason": metrics.finish_reason,
+        "stream_metrics": metrics.to_dict()
+    }
+
+
+def _iter_stream(stream) -> Iterable[Any]:
+    """兼容OpenAI流对象与普通可迭代对象"""
+    try:
+        for chunk in stream:
+            yield chunk
+    finally:
+        close = getattr(stream, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
@@ -9,6 +9,9 @@ import time
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 
+from .streaming_parser import stream_chat_completion
+from app.services.llm_client import llm_client
+
 logger = logging.getLogger(__name__)
 
 class VisionAnalyzer:
@@ -146,32 +149,25 @@ class VisionAnalyzer:
             
             from app.core.config import settings
             
-            response = self.client.chat.completions.create(
-                model=settings.OPENAI_MODEL,
-                messages=[
+            request_body = {
+                "model": settings.OPENAI_MODEL,
+                "messages": [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_content}
                 ],
-                temperature=settings.OPENAI_TEMPERATURE,
-                max_tokens=settings.OPENAI_MAX_TOKENS,
-                response_format={"type": "json_object"}
-            )
-            
-            response_content = response.choices[0].message.content
+                "temperature": settings.OPENAI_TEMPERATURE,
+                "max_tokens": settings.OPENAI_MAX_TOKENS,
+                "response_format": {"type": "json_object"}
+            }
+            response_content, streamed = self._create_completion(step_name, **request_body)
             
-            # 记录交互
+            # 记录交互（记录实际请求体，便于导入回放录制文件）
             if self.interaction_logger:
                 try:
                     self.interaction_logger.log_api_call(
                         session_id=f"{task_id}_{step_name}",
                         step_name=step_name,
-                        request_data={
-                            "model": settings.OPENAI_MODEL,
-                            "messages": [
-                                {"role": "system", "content": system_prompt},
-                                {"role": "user", "content": "图像分析请求"}
-                            ]
-                        },
+                        request_data=request_body,
                         response_data={"content": response_content},
                         task_id=task_id,
                         drawing_id=drawing_id
@@ -180,6 +176,9 @@ class VisionAnalyzer:
                     logger.warning(f"⚠️ 交互记录失败: {e}")
             
             # 解析响应
+            if streamed is not None:
+                logger.info(f"✅ {step_name} 执行成功（流式）")
+                return {"success": True, "response": streamed["parsed"], "stream_metrics": streamed["stream_metrics"]}
             try:
                 parsed_response = json.loads(response_content)
                 logger.info(f"✅ {step_name} 执行成功")
@@ -352,23 +351,22 @@ class VisionAnalyzer:
             # 只使用最新的系统消息和用户消息
             messages = conversation_messages[-2:] if len(conversation_messages) >= 2 else conversation_messages
             
-            response = self.client.chat.completions.create(
-                model=settings.OPENAI_MODEL,
-                messages=messages,
-                temperature=settings.OPENAI_TEMPERATURE,
-                max_tokens=settings.OPENAI_MAX_TOKENS,
-                response_format={"type": "json_object"}
-            )
-            
-            response_content = response.choices[0].message.content
+            request_body = {
+                "model": settings.OPENAI_MODEL,
+                "messages": messages,
+                "temperature": settings.OPENAI_TEMPERATURE,
+                "max_tokens": settings.OPENAI_MAX_TOKENS,
+                "response_format": {"type": "json_object"}
+            }
+            response_content, streamed = self._create_completion(step_name, **request_body)
             
-            # 记录交互
+            # 记录交互（记录实际请求体，便于导入回放录制文件）
             if self.interaction_logger:
                 try:
                     self.interaction_logger.log_api_call(
                         session_id=f"{task_id}_{step_name}",
                         step_name=step_name,
-                        request_data={"messages": messages},
+                        request_data=request_body,
                         response_data={"content": response_content},
                         task_id=task_id,
                         drawing_id=drawing_id
@@ -377,6 +375,8 @@ class VisionAnalyzer:
                     logger.warning(f"⚠️ 交互记录失败: {e}")
             
             # 解析响应
+            if streamed is not None:
+                return {"success": True, "response": streamed["parsed"], "stream_metrics": streamed["stream_metrics"]}
             try:
                 parsed_response = json.loads(response_content)
                 return {"success": True, "response": parsed_response}
@@ -387,10 +387,39 @@ class VisionAnalyzer:
             logger.error(f"❌ {step_name} API调用失败: {e}")
             return {"error": str(e)}
     
+    def _create_completion(self, step_name: str, **request_kwargs) -> tuple:
+        """
+        执行chat completion调用
+        
+        Returns:
+            (原始响应文本, 流式调用结果)；流式结果含 parsed 与 stream_metrics，非流式模式下第二项为None
+        """
+        from app.core.config import settings
+        
+        if not getattr(settings, "OPENAI_STREAM_ENABLED", False):
+            response = llm_client.create(self.client, f"vision.{step_name}", **request_kwargs)
+            return response.choices[0].message.content, None
+        
+        streamed = llm_client.call(
+            f"vision.{step_name}",
+            lambda timeout: stream_chat_completion(
+                llm_client.with_timeout(self.client, timeout),
+                call_name=step_name,
+                **request_kwargs
+            ),
+            hedge=False
+        )
+        return streamed["content"], streamed
+    
     def _merge_multi_turn_results(self, results: List[Dict]) -> Dict[str, Any]:
         """合并多轮分析结果"""
         merged = {"success": True, "turns": len(results)}
         
+        # 流式模式下各轮的首token/首构件耗时
+        stream_metrics = [result["stream_metrics"] for result in results if "stream_metrics" in result]
+        if stream_metrics:
+            merged["stream_metrics"] = stream_metrics
+        
         # 提取每轮的响应数据
         responses = []
         for i, result in enumerate(results):
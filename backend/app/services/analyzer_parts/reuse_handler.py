@@ -239,7 +239,7 @@ class ReuseHandler:
             
             for i, slice_data in enumerate(slice_infos):
                 try:
-                    slice_image_data = base64.b64decode(slice_data.base64_data)
+                    slice_image_data = base64.b64decode(slice_data.load_base64())
                     temp_slice_file = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
                     temp_slice_file.write(slice_image_data)
                     temp_slice_file.close()
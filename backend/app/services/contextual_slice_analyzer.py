@@ -150,6 +150,16 @@ class ContextualSliceAnalyzer:
         """如果需要，创建缩略图"""
         try:
             from PIL import Image
+            from app.services.tile_pyramid import tile_pyramid_store
+            
+            # 已有瓦片金字塔时由粗级瓦片拼接，无需解码整页
+            manifest = tile_pyramid_store.lookup(image_path)
+            if manifest is not None and max(manifest["width"], manifest["height"]) > max_size:
+                pyramid_image = tile_pyramid_store.get_image(manifest["content_hash"], max_size)
+                thumbnail_path = image_path.replace('.', '_thumbnail.')
+                pyramid_image.save(thumbnail_path)
+                logger.info(f"📷 由瓦片金字塔创建缩略图: {thumbnail_path}")
+                return thumbnail_path
             
             with Image.open(image_path) as img:
                 # 如果图像太大，创建缩略图
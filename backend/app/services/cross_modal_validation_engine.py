@@ -11,6 +11,8 @@ from dataclasses import dataclass, asdict
 import asyncio
 import logging
 
+from app.services.spatial_alignment import optimal_alignment
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -55,44 +57,23 @@ class SpatialAlignmentEngine:
         try:
             logger.info(f"🔄 开始跨模态空间对齐: OCR {len(ocr_elements)} vs Vision {len(vision_elements)}")
             
-            matched_pairs = []
-            ocr_matched = set()
-            vision_matched = set()
-            
-            # 基于空间位置匹配元素
-            for i, ocr_elem in enumerate(ocr_elements):
-                best_match = None
-                best_score = 0.0
-                best_j = -1
-                
-                for j, vision_elem in enumerate(vision_elements):
-                    if j in vision_matched:
-                        continue
-                    
-                    # 计算空间匹配度
-                    spatial_score = self._calculate_spatial_similarity(ocr_elem, vision_elem)
-                    
-                    # 计算语义匹配度
-                    semantic_score = self._calculate_semantic_similarity(ocr_elem, vision_elem)
-                    
-                    # 综合匹配度
-                    overall_score = spatial_score * 0.7 + semantic_score * 0.3
-                    
-                    if overall_score > best_score and overall_score > 0.5:
-                        best_score = overall_score
-                        best_match = vision_elem
-                        best_j = j
-                
-                if best_match is not None:
-                    matched_pairs.append({
-                        "ocr_element": ocr_elem,
-                        "vision_element": best_match,
-                        "match_confidence": best_score,
-                        "ocr_index": i,
-                        "vision_index": best_j
-                    })
-                    ocr_matched.add(i)
-                    vision_matched.add(best_j)
+            # 网格候选对 + 连通分量上的最优指派（见 spatial_alignment）
+            alignment = optimal_alignment(
+                ocr_elements, vision_elements, self.coordinate_tolerance,
+                self._calculate_semantic_similarity
+            )
+            matched_pairs = [
+                {
+                    "ocr_element": ocr_elements[i],
+                    "vision_element": vision_elements[j],
+                    "match_confidence": score,
+                    "ocr_index": i,
+                    "vision_index": j
+                }
+                for i, j, score, _ in alignment["pairs"]
+            ]
+            ocr_matched = {pair["ocr_index"] for pair in matched_pairs}
+            vision_matched = {pair["vision_index"] for pair in matched_pairs}
             
             # 收集未匹配的元素
             ocr_only_elements = [elem for i, elem in enumerate(ocr_elements) if i not in ocr_matched]
@@ -62,7 +62,7 @@ class SliceManager:
             enhanced_slices = []
             for i, slice_data in enumerate(slice_infos_raw):
                 try:
-                    slice_image_data = base64.b64decode(slice_data.base64_data)
+                    slice_image_data = base64.b64decode(slice_data.load_base64())
                     with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_slice_file:
                         temp_slice_file.write(slice_image_data)
                         slice_path = temp_slice_file.name
@@ -7,6 +7,7 @@ from typing import Dict, Any, List, Optional
 import openai
 
 from app.core.config import settings
+from app.services.llm_client import llm_client
 from ..enhanced_slice_models import EnhancedSliceInfo, OCRTextItem
 from ...schemas.component import DrawingComponent, ComponentPosition, ComponentConfidence
 from ..ai_analyzer import AIAnalyzerService
@@ -142,8 +143,10 @@ class VisionTrackService:
 
             system_prompt = "你是专业的结构工程师，专门分析建筑结构图纸。请识别构件的几何形状、空间位置、尺寸，并以指定的JSON格式返回。"
             
-            client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
-            response = client.chat.completions.create(
+            client = openai.OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL or None)
+            response = llm_client.create(
+                client,
+                "vision.track_slice",
                 model=settings.OPENAI_MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
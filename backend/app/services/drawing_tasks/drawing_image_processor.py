@@ -223,7 +223,7 @@ class DrawingImageProcessor:
         """处理单个切片的OCR"""
         try:
             # 将base64数据转换为临时图片文件
-            slice_image_data = base64.b64decode(slice_data.base64_data)
+            slice_image_data = base64.b64decode(slice_data.load_base64())
             temp_slice_file = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
             temp_slice_file.write(slice_image_data)
             temp_slice_file.close()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DWG→DXF转换结果缓存
+以DWG内容哈希为键，本地目录按最近使用（文件mtime）做LRU淘汰，可选镜像到对象存储，
+同一份图纸重新上传或任务重试时直接复用已转换的DXF。
+正在被任务读取的条目通过 pin/unpin 标记，淘汰时跳过。
+同一内容的转换通过缓存目录下的锁文件跨进程互斥，多个worker只转换一次。
+
+目录结构:
+    {DWG_CACHE_DIR}/{content_hash}.dxf
+    {DWG_CACHE_DIR}/{content_hash}.lock
+"""
+
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from app.core.config import settings
+from app.services.tile_pyramid import compute_content_hash
+
+# 跨进程文件锁：Unix 使用 flock，Windows 使用 msvcrt
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['DXFConversionCache', 'compute_content_hash', 'conversion_cache']
+
+
+class DXFConversionCache:
+    """按内容哈希寻址的DXF转换缓存"""
+
+    def __init__(self, root_dir: str = None, max_bytes: int = None, upload_to_s3: bool = None):
+        self.root_dir = Path(root_dir or settings.DWG_CACHE_DIR)
+        self.max_bytes = max_bytes if max_bytes is not None else settings.DWG_CACHE_MAX_MB * 1024 * 1024
+        self.upload_to_s3 = settings.DWG_CACHE_S3 if upload_to_s3 is None else upload_to_s3
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'remote_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        # 内容哈希 -> 使用中的引用数
+        self._pins: Dict[str, int] = {}
+        self._upload_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="dxf-cache-upload")
+
+    def _path(self, content_hash: str) -> Path:
+        return self.root_dir / f"{content_hash}.dxf"
+
+    @staticmethod
+    def _s3_key(content_hash: str) -> str:
+        return f"dwg_cache/{content_hash}.dxf"
+
+    def pin(self, content_hash: str):
+        """标记条目正在使用，淘汰时跳过（可重复调用，需成对 unpin）"""
+        with self._lock:
+            self._pins[content_hash] = self._pins.get(content_hash, 0) + 1
+
+    def unpin(self, content_hash: str):
+        with self._lock:
+            remaining = self._pins.get(content_hash, 0) - 1
+            if remaining > 0:
+                self._pins[content_hash] = remaining
+            else:
+                self._pins.pop(content_hash, None)
+
+    @contextmanager
+    def lock(self, content_hash: str):
+        """按内容哈希加跨进程文件锁，持有期间其他进程/线程对同一内容的转换等待"""
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.root_dir / f"{content_hash}.lock", "a+b") as handle:
+            _lock_file(handle)
+            try:
+                yield
+            finally:
+                _unlock_file(handle)
+
+    def get(self, content_hash: str) -> Optional[str]:
+        """命中时返回缓存的DXF路径并刷新其最近使用时间"""
+        path = self._path(content_hash)
+        if path.exists():
+            os.utime(path, None)
+            self._count('hits')
+            return str(path)
+
+        if self.upload_to_s3 and self._download(content_hash, path):
+            self._count('remote_hits')
+            return str(path)
+
+        self._count('misses')
+        return None
+
+    def put(self, content_hash: str, dxf_path: str) -> str:
+        """把转换结果放入缓存（先写临时文件再原子替换），返回缓存路径"""
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(content_hash)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        shutil.copyfile(dxf_path, tmp_path)
+        os.replace(tmp_path, path)
+        self._count('stores')
+        self._evict()
+
+        if self.upload_to_s3:
+            self._upload_executor.submit(self._upload, content_hash, path)
+        return str(path)
+
+    def discard(self, content_hash: str):
+        """删除无效的缓存条目（如校验失败的DXF）"""
+        try:
+            self._path(content_hash).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        """超出容量时按最近使用时间淘汰最旧的条目，跳过使用中的条目"""
+        entries = []
+        total = 0
+        for path in self.root_dir.glob("*.dxf"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        with self._lock:
+            pinned = set(self._pins)
+        # 至少保留最近写入的一个条目
+        for _, size, path in sorted(entries)[:-1]:
+            if total <= self.max_bytes:
+                break
+            if path.stem in pinned:
+                continue
+            try:
+                path.unlink()
+                total -= size
+                self._count('evictions')
+            except OSError:
+                continue
+
+    def _download(self, content_hash: str, path: Path) -> bool:
+        try:
+            from app.services.dual_storage_service import DualStorageService
+            self.root_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.download")
+            if DualStorageService().download_file_sync(self._s3_key(content_hash), str(tmp_path)) \
+                    and tmp_path.exists():
+                os.replace(tmp_path, path)
+                self._evict()
+                return True
+        except Exception as e:
+            logger.debug(f"对象存储中没有DXF缓存 {content_hash}: {e}")
+        return False
+
+    def _upload(self, content_hash: str, path: Path):
+        """后台镜像到对象存储"""
+        try:
+            from app.services.dual_storage_service import DualStorageService
+            DualStorageService().upload_file_sync(
+                file_obj=path.read_bytes(),
+                s3_key=self._s3_key(content_hash),
+                content_type="application/dxf"
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ DXF缓存上传失败: {content_hash}, {e}")
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def get_statistics(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['remote_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['remote_hits']) / lookups, 4) if lookups else None
+        stats['timestamp'] = time.time()
+        return stats
+
+
+def _lock_file(handle):
+    if fcntl is not None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        return
+    handle.seek(0)
+    while True:
+        try:
+            # LK_LOCK 自行重试约10秒，仍未获得时继续等待
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+
+def _unlock_file(handle):
+    if fcntl is not None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        return
+    handle.seek(0)
+    msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# 全局实例
+conversion_cache = DXFConversionCache()
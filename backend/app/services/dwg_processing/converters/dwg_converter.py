@@ -3,6 +3,9 @@
 """
 DWG转换器
 专门负责DWG到DXF的转换
+
+转换结果按DWG内容哈希缓存（见 conversion_cache），ODA转换子进程受全局信号量限制并发，
+每次转换使用独立的输入/输出目录，批量转换通过线程池并行执行。
 """
 
 import os
@@ -10,21 +13,38 @@ import logging
 import subprocess
 import tempfile
 import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
 from typing import Optional, Dict, Any, List
 from pathlib import Path
 
+from app.core.config import settings
 from .file_validator import FileValidator
+from .conversion_cache import DXFConversionCache, compute_content_hash, conversion_cache
 
 logger = logging.getLogger(__name__)
 
+# 进程内所有转换器共享的ODA子进程并发上限
+_oda_slots = threading.BoundedSemaphore(max(1, settings.DWG_CONVERT_MAX_PROCESSES))
+
+
 class DWGConverter:
     """DWG转换器类"""
     
-    def __init__(self):
+    def __init__(self, cache: DXFConversionCache = None):
         """初始化DWG转换器"""
         self.validator = FileValidator()
         self.temp_dir = None
+        self.cache = cache if cache is not None else (conversion_cache if settings.DWG_CACHE_ENABLED else None)
         self.oda_available = self._check_oda_converter()
+        self.conversion_records: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        # 内容哈希 -> [锁, 等待/持有者数]，无人使用时删除
+        self._hash_locks: Dict[str, List[Any]] = {}
+        # 已返回给调用方的缓存条目，cleanup 时释放
+        self._pinned_hashes: List[str] = []
     
     def convert_to_dxf(self, dwg_path: str) -> Optional[str]:
         """
@@ -51,45 +71,111 @@ class DWGConverter:
                 return str(dwg_path)
             
             # 创建临时目录
-            if not self.temp_dir:
-                self.temp_dir = tempfile.mkdtemp(prefix='dwg_convert_')
+            with self._lock:
+                if not self.temp_dir:
+                    self.temp_dir = tempfile.mkdtemp(prefix='dwg_convert_')
             
-            # 尝试不同的转换方法
-            dxf_path = None
+            start_time = time.time()
+            record = {'file': str(dwg_path), 'cache_hit': False, 'method': None, 'seconds': 0.0, 'error': None}
+            content_hash = compute_content_hash(str(dwg_path))
+            record['content_hash'] = content_hash
             
-            # 方法1：使用ODA文件转换器
-            if self.oda_available:
-                logger.info("尝试使用ODA文件转换器...")
-                dxf_path = self._convert_with_oda(str(dwg_path))
+            # 同一内容的并发转换只执行一次（进程内按哈希加锁，跨进程用缓存目录的文件锁），后到者直接命中缓存
+            with self._hash_lock(content_hash), (self.cache.lock(content_hash) if self.cache else nullcontext()):
+                # 先标记使用中，再查找/写入，避免其他任务的淘汰删除即将返回的缓存文件
+                if self.cache:
+                    self.cache.pin(content_hash)
+                try:
+                    dxf_path = self.cache.get(content_hash) if self.cache else None
+                    if dxf_path and not self._is_valid_dxf(dxf_path):
+                        logger.warning(f"⚠️ DXF缓存条目无效，重新转换: {dxf_path}")
+                        self.cache.discard(content_hash)
+                        dxf_path = None
+                    if dxf_path:
+                        record.update(cache_hit=True, method='cache')
+                        logger.info(f"♻️ 命中DXF转换缓存: {dwg_path.name} -> {dxf_path}")
+                    else:
+                        dxf_path = self._convert_uncached(dwg_path, record)
+                        # 校验通过后才写入缓存，避免损坏的转换结果被永久复用
+                        if dxf_path and not self._is_valid_dxf(dxf_path):
+                            record['error'] = "转换结果无效"
+                            dxf_path = None
+                        if dxf_path and self.cache:
+                            dxf_path = self.cache.put(content_hash, dxf_path)
+                except Exception:
+                    if self.cache:
+                        self.cache.unpin(content_hash)
+                    raise
             
-            # 方法2：手动转换（备用方法）
-            if not dxf_path:
-                logger.info("尝试手动转换方法...")
-                dxf_path = self._manual_convert(str(dwg_path))
+            record['seconds'] = round(time.time() - start_time, 3)
+            self._record(record)
             
-            # 验证转换结果
-            if dxf_path and self.validator.validate_input_file(dxf_path)['valid']:
-                logger.info(f"DWG转换成功: {dwg_path} -> {dxf_path}")
+            if dxf_path:
+                logger.info(f"DWG转换成功: {dwg_path} -> {dxf_path} "
+                            f"({record['method']}, {record['seconds']:.2f}s)")
+                if self.cache:
+                    with self._lock:
+                        self._pinned_hashes.append(content_hash)
                 return dxf_path
             else:
+                if self.cache:
+                    self.cache.unpin(content_hash)
                 logger.error(f"DWG转换失败: {dwg_path}")
                 return None
                 
         except Exception as e:
             logger.error(f"DWG转换异常: {e}")
+            self._record({'file': str(dwg_path), 'cache_hit': False, 'method': None, 'seconds': 0.0, 'error': str(e)})
             return None
     
-    def _convert_with_oda(self, dwg_path: str) -> Optional[str]:
+    def _is_valid_dxf(self, dxf_path: str) -> bool:
+        return bool(self.validator.validate_input_file(dxf_path)['valid'])
+    
+    def _convert_uncached(self, dwg_path: Path, record: Dict[str, Any]) -> Optional[str]:
+        """缓存未命中时依次尝试ODA和ezdxf恢复"""
+        # 每次转换使用独立目录，避免并发任务互相覆盖同名输出
+        job_dir = Path(tempfile.mkdtemp(prefix='job_', dir=self.temp_dir))
+        dxf_path = None
+        
+        # 方法1：使用ODA文件转换器
+        if self.oda_available:
+            logger.info("尝试使用ODA文件转换器...")
+            dxf_path = self._convert_with_oda(str(dwg_path), job_dir)
+            if dxf_path:
+                record['method'] = 'oda'
+        
+        # 方法2：手动转换（备用方法）
+        if not dxf_path:
+            logger.info("尝试手动转换方法...")
+            dxf_path = self._manual_convert(str(dwg_path), job_dir)
+            if dxf_path:
+                record['method'] = 'ezdxf_recover'
+        
+        if not dxf_path:
+            record['error'] = "ODA转换和ezdxf恢复均失败"
+        return dxf_path
+    
+    def _convert_with_oda(self, dwg_path: str, job_dir: Path = None) -> Optional[str]:
         """使用ODA文件转换器转换DWG"""
         try:
             dwg_path = Path(dwg_path)
-            output_dir = Path(self.temp_dir) / 'oda_output'
+            job_dir = job_dir or Path(tempfile.mkdtemp(prefix='job_', dir=self.temp_dir))
+            input_dir = job_dir / 'input'
+            output_dir = job_dir / 'oda_output'
+            input_dir.mkdir(exist_ok=True)
             output_dir.mkdir(exist_ok=True)
             
+            # ODA按目录扫描输入，只把当前文件放进独立输入目录（优先硬链接）
+            staged = input_dir / dwg_path.name
+            try:
+                os.link(dwg_path, staged)
+            except OSError:
+                shutil.copyfile(dwg_path, staged)
+            
             # 构建ODA转换器命令
             cmd = [
                 'ODAFileConverter',
-                str(dwg_path.parent),
+                str(input_dir),
                 str(output_dir),
                 'ACAD2018',
                 'DXF',
@@ -98,13 +184,14 @@ class DWGConverter:
                 dwg_path.name
             ]
             
-            # 执行转换
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=300  # 5分钟超时
-            )
+            # 执行转换（受全局并发上限约束）
+            with _oda_slots:
+                result = subprocess.run(
+                    cmd,
+                    capture_output=True,
+                    text=True,
+                    timeout=settings.DWG_CONVERT_TIMEOUT
+                )
             
             if result.returncode == 0:
                 # 查找生成的DXF文件
@@ -124,7 +211,7 @@ class DWGConverter:
             logger.error(f"ODA转换异常: {e}")
             return None
     
-    def _manual_convert(self, dwg_path: str) -> Optional[str]:
+    def _manual_convert(self, dwg_path: str, job_dir: Path = None) -> Optional[str]:
         """手动转换方法（简化版）"""
         try:
             # 尝试使用ezdxf库
@@ -134,7 +221,7 @@ class DWGConverter:
                 
                 # 尝试恢复损坏的DWG文件并转换
                 dwg_path = Path(dwg_path)
-                dxf_path = Path(self.temp_dir) / f"{dwg_path.stem}.dxf"
+                dxf_path = Path(job_dir or self.temp_dir) / f"{dwg_path.stem}.dxf"
                 
                 doc, auditor = recover.readfile(str(dwg_path))
                 doc.saveas(str(dxf_path))
@@ -168,37 +255,92 @@ class DWGConverter:
         except (subprocess.TimeoutExpired, FileNotFoundError, Exception):
             return False
     
-    def batch_convert(self, dwg_files: List[str]) -> Dict[str, Optional[str]]:
+    def batch_convert(self, dwg_files: List[str], max_workers: int = None) -> Dict[str, Optional[str]]:
         """
-        批量转换DWG文件
+        批量转换DWG文件（线程池并行，ODA子进程数另受全局上限约束）
         
         Args:
             dwg_files: DWG文件路径列表
+            max_workers: 并行转换数，默认取 DWG_CONVERT_WORKERS
             
         Returns:
             转换结果字典 {原文件路径: 转换后路径}
         """
         results = {}
+        if not dwg_files:
+            return results
         
-        for dwg_file in dwg_files:
-            try:
-                dxf_path = self.convert_to_dxf(dwg_file)
-                results[dwg_file] = dxf_path
-                
-                if dxf_path:
-                    logger.info(f"批量转换成功: {dwg_file}")
-                else:
-                    logger.error(f"批量转换失败: {dwg_file}")
+        workers = max(1, min(max_workers or settings.DWG_CONVERT_WORKERS, len(dwg_files)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dwg-convert") as executor:
+            futures = {dwg_file: executor.submit(self.convert_to_dxf, dwg_file) for dwg_file in dwg_files}
+            for dwg_file, future in futures.items():
+                try:
+                    dxf_path = future.result()
+                    results[dwg_file] = dxf_path
                     
-            except Exception as e:
-                logger.error(f"批量转换异常 {dwg_file}: {e}")
-                results[dwg_file] = None
+                    if dxf_path:
+                        logger.info(f"批量转换成功: {dwg_file}")
+                    else:
+                        logger.error(f"批量转换失败: {dwg_file}")
+                        
+                except Exception as e:
+                    logger.error(f"批量转换异常 {dwg_file}: {e}")
+                    results[dwg_file] = None
         
+        stats = self.get_statistics()
+        logger.info(f"📊 批量转换完成: {stats['files']} 个文件, 缓存命中率 {stats['cache_hit_rate']}, "
+                    f"失败 {stats['failures']} 个")
         return results
     
+    @contextmanager
+    def _hash_lock(self, content_hash: str):
+        """按内容哈希加锁，最后一个使用者退出时删除该锁"""
+        with self._lock:
+            entry = self._hash_locks.setdefault(content_hash, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._hash_locks[content_hash]
+    
+    def release(self):
+        """释放已返回的缓存条目，之后它们可以被淘汰"""
+        with self._lock:
+            pinned, self._pinned_hashes = self._pinned_hashes, []
+        for content_hash in pinned:
+            self.cache.unpin(content_hash)
+    
+    def _record(self, record: Dict[str, Any]):
+        with self._lock:
+            self.conversion_records[record['file']] = record
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """按文件汇总转换耗时、缓存命中率和失败数"""
+        with self._lock:
+            records = list(self.conversion_records.values())
+        hits = sum(1 for r in records if r['cache_hit'])
+        methods: Dict[str, int] = {}
+        for r in records:
+            if r['method']:
+                methods[r['method']] = methods.get(r['method'], 0) + 1
+        return {
+            'files': len(records),
+            'cache_hits': hits,
+            'cache_hit_rate': round(hits / len(records), 4) if records else None,
+            'failures': sum(1 for r in records if r['error']),
+            'total_seconds': round(sum(r['seconds'] for r in records), 3),
+            'methods': methods,
+            'per_file': records
+        }
+    
     def cleanup(self):
-        """清理临时文件"""
+        """清理临时文件并释放缓存条目"""
         try:
+            self.release()
             if self.temp_dir and os.path.exists(self.temp_dir):
                 shutil.rmtree(self.temp_dir)
                 logger.info(f"清理临时目录: {self.temp_dir}")
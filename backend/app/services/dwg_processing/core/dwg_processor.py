@@ -8,15 +8,25 @@ DWG处理器主控制器 - 精细化版本
 import logging
 import tempfile
 import shutil
-from typing import Dict, Any, Optional, List
+from dataclasses import asdict
+from typing import Dict, Any, Optional, List, Tuple
 from pathlib import Path
 
+from app.core.config import settings
+
 from ..converters.dwg_converter import DWGConverter
 from ..converters.file_validator import FileValidator
 from ..processors.component_calculator import ComponentCalculator, ComponentInfo
 from ..processors.summary_generator import SummaryGenerator
+from ..processors.vector_takeoff import VectorTakeoffEngine
 from ..exporters.image_renderer import ImageRenderer
 from ..detectors.text_parser import TextParser
+from ..detectors.frame_detector import FrameDetector
+from ..exporters.dxf_rasterizer import find_frames, vector_text_page
+from ..utils.frame_sorting import sort_drawings_by_number
+from .entity_index import ModelSpaceIndex
+from .frame_executor import FrameExecutor
+from .dxf_stream import stream_dxf, should_stream
 
 logger = logging.getLogger(__name__)
 
@@ -35,8 +45,13 @@ class DWGProcessor:
         self.summary_generator = SummaryGenerator()
         self.image_renderer = ImageRenderer()
         self.text_parser = TextParser()
+        self.frame_executor = FrameExecutor()
+        self.takeoff_engine = VectorTakeoffEngine()
+        self.frame_detector = FrameDetector()
         
         self.temp_dir = None
+        self.last_frame_execution = None
+        self.last_frame_detection = None
         
         logger.info("精细化DWG处理器初始化完成")
     
@@ -86,13 +101,11 @@ class DWGProcessor:
             # 步骤4：处理图框和构件
             drawings = self._process_drawings(doc, file_path)
             
-            # 步骤5：计算工程量
+            # 步骤5：计算工程量（矢量提取的构件直接使用，其余图框留给OCR阶段识别）
             all_components = []
             for drawing in drawings:
-                for comp_data in drawing.get('component_data', []):
-                    component = self.component_calculator.classify_component(comp_data)
-                    if component:
-                        all_components.append(component)
+                for comp in drawing.get('components', []):
+                    all_components.append(ComponentInfo(**comp))
             
             # 步骤6：生成计算结果
             calculation_results = self.component_calculator.batch_calculate(all_components)
@@ -103,15 +116,24 @@ class DWGProcessor:
             processing_info = {
                 'method': 'modular_processing_v2',
                 'modules_used': [
-                    'file_validator', 'dwg_converter', 'text_parser', 
+                    'file_validator', 'dwg_converter', 'text_parser', 'vector_takeoff',
                     'component_calculator', 'summary_generator', 'image_renderer'
                 ],
-                'architecture': 'fine_grained_single_responsibility'
+                'vector_frames': sum(1 for d in drawings if d.get('quantity_source') == 'vector'),
+                'ocr_frames': sum(1 for d in drawings if d.get('quantity_source') == 'ocr'),
+                'architecture': 'fine_grained_single_responsibility',
+                'frame_execution': self.last_frame_execution,
+                'frame_detection': self.last_frame_detection,
+                'conversion': self.converter.conversion_records.get(str(file_path))
             }
             
             final_report = self.summary_generator.generate_final_report(
                 file_path, drawings, component_summary, processing_info
             )
+            # 与 FileProcessor 结果一致：图框图片及按图片路径索引的矢量文本，供OCR阶段跳过整页识别
+            framed = [d for d in drawings if d.get('frame_image')]
+            final_report['image_paths'] = [d['frame_image'] for d in framed]
+            final_report['vector_text'] = {d['frame_image']: d['vector_text'] for d in framed}
             
             logger.info(f"精细化DWG处理完成: {file_path}")
             return final_report
@@ -129,58 +151,91 @@ class DWGProcessor:
         """加载DXF文档"""
         try:
             import ezdxf
-            doc = ezdxf.readfile(dxf_path)
+            doc = None
+            if should_stream(dxf_path):
+                # 大文件按列式流式读取，避免完整文档对象超出工作进程内存
+                try:
+                    doc = stream_dxf(dxf_path)
+                except Exception as e:
+                    logger.warning(f"⚠️ DXF流式读取失败，改用完整读取: {e}")
+            if doc is None:
+                doc = ezdxf.readfile(dxf_path)
+            # 模型空间索引只构建一次，后续各检测器按区域查询
+            index = ModelSpaceIndex.of(doc)
+            logger.info(f"🗂️ DXF模型空间索引: {index.stats()}")
             return doc
         except Exception as e:
             logger.error(f"DXF文档加载失败: {e}")
             return None
     
     def _process_drawings(self, doc: Any, file_path: str) -> List[Dict[str, Any]]:
-        """处理图框"""
+        """处理图框：各图框相互独立，按图框并行执行后按图号排序"""
         try:
-            # 简化版图框处理
-            drawings = []
+            # 按标准图幅检测图框，检测不到时退回闭合多段线/模型空间范围
+            detected = self.frame_detector.detect(doc)
+            frames = [frame['bounds'] for frame in detected] or find_frames(doc)
+            self.last_frame_detection = {
+                'detected_frames': len(detected),
+                'frames': [{key: frame.get(key) for key in
+                            ('bounds', 'source', 'sheet', 'scale', 'size_match', 'standard_compliance')}
+                           for frame in detected]
+            }
+            if not self.temp_dir:
+                self.temp_dir = tempfile.mkdtemp(prefix="dwg_frames_")
             
-            # 模拟检测到的图框
-            frame_bounds = (0, 0, 1000, 700)  # 默认图框
+            drawings, self.last_frame_execution = self.frame_executor.map(doc, frames, self._process_frame)
+            return sort_drawings_by_number(drawings)
             
+        except Exception as e:
+            logger.error(f"图框处理失败: {e}")
+            return []
+    
+    def _process_frame(self, doc: Any, index: int, frame_bounds: Tuple[float, float, float, float]) -> Dict[str, Any]:
+        """处理单个图框：文本解析、图框渲染、构件数据"""
+        try:
             # 提取文本信息
             texts = self.text_parser.extract_texts_from_area(doc, frame_bounds)
             
             # 解析图纸信息
-            drawing_number = self.text_parser.parse_drawing_number(texts) or "图纸-1"
-            title = self.text_parser.parse_title(texts) or "建筑平面图"
-            scale = self.text_parser.parse_scale(texts) or "1:100"
+            title_block = self.text_parser.parse_title_block(texts)
+            drawing_number = title_block['drawing_number'] or f"图纸-{index + 1}"
+            title = title_block['title'] or "建筑平面图"
+            parsed_scale = title_block['scale']
+            scale = parsed_scale or "1:100"
             
-            # 生成模拟构件数据
-            component_data = self._generate_demo_component_data()
+            # 渲染图框（按出图比例换算到纸面DPI）
+            scale_denominator = float(parsed_scale.split(':')[1]) if parsed_scale else 1.0
+            image_path = str(Path(self.temp_dir) / f"frame_{index:03d}.png")
+            render_result = self.image_renderer.render_frame_to_image(
+                doc, frame_bounds, image_path, title, scale_denominator=scale_denominator
+            )
             
-            drawing = {
-                'index': 0,
+            # 矢量工程量提取；没有可归类的构件时交给栅格/OCR阶段按图框图片识别
+            components, takeoff_info = [], None
+            # 矢量工程量提取需要完整文档（块定义、填充等），流式读取的文档同样走OCR阶段
+            if settings.VECTOR_TAKEOFF_ENABLED and not getattr(doc, 'is_streamed', False):
+                takeoff = self.takeoff_engine.takeoff(doc, frame_bounds)
+                components = [asdict(component) for component in takeoff['components']]
+                takeoff_info = {'dimensions': takeoff['dimensions'], 'statistics': takeoff['statistics']}
+            
+            return {
+                'index': index,
                 'drawing_number': drawing_number,
                 'title': title,
                 'scale': scale,
                 'frame_bounds': frame_bounds,
-                'component_data': component_data,
+                'frame_image': render_result.get('output_path'),
+                # 文字不画进位图，矢量文本随图框传给OCR/合并阶段
+                'vector_text': vector_text_page(render_result),
+                'components': components,
+                'quantity_source': 'vector' if components else 'ocr',
+                'vector_takeoff': takeoff_info,
                 'success': True
             }
             
-            drawings.append(drawing)
-            
-            return drawings
-            
         except Exception as e:
-            logger.error(f"图框处理失败: {e}")
-            return []
-    
-    def _generate_demo_component_data(self) -> List[Dict[str, Any]]:
-        """生成演示构件数据"""
-        return [
-            {'width': 400, 'height': 400, 'length': 3000, 'entities': []},  # 柱
-            {'width': 300, 'height': 600, 'length': 6000, 'entities': []},  # 梁
-            {'width': 6000, 'height': 120, 'length': 8000, 'entities': []}, # 板
-            {'width': 200, 'height': 2800, 'length': 4000, 'entities': []}, # 墙
-        ]
+            logger.error(f"图框 {index} 处理失败: {e}")
+            return {'index': index, 'frame_bounds': frame_bounds, 'success': False, 'error': str(e)}
     
     def cleanup(self):
         """清理临时文件"""
@@ -0,0 +1,798 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DXF流式读取
+按标签流逐个解析 BLOCKS 与 ENTITIES 段中的实体，只提取需要的几何、文本、块参照和图层，
+写入紧凑的 array/NumPy 列，实体对象用完即丢，内存占用不随完整文档对象模型增长。
+块定义只存一份，块参照（含绑定后的外部参照）在查询/渲染时按变换矩阵整批展开。
+
+得到的 StreamedDXF 可直接用于 ModelSpaceIndex.of、文本解析、图框检测和 DXFRasterizer；
+依赖完整文档对象的功能（如矢量工程量提取）仍需 ezdxf.readfile。
+
+用法（基准测试，子进程分别测量峰值内存和耗时）:
+    python -m app.services.dwg_processing.core.dxf_stream <file.dxf>
+    python -m app.services.dwg_processing.core.dxf_stream --synthetic 200000
+"""
+
+import json
+import logging
+import math
+import os
+import subprocess
+import sys
+import time
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import ezdxf
+    from ezdxf import path as ezdxf_path
+    from ezdxf.math import Vec3
+except ImportError:
+    ezdxf = None
+
+from app.core.config import settings
+from .entity_index import ModelSpaceIndex, Bounds
+
+logger = logging.getLogger(__name__)
+
+# 逐实体加载依赖 ezdxf 的底层接口（非公开API），已在 requirements.txt 锁定的版本上验证；
+# 其他版本缺少这些接口时 stream_dxf 明确报错，而不是静默退化
+EZDXF_VERIFIED_VERSION = "1.1.4"
+_internals_error: Optional[ImportError] = None
+if ezdxf is not None:
+    try:
+        from ezdxf.entities import factory
+        from ezdxf.entities.subentity import entity_linker
+        from ezdxf.filemanagement import dxf_file_info
+        from ezdxf.lldxf.extendedtags import ExtendedTags
+        from ezdxf.lldxf.tagger import tag_compiler
+        from ezdxf.lldxf.types import DXFTag
+        from ezdxf.lldxf.validator import is_binary_dxf_file
+    except ImportError as e:
+        _internals_error = e
+        logger.error(f"❌ ezdxf {ezdxf.__version__} 缺少DXF流式读取所需的内部接口"
+                     f"（已验证版本 {EZDXF_VERIFIED_VERSION}）: {e}")
+
+# 需要提取的实体类型，列中的类型代码即在此元组中的下标
+STREAM_TYPES = ('LINE', 'LWPOLYLINE', 'POLYLINE', 'CIRCLE', 'ARC', 'ELLIPSE', 'SPLINE',
+                'TEXT', 'MTEXT', 'INSERT', 'DIMENSION')
+_TYPE_CODE = {name: code for code, name in enumerate(STREAM_TYPES)}
+# 与主实体关联、必须随之加载的子实体
+_LINKED_TYPES = ('VERTEX', 'ATTRIB', 'SEQEND')
+_CURVE_TYPES = ('ELLIPSE', 'SPLINE')
+_POLYLINE_TYPES = ('LWPOLYLINE', 'POLYLINE', 'ELLIPSE', 'SPLINE')
+# 块参照最大嵌套展开深度
+_MAX_BLOCK_DEPTH = 8
+# 非等比缩放/镜像块中的圆弧离散段数
+_ARC_SAMPLES = 64
+
+_EMPTY_BOX = (math.inf, math.inf, -math.inf, -math.inf)
+
+
+def _is_planar(entity: Any) -> bool:
+    extrusion = entity.dxf.get('extrusion', None)
+    return extrusion is None or (abs(extrusion[0]) < 1e-9 and abs(extrusion[1]) < 1e-9 and extrusion[2] > 0)
+
+
+def _insert_matrix(x: float, y: float, xscale: float, yscale: float, rotation: float,
+                   base: Tuple[float, float] = (0.0, 0.0)) -> np.ndarray:
+    """块参照变换矩阵（3x3齐次）：平移·旋转·缩放·减去块基点"""
+    cos_r, sin_r = math.cos(math.radians(rotation)), math.sin(math.radians(rotation))
+    linear = np.array([[cos_r, -sin_r], [sin_r, cos_r]]) @ np.diag([xscale, yscale])
+    matrix = np.eye(3)
+    matrix[:2, :2] = linear
+    matrix[:2, 2] = np.array([x, y]) - linear @ np.asarray(base, dtype=float)
+    return matrix
+
+
+def _apply(matrix: np.ndarray, xy: np.ndarray) -> np.ndarray:
+    return xy @ matrix[:2, :2].T + matrix[:2, 2]
+
+
+def _transform_box(matrix: np.ndarray, box: Sequence[float]) -> Tuple[float, float, float, float]:
+    corners = np.array([[box[0], box[1]], [box[2], box[1]], [box[2], box[3]], [box[0], box[3]]])
+    world = _apply(matrix, corners)
+    return world[:, 0].min(), world[:, 1].min(), world[:, 0].max(), world[:, 1].max()
+
+
+class _StringTable:
+    """字符串到整数代码的映射（图层名、块名）"""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.names: List[str] = []
+
+    def code(self, name: str) -> int:
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+
+class _StreamedAttribs:
+    """列式实体的 dxf 属性视图，按需从列中取值"""
+
+    def __init__(self, layout: "ColumnarLayout", row: int):
+        self._layout = layout
+        self._row = row
+
+    def get(self, name: str, default: Any = None) -> Any:
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            return default
+
+    def __getattr__(self, name: str) -> Any:
+        layout, row = self._layout, self._row
+        if name == 'layer':
+            return layout.layer_table.names[layout.layers[row]]
+        dxftype = STREAM_TYPES[layout.types[row]]
+        if dxftype == 'LINE' and name in ('start', 'end'):
+            x, y = layout.vertices[layout.offsets[row] + (name == 'end')]
+            return Vec3(x, y, 0)
+        if name in ('center', 'radius', 'start_angle', 'end_angle') and row in layout.arc_lookup:
+            cx, cy, radius, start, sweep = layout.arc_params[layout.arc_lookup[row]]
+            return {'center': Vec3(cx, cy, 0), 'radius': radius, 'start_angle': math.degrees(start),
+                    'end_angle': math.degrees(start + sweep)}[name]
+        if row in layout.text_lookup:
+            record = layout.text_record(layout.text_lookup[row])
+            if name in ('text', 'height', 'rotation'):
+                return record[name]
+            if name == 'insert':
+                return Vec3(*record['position'], 0)
+        if row in layout.insert_lookup:
+            k = layout.insert_lookup[row]
+            x, y, xscale, yscale, rotation = layout.insert_params[k]
+            values = {'name': layout.block_table.names[layout.insert_blocks[k]], 'insert': Vec3(x, y, 0),
+                      'xscale': xscale, 'yscale': yscale, 'rotation': rotation}
+            if name in values:
+                return values[name]
+        raise AttributeError(name)
+
+
+class StreamedEntity:
+    """列式布局中一行的轻量只读视图，提供检测器用到的实体接口"""
+
+    __slots__ = ('layout', 'row')
+
+    def __init__(self, layout: "ColumnarLayout", row: int):
+        self.layout = layout
+        self.row = row
+
+    def dxftype(self) -> str:
+        return STREAM_TYPES[self.layout.types[self.row]]
+
+    @property
+    def dxf(self) -> _StreamedAttribs:
+        return _StreamedAttribs(self.layout, self.row)
+
+    @property
+    def closed(self) -> bool:
+        return bool(self.layout.closed[self.row])
+
+    def points_xy(self) -> np.ndarray:
+        """折线/曲线顶点（曲线已按容差离散）"""
+        offsets = self.layout.offsets
+        return self.layout.vertices[offsets[self.row]:offsets[self.row + 1]]
+
+
+class _LazyRows:
+    """按下标即时生成行视图的只读序列"""
+
+    def __init__(self, size: int, factory_fn):
+        self._size = size
+        self._factory = factory_fn
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._factory(k) for k in range(*i.indices(self._size))]
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError(i)
+        return self._factory(int(i))
+
+    def __iter__(self):
+        return (self._factory(i) for i in range(self._size))
+
+
+class ColumnarLayout:
+    """一个布局（模型空间或块定义）的列式存储"""
+
+    def __init__(self, layer_table: _StringTable, block_table: _StringTable, curve_tolerance: float):
+        self.layer_table = layer_table
+        self.block_table = block_table
+        self.curve_tolerance = curve_tolerance
+        self.base_point = (0.0, 0.0)
+        self.doc: Optional["StreamedDXF"] = None
+        # 构建阶段使用 array，finalize 后转为 NumPy
+        self.types = array('B')
+        self.layers = array('I')
+        self.boxes = array('d')
+        self.closed = array('B')
+        self.offsets = array('q', [0])
+        self.vertices = array('d')
+        self.arc_rows = array('q')
+        self.arc_params = array('d')
+        self.text_owner = array('q')
+        self.text_strings: List[str] = []
+        self.text_params = array('d')  # x, y, height, rotation
+        self.text_types = array('B')
+        self.insert_rows = array('q')
+        self.insert_blocks = array('I')
+        self.insert_params = array('d')  # x, y, xscale, yscale, rotation
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    # ---- 构建 ----
+    def _row(self, dxftype: str, layer: str, box: Sequence[float], closed: bool = False) -> int:
+        row = len(self.types)
+        self.types.append(_TYPE_CODE[dxftype])
+        self.layers.append(self.layer_table.code(layer))
+        self.boxes.extend(box)
+        self.closed.append(1 if closed else 0)
+        self.offsets.append(len(self.vertices) // 2)
+        return row
+
+    def _points_row(self, dxftype: str, layer: str, points: np.ndarray, closed: bool = False):
+        if len(points) < 2:
+            return
+        self.vertices.extend(points[:, :2].ravel().tolist())
+        box = (points[:, 0].min(), points[:, 1].min(), points[:, 0].max(), points[:, 1].max())
+        self._row(dxftype, layer, box, closed)
+
+    def _flattened_row(self, dxftype: str, layer: str, entity: Any):
+        points = np.asarray([(v.x, v.y) for v in ezdxf_path.make_path(entity).flattening(self.curve_tolerance)],
+                            dtype=float).reshape(-1, 2)
+        self._points_row(dxftype if dxftype in _POLYLINE_TYPES else 'SPLINE', layer, points)
+
+    def _text_row(self, dxftype: str, layer: str, text: str, insert: Any, height: float, rotation: float):
+        text = (text or '').strip()
+        if not text:
+            return
+        row = self._row(dxftype, layer, (insert[0], insert[1], insert[0], insert[1]))
+        self.text_owner.append(row)
+        self.text_strings.append(text)
+        self.text_params.extend((insert[0], insert[1], float(height or 0), float(rotation or 0)))
+        self.text_types.append(0 if dxftype == 'TEXT' else 1)
+
+    def add_fast(self, record: "_FastRecord"):
+        """从快速路径记录中提取几何/文本"""
+        dxftype = record.type
+        layer = record.values.get(8, '0')
+        if dxftype == 'LINE':
+            points = np.array([[record.number(10, 0.0), record.number(20, 0.0)],
+                               [record.number(11, 0.0), record.number(21, 0.0)]])
+            self._points_row('LINE', layer, points)
+        elif dxftype == 'LWPOLYLINE':
+            points = np.column_stack([np.asarray(record.xs, dtype=float), np.asarray(record.ys, dtype=float)])
+            self._points_row('LWPOLYLINE', layer, points, bool(int(record.values.get(70, 0)) & 1))
+        elif dxftype in ('CIRCLE', 'ARC'):
+            cx, cy, radius = record.number(10, 0.0), record.number(20, 0.0), record.number(40, 1.0)
+            if dxftype == 'CIRCLE':
+                start, sweep = 0.0, 2 * math.pi
+            else:
+                start = math.radians(record.number(50, 0.0))
+                sweep = (math.radians(record.number(51, 360.0)) - start) % (2 * math.pi) or 2 * math.pi
+            row = self._row(dxftype, layer, (cx - radius, cy - radius, cx + radius, cy + radius))
+            self.arc_rows.append(row)
+            self.arc_params.extend((cx, cy, radius, start, sweep))
+        elif dxftype == 'TEXT':
+            self._text_row('TEXT', layer, record.values.get(1, ''), (record.number(10, 0.0), record.number(20, 0.0)),
+                           record.number(40, 10.0), record.number(50, 0.0))
+
+    def add(self, entity: Any):
+        """提取一个实体的几何/文本/块参照信息"""
+        if isinstance(entity, _FastRecord):
+            self.add_fast(entity)
+            return
+        dxftype = entity.dxftype()
+        layer = entity.dxf.get('layer', '0')
+        if dxftype == 'LINE':
+            start, end = entity.dxf.start, entity.dxf.end
+            self._points_row('LINE', layer, np.array([[start[0], start[1]], [end[0], end[1]]]))
+        elif dxftype == 'LWPOLYLINE':
+            raw = np.asarray(entity.lwpoints.values, dtype=float).reshape(-1, 5)
+            if _is_planar(entity) and not np.any(raw[:, 4]):
+                self._points_row('LWPOLYLINE', layer, raw[:, :2], entity.closed)
+            else:
+                self._flattened_row('LWPOLYLINE', layer, entity)
+        elif dxftype == 'POLYLINE':
+            if entity.is_2d_polyline and not entity.has_arc and _is_planar(entity):
+                points = np.asarray([(v[0], v[1]) for v in entity.points()], dtype=float).reshape(-1, 2)
+                self._points_row('POLYLINE', layer, points, entity.is_closed)
+            else:
+                self._flattened_row('POLYLINE', layer, entity)
+        elif dxftype in ('CIRCLE', 'ARC'):
+            if not _is_planar(entity):
+                self._flattened_row(dxftype, layer, entity)
+                return
+            center, radius = entity.dxf.center, entity.dxf.radius
+            if dxftype == 'CIRCLE':
+                start, sweep = 0.0, 2 * math.pi
+            else:
+                start = math.radians(entity.dxf.start_angle)
+                sweep = (math.radians(entity.dxf.end_angle) - start) % (2 * math.pi) or 2 * math.pi
+            row = self._row(dxftype, layer, (center[0] - radius, center[1] - radius,
+                                             center[0] + radius, center[1] + radius))
+            self.arc_rows.append(row)
+            self.arc_params.extend((center[0], center[1], radius, start, sweep))
+        elif dxftype in _CURVE_TYPES:
+            self._flattened_row(dxftype, layer, entity)
+        elif dxftype == 'TEXT':
+            self._text_row('TEXT', layer, entity.dxf.text, entity.dxf.insert,
+                           entity.dxf.get('height', 10), entity.dxf.get('rotation', 0.0))
+        elif dxftype == 'MTEXT':
+            self._text_row('MTEXT', layer, entity.plain_text(), entity.dxf.insert,
+                           entity.dxf.get('char_height', 10), entity.dxf.get('rotation', 0.0))
+        elif dxftype in ('INSERT', 'DIMENSION'):
+            if dxftype == 'INSERT':
+                name = entity.dxf.name
+                insert = entity.dxf.insert
+                params = (insert[0], insert[1], entity.dxf.get('xscale', 1.0), entity.dxf.get('yscale', 1.0),
+                          entity.dxf.get('rotation', 0.0))
+            else:
+                # 标注的几何块已在世界坐标中
+                name = entity.dxf.get('geometry', None)
+                params = (0.0, 0.0, 1.0, 1.0, 0.0)
+            if name:
+                row = self._row(dxftype, layer, _EMPTY_BOX)
+                self.insert_rows.append(row)
+                self.insert_blocks.append(self.block_table.code(name))
+                self.insert_params.extend(params)
+            if dxftype == 'INSERT':
+                for attrib in entity.attribs:
+                    if not attrib.is_invisible:
+                        self._text_row('TEXT', attrib.dxf.get('layer', layer), attrib.dxf.text,
+                                       attrib.dxf.insert, attrib.dxf.get('height', 10),
+                                       attrib.dxf.get('rotation', 0.0))
+
+    def finalize(self):
+        """array 列转为 NumPy 数组"""
+        self.types = np.frombuffer(self.types, dtype=np.uint8)
+        self.layers = np.frombuffer(self.layers, dtype=np.uint32)
+        self.boxes = np.frombuffer(self.boxes, dtype=float).reshape(-1, 4).copy()
+        self.closed = np.frombuffer(self.closed, dtype=np.uint8)
+        self.offsets = np.frombuffer(self.offsets, dtype=np.int64)
+        self.vertices = np.frombuffer(self.vertices, dtype=float).reshape(-1, 2)
+        self.arc_rows = np.frombuffer(self.arc_rows, dtype=np.int64)
+        self.arc_params = np.frombuffer(self.arc_params, dtype=float).reshape(-1, 5)
+        self.text_owner = np.frombuffer(self.text_owner, dtype=np.int64)
+        self.text_params = np.frombuffer(self.text_params, dtype=float).reshape(-1, 4)
+        self.text_types = np.frombuffer(self.text_types, dtype=np.uint8)
+        self.insert_rows = np.frombuffer(self.insert_rows, dtype=np.int64)
+        self.insert_blocks = np.frombuffer(self.insert_blocks, dtype=np.uint32)
+        self.insert_params = np.frombuffer(self.insert_params, dtype=float).reshape(-1, 5)
+        self.arc_lookup = {int(row): k for k, row in enumerate(self.arc_rows)}
+        self.text_lookup = {int(row): k for k, row in enumerate(self.text_owner)}
+        self.insert_lookup = {int(row): k for k, row in enumerate(self.insert_rows)}
+
+    # ---- ModelSpaceIndex 接口 ----
+    @property
+    def text_positions(self) -> np.ndarray:
+        return self.text_params[:, :2]
+
+    def type_names(self) -> List[str]:
+        return [STREAM_TYPES[code] for code in self.types.tolist()]
+
+    def rows(self) -> Sequence[StreamedEntity]:
+        return _LazyRows(len(self.types), lambda row: StreamedEntity(self, row))
+
+    def text_record(self, k: int) -> Dict[str, Any]:
+        x, y, height, rotation = self.text_params[k]
+        return {
+            'text': self.text_strings[k],
+            'position': (float(x), float(y)),
+            'height': float(height),
+            'type': 'TEXT' if self.text_types[k] == 0 else 'MTEXT',
+            'rotation': float(rotation),
+            'entity': StreamedEntity(self, int(self.text_owner[k]))
+        }
+
+    def text_rows(self) -> Sequence[Dict[str, Any]]:
+        return _LazyRows(len(self.text_strings), self.text_record)
+
+    def build_index(self) -> ModelSpaceIndex:
+        return ModelSpaceIndex.from_columns(self)
+
+
+class StreamedDXF:
+    """流式读取结果：模型空间与块定义的列式存储，接口与检测器所需的 ezdxf 文档子集一致"""
+
+    is_streamed = True
+
+    def __init__(self, filename: str, units: int, curve_tolerance: float):
+        self.filename = filename
+        self.units = units
+        self.layer_table = _StringTable()
+        self.block_table = _StringTable()
+        self.curve_tolerance = curve_tolerance
+        self.msp = ColumnarLayout(self.layer_table, self.block_table, curve_tolerance)
+        self.msp.doc = self
+        self.blocks: Dict[str, ColumnarLayout] = {}
+        self.stats: Dict[str, Any] = {}
+        self._block_boxes: Dict[str, Tuple[float, float, float, float]] = {}
+
+    def modelspace(self) -> ColumnarLayout:
+        return self.msp
+
+    def new_block(self, name: str, base_point: Tuple[float, float]) -> ColumnarLayout:
+        layout = ColumnarLayout(self.layer_table, self.block_table, self.curve_tolerance)
+        layout.base_point = base_point
+        self.blocks[name] = layout
+        return layout
+
+    def finalize(self):
+        for layout in [self.msp, *self.blocks.values()]:
+            layout.finalize()
+        # 块参照的包围盒依赖块定义，全部读完后再计算
+        for layout in [self.msp, *self.blocks.values()]:
+            self._resolve_insert_boxes(layout, 0)
+
+    def _insert_matrix(self, layout: ColumnarLayout, k: int) -> Tuple[Optional[ColumnarLayout], np.ndarray]:
+        block = self.blocks.get(self.block_table.names[layout.insert_blocks[k]])
+        if block is None:
+            return None, np.eye(3)
+        return block, _insert_matrix(*layout.insert_params[k], base=block.base_point)
+
+    def _resolve_insert_boxes(self, layout: ColumnarLayout, depth: int):
+        for k, row in enumerate(layout.insert_rows):
+            block, matrix = self._insert_matrix(layout, k)
+            if block is None:
+                continue
+            box = self._block_box(self.block_table.names[layout.insert_blocks[k]], block, depth + 1)
+            if np.isfinite(box).all():
+                layout.boxes[row] = _transform_box(matrix, box)
+
+    def _block_box(self, name: str, block: ColumnarLayout, depth: int) -> Tuple[float, float, float, float]:
+        cached = self._block_boxes.get(name)
+        if cached is not None:
+            return cached
+        if depth > _MAX_BLOCK_DEPTH:
+            return _EMPTY_BOX
+        self._resolve_insert_boxes(block, depth)
+        finite = block.boxes[np.isfinite(block.boxes).all(axis=1)]
+        box = (finite[:, 0].min(), finite[:, 1].min(), finite[:, 2].max(), finite[:, 3].max()) \
+            if len(finite) else _EMPTY_BOX
+        self._block_boxes[name] = box
+        return box
+
+    def collect_geometry(self, bounds: Bounds, geometry: Any):
+        """
+        把图框内的几何按世界坐标写入 geometry（lines/arcs/polylines/texts/entity_count），
+        供 DXFRasterizer 直接绘制
+        """
+        index = ModelSpaceIndex.of(self)
+        rows = np.asarray(index._entity_grid.query(bounds), dtype=np.int64)
+        self._collect_layout(self.msp, rows, np.eye(3), geometry, 0)
+
+    def _collect_layout(self, layout: ColumnarLayout, rows: np.ndarray, matrix: np.ndarray,
+                        geometry: Any, depth: int):
+        geometry.entity_count += len(rows)
+        identity = np.allclose(matrix, np.eye(3))
+        linear = matrix[:2, :2]
+        scale_x, scale_y = np.linalg.norm(linear[:, 0]), np.linalg.norm(linear[:, 1])
+        conformal = abs(scale_x - scale_y) <= 1e-9 * max(scale_x, 1e-12) and np.linalg.det(linear) > 0
+        rotation = math.atan2(linear[1, 0], linear[0, 0])
+        types = layout.types[rows]
+
+        line_rows = rows[types == _TYPE_CODE['LINE']]
+        if len(line_rows):
+            starts = layout.offsets[line_rows]
+            segments = np.concatenate([layout.vertices[starts], layout.vertices[starts + 1]], axis=1)
+            if not identity:
+                segments = _apply(matrix, segments.reshape(-1, 2)).reshape(-1, 4)
+            geometry.lines.extend(segments.tolist())
+
+        for row in rows[np.isin(types, [_TYPE_CODE[t] for t in _POLYLINE_TYPES])].tolist():
+            points = layout.vertices[layout.offsets[row]:layout.offsets[row + 1]]
+            if layout.closed[row] and len(points) > 2:
+                points = np.vstack([points, points[:1]])
+            geometry.polylines.append(points if identity else _apply(matrix, points))
+
+        arc_mask = np.isin(layout.arc_rows, rows)
+        if arc_mask.any():
+            arcs = layout.arc_params[arc_mask]
+            if identity:
+                geometry.arcs.extend(arcs.tolist())
+            elif conformal:
+                centers = _apply(matrix, arcs[:, :2])
+                transformed = np.column_stack([centers, arcs[:, 2] * scale_x, arcs[:, 3] + rotation, arcs[:, 4]])
+                geometry.arcs.extend(transformed.tolist())
+            else:
+                # 非等比缩放或镜像：按固定段数离散后整体变换
+                t = np.linspace(0.0, 1.0, _ARC_SAMPLES + 1)
+                angles = arcs[:, 3:4] + arcs[:, 4:5] * t
+                xy = np.stack([arcs[:, 0:1] + arcs[:, 2:3] * np.cos(angles),
+                               arcs[:, 1:2] + arcs[:, 2:3] * np.sin(angles)], axis=-1)
+                geometry.polylines.extend(_apply(matrix, xy.reshape(-1, 2)).reshape(xy.shape))
+
+        text_mask = np.isin(layout.text_owner, rows)
+        for k in np.flatnonzero(text_mask).tolist():
+            record = layout.text_record(k)
+            if not identity:
+                record['position'] = tuple(_apply(matrix, np.asarray([record['position']]))[0].tolist())
+                record['height'] *= scale_y
+                record['rotation'] += math.degrees(rotation)
+            geometry.texts.append(record)
+
+        if depth >= _MAX_BLOCK_DEPTH:
+            return
+        for k in np.flatnonzero(np.isin(layout.insert_rows, rows)).tolist():
+            block, insert_matrix = self._insert_matrix(layout, k)
+            if block is not None:
+                self._collect_layout(block, np.arange(len(block)), matrix @ insert_matrix, geometry, depth + 1)
+
+
+class _FastRecord:
+    """常见简单实体直接从原始组码/值取数，不构建 ezdxf 实体对象"""
+
+    __slots__ = ('type', 'values', 'xs', 'ys')
+
+    def __init__(self, dxftype: str, values: Dict[int, str], xs: List[str], ys: List[str]):
+        self.type = dxftype
+        self.values = values
+        self.xs = xs
+        self.ys = ys
+
+    def dxftype(self) -> str:
+        return self.type
+
+    def number(self, code: int, default: float) -> float:
+        value = self.values.get(code)
+        return float(value) if value is not None else default
+
+    @property
+    def paperspace(self) -> int:
+        return int(self.values.get(67, 0))
+
+
+# 走快速路径的实体类型
+_FAST_TYPES = ('LINE', 'CIRCLE', 'ARC', 'TEXT', 'LWPOLYLINE')
+
+
+def _fast_record(dxftype: str, pairs: List[Tuple[int, str]]) -> Optional[_FastRecord]:
+    """
+    解析简单实体的原始组码；带凸度、非默认拉伸方向等需要完整解析的情况返回None
+
+    每个组码只取第一次出现的值（多段线顶点除外），扩展数据（组码≥1000）之后的组码忽略。
+    """
+    values: Dict[int, str] = {}
+    xs: List[str] = []
+    ys: List[str] = []
+    polyline = dxftype == 'LWPOLYLINE'
+    for code, value in pairs:
+        if code >= 1000:
+            break
+        if polyline and code in (10, 20, 42):
+            if code == 10:
+                xs.append(value)
+            elif code == 20:
+                ys.append(value)
+            elif float(value):
+                return None
+        elif code not in values:
+            values[code] = value
+    if 210 in values or 220 in values:
+        extrusion = (float(values.get(210, 0)), float(values.get(220, 0)), float(values.get(230, 1)))
+        if abs(extrusion[0]) > 1e-9 or abs(extrusion[1]) > 1e-9 or extrusion[2] <= 0:
+            return None
+    return _FastRecord(dxftype, values, xs, ys)
+
+
+def _raw_pairs(fp) -> Iterator[Tuple[int, str]]:
+    """逐对读取 (组码, 值) 原始字符串，跳过注释"""
+    readline = fp.readline
+    while True:
+        code = readline()
+        if not code:
+            return
+        value = readline().rstrip('\r\n')
+        code = int(code)
+        if code != 999:
+            yield code, value
+
+
+def _load_entity(pairs: List[Tuple[int, str]]) -> Any:
+    """
+    复杂实体交给 ezdxf 解析
+
+    tag_compiler 需要读到下一个组码才能产出坐标点，实体末尾是坐标时（如多段线最后一个顶点）
+    会被丢弃，因此补一个结束组码再去掉。
+    """
+    raw = [DXFTag(code, value) for code, value in pairs]
+    raw.append(DXFTag(0, 'EOF'))
+    tags = list(tag_compiler(iter(raw)))[:-1]
+    return factory.load(ExtendedTags(tags))
+
+
+def _iter_entities(filename: str, encoding: str) -> Iterator[Tuple[str, Any]]:
+    """
+    单遍扫描组码流，产出 (所在段, 实体)
+
+    段为 'BLOCKS'/'ENTITIES'；BLOCK/ENDBLK 原样产出以便切换当前块，
+    VERTEX/ATTRIB/SEQEND 已链接到主实体，不单独产出；简单实体以 _FastRecord 产出。
+    """
+    wanted = set(STREAM_TYPES) | set(_LINKED_TYPES) | {'BLOCK', 'ENDBLK'}
+    section = None
+    prev_code, prev_value = -1, ''
+    with open(filename, mode='rt', encoding=encoding, errors='surrogateescape') as fp:
+        pairs: List[Tuple[int, str]] = []
+        queued = None
+        linked_entity = entity_linker()
+        for code, value in _raw_pairs(fp):
+            if section in ('BLOCKS', 'ENTITIES'):
+                if code == 0:
+                    if pairs and pairs[0][1] in wanted:
+                        dxftype = pairs[0][1]
+                        record = _fast_record(dxftype, pairs[1:]) if dxftype in _FAST_TYPES else None
+                        if record is not None:
+                            if queued is not None:
+                                yield section, queued
+                                queued = None
+                            yield section, record
+                        else:
+                            entity = _load_entity(pairs)
+                            if not linked_entity(entity):
+                                if queued is not None:
+                                    yield section, queued
+                                queued = entity
+                    pairs = [(code, value)]
+                    if value == 'ENDSEC':
+                        if queued is not None:
+                            yield section, queued
+                        queued, pairs, section = None, [], None
+                else:
+                    pairs.append((code, value))
+            elif code == 2 and prev_code == 0 and prev_value == 'SECTION':
+                section = value
+                pairs = []
+            prev_code, prev_value = code, value
+
+
+def stream_dxf(filename: str, curve_tolerance: float = None) -> StreamedDXF:
+    """
+    流式读取DXF为列式存储
+
+    Args:
+        filename: ASCII DXF 文件路径
+        curve_tolerance: 样条/椭圆/凸度多段线的离散弦高（图形单位）
+
+    Raises:
+        ValueError: 二进制DXF（不支持流式读取）
+    """
+    if ezdxf is None:
+        raise ImportError("ezdxf 库未安装，无法读取DXF文件")
+    if _internals_error is not None:
+        raise ImportError(f"ezdxf {ezdxf.__version__} 不支持DXF流式读取（已验证版本 "
+                          f"{EZDXF_VERIFIED_VERSION}）: {_internals_error}") from _internals_error
+    if is_binary_dxf_file(filename):
+        raise ValueError("二进制DXF不支持流式读取")
+    start = time.perf_counter()
+    info = dxf_file_info(str(filename))
+    streamed = StreamedDXF(str(filename), info.insert_units or 0,
+                           curve_tolerance if curve_tolerance is not None else settings.DXF_STREAM_CURVE_TOLERANCE)
+
+    counts = {'modelspace': 0, 'blocks': 0, 'block_entities': 0, 'failed': 0}
+    current = None
+    for section, entity in _iter_entities(str(filename), info.encoding):
+        dxftype = entity.dxftype()
+        if dxftype == 'BLOCK':
+            base = entity.dxf.get('base_point', (0, 0, 0))
+            current = streamed.new_block(entity.dxf.name, (base[0], base[1]))
+            counts['blocks'] += 1
+            continue
+        if dxftype == 'ENDBLK':
+            current = None
+            continue
+        if section == 'ENTITIES':
+            paperspace = entity.paperspace if isinstance(entity, _FastRecord) else entity.dxf.get('paperspace', 0)
+            if paperspace:
+                continue
+            layout = streamed.msp
+            counts['modelspace'] += 1
+        elif current is not None:
+            layout = current
+            counts['block_entities'] += 1
+        else:
+            continue
+        try:
+            layout.add(entity)
+        except Exception:
+            counts['failed'] += 1
+
+    streamed.finalize()
+    streamed.stats = {
+        **counts,
+        'layers': len(streamed.layer_table.names),
+        'rows': len(streamed.msp),
+        'texts': len(streamed.msp.text_strings),
+        'seconds': round(time.perf_counter() - start, 3)
+    }
+    logger.info(f"🌊 DXF流式读取完成: {streamed.stats}")
+    return streamed
+
+
+def should_stream(filename: str) -> bool:
+    """文件超过阈值时使用流式读取"""
+    try:
+        return settings.DXF_STREAMING_ENABLED and \
+            os.path.getsize(filename) >= settings.DXF_STREAMING_THRESHOLD_MB * 1024 * 1024
+    except OSError:
+        return False
+
+
+def _measure(mode: str, filename: str) -> Dict[str, Any]:
+    """在当前进程中读取一次并建索引，返回耗时和峰值RSS"""
+    start = time.perf_counter()
+    if mode == 'stream':
+        doc = stream_dxf(filename)
+    else:
+        doc = ezdxf.readfile(filename)
+    index = ModelSpaceIndex.of(doc)
+    return {
+        'mode': mode,
+        'seconds': round(time.perf_counter() - start, 2),
+        'entities': len(index.entities),
+        'texts': len(index.texts),
+        'peak_rss_mb': _peak_rss_mb()
+    }
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """当前进程峰值内存（MB）；resource 仅 Unix 可用，Windows 改用 psutil 的峰值工作集"""
+    try:
+        import resource
+        # Linux 下 ru_maxrss 单位为 KB
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().peak_wset / 1024 / 1024, 1)
+    except (ImportError, AttributeError):
+        return None
+
+
+def benchmark(filename: str) -> List[Dict[str, Any]]:
+    """基准：流式读取与 ezdxf.readfile 各在独立子进程中运行，对比峰值RSS和耗时"""
+    results = []
+    for mode in ('stream', 'readfile'):
+        output = subprocess.run([sys.executable, '-m', f'{__package__}.dxf_stream', '--measure', mode, filename],
+                                capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+def main(argv: List[str] = None) -> int:
+    args = argv if argv is not None else sys.argv[1:]
+    if len(args) == 3 and args[0] == '--measure':
+        logging.disable(logging.CRITICAL)
+        print(json.dumps(_measure(args[1], args[2])))
+        return 0
+    if len(args) == 2 and args[0] == '--synthetic':
+        import tempfile
+        from .entity_index import synthetic_document
+        filename = os.path.join(tempfile.mkdtemp(prefix='dxf_stream_'), 'synthetic.dxf')
+        synthetic_document(int(args[1])).saveas(filename)
+    elif len(args) == 1:
+        filename = args[0]
+    else:
+        print("用法: python -m app.services.dwg_processing.core.dxf_stream <file.dxf> | --synthetic <N>")
+        return 1
+    print(f"文件大小: {os.path.getsize(filename) / 1024 / 1024:.1f} MB")
+    for row in benchmark(filename):
+        print("  ".join(f"{key}={value}" for key, value in row.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模型空间实体空间索引
+每个DXF文档只遍历一次模型空间：实体包围盒存入NumPy数组并按均匀网格分桶，文本实体预先提取。
+文本解析、图框信息提取、图框验证、图像渲染等检测器都以矩形查询代替逐图框全量遍历。
+
+用法（基准测试）:
+    python -m app.services.dwg_processing.core.entity_index <file.dxf>
+    python -m app.services.dwg_processing.core.entity_index --synthetic 200000
+"""
+
+import logging
+import math
+import sys
+import time
+import weakref
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Bounds = Tuple[float, float, float, float]
+
+TEXT_TYPES = ('TEXT', 'MTEXT')
+
+# 跨越网格单元过多的大实体（图框线、长轴线等）不分桶，查询时单独向量化筛选
+_MAX_CELLS_PER_ENTITY = 16
+# 平均每个网格单元的实体数
+_TARGET_ENTITIES_PER_CELL = 8
+
+
+def entity_bounds(entity: Any) -> Optional[Bounds]:
+    """按实体类型快速计算二维包围盒，无法计算时返回None"""
+    dxftype = entity.dxftype()
+    dxf = entity.dxf
+    if dxftype == 'LINE':
+        start, end = dxf.start, dxf.end
+        return min(start[0], end[0]), min(start[1], end[1]), max(start[0], end[0]), max(start[1], end[1])
+    if dxftype in ('CIRCLE', 'ARC'):
+        center, radius = dxf.center, dxf.radius
+        return center[0] - radius, center[1] - radius, center[0] + radius, center[1] + radius
+    if dxftype in TEXT_TYPES:
+        insert = dxf.insert
+        return insert[0], insert[1], insert[0], insert[1]
+    if dxftype == 'LWPOLYLINE':
+        points = np.asarray(entity.get_points('xy'), dtype=float)
+    elif dxftype == 'POLYLINE':
+        points = np.asarray([(v[0], v[1]) for v in entity.points()], dtype=float)
+    elif dxftype == 'POINT':
+        location = dxf.location
+        return location[0], location[1], location[0], location[1]
+    else:
+        try:
+            from ezdxf import bbox
+            extents = bbox.extents([entity], fast=True)
+            if not extents.has_data:
+                return None
+            return extents.extmin.x, extents.extmin.y, extents.extmax.x, extents.extmax.y
+        except Exception:
+            return None
+    if points.size == 0:
+        return None
+    return points[:, 0].min(), points[:, 1].min(), points[:, 0].max(), points[:, 1].max()
+
+
+def text_record(entity: Any) -> Optional[Dict[str, Any]]:
+    """提取TEXT/MTEXT实体的文本信息"""
+    dxftype = entity.dxftype()
+    if dxftype == 'TEXT':
+        text_content = entity.dxf.text
+        height = getattr(entity.dxf, 'height', 10)
+    elif dxftype == 'MTEXT':
+        text_content = entity.plain_text()
+        height = getattr(entity.dxf, 'char_height', 10)
+    else:
+        return None
+    text_content = text_content.strip()
+    if not text_content:
+        return None
+    insert = entity.dxf.insert
+    return {
+        'text': text_content,
+        'position': (insert[0], insert[1]),
+        'height': height,
+        'type': dxftype
+    }
+
+
+def units_to_mm(doc: Any) -> float:
+    """图纸单位（$INSUNITS）换算为毫米的系数，未设置或无法识别时按毫米"""
+    units = getattr(doc, 'units', 0) if doc is not None else 0
+    if not units:
+        return 1.0
+    try:
+        from ezdxf.units import conversion_factor, MM
+        return conversion_factor(units, MM)
+    except Exception:
+        return 1.0
+
+
+class _GridIndex:
+    """包围盒数组上的均匀网格索引"""
+
+    def __init__(self, boxes: np.ndarray):
+        self.boxes = boxes
+        self.cells: Dict[Tuple[int, int], np.ndarray] = {}
+        self.oversized = np.empty(0, dtype=np.int64)
+        n = len(boxes)
+        if n == 0:
+            self.origin, self.cell_size = (0.0, 0.0), 1.0
+            return
+
+        # 无法确定范围的实体（整行非有限值）不参与网格
+        valid = np.isfinite(boxes).all(axis=1)
+        if not valid.any():
+            self.origin, self.cell_size = (0.0, 0.0), 1.0
+            return
+        finite = boxes[valid]
+        min_x, min_y = finite[:, 0].min(), finite[:, 1].min()
+        max_x, max_y = finite[:, 2].max(), finite[:, 3].max()
+        area = max((max_x - min_x) * (max_y - min_y), 1e-9)
+        self.origin = (min_x, min_y)
+        self.cell_size = max(math.sqrt(area * _TARGET_ENTITIES_PER_CELL / int(valid.sum())), 1e-6)
+
+        cx0, cy0, cx1, cy1 = self._cell_range(np.where(valid[:, None], boxes, 0.0))
+        spans_x, spans_y = cx1 - cx0 + 1, cy1 - cy0 + 1
+        fits = valid & (spans_x * spans_y <= _MAX_CELLS_PER_ENTITY)
+        self.oversized = np.nonzero(valid & ~fits)[0]
+
+        # 把每个实体展开到其覆盖的所有单元，再按单元键排序分组
+        idx = np.nonzero(fits)[0]
+        counts = (spans_x * spans_y)[idx]
+        owner = np.repeat(idx, counts)
+        offset = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+        span_x = np.repeat(spans_x[idx], counts)
+        cell_x = np.repeat(cx0[idx], counts) + offset % span_x
+        cell_y = np.repeat(cy0[idx], counts) + offset // span_x
+        if len(owner) == 0:
+            return
+        keys = cell_x.astype(np.int64) * 1_000_003 + cell_y.astype(np.int64)
+        order = np.argsort(keys, kind='stable')
+        keys, owner = keys[order], owner[order]
+        cell_x, cell_y = cell_x[order], cell_y[order]
+        boundaries = np.nonzero(np.diff(keys))[0] + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(keys)]))
+        for start, end in zip(starts, ends):
+            self.cells[(int(cell_x[start]), int(cell_y[start]))] = owner[start:end]
+
+    def _cell_range(self, boxes: np.ndarray):
+        ox, oy = self.origin
+        size = self.cell_size
+        cx0 = np.floor((boxes[:, 0] - ox) / size).astype(np.int64)
+        cy0 = np.floor((boxes[:, 1] - oy) / size).astype(np.int64)
+        cx1 = np.floor((boxes[:, 2] - ox) / size).astype(np.int64)
+        cy1 = np.floor((boxes[:, 3] - oy) / size).astype(np.int64)
+        return cx0, cy0, cx1, cy1
+
+    def query(self, bounds: Bounds) -> np.ndarray:
+        """返回包围盒与查询矩形相交的实体下标（升序，即模型空间顺序）"""
+        if len(self.boxes) == 0:
+            return np.empty(0, dtype=np.int64)
+        query_box = np.asarray([bounds], dtype=float)
+        cx0, cy0, cx1, cy1 = [int(v[0]) for v in self._cell_range(query_box)]
+
+        candidates = [self.oversized]
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) <= len(self.cells):
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    bucket = self.cells.get((cx, cy))
+                    if bucket is not None:
+                        candidates.append(bucket)
+        else:
+            # 查询范围覆盖的单元比已有单元还多，直接遍历已有单元
+            candidates.extend(bucket for (cx, cy), bucket in self.cells.items()
+                              if cx0 <= cx <= cx1 and cy0 <= cy <= cy1)
+
+        candidate_idx = np.unique(np.concatenate(candidates))
+        boxes = self.boxes[candidate_idx]
+        min_x, min_y, max_x, max_y = bounds
+        hit = (boxes[:, 2] >= min_x) & (boxes[:, 0] <= max_x) & (boxes[:, 3] >= min_y) & (boxes[:, 1] <= max_y)
+        return candidate_idx[hit]
+
+
+class ModelSpaceIndex:
+    """DXF模型空间实体索引（每个文档构建一次）"""
+
+    _cache: "weakref.WeakKeyDictionary[Any, ModelSpaceIndex]" = weakref.WeakKeyDictionary()
+    # 构建时模型空间的实体数量，用于判断缓存是否失效
+    _source_size = -1
+
+    def __init__(self, entities: Iterable[Any]):
+        start = time.perf_counter()
+        self.entities: List[Any] = []
+        self.types: List[str] = []
+        self.unbounded: List[int] = []
+        self.texts: List[Dict[str, Any]] = []
+        text_owner: List[int] = []
+        boxes = []
+
+        for entity in entities:
+            try:
+                dxftype = entity.dxftype()
+                box = entity_bounds(entity)
+            except Exception:
+                continue
+            index = len(self.entities)
+            self.entities.append(entity)
+            self.types.append(dxftype)
+            if box is None:
+                self.unbounded.append(index)
+                box = (math.inf, math.inf, -math.inf, -math.inf)
+            boxes.append(box)
+            if dxftype in TEXT_TYPES:
+                try:
+                    record = text_record(entity)
+                except Exception:
+                    record = None
+                if record:
+                    record['entity'] = entity
+                    self.texts.append(record)
+                    text_owner.append(index)
+
+        positions = np.asarray([t['position'] for t in self.texts], dtype=float).reshape(-1, 2)
+        self._build_grids(np.asarray(boxes, dtype=float).reshape(-1, 4), positions, text_owner, start)
+
+    @classmethod
+    def from_columns(cls, columns: Any) -> "ModelSpaceIndex":
+        """
+        由流式读取得到的列式模型空间构建索引（不持有ezdxf实体）
+
+        Args:
+            columns: 提供 rows()/type_names()/boxes/text_rows()/text_positions/text_owner 的列式布局
+        """
+        start = time.perf_counter()
+        index = cls.__new__(cls)
+        index.entities = columns.rows()
+        index.types = columns.type_names()
+        index.unbounded = np.flatnonzero(~np.isfinite(columns.boxes).all(axis=1)).tolist()
+        index.texts = columns.text_rows()
+        index._build_grids(columns.boxes, columns.text_positions, columns.text_owner, start)
+        return index
+
+    def _build_grids(self, boxes: np.ndarray, text_positions: np.ndarray, text_owner: Sequence[int],
+                     start: float):
+        self.boxes = boxes
+        self._entity_grid = _GridIndex(self.boxes)
+        self._type_array = np.asarray(self.types, dtype=object)
+        self._unbounded = np.asarray(self.unbounded, dtype=np.int64)
+
+        self._text_grid = _GridIndex(np.hstack([text_positions, text_positions]))
+        self._text_owner = np.asarray(text_owner, dtype=np.int64)
+
+        self.build_seconds = time.perf_counter() - start
+        logger.info(f"🗂️ 模型空间索引构建完成: {len(self.entities)} 个实体, {len(self.texts)} 个文本, "
+                    f"耗时 {self.build_seconds * 1000:.1f}ms")
+
+    @classmethod
+    def of(cls, source: Any) -> "ModelSpaceIndex":
+        """
+        获取文档的索引（按文档缓存）
+
+        Args:
+            source: ezdxf 文档、模型空间或任意实体序列
+        """
+        doc = source if hasattr(source, 'modelspace') else getattr(source, 'doc', None)
+        if doc is None:
+            return cls(source)
+        modelspace = doc.modelspace()
+        index = cls._cache.get(doc)
+        # 模型空间实体数量变化时重建
+        if index is None or index._source_size != len(modelspace):
+            # 流式读取的列式模型空间自带建索引入口
+            build = getattr(modelspace, 'build_index', None)
+            index = build() if build is not None else cls(modelspace)
+            index._source_size = len(modelspace)
+            cls._cache[doc] = index
+        return index
+
+    def query(self, bounds: Bounds, types: Sequence[str] = None,
+              include_unbounded: bool = False) -> List[Any]:
+        """查询包围盒与矩形相交的实体，按模型空间顺序返回"""
+        idx = self._entity_grid.query(bounds)
+        if include_unbounded and len(self._unbounded):
+            idx = np.union1d(idx, self._unbounded)
+        if types is not None:
+            idx = idx[np.isin(self._type_array[idx], list(types))]
+        return [self.entities[i] for i in idx]
+
+    def query_boxes(self, bounds: Bounds, types: Sequence[str] = None) -> np.ndarray:
+        """查询包围盒与矩形相交的实体包围盒 (n, 4)，流式文档同样可用"""
+        idx = self._entity_grid.query(bounds)
+        if types is not None:
+            idx = idx[np.isin(self._type_array[idx], list(types))]
+        return self.boxes[idx]
+
+    def query_texts(self, bounds: Bounds, max_texts: int = None) -> List[Dict[str, Any]]:
+        """查询插入点位于矩形内的文本记录（text/position/height/type/entity），按模型空间顺序返回"""
+        idx = self._text_grid.query(bounds)
+        if max_texts is not None:
+            idx = idx[:max_texts]
+        return [self.texts[i] for i in idx]
+
+    def extent(self) -> Optional[Bounds]:
+        """模型空间内可计算包围盒的实体的总范围"""
+        finite = self.boxes[np.isfinite(self.boxes).all(axis=1)]
+        if len(finite) == 0:
+            return None
+        return (float(finite[:, 0].min()), float(finite[:, 1].min()),
+                float(finite[:, 2].max()), float(finite[:, 3].max()))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'entity_count': len(self.entities),
+            'text_count': len(self.texts),
+            'unbounded_count': len(self.unbounded),
+            'grid_cells': len(self._entity_grid.cells),
+            'oversized_entities': len(self._entity_grid.oversized),
+            'build_ms': round(self.build_seconds * 1000, 2)
+        }
+
+
+def synthetic_document(entity_count: int):
+    """生成多图框的合成DXF：若干A1图框，框内随机线段、圆和文字"""
+    import ezdxf
+    rng = np.random.default_rng(0)
+    doc = ezdxf.new()
+    doc.units = ezdxf.units.MM
+    msp = doc.modelspace()
+    frame_w, frame_h = 841.0, 594.0
+    frames = max(1, entity_count // 5000)
+    per_frame = entity_count // frames
+    for f in range(frames):
+        ox = (f % 8) * frame_w * 1.1
+        oy = (f // 8) * frame_h * 1.1
+        msp.add_lwpolyline([(ox, oy), (ox + frame_w, oy), (ox + frame_w, oy + frame_h), (ox, oy + frame_h)],
+                           close=True)
+        xy = rng.random((per_frame, 2)) * (frame_w, frame_h) + (ox, oy)
+        for i, (x, y) in enumerate(xy):
+            kind = i % 10
+            if kind < 7:
+                msp.add_line((x, y), (x + rng.random() * 20, y + rng.random() * 20))
+            elif kind < 9:
+                msp.add_circle((x, y), 1 + rng.random() * 5)
+            else:
+                msp.add_text(f"KZ{i}", dxfattribs={'insert': (x, y), 'height': 3.5})
+    return doc
+
+
+def benchmark(doc: Any, queries: int = 200) -> Dict[str, Any]:
+    """基准：索引构建耗时、矩形查询平均耗时，以及同等查询的全量遍历耗时"""
+    msp = doc.modelspace()
+    start = time.perf_counter()
+    index = ModelSpaceIndex(msp)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    min_x, min_y, max_x, max_y = index.extent()
+    rng = np.random.default_rng(1)
+    size = min(max_x - min_x, max_y - min_y) * 0.1
+    rects = [(x, y, x + size, y + size) for x, y in
+             zip(rng.uniform(min_x, max_x - size, queries), rng.uniform(min_y, max_y - size, queries))]
+
+    start = time.perf_counter()
+    for rect in rects:
+        index.query(rect)
+        index.query_texts(rect)
+    query_ms = (time.perf_counter() - start) * 1000 / queries
+
+    scan_rects = rects[:max(1, queries // 20)]
+    start = time.perf_counter()
+    for min_qx, min_qy, max_qx, max_qy in scan_rects:
+        for entity in msp:
+            if entity.dxftype() in TEXT_TYPES:
+                insert = entity.dxf.insert
+                _ = min_qx <= insert[0] <= max_qx and min_qy <= insert[1] <= max_qy
+    scan_ms = (time.perf_counter() - start) * 1000 / len(scan_rects)
+
+    return {**index.stats(), 'build_ms': round(build_ms, 1), 'query_ms': round(query_ms, 3),
+            'full_scan_text_query_ms': round(scan_ms, 1)}
+
+
+def main(argv: List[str] = None) -> int:
+    args = argv if argv is not None else sys.argv[1:]
+    if len(args) == 2 and args[0] == '--synthetic':
+        doc = synthetic_document(int(args[1]))
+    elif len(args) == 1:
+        import ezdxf
+        doc = ezdxf.readfile(args[0])
+    else:
+        print("用法: python -m app.services.dwg_processing.core.entity_index <file.dxf> | --synthetic <N>")
+        return 1
+    for key, value in benchmark(doc).items():
+        print(f"{key:<26}{value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图框并行执行器
+DXF只在父进程解析一次并建好模型空间索引；fork 出的工作进程以写时复制方式只读共享文档和索引，
+任务参数只有图框序号和边界，返回已落盘的图像路径和小体积的结果字典。
+每个工作进程同一时间只处理一个图框，峰值内存受单图框像素预算约束。
+父进程已有其他线程时 fork 可能继承被持有的锁，此时改用 forkserver/spawn 并序列化文档传给工作进程。
+"""
+
+import logging
+import multiprocessing
+import pickle
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+from app.core.config import settings
+from .entity_index import ModelSpaceIndex
+
+logger = logging.getLogger(__name__)
+
+Bounds = Tuple[float, float, float, float]
+FrameFn = Callable[[Any, int, Bounds], Dict[str, Any]]
+
+MODE_SEQUENTIAL = "sequential"
+MODE_PROCESS = "process"
+MODE_THREAD = "thread"
+
+# 工作进程内的文档和处理函数，由进程池初始化函数写入，父进程不使用
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_worker(doc: Any, frame_fn: FrameFn, payload: bytes = None):
+    """
+    工作进程初始化
+
+    fork 方式下 doc/frame_fn 随进程对象直接继承，不经过序列化；
+    forkserver/spawn 方式下二者以 payload 形式传入。
+    同时限制OpenCV线程，避免进程数×线程数超额占用CPU。
+    """
+    if payload is not None:
+        doc, frame_fn = pickle.loads(payload)
+    _worker_state.update(doc=doc, frame_fn=frame_fn)
+    if cv2 is not None:
+        cv2.setNumThreads(1)
+
+
+def _run_shared_frame(frame_index: int, bounds: Bounds) -> Dict[str, Any]:
+    return _worker_state['frame_fn'](_worker_state['doc'], frame_index, bounds)
+
+
+def _start_method() -> str:
+    """单线程进程用 fork 共享内存；已有其他线程时 fork 不安全，改用 forkserver/spawn"""
+    methods = multiprocessing.get_all_start_methods()
+    if 'fork' in methods and threading.active_count() == 1:
+        return 'fork'
+    return 'forkserver' if 'forkserver' in methods else 'spawn'
+
+
+class FrameExecutor:
+    """按图框并行执行处理函数"""
+
+    def __init__(self, max_workers: int = None, enabled: bool = None):
+        self.max_workers = max(1, max_workers or settings.DWG_FRAME_WORKERS)
+        self.enabled = settings.DWG_FRAME_PARALLEL if enabled is None else enabled
+
+    def choose_mode(self, frame_count: int) -> str:
+        """
+        选择执行方式
+
+        Celery prefork 工作进程是守护进程，不能再创建子进程，此时退化为线程池
+        （渲染中的OpenCV绘制和PNG压缩会释放GIL）。
+        """
+        if not self.enabled or self.max_workers <= 1 or frame_count < settings.DWG_FRAME_PARALLEL_MIN_FRAMES:
+            return MODE_SEQUENTIAL
+        if multiprocessing.current_process().daemon:
+            return MODE_THREAD
+        return MODE_PROCESS
+
+    def _process_pool(self, doc: Any, frame_fn: FrameFn, workers: int) -> Tuple[ProcessPoolExecutor, str]:
+        """
+        创建进程池，状态通过初始化参数逐池传递，并发的 map 调用互不覆盖
+
+        Returns:
+            (进程池, 启动方式)；非 fork 方式下文档或处理函数无法序列化时进程池为 None
+        """
+        method = _start_method()
+        initargs: Tuple = (doc, frame_fn)
+        if method != 'fork':
+            try:
+                initargs = (None, None, pickle.dumps((doc, frame_fn), protocol=pickle.HIGHEST_PROTOCOL))
+            except Exception as e:
+                logger.warning(f"⚠️ 当前进程已有多个线程且图框任务无法序列化，改用线程池: {e}")
+                return None, method
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method),
+                                   initializer=_init_worker, initargs=initargs)
+        return pool, method
+
+    def map(self, doc: Any, frames: Sequence[Bounds], frame_fn: FrameFn) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        对每个图框执行 frame_fn(doc, frame_index, bounds)
+
+        Returns:
+            (按图框顺序排列的结果列表, 执行统计)
+        """
+        start = time.perf_counter()
+        mode = self.choose_mode(len(frames))
+        workers = min(self.max_workers, len(frames)) if mode != MODE_SEQUENTIAL else 1
+        # 子进程继承已建好的索引，不再各自遍历模型空间
+        ModelSpaceIndex.of(doc)
+
+        results: List[Dict[str, Any]] = [None] * len(frames)
+        retried = 0
+        start_method = None
+        pool = None
+        if mode == MODE_PROCESS:
+            pool, start_method = self._process_pool(doc, frame_fn, workers)
+            if pool is None:
+                mode = MODE_THREAD
+        if mode == MODE_SEQUENTIAL:
+            for i, bounds in enumerate(frames):
+                results[i] = frame_fn(doc, i, bounds)
+        else:
+            logger.info(f"🚀 图框并行处理: {len(frames)} 个图框, {workers} 个{'进程' if mode == MODE_PROCESS else '线程'}")
+            if mode == MODE_PROCESS:
+                submit = lambda i, bounds: pool.submit(_run_shared_frame, i, bounds)
+            else:
+                pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dwg_frame')
+                submit = lambda i, bounds: pool.submit(frame_fn, doc, i, bounds)
+            try:
+                futures = [submit(i, bounds) for i, bounds in enumerate(frames)]
+                for i, future in enumerate(futures):
+                    try:
+                        results[i] = future.result()
+                    except Exception as e:
+                        # 工作进程异常退出等情况，在当前进程重做该图框
+                        logger.warning(f"⚠️ 图框 {i} 并行处理失败，改为串行重试: {e}")
+                        results[i] = frame_fn(doc, i, frames[i])
+                        retried += 1
+            finally:
+                pool.shutdown(wait=True)
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            'mode': mode,
+            'workers': workers,
+            'start_method': start_method,
+            'frames': len(frames),
+            'retried_frames': retried,
+            'seconds': round(elapsed, 3),
+            'frames_per_second': round(len(frames) / elapsed, 2) if elapsed > 0 else None
+        }
+        logger.info(f"✅ 图框处理完成: {stats}")
+        return results, stats
@@ -6,5 +6,6 @@
 """
 
 from .text_parser import TextParser
+from .frame_detector import FrameDetector
 
-__all__ = ['TextParser'] 
\ No newline at end of file
+__all__ = ['TextParser', 'FrameDetector'] 
\ No newline at end of file
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图框候选检测器
+基于模型空间索引一次性筛选图框候选：闭合矩形多段线、四条直线围成的矩形以及块参照，
+外形尺寸需符合GB/T 50001标准图幅（A0–A4及加长图幅）在常用出图比例下的大小。
+候选按面积和包含关系排序，再用 FrameValidator 的区域查询评分，低于 DWG_FRAME_MIN_SCORE 的候选
+（只是尺寸恰好符合图幅的普通矩形）不作为图框，其内部候选参与后续判断。
+
+用法（基准测试）:
+    python -m app.services.dwg_processing.detectors.frame_detector <file.dxf>
+    python -m app.services.dwg_processing.detectors.frame_detector --synthetic 60
+"""
+
+import logging
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from ..core.entity_index import ModelSpaceIndex, Bounds
+from .frame_validator import FrameValidator
+
+logger = logging.getLogger(__name__)
+
+# 标准图幅（纸面毫米，长边×短边）
+STANDARD_SHEETS = {
+    'A0': (1189.0, 841.0),
+    'A1': (841.0, 594.0),
+    'A2': (594.0, 420.0),
+    'A3': (420.0, 297.0),
+    'A4': (297.0, 210.0),
+}
+
+# 加长图幅：长边按 1/4 递增（A4不加长）
+LENGTHENING = (1.0, 1.25, 1.5, 1.75, 2.0)
+
+# 常用出图比例分母
+COMMON_SCALES = (1, 2, 5, 10, 20, 25, 50, 75, 100, 150, 200, 250, 300, 500, 1000, 2000)
+
+# 尺寸相对容差
+SIZE_TOLERANCE = 0.01
+# 该误差内视为精确匹配
+EXACT_TOLERANCE = 0.002
+
+_RECT_TYPES = ('LWPOLYLINE', 'POLYLINE', 'INSERT')
+# 同一位置的重复候选保留顺序：块参照 > 多段线 > 直线
+_SOURCE_PRIORITY = {'INSERT': 0, 'LWPOLYLINE': 1, 'POLYLINE': 1, 'LINE': 2}
+
+
+def unit_factors(doc: Any) -> Tuple[float, ...]:
+    """纸面毫米到图形单位的换算系数；声明单位不是毫米时同时按毫米尝试"""
+    factors = [1.0]
+    try:
+        import ezdxf
+        units = doc.units if hasattr(doc, 'units') else 0
+        if units:
+            factor = ezdxf.units.conversion_factor(ezdxf.units.MM, units)
+            if abs(factor - 1.0) > 1e-9:
+                factors.insert(0, factor)
+    except Exception:
+        pass
+    return tuple(factors)
+
+
+class SheetSizeTable:
+    """标准图幅×加长×比例×单位 的外形尺寸表"""
+
+    def __init__(self, factors: Tuple[float, ...] = (1.0,), tolerance: float = SIZE_TOLERANCE):
+        self.tolerance = tolerance
+        rows = []
+        for name, (long_side, short_side) in STANDARD_SHEETS.items():
+            for lengthening in (LENGTHENING if name != 'A4' else (1.0,)):
+                for scale in COMMON_SCALES:
+                    for factor in factors:
+                        k = scale * factor
+                        rows.append((long_side * lengthening * k, short_side * k, name, lengthening, scale, k))
+        rows.sort(key=lambda row: row[0])
+        self.long = np.array([row[0] for row in rows])
+        self.short = np.array([row[1] for row in rows])
+        self.labels = [(row[2], row[3], row[4], row[5]) for row in rows]
+        self.sides = np.unique(np.concatenate([self.long, self.short]))
+
+    def side_mask(self, lengths: np.ndarray) -> np.ndarray:
+        """长度是否等于某个标准图幅边长（向量化，用于直线预筛）"""
+        lengths = np.asarray(lengths, dtype=float)
+        lo = np.searchsorted(self.sides, lengths * (1 - self.tolerance), side='left')
+        hi = np.searchsorted(self.sides, lengths * (1 + self.tolerance), side='right')
+        return hi > lo
+
+    def size_mask(self, widths: np.ndarray, heights: np.ndarray) -> np.ndarray:
+        """外形是否可能是标准图幅：长边、短边都能在尺寸表中找到（向量化预筛）"""
+        long_side = np.maximum(widths, heights)
+        short_side = np.minimum(widths, heights)
+        return self.side_mask(long_side) & self.side_mask(short_side) & (short_side > 0)
+
+    def match(self, width: float, height: float) -> Optional[Dict[str, Any]]:
+        """返回误差最小的图幅匹配 {sheet, scale, size_match, size_error, paper_factor}"""
+        long_side, short_side = max(width, height), min(width, height)
+        if short_side <= 0:
+            return None
+        lo = np.searchsorted(self.long, long_side * (1 - self.tolerance), side='left')
+        hi = np.searchsorted(self.long, long_side * (1 + self.tolerance), side='right')
+        best = None
+        for i in range(lo, hi):
+            error = max(abs(long_side / self.long[i] - 1), abs(short_side / self.short[i] - 1))
+            if error <= self.tolerance and (best is None or error < best[0]):
+                best = (error, i)
+        if best is None:
+            return None
+        error, i = best
+        name, lengthening, scale, paper_factor = self.labels[i]
+        if lengthening != 1.0:
+            name = f"{name}+{lengthening - 1:.2f}".rstrip('0').rstrip('.')
+        return {
+            'sheet': name,
+            'scale': f"1:{scale}",
+            'size_match': 'exact' if error <= EXACT_TOLERANCE else 'approximate',
+            'size_error': round(float(error), 5),
+            'paper_factor': paper_factor
+        }
+
+
+def _is_axis_rectangle(entity: Any, box: np.ndarray, tolerance: float) -> bool:
+    """闭合多段线的顶点是否恰好是包围盒的四个角"""
+    if hasattr(entity, 'points_xy'):
+        # 流式读取的列式实体，带凸度的多段线已离散，不会只有4个顶点
+        points, closed = entity.points_xy(), entity.closed
+    elif entity.dxftype() == 'LWPOLYLINE':
+        raw = np.asarray(entity.lwpoints.values, dtype=float).reshape(-1, 5)
+        if raw.size and np.any(raw[:, 4] != 0):
+            return False
+        points = raw[:, :2]
+        closed = entity.closed
+    else:
+        if not entity.is_2d_polyline:
+            return False
+        points = np.asarray([(v[0], v[1]) for v in entity.points()], dtype=float).reshape(-1, 2)
+        closed = entity.is_closed
+    if len(points) == 5 and np.allclose(points[0], points[-1], atol=tolerance):
+        points, closed = points[:4], True
+    if not closed or len(points) != 4:
+        return False
+    on_x = np.minimum(np.abs(points[:, 0] - box[0]), np.abs(points[:, 0] - box[2])) <= tolerance
+    on_y = np.minimum(np.abs(points[:, 1] - box[1]), np.abs(points[:, 1] - box[3])) <= tolerance
+    corners = {(abs(x - box[0]) > tolerance, abs(y - box[1]) > tolerance) for x, y in points}
+    return bool(on_x.all() and on_y.all() and len(corners) == 4)
+
+
+class FrameDetector:
+    """图框候选检测器"""
+
+    def __init__(self, validator: FrameValidator = None, tolerance: float = SIZE_TOLERANCE,
+                 min_score: float = None):
+        self.validator = validator or FrameValidator()
+        self.tolerance = tolerance
+        self.min_score = settings.DWG_FRAME_MIN_SCORE if min_score is None else min_score
+
+    def find_candidates(self, doc: Any) -> List[Dict[str, Any]]:
+        """
+        一次遍历索引生成图框候选，按面积从大到小排序并标注包含关系
+
+        Returns:
+            候选列表，每项含 bounds/source/entity/sheet/scale/size_match/paper_factor/parent/depth
+        """
+        index = ModelSpaceIndex.of(doc)
+        extent = index.extent()
+        if extent is None:
+            return []
+        table = SheetSizeTable(unit_factors(doc), self.tolerance)
+        # 坐标容差：总范围的百万分之五，用于顶点贴合和直线端点量化
+        quantum = max(extent[2] - extent[0], extent[3] - extent[1], 1e-9) * 5e-6
+
+        boxes = index.boxes
+        finite = np.isfinite(boxes).all(axis=1)
+        widths = np.where(finite, boxes[:, 2] - boxes[:, 0], 0.0)
+        heights = np.where(finite, boxes[:, 3] - boxes[:, 1], 0.0)
+        types = np.asarray(index.types, dtype=object)
+
+        candidates = []
+        rect_idx = np.flatnonzero(np.isin(types, _RECT_TYPES) & table.size_mask(widths, heights))
+        for i in rect_idx:
+            entity = index.entities[i]
+            try:
+                if types[i] != 'INSERT' and not _is_axis_rectangle(entity, boxes[i], quantum):
+                    continue
+            except Exception:
+                continue
+            candidates.append((tuple(float(v) for v in boxes[i]), types[i], entity))
+
+        line_idx = np.flatnonzero(types == 'LINE')
+        candidates.extend((bounds, 'LINE', None) for bounds in
+                          self._line_rectangles(boxes[line_idx], widths[line_idx], heights[line_idx], table, quantum))
+
+        return self._rank(candidates, table, quantum)
+
+    def _line_rectangles(self, boxes: np.ndarray, widths: np.ndarray, heights: np.ndarray,
+                         table: SheetSizeTable, quantum: float) -> List[Bounds]:
+        """四条首尾相接的水平/竖直直线围成的矩形"""
+        horizontal = (heights <= quantum) & table.side_mask(widths)
+        vertical = (widths <= quantum) & table.side_mask(heights)
+        if not horizontal.any() or not vertical.any():
+            return []
+
+        def quantize(values):
+            return np.rint(np.asarray(values) / quantum).astype(np.int64).tolist()
+
+        # 水平线按量化后的 (x0, x1) 分组记录 y；竖直线按量化后的 (y0, y1, x) 建集合
+        rows = defaultdict(list)
+        spans = {}
+        h_boxes = boxes[horizontal]
+        for row_key, (x0, y0, x1, _) in zip(map(tuple, quantize(h_boxes[:, [0, 2]])), h_boxes.tolist()):
+            rows[row_key].append(y0)
+            spans.setdefault(row_key, (x0, x1))
+        columns = set(map(tuple, quantize(boxes[vertical][:, [1, 3, 0]])))
+
+        rectangles = []
+        for (kx0, kx1), ys in rows.items():
+            if len(ys) < 2:
+                continue
+            x0, x1 = spans[(kx0, kx1)]
+            ys = sorted(set(ys))
+            for a in range(len(ys)):
+                for b in range(a + 1, len(ys)):
+                    y0, y1 = ys[a], ys[b]
+                    if table.match(x1 - x0, y1 - y0) is None:
+                        continue
+                    ky0, ky1 = quantize((y0, y1))
+                    if (ky0, ky1, kx0) in columns and (ky0, ky1, kx1) in columns:
+                        rectangles.append((x0, y0, x1, y1))
+        return rectangles
+
+    def _rank(self, candidates: List[Tuple[Bounds, str, Any]], table: SheetSizeTable,
+              quantum: float) -> List[Dict[str, Any]]:
+        """去重、按面积降序排序并确定每个候选的直接父候选"""
+        tolerance = quantum * 4
+        ordered = sorted(candidates, key=lambda c: (-(c[0][2] - c[0][0]) * (c[0][3] - c[0][1]),
+                                                    _SOURCE_PRIORITY.get(c[1], 9)))
+        ranked: List[Dict[str, Any]] = []
+        kept = np.empty((0, 4))
+        for bounds, source, entity in ordered:
+            box = np.asarray(bounds)
+            if len(kept) and np.any(np.all(np.abs(kept - box) <= tolerance, axis=1)):
+                continue
+            match = table.match(bounds[2] - bounds[0], bounds[3] - bounds[1])
+            if match is None:
+                continue
+            # 已保留的候选都不小于当前候选，包含当前候选的最后一个即最小的父候选
+            containing = np.flatnonzero(
+                (kept[:, 0] <= box[0] + tolerance) & (kept[:, 1] <= box[1] + tolerance) &
+                (kept[:, 2] >= box[2] - tolerance) & (kept[:, 3] >= box[3] - tolerance)
+            ) if len(kept) else np.empty(0, dtype=np.int64)
+            parent = int(containing[-1]) if len(containing) else None
+            ranked.append({
+                'bounds': bounds,
+                'source': source,
+                'entity': entity,
+                'frame_type': match['sheet'],
+                **match,
+                'parent': parent,
+                'depth': ranked[parent]['depth'] + 1 if parent is not None else 0
+            })
+            kept = np.vstack([kept, box])
+        return ranked
+
+    def detect(self, doc: Any, validate: bool = True) -> List[Dict[str, Any]]:
+        """
+        检测图框：按面积从大到小，不在已接受图框内的候选经标准符合度评分后成为图框
+
+        validate=False 时不评分，所有顶层候选都作为图框。
+
+        Returns:
+            图框列表（按面积降序），内图框/详图框记录在 children 中
+        """
+        start = time.perf_counter()
+        candidates = self.find_candidates(doc)
+        modelspace = doc.modelspace() if validate else None
+        frames = []
+        position = {}
+        rejected = 0
+        for i, candidate in enumerate(candidates):
+            # 最外层的已接受祖先
+            root, ancestor = None, candidate['parent']
+            while ancestor is not None:
+                if ancestor in position:
+                    root = ancestor
+                ancestor = candidates[ancestor]['parent']
+            if root is not None:
+                frames[position[root]]['children'].append(candidate['bounds'])
+                continue
+            if validate:
+                score = self.validator.validate_frame_by_standard(modelspace, candidate)
+                if score < self.min_score:
+                    rejected += 1
+                    continue
+            elif candidate['parent'] is not None:
+                continue
+            position[i] = len(frames)
+            candidate['children'] = []
+            frames.append(candidate)
+
+        for candidate in candidates:
+            candidate.pop('entity', None)
+        logger.info(f"🖼️ 图框检测完成: {len(candidates)} 个候选, {len(frames)} 个图框, "
+                    f"{rejected} 个低于标准符合度阈值, 耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+        return frames
+
+    def detect_bounds(self, doc: Any) -> List[Bounds]:
+        """只返回顶层图框边界"""
+        return [frame['bounds'] for frame in self.detect(doc, validate=False)]
+
+
+def synthetic_document(frame_count: int, clutter_per_frame: int = 2000):
+    """生成多图框合成DXF：A1@1:100 图框轮流用多段线、四条直线、块参照绘制，框内含内框和随机线段"""
+    import ezdxf
+    rng = np.random.default_rng(0)
+    doc = ezdxf.new()
+    doc.units = ezdxf.units.MM
+    msp = doc.modelspace()
+    width, height = 84100.0, 59400.0
+    block = doc.blocks.new('A1_FRAME')
+    block.add_lwpolyline([(0, 0), (width, 0), (width, height), (0, height)], close=True)
+    block.add_lwpolyline([(2500, 1000), (width - 1000, 1000), (width - 1000, height - 1000),
+                          (2500, height - 1000)], close=True)
+    for f in range(frame_count):
+        ox, oy = (f % 10) * width * 1.2, (f // 10) * height * 1.2
+        corners = [(ox, oy), (ox + width, oy), (ox + width, oy + height), (ox, oy + height)]
+        if f % 3 == 0:
+            msp.add_lwpolyline(corners, close=True)
+        elif f % 3 == 1:
+            for a, b in zip(corners, corners[1:] + corners[:1]):
+                msp.add_line(a, b)
+        else:
+            msp.add_blockref('A1_FRAME', (ox, oy))
+        msp.add_text("图号:S-%02d" % f, dxfattribs={'insert': (ox + width - 5000, oy + 1500), 'height': 350})
+        xy = rng.random((clutter_per_frame, 2)) * (width, height) + (ox, oy)
+        for x, y in xy:
+            msp.add_line((x, y), (x + rng.random() * 3000, y))
+    return doc
+
+
+def benchmark(doc: Any) -> Dict[str, Any]:
+    """基准：索引构建、候选生成和验证耗时"""
+    start = time.perf_counter()
+    index = ModelSpaceIndex.of(doc)
+    index_ms = (time.perf_counter() - start) * 1000
+    detector = FrameDetector()
+    start = time.perf_counter()
+    candidates = detector.find_candidates(doc)
+    candidate_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    frames = detector.detect(doc)
+    detect_ms = (time.perf_counter() - start) * 1000
+    return {
+        'entities': len(index.entities),
+        'candidates': len(candidates),
+        'frames': len(frames),
+        'index_ms': round(index_ms, 1),
+        'candidate_ms': round(candidate_ms, 1),
+        'detect_with_validation_ms': round(detect_ms, 1)
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    args = argv if argv is not None else sys.argv[1:]
+    if len(args) == 2 and args[0] == '--synthetic':
+        doc = synthetic_document(int(args[1]))
+    elif len(args) == 1:
+        import ezdxf
+        doc = ezdxf.readfile(args[0])
+    else:
+        print("用法: python -m app.services.dwg_processing.detectors.frame_detector <file.dxf> | --synthetic <N>")
+        return 1
+    for key, value in benchmark(doc).items():
+        print(f"{key:<28}{value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,8 @@
 import logging
 from typing import Any, Tuple, Dict
 
+from ..core.entity_index import ModelSpaceIndex
+
 logger = logging.getLogger(__name__)
 
 class FrameInfoExtractor:
@@ -44,25 +46,9 @@ class FrameInfoExtractor:
     def _find_texts_in_area(self, doc: Any, bounds: Tuple[float, float, float, float]):
         """在图框区域查找文本"""
         try:
-            texts = []
-            min_x, min_y, max_x, max_y = bounds
             if not hasattr(doc, 'modelspace'):
-                return texts
-            modelspace = doc.modelspace()
-            for entity in modelspace:
-                if entity.dxftype() in ['TEXT', 'MTEXT']:
-                    try:
-                        if entity.dxftype() == 'TEXT':
-                            position = entity.dxf.insert
-                            text_content = entity.dxf.text
-                        else:
-                            position = entity.dxf.insert
-                            text_content = entity.plain_text()
-                        if (min_x <= position.x <= max_x and min_y <= position.y <= max_y and text_content.strip()):
-                            texts.append(text_content.strip())
-                    except Exception:
-                        continue
-            return texts
+                return []
+            return [text['text'] for text in ModelSpaceIndex.of(doc).query_texts(bounds)]
         except Exception as e:
             logger.error(f"查找文本时发生错误: {e}")
             return []
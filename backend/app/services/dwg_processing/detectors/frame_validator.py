@@ -3,14 +3,26 @@
 """
 图框验证器 - 基于建筑制图标准
 专门负责验证图框是否符合GB/T 50001-2017标准
+
+标准中的图签、印章尺寸按纸面毫米给出，候选带有 paper_factor（每纸面毫米对应的图形单位）时
+按出图比例换算到模型空间再查询。
 """
 
 import logging
 import re
 from typing import List, Dict, Any, Tuple, Optional
 
+from ..core.entity_index import ModelSpaceIndex, entity_bounds
+
 logger = logging.getLogger(__name__)
 
+# 图框线（内框）与幅面线的最大间距（纸面毫米，装订边25mm，其余5/10mm）
+INNER_BORDER_MAX_MARGIN = 30.0
+# 图框线至少覆盖幅面边长的比例
+INNER_BORDER_MIN_SPAN = 0.8
+_BORDER_TYPES = ('LINE', 'LWPOLYLINE', 'POLYLINE')
+
+
 class FrameValidator:
     """图框验证器类"""
     
@@ -56,23 +68,25 @@ class FrameValidator:
             标准符合度得分
         """
         bounds = frame_candidate['bounds']
+        paper_factor = frame_candidate.get('paper_factor', 1.0)
         score = 0.0
         
         try:
             # 图签区域验证（权重3.0）
-            title_block_score = self._validate_title_block_standard(modelspace, bounds)
+            title_block_score = self._validate_title_block_standard(modelspace, bounds, paper_factor)
             score += title_block_score * 3.0
             
             # 边框完整性验证（权重2.0）
-            border_score = self._validate_border_integrity(modelspace, bounds)
+            block_ref = frame_candidate.get('entity') if frame_candidate.get('source') == 'INSERT' else None
+            border_score = self._validate_border_integrity(modelspace, bounds, paper_factor, block_ref)
             score += border_score * 2.0
             
             # 标准文本验证（权重2.5）
-            text_score = self._validate_standard_texts(modelspace, bounds)
+            text_score = self._validate_standard_texts(modelspace, bounds, paper_factor)
             score += text_score * 2.5
             
             # 印章位置验证（权重1.5）
-            seal_score = self._validate_standard_seal_positions(modelspace, bounds)
+            seal_score = self._validate_standard_seal_positions(modelspace, bounds, paper_factor)
             score += seal_score * 1.5
             
             # 尺寸标准验证（权重1.0）
@@ -108,7 +122,8 @@ class FrameValidator:
             
         return score
     
-    def _validate_title_block_standard(self, modelspace: Any, bounds: Tuple[float, float, float, float]) -> float:
+    def _validate_title_block_standard(self, modelspace: Any, bounds: Tuple[float, float, float, float],
+                                       paper_factor: float = 1.0) -> float:
         """验证图签区域是否符合GB/T 50001-2017标准"""
         min_x, min_y, max_x, max_y = bounds
         width = max_x - min_x
@@ -116,10 +131,10 @@ class FrameValidator:
         
         # 图签通常位于右下角
         title_block_bounds = (
-            max_x - min(180, width * 0.3),
+            max_x - min(180 * paper_factor, width * 0.3),
             min_y,
             max_x,
-            min_y + min(80, height * 0.2)
+            min_y + min(80 * paper_factor, height * 0.2)
         )
         
         score = 0.0
@@ -186,52 +201,60 @@ class FrameValidator:
         
         return min(score, 3.0)  # 最大3分
     
-    def _validate_border_integrity(self, modelspace: Any, bounds: Tuple[float, float, float, float]) -> float:
-        """验证边框完整性"""
+    def _validate_border_integrity(self, modelspace: Any, bounds: Tuple[float, float, float, float],
+                                   paper_factor: float = 1.0, block_ref: Any = None) -> float:
+        """
+        验证图框线（内框）完整性
+
+        幅面线本身已由候选检测确认，这里查找与幅面线间距不超过30mm、覆盖大部分边长的内框：
+        闭合矩形计四条边，单独的直线按上下左右分别计数。块参照图框在块定义内查找。
+        """
         min_x, min_y, max_x, max_y = bounds
-        tolerance = 10  # 10个单位的容差
-        
-        # 检查四条边框线
-        edges = {
-            'top': (min_x, max_y, max_x, max_y),      # 上边
-            'bottom': (min_x, min_y, max_x, min_y),   # 下边  
-            'left': (min_x, min_y, min_x, max_y),     # 左边
-            'right': (max_x, min_y, max_x, max_y)     # 右边
-        }
-        
-        found_edges = 0
-        entity_count = 0
-        
-        for entity in modelspace:
-            entity_count += 1
-            if entity_count > 2000:  # 限制检查数量
+        width = max_x - min_x
+        height = max_y - min_y
+        max_margin = INNER_BORDER_MAX_MARGIN * paper_factor
+        tolerance = max(width, height) * 1e-4
+
+        boxes = ModelSpaceIndex.of(modelspace).query_boxes(bounds, types=_BORDER_TYPES).tolist()
+        if block_ref is not None:
+            try:
+                boxes += [entity_bounds(e) for e in block_ref.virtual_entities() if e.dxftype() in _BORDER_TYPES]
+            except Exception:
+                pass
+
+        def inset(near: float, far: float) -> bool:
+            return tolerance < near <= max_margin and far >= 0
+
+        found = set()
+        for box in boxes:
+            if box is None:
+                continue
+            x0, y0, x1, y1 = box
+            left, bottom, right, top = x0 - min_x, y0 - min_y, max_x - x1, max_y - y1
+            spans_x = (x1 - x0) >= width * INNER_BORDER_MIN_SPAN
+            spans_y = (y1 - y0) >= height * INNER_BORDER_MIN_SPAN
+            if spans_x and spans_y:
+                if all(tolerance < margin <= max_margin for margin in (left, bottom, right, top)):
+                    found.update(('top', 'bottom', 'left', 'right'))
+            elif spans_x and (y1 - y0) <= tolerance:
+                if inset(bottom, top):
+                    found.add('bottom')
+                elif inset(top, bottom):
+                    found.add('top')
+            elif spans_y and (x1 - x0) <= tolerance:
+                if inset(left, right):
+                    found.add('left')
+                elif inset(right, left):
+                    found.add('right')
+            if len(found) == 4:
                 break
-                
-            if entity.dxftype() == 'LINE':
-                try:
-                    start = entity.dxf.start
-                    end = entity.dxf.end
-                    
-                    for edge_name, (ex1, ey1, ex2, ey2) in edges.items():
-                        # 检查线段是否接近边框线
-                        if edge_name in ['top', 'bottom']:  # 水平线
-                            if (abs(start.y - ey1) < tolerance and abs(end.y - ey1) < tolerance and
-                                abs(start.x - ex1) < tolerance * 5 and abs(end.x - ex2) < tolerance * 5):
-                                found_edges += 1
-                                break
-                        else:  # 垂直线
-                            if (abs(start.x - ex1) < tolerance and abs(end.x - ex1) < tolerance and
-                                abs(start.y - ey1) < tolerance * 5 and abs(end.y - ey2) < tolerance * 5):
-                                found_edges += 1
-                                break
-                except Exception:
-                    continue
-        
+
         # 边框完整性得分
-        border_score = found_edges / 4.0  # 最多4条边
+        border_score = len(found) / 4.0  # 最多4条边
         return min(border_score * 2.0, 2.0)  # 最大2分
     
-    def _validate_standard_texts(self, modelspace: Any, bounds: Tuple[float, float, float, float]) -> float:
+    def _validate_standard_texts(self, modelspace: Any, bounds: Tuple[float, float, float, float],
+                                 paper_factor: float = 1.0) -> float:
         """验证标准文本"""
         texts = self._find_texts_in_specific_area(modelspace, bounds, max_texts=100)
         
@@ -275,7 +298,7 @@ class FrameValidator:
             score += 0.2
         
         # 文本密度奖励
-        text_density = len(texts) / ((bounds[2] - bounds[0]) * (bounds[3] - bounds[1]) / 10000)
+        text_density = len(texts) / ((bounds[2] - bounds[0]) * (bounds[3] - bounds[1]) / (10000 * paper_factor ** 2))
         if text_density >= 5:
             score += 0.2
         elif text_density >= 2:
@@ -283,7 +306,8 @@ class FrameValidator:
         
         return min(score, 2.5)  # 最大2.5分
     
-    def _validate_standard_seal_positions(self, modelspace: Any, bounds: Tuple[float, float, float, float]) -> float:
+    def _validate_standard_seal_positions(self, modelspace: Any, bounds: Tuple[float, float, float, float],
+                                          paper_factor: float = 1.0) -> float:
         """验证标准印章位置"""
         min_x, min_y, max_x, max_y = bounds
         width = max_x - min_x
@@ -292,54 +316,42 @@ class FrameValidator:
         # 印章通常位于图签区域的特定位置
         seal_areas = [
             # 右下角图签区域
-            (max_x - min(160, width * 0.25), min_y, max_x - 20, min_y + min(60, height * 0.15)),
+            (max_x - min(160 * paper_factor, width * 0.25), min_y,
+             max_x - 20 * paper_factor, min_y + min(60 * paper_factor, height * 0.15)),
             # 右侧中部
-            (max_x - min(100, width * 0.15), min_y + height * 0.3, max_x, min_y + height * 0.7),
+            (max_x - min(100 * paper_factor, width * 0.15), min_y + height * 0.3, max_x, min_y + height * 0.7),
         ]
         
         score = 0.0
         
         for seal_area in seal_areas:
-            seal_score = self._detect_seal_positions_fast(modelspace, seal_area)
+            seal_score = self._detect_seal_positions_fast(modelspace, seal_area, paper_factor)
             score += seal_score
         
         return min(score, 1.5)  # 最大1.5分
     
-    def _detect_seal_positions_fast(self, modelspace: Any, bounds: Tuple[float, float, float, float]) -> float:
+    def _detect_seal_positions_fast(self, modelspace: Any, bounds: Tuple[float, float, float, float],
+                                    paper_factor: float = 1.0) -> float:
         """快速检测印章位置"""
         min_x, min_y, max_x, max_y = bounds
         seal_indicators = 0
-        entity_count = 0
-        
-        for entity in modelspace:
-            entity_count += 1
-            if entity_count > 1000:  # 限制检查数量
-                break
-                
+        index = ModelSpaceIndex.of(modelspace)
+
+        for entity in index.query(bounds, types=('CIRCLE',)):
             try:
-                if entity.dxftype() == 'CIRCLE':
-                    center = entity.dxf.center
-                    if min_x <= center.x <= max_x and min_y <= center.y <= max_y:
-                        radius = entity.dxf.radius
-                        if 10 <= radius <= 50:  # 印章大小范围
-                            seal_indicators += 1
-                            
-                elif entity.dxftype() in ['TEXT', 'MTEXT']:
-                    if entity.dxftype() == 'TEXT':
-                        position = entity.dxf.insert
-                        text = entity.dxf.text
-                    else:
-                        position = entity.dxf.insert
-                        text = entity.plain_text()
-                    
-                    if (min_x <= position.x <= max_x and min_y <= position.y <= max_y):
-                        # 检查印章相关文字
-                        seal_keywords = ['注册', '执业', '印章', '章', 'SEAL', 'STAMP', '工程师', '建筑师']
-                        if any(keyword in text for keyword in seal_keywords):
-                            seal_indicators += 1
-                            
+                center = entity.dxf.center
+                if min_x <= center.x <= max_x and min_y <= center.y <= max_y:
+                    radius = entity.dxf.radius
+                    if 10 * paper_factor <= radius <= 50 * paper_factor:  # 印章大小范围
+                        seal_indicators += 1
             except Exception:
                 continue
+
+        # 检查印章相关文字
+        seal_keywords = ['注册', '执业', '印章', '章', 'SEAL', 'STAMP', '工程师', '建筑师']
+        for text in index.query_texts(bounds):
+            if any(keyword in text['text'] for keyword in seal_keywords):
+                seal_indicators += 1
         
         # 印章指示器得分
         if seal_indicators >= 3:
@@ -370,32 +382,5 @@ class FrameValidator:
                                    bounds: Tuple[float, float, float, float], 
                                    max_texts: int = 50) -> List[str]:
         """在指定区域查找文本"""
-        texts = []
-        min_x, min_y, max_x, max_y = bounds
-        text_count = 0
-        
-        for entity in modelspace:
-            if text_count >= max_texts:
-                break
-                
-            try:
-                if entity.dxftype() == 'TEXT':
-                    position = entity.dxf.insert
-                    if min_x <= position.x <= max_x and min_y <= position.y <= max_y:
-                        text_content = entity.dxf.text.strip()
-                        if text_content:
-                            texts.append(text_content)
-                            text_count += 1
-                            
-                elif entity.dxftype() == 'MTEXT':
-                    position = entity.dxf.insert
-                    if min_x <= position.x <= max_x and min_y <= position.y <= max_y:
-                        text_content = entity.plain_text().strip()
-                        if text_content:
-                            texts.append(text_content)
-                            text_count += 1
-                            
-            except Exception:
-                continue
-        
-        return texts 
\ No newline at end of file
+        index = ModelSpaceIndex.of(modelspace)
+        return [text['text'] for text in index.query_texts(bounds, max_texts=max_texts)] 
\ No newline at end of file
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文本邻近聚类
+以阈值为边长的哈希网格只比较相邻9个单元内的文本，替代逐对计算距离的 O(n²) 分组。
+
+两种分组语义:
+    greedy_text_groups      与 TextParser 原有实现一致：按顺序取未分组文本为种子，
+                            收拢距种子不超过阈值的其余未分组文本
+    connected_text_groups   单链接：距离不超过阈值的文本两两连通，取连通分量（box_overlap 的并查集）
+"""
+
+import logging
+import sys
+import time
+from typing import List, Dict, Any, Sequence, Tuple
+
+import numpy as np
+
+from app.services.box_overlap import component_labels
+
+logger = logging.getLogger(__name__)
+
+# 邻居单元偏移的一半（另一半由对称性覆盖），(0, 0) 表示同一单元
+_HALF_NEIGHBOURS = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+
+def positions_array(texts: Sequence[Dict[str, Any]]) -> np.ndarray:
+    """文本插入点转为 (n, 2) 数组，缺失或格式不对的位置记为 NaN（不与任何文本成组）"""
+    xy = np.full((len(texts), 2), np.nan)
+    for i, text in enumerate(texts):
+        position = text.get('position')
+        try:
+            if len(position) == 2:
+                xy[i] = (float(position[0]), float(position[1]))
+        except (TypeError, ValueError):
+            continue
+    return xy
+
+
+def neighbour_pairs(xy: np.ndarray, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    找出距离不超过阈值的所有点对 (i < j)
+
+    点按所在网格单元排序后，对每个半邻域偏移用 searchsorted 定位相邻单元的区间，
+    一次性展开为候选点对再按距离过滤。
+    """
+    n = len(xy)
+    valid = np.flatnonzero(np.isfinite(xy).all(axis=1))
+    if n < 2 or len(valid) < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    cell_size = threshold if threshold > 0 else 1.0
+    cells = np.floor(xy[valid] / cell_size).astype(np.int64)
+    cells -= cells.min(axis=0) - 1
+    stride = int(cells[:, 1].max()) + 2
+    keys = cells[:, 0] * stride + cells[:, 1]
+
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    members = valid[order]
+
+    left_parts, right_parts = [], []
+    for dx, dy in _HALF_NEIGHBOURS:
+        target = sorted_keys + dx * stride + dy
+        starts = np.searchsorted(sorted_keys, target, side='left')
+        ends = np.searchsorted(sorted_keys, target, side='right')
+        if dx == 0 and dy == 0:
+            # 同一单元内只取排序位置靠后的点，避免重复和自配对
+            starts = np.maximum(starts, np.arange(len(sorted_keys)) + 1)
+        counts = np.maximum(ends - starts, 0)
+        total = int(counts.sum())
+        if total == 0:
+            continue
+        rows = np.repeat(np.arange(len(sorted_keys)), counts)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        left_parts.append(members[rows])
+        right_parts.append(members[starts[rows] + offsets])
+
+    if not left_parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    left = np.concatenate(left_parts)
+    right = np.concatenate(right_parts)
+
+    delta = xy[left] - xy[right]
+    keep = np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2) <= threshold
+    left, right = left[keep], right[keep]
+    return np.minimum(left, right), np.maximum(left, right)
+
+
+def greedy_text_groups(xy: np.ndarray, threshold: float) -> List[List[int]]:
+    """与原有逐对比较完全一致的种子式分组，返回按原顺序排列的下标分组"""
+    n = len(xy)
+    first, second = neighbour_pairs(xy, threshold)
+
+    # 只需要“种子 -> 其后的邻居”方向：种子之前的文本必然已被分组
+    order = np.lexsort((second, first))
+    first, second = first[order], second[order]
+    bounds = np.searchsorted(first, np.arange(n + 1))
+    neighbours = second.tolist()
+
+    used = [False] * n
+    groups = []
+    for i in range(n):
+        if used[i]:
+            continue
+        used[i] = True
+        group = [i]
+        for j in neighbours[bounds[i]:bounds[i + 1]]:
+            if not used[j]:
+                used[j] = True
+                group.append(j)
+        groups.append(group)
+    return groups
+
+
+def connected_text_groups(xy: np.ndarray, threshold: float) -> List[List[int]]:
+    """并查集单链接分组，分组按最小下标排序，组内保持原顺序"""
+    n = len(xy)
+    labels = component_labels(n, *neighbour_pairs(xy, threshold))
+    order = np.argsort(labels, kind='stable')
+    split_at = np.flatnonzero(np.diff(labels[order])) + 1
+    return [group.tolist() for group in np.split(order, split_at)] if n else []
+
+
+def brute_force_greedy_groups(xy: np.ndarray, threshold: float) -> List[List[int]]:
+    """原有 O(n²) 实现，用于对照测试和基准"""
+    groups, used = [], set()
+    points = xy.tolist()
+    for i, (x1, y1) in enumerate(points):
+        if i in used:
+            continue
+        group = [i]
+        used.add(i)
+        for j, (x2, y2) in enumerate(points):
+            if j in used:
+                continue
+            if ((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5 <= threshold:
+                group.append(j)
+                used.add(j)
+        groups.append(group)
+    return groups
+
+
+def synthetic_positions(n: int, seed: int = 0) -> np.ndarray:
+    """模拟图纸文本分布：若干成簇的标题栏/标注加均匀分散的构件编号"""
+    rng = np.random.default_rng(seed)
+    clustered = n // 2
+    centres = rng.uniform(0, 200000, size=(max(1, clustered // 50), 2))
+    cluster_xy = centres[rng.integers(0, len(centres), clustered)] + rng.normal(0, 60, size=(clustered, 2))
+    scattered = rng.uniform(0, 200000, size=(n - clustered, 2))
+    return np.vstack([cluster_xy, scattered])
+
+
+def benchmark(sizes: Sequence[int] = (10000, 100000), threshold: float = 100.0,
+              brute_force_limit: int = 10000) -> List[Dict[str, Any]]:
+    """基准：网格分组与原有逐对分组的耗时对比（超过 brute_force_limit 的规模不跑逐对版本）"""
+    rows = []
+    for n in sizes:
+        xy = synthetic_positions(n)
+        start = time.perf_counter()
+        groups = greedy_text_groups(xy, threshold)
+        grid_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        connected = connected_text_groups(xy, threshold)
+        connected_ms = (time.perf_counter() - start) * 1000
+        row = {'texts': n, 'groups': len(groups), 'grid_ms': round(grid_ms, 1),
+               'connected_groups': len(connected), 'connected_ms': round(connected_ms, 1)}
+        if n <= brute_force_limit:
+            start = time.perf_counter()
+            reference = brute_force_greedy_groups(xy, threshold)
+            row['brute_force_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            row['identical'] = reference == groups
+        rows.append(row)
+    return rows
+
+
+def main(argv: List[str] = None) -> int:
+    args = argv if argv is not None else sys.argv[1:]
+    sizes = [int(arg) for arg in args] or [10000, 100000]
+    for row in benchmark(sizes):
+        print("  ".join(f"{key}={value}" for key, value in row.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,6 +9,9 @@ import logging
 import re
 from typing import List, Dict, Any, Optional, Tuple
 
+from ..core.entity_index import ModelSpaceIndex
+from .text_clustering import positions_array, greedy_text_groups, connected_text_groups
+
 logger = logging.getLogger(__name__)
 
 class TextParser:
@@ -34,6 +37,16 @@ class TextParser:
             r'Title\s*[:：]?\s*([^：:\n]+)',
             r'工程名称[：:]\s*([^：:\n]+)',
         ]
+        
+        # 预编译：各模式按优先级逐个匹配
+        self._compiled = {
+            name: [re.compile(p, re.IGNORECASE) for p in patterns]
+            for name, patterns in (('drawing_number', self.drawing_number_patterns),
+                                   ('scale', self.scale_patterns),
+                                   ('title', self.title_patterns))
+        }
+        self._short_code = re.compile(r'^[A-Za-z0-9\-\/]{2,10}$')
+        self._chinese = re.compile(r'[\u4e00-\u9fff]')
     
     def extract_texts_from_area(self, 
                                doc: Any, 
@@ -51,32 +64,15 @@ class TextParser:
             文本信息列表
         """
         try:
-            texts = []
-            min_x, min_y, max_x, max_y = bounds
-            
             if not hasattr(doc, 'modelspace'):
-                return texts
-                
-            modelspace = doc.modelspace()
-            count = 0
-            
-            for entity in modelspace:
-                if count >= max_texts:
-                    break
-                    
-                try:
-                    if entity.dxftype() in ['TEXT', 'MTEXT']:
-                        text_info = self._extract_text_entity(entity)
-                        
-                        if text_info and self._is_text_in_bounds(text_info, bounds):
-                            texts.append(text_info)
-                            count += 1
-                            
-                except Exception as e:
-                    # 单个文本实体处理失败，继续处理其他
-                    continue
-            
-            return texts
+                return []
+
+            # 文本实体在模型空间索引构建时已预提取，这里只做矩形查询
+            index = ModelSpaceIndex.of(doc)
+            return [
+                {key: text[key] for key in ('text', 'position', 'height', 'type')}
+                for text in index.query_texts(bounds, max_texts=max_texts)
+            ]
             
         except Exception as e:
             logger.error(f"区域文本提取失败: {e}")
@@ -124,32 +120,56 @@ class TextParser:
         except Exception:
             return False
     
-    def parse_drawing_number(self, texts: List[Dict[str, Any]]) -> Optional[str]:
+    def _search(self, name: str, all_text: str):
+        """按优先级依次产出命中的模式匹配"""
+        for pattern in self._compiled[name]:
+            match = pattern.search(all_text)
+            if match:
+                yield match
+    
+    def parse_title_block(self, texts: List[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+        """
+        一次合并文本后同时解析图号、图名和比例
+        
+        Args:
+            texts: 文本信息列表
+            
+        Returns:
+            {'drawing_number', 'title', 'scale'}，未识别的为None
+        """
+        all_text = " ".join([t['text'] for t in texts])
+        return {
+            'drawing_number': self.parse_drawing_number(texts, all_text),
+            'title': self.parse_title(texts, all_text),
+            'scale': self.parse_scale(texts, all_text)
+        }
+    
+    def parse_drawing_number(self, texts: List[Dict[str, Any]], all_text: str = None) -> Optional[str]:
         """
         解析图号
         
         Args:
             texts: 文本信息列表
+            all_text: 已合并的文本（可选）
             
         Returns:
             图号
         """
         try:
             # 合并所有文本
-            all_text = " ".join([t['text'] for t in texts])
+            if all_text is None:
+                all_text = " ".join([t['text'] for t in texts])
             
             # 尝试各种模式匹配
-            for pattern in self.drawing_number_patterns:
-                match = re.search(pattern, all_text, re.IGNORECASE)
-                if match:
-                    drawing_number = match.group(1).strip()
-                    if len(drawing_number) >= 2:  # 图号至少2个字符
-                        return drawing_number
+            for match in self._search('drawing_number', all_text):
+                drawing_number = match.group(1).strip()
+                if len(drawing_number) >= 2:  # 图号至少2个字符
+                    return drawing_number
             
             # 如果没有匹配到，尝试找包含数字和字母的较短文本
             for text_info in texts:
                 text = text_info['text']
-                if re.match(r'^[A-Za-z0-9\-\/]{2,10}$', text):
+                if self._short_code.match(text):
                     return text
             
             return None
@@ -158,24 +178,24 @@ class TextParser:
             logger.error(f"图号解析失败: {e}")
             return None
     
-    def parse_scale(self, texts: List[Dict[str, Any]]) -> Optional[str]:
+    def parse_scale(self, texts: List[Dict[str, Any]], all_text: str = None) -> Optional[str]:
         """
         解析比例
         
         Args:
             texts: 文本信息列表
+            all_text: 已合并的文本（可选）
             
         Returns:
             比例信息
         """
         try:
-            all_text = " ".join([t['text'] for t in texts])
+            if all_text is None:
+                all_text = " ".join([t['text'] for t in texts])
             
-            for pattern in self.scale_patterns:
-                match = re.search(pattern, all_text, re.IGNORECASE)
-                if match:
-                    scale_value = match.group(1)
-                    return f"1:{scale_value}"
+            for match in self._search('scale', all_text):
+                scale_value = match.group(1)
+                return f"1:{scale_value}"
             
             # 查找常见比例格式
             common_scales = ['1:100', '1:200', '1:50', '1:500', '1:1000']
@@ -189,31 +209,31 @@ class TextParser:
             logger.error(f"比例解析失败: {e}")
             return None
     
-    def parse_title(self, texts: List[Dict[str, Any]]) -> Optional[str]:
+    def parse_title(self, texts: List[Dict[str, Any]], all_text: str = None) -> Optional[str]:
         """
         解析图纸标题
         
         Args:
             texts: 文本信息列表
+            all_text: 已合并的文本（可选）
             
         Returns:
             图纸标题
         """
         try:
-            all_text = " ".join([t['text'] for t in texts])
+            if all_text is None:
+                all_text = " ".join([t['text'] for t in texts])
             
-            for pattern in self.title_patterns:
-                match = re.search(pattern, all_text, re.IGNORECASE)
-                if match:
-                    title = match.group(1).strip()
-                    if len(title) >= 2:
-                        return title
+            for match in self._search('title', all_text):
+                title = match.group(1).strip()
+                if len(title) >= 2:
+                    return title
             
             # 查找可能的标题（较长的中文文本）
             for text_info in texts:
                 text = text_info['text']
                 # 查找包含中文且长度适中的文本作为标题
-                if re.search(r'[\u4e00-\u9fff]', text) and 3 <= len(text) <= 20:
+                if self._chinese.search(text) and 3 <= len(text) <= 20:
                     # 排除一些常见的非标题文本
                     exclude_keywords = ['比例', '图号', '日期', '审核', '设计', '制图']
                     if not any(keyword in text for keyword in exclude_keywords):
@@ -266,13 +286,18 @@ class TextParser:
             logger.error(f"尺寸解析失败: {e}")
             return []
     
-    def group_texts_by_proximity(self, texts: List[Dict[str, Any]], threshold: float = 100.0) -> List[List[Dict[str, Any]]]:
+    def group_texts_by_proximity(self,
+                                 texts: List[Dict[str, Any]],
+                                 threshold: float = 100.0,
+                                 transitive: bool = False) -> List[List[Dict[str, Any]]]:
         """
-        按位置邻近性分组文本
+        按位置邻近性分组文本（哈希网格只比较相邻单元）
         
         Args:
             texts: 文本信息列表
             threshold: 距离阈值
+            transitive: False时以种子文本为中心收拢邻近文本（原有语义）；
+                        True时按并查集取连通分量，链状排列的标题栏文本会归为一组
             
         Returns:
             分组后的文本列表
@@ -281,28 +306,9 @@ class TextParser:
             if not texts:
                 return []
             
-            groups = []
-            used = set()
-            
-            for i, text1 in enumerate(texts):
-                if i in used:
-                    continue
-                    
-                group = [text1]
-                used.add(i)
-                
-                for j, text2 in enumerate(texts):
-                    if j in used:
-                        continue
-                        
-                    distance = self._calculate_distance(text1['position'], text2['position'])
-                    if distance <= threshold:
-                        group.append(text2)
-                        used.add(j)
-                
-                groups.append(group)
-            
-            return groups
+            xy = positions_array(texts)
+            grouping = connected_text_groups if transitive else greedy_text_groups
+            return [[texts[i] for i in group] for group in grouping(xy, threshold)]
             
         except Exception as e:
             logger.error(f"文本分组失败: {e}")
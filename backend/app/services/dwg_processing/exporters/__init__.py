@@ -6,5 +6,6 @@
 """
 
 from .image_renderer import ImageRenderer
+from .dxf_rasterizer import DXFRasterizer
 
-__all__ = ['ImageRenderer'] 
\ No newline at end of file
+__all__ = ['ImageRenderer', 'DXFRasterizer'] 
\ No newline at end of file
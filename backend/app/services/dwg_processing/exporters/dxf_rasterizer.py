@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DXF批量栅格化引擎
+把图框内的实体（含块参照展开）压平成NumPy线段/圆弧/折线数组，按类型整批坐标变换，
+再用 cv2.polylines 一次性画到预分配的灰度画布上；不限制实体数量。
+文字不画进位图，以PaddleOCR结构的矢量文本区域（像素坐标）随结果返回，下游无需OCR。
+
+用法（基准测试，输出每秒渲染图框数）:
+    python -m app.services.dwg_processing.exporters.dxf_rasterizer <file.dxf>
+    python -m app.services.dwg_processing.exporters.dxf_rasterizer --synthetic 200000
+"""
+
+import logging
+import math
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+try:
+    import ezdxf
+    from ezdxf import path as ezdxf_path
+except ImportError:
+    ezdxf = None
+
+from PIL import Image
+
+from app.core.config import settings
+from app.services.page_raster import to_compact
+from app.services.pdf_vector_text import analyze_text_type, PAGE_MODE_VECTOR, PAGE_MODE_SCANNED
+from ..core.entity_index import ModelSpaceIndex, TEXT_TYPES, text_record, units_to_mm
+
+logger = logging.getLogger(__name__)
+
+Bounds = Tuple[float, float, float, float]
+
+# 块参照最大嵌套展开深度
+_MAX_BLOCK_DEPTH = 8
+# 曲线离散化的弦高容差（像素）
+_CURVE_TOLERANCE_PX = 0.5
+# 单个圆弧的离散段数上限
+_MAX_ARC_SEGMENTS = 512
+# 不产生可见几何的实体
+_SKIPPED_TYPES = {'POINT', 'IMAGE', 'VIEWPORT', 'WIPEOUT', 'XLINE', 'RAY', 'ATTDEF'}
+
+
+class FlatGeometry:
+    """压平后的图框几何（世界坐标）"""
+
+    def __init__(self):
+        self.lines: List[Tuple[float, float, float, float]] = []
+        self.arcs: List[Tuple[float, float, float, float, float]] = []  # cx, cy, r, 起始弧度, 扫过弧度
+        self.polylines: List[np.ndarray] = []
+        self.texts: List[Dict[str, Any]] = []
+        self.entity_count = 0
+        self.failed_count = 0
+
+
+def _is_planar(entity: Any) -> bool:
+    """OCS 与 WCS 一致（拉伸方向为 +Z）时可以直接读取二维坐标"""
+    extrusion = entity.dxf.get('extrusion', None)
+    return extrusion is None or (abs(extrusion[0]) < 1e-9 and abs(extrusion[1]) < 1e-9 and extrusion[2] > 0)
+
+
+def _text_extent(text: str, height: float) -> Tuple[float, float]:
+    """按字符宽度估算文本外框（CJK字符约1倍字高，西文约0.6倍）"""
+    lines = text.split('\n') or ['']
+    width = max(sum(height if ord(c) > 0x2E80 else height * 0.6 for c in line) for line in lines)
+    return width, height * len(lines) * (1.0 if len(lines) == 1 else 1.4)
+
+
+class DXFRasterizer:
+    """DXF图框批量栅格化"""
+
+    def __init__(self, dpi: int = None, max_megapixels: float = None, line_width: int = None):
+        self.dpi = dpi or settings.DXF_RASTER_DPI
+        self.max_megapixels = max_megapixels or settings.DXF_RASTER_MAX_MEGAPIXELS
+        self.line_width = max(1, line_width or settings.DXF_RASTER_LINE_WIDTH)
+
+    @staticmethod
+    def is_available() -> bool:
+        return cv2 is not None and ezdxf is not None
+
+    def pixel_scale(self, doc: Any, bounds: Bounds, scale_denominator: float = 1.0) -> float:
+        """
+        每个图纸单位对应的像素数
+
+        图纸单位按 $INSUNITS 换算为毫米（未设置时按毫米），再按出图比例 1:scale_denominator 折算到纸面，
+        最后受像素预算限制。
+        """
+        scale = self.dpi / 25.4 * units_to_mm(doc) / max(scale_denominator, 1e-9)
+
+        width, height = max(bounds[2] - bounds[0], 1e-9), max(bounds[3] - bounds[1], 1e-9)
+        budget_scale = math.sqrt(self.max_megapixels * 1e6 / (width * height))
+        return min(scale, budget_scale)
+
+    def flatten(self, entities: Iterable[Any], tolerance: float) -> FlatGeometry:
+        """压平实体：LINE/CIRCLE/ARC/无凸度多段线走快速路径，其余曲线按容差离散为折线"""
+        geometry = FlatGeometry()
+        for entity in entities:
+            geometry.entity_count += 1
+            try:
+                self._collect(entity, geometry, tolerance, 0)
+            except Exception:
+                geometry.failed_count += 1
+        return geometry
+
+    def _collect(self, entity: Any, geometry: FlatGeometry, tolerance: float, depth: int):
+        dxftype = entity.dxftype()
+        if dxftype in _SKIPPED_TYPES:
+            return
+        if dxftype == 'LINE':
+            start, end = entity.dxf.start, entity.dxf.end
+            geometry.lines.append((start[0], start[1], end[0], end[1]))
+        elif dxftype == 'CIRCLE' and _is_planar(entity):
+            center = entity.dxf.center
+            geometry.arcs.append((center[0], center[1], entity.dxf.radius, 0.0, 2 * math.pi))
+        elif dxftype == 'ARC' and _is_planar(entity):
+            center = entity.dxf.center
+            start = math.radians(entity.dxf.start_angle)
+            sweep = (math.radians(entity.dxf.end_angle) - start) % (2 * math.pi) or 2 * math.pi
+            geometry.arcs.append((center[0], center[1], entity.dxf.radius, start, sweep))
+        elif dxftype == 'LWPOLYLINE' and _is_planar(entity) and not entity.has_arc:
+            points = np.asarray(entity.get_points('xy'), dtype=float)
+            if entity.closed and len(points) > 2:
+                points = np.vstack([points, points[:1]])
+            if len(points) >= 2:
+                geometry.polylines.append(points)
+        elif dxftype in TEXT_TYPES:
+            record = text_record(entity)
+            if record:
+                record['rotation'] = entity.dxf.get('rotation', 0.0) or 0.0
+                geometry.texts.append(record)
+        elif dxftype in ('INSERT', 'DIMENSION', 'LEADER', 'MLEADER'):
+            if depth >= _MAX_BLOCK_DEPTH:
+                return
+            if dxftype == 'INSERT':
+                for attrib in entity.attribs:
+                    self._collect(attrib, geometry, tolerance, depth + 1)
+            for child in entity.virtual_entities():
+                self._collect(child, geometry, tolerance, depth + 1)
+        elif dxftype == 'ATTRIB':
+            if not entity.is_invisible:
+                record = text_record_from_attrib(entity)
+                if record:
+                    geometry.texts.append(record)
+        else:
+            # 样条、椭圆、带凸度多段线、填充边界等
+            path = ezdxf_path.make_path(entity)
+            points = np.asarray([(v.x, v.y) for v in path.flattening(tolerance)], dtype=float)
+            if len(points) >= 2:
+                geometry.polylines.append(points)
+
+    def render(self, doc: Any, bounds: Bounds = None, scale_denominator: float = 1.0) -> Dict[str, Any]:
+        """
+        渲染图框
+
+        Args:
+            doc: ezdxf 文档
+            bounds: 图框边界 (min_x, min_y, max_x, max_y)，为空时渲染整个模型空间
+            scale_denominator: 出图比例分母
+
+        Returns:
+            {"image": 灰度画布, "scale": 像素/单位, "text_regions", "entity_count", "primitive_count", ...}
+        """
+        start = time.perf_counter()
+        index = ModelSpaceIndex.of(doc)
+        bounds = bounds or index.extent()
+        if bounds is None:
+            raise ValueError("模型空间没有可渲染的实体")
+        min_x, min_y, max_x, max_y = bounds
+        scale = self.pixel_scale(doc, bounds, scale_denominator)
+        width = int(math.ceil((max_x - min_x) * scale)) + 1
+        height = int(math.ceil((max_y - min_y) * scale)) + 1
+
+        if hasattr(doc, 'collect_geometry'):
+            # 流式读取的列式文档直接按列取几何
+            geometry = FlatGeometry()
+            doc.collect_geometry(bounds, geometry)
+        else:
+            geometry = self.flatten(index.query(bounds, include_unbounded=True), _CURVE_TOLERANCE_PX / scale)
+        canvas = np.full((height, width), 255, dtype=np.uint8)
+
+        def to_pixels(xy: np.ndarray) -> np.ndarray:
+            pixels = np.empty_like(xy)
+            pixels[..., 0] = (xy[..., 0] - min_x) * scale
+            pixels[..., 1] = (max_y - xy[..., 1]) * scale
+            return np.rint(pixels).astype(np.int32)
+
+        primitives = 0
+        if geometry.lines:
+            segments = to_pixels(np.asarray(geometry.lines, dtype=float).reshape(-1, 2, 2))
+            cv2.polylines(canvas, segments, False, 0, self.line_width)
+            primitives += len(segments)
+
+        if geometry.arcs:
+            arcs = np.asarray(geometry.arcs, dtype=float)
+            primitives += len(arcs)
+            self._draw_arcs(canvas, arcs, scale, to_pixels)
+
+        if geometry.polylines:
+            # 拼接后整体变换，再按长度切回
+            lengths = np.fromiter((len(p) for p in geometry.polylines), dtype=np.int64)
+            pixels = to_pixels(np.concatenate(geometry.polylines))
+            polylines = np.split(pixels, np.cumsum(lengths)[:-1])
+            cv2.polylines(canvas, polylines, False, 0, self.line_width)
+            primitives += len(polylines)
+
+        text_regions = self._text_regions(geometry.texts, bounds, scale, width, height)
+        return {
+            'image': canvas,
+            'scale': scale,
+            'dpi': self.dpi,
+            'bounds': bounds,
+            'text_regions': text_regions,
+            'entity_count': geometry.entity_count,
+            'failed_entities': geometry.failed_count,
+            'primitive_count': primitives,
+            'render_seconds': round(time.perf_counter() - start, 4)
+        }
+
+    def _draw_arcs(self, canvas: np.ndarray, arcs: np.ndarray, scale: float, to_pixels):
+        """按离散段数分组，每组整批生成顶点并绘制"""
+        radius_px = np.maximum(arcs[:, 2] * scale, _CURVE_TOLERANCE_PX)
+        step = 2 * np.arccos(np.clip(1 - _CURVE_TOLERANCE_PX / radius_px, -1.0, 1.0))
+        segments = np.clip(np.ceil(arcs[:, 4] / np.maximum(step, 1e-6)), 2, _MAX_ARC_SEGMENTS).astype(np.int64)
+        # 段数向上取到2的幂，减少分组数量
+        segments = (2 ** np.ceil(np.log2(segments))).astype(np.int64)
+        for count in np.unique(segments):
+            group = arcs[segments == count]
+            t = np.linspace(0.0, 1.0, count + 1)
+            angles = group[:, 3:4] + group[:, 4:5] * t
+            xy = np.stack([group[:, 0:1] + group[:, 2:3] * np.cos(angles),
+                           group[:, 1:2] + group[:, 2:3] * np.sin(angles)], axis=-1)
+            cv2.polylines(canvas, to_pixels(xy), False, 0, self.line_width)
+
+    def _text_regions(self, texts: List[Dict[str, Any]], bounds: Bounds, scale: float,
+                      width: int, height: int) -> List[Dict[str, Any]]:
+        """文本实体 -> PaddleOCR结构的文本区域（像素坐标，外框按字高估算）"""
+        min_x, min_y, max_x, max_y = bounds
+        regions = []
+        for text in texts:
+            x, y = text['position']
+            text_height = float(text.get('height') or 0) or 2.5
+            text_width, block_height = _text_extent(text['text'], text_height)
+            # TEXT 插入点为左下基线，MTEXT 默认为左上角
+            y0 = y if text['type'] == 'TEXT' else y - block_height
+            corners = np.array([[0, 0], [text_width, 0], [text_width, block_height], [0, block_height]])
+            corners[:, 1] += y0 - y
+            angle = math.radians(text.get('rotation', 0.0))
+            rotation = np.array([[math.cos(angle), -math.sin(angle)], [math.sin(angle), math.cos(angle)]])
+            world = corners @ rotation.T + (x, y)
+
+            x1 = (world[:, 0].min() - min_x) * scale
+            x2 = (world[:, 0].max() - min_x) * scale
+            y1 = (max_y - world[:, 1].max()) * scale
+            y2 = (max_y - world[:, 1].min()) * scale
+            if x2 < 0 or y2 < 0 or x1 > width or y1 > height:
+                continue
+            bbox = [float(max(0.0, x1)), float(max(0.0, y1)), float(min(width, x2)), float(min(height, y2))]
+            regions.append({
+                'id': len(regions),
+                'text': text['text'],
+                'confidence': 1.0,
+                'bbox': bbox,
+                'bbox_xyxy': {'x_min': bbox[0], 'y_min': bbox[1], 'x_max': bbox[2], 'y_max': bbox[3]},
+                'type_analysis': analyze_text_type(text['text']),
+                'font_size': text_height * scale,
+                'source': 'dxf_vector'
+            })
+        return regions
+
+    def render_to_file(self, doc: Any, bounds: Bounds, output_path: str,
+                       scale_denominator: float = 1.0) -> Dict[str, Any]:
+        """渲染图框并按页面栅格模式保存为PNG"""
+        result = self.render(doc, bounds, scale_denominator)
+        image = to_compact(Image.fromarray(result.pop('image'), mode='L'))
+        image.save(output_path, format='PNG')
+        result.update({'output_path': output_path, 'width': image.width, 'height': image.height})
+        return result
+
+
+def vector_text_page(render_result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    渲染结果中的矢量文本 -> 与PDF矢量文本相同结构的页面条目
+
+    OCR阶段按图片路径取该条目，有文本的页面直接使用矢量文本，不再整页OCR
+    """
+    text_regions = render_result.get('text_regions') or []
+    return {
+        "mode": PAGE_MODE_VECTOR if text_regions else PAGE_MODE_SCANNED,
+        "dpi": render_result.get('dpi'),
+        "text_regions": text_regions,
+        "all_text": "\n".join(region['text'] for region in text_regions),
+        "ocr_regions": [],
+        "statistics": {
+            "total_regions": len(text_regions),
+            "avg_confidence": 1.0 if text_regions else 0
+        }
+    }
+
+
+def text_record_from_attrib(entity: Any) -> Optional[Dict[str, Any]]:
+    """块属性（ATTRIB）按单行文本处理"""
+    text_content = (entity.dxf.text or '').strip()
+    if not text_content:
+        return None
+    insert = entity.dxf.insert
+    return {
+        'text': text_content,
+        'position': (insert[0], insert[1]),
+        'height': entity.dxf.get('height', 10),
+        'type': 'TEXT',
+        'rotation': entity.dxf.get('rotation', 0.0) or 0.0
+    }
+
+
+def find_frames(doc: Any, min_area_ratio: float = 0.01) -> List[Bounds]:
+    """以闭合多段线矩形作为图框，找不到时返回整个模型空间范围"""
+    index = ModelSpaceIndex.of(doc)
+    extent = index.extent()
+    if extent is None:
+        return []
+    extent_area = max((extent[2] - extent[0]) * (extent[3] - extent[1]), 1e-9)
+    frames = []
+    for entity, box in zip(index.entities, index.boxes):
+        if entity.dxftype() == 'LWPOLYLINE' and entity.closed and len(entity) == 4 \
+                and (box[2] - box[0]) * (box[3] - box[1]) / extent_area >= min_area_ratio:
+            frames.append(tuple(float(v) for v in box))
+    return frames or [extent]
+
+
+def benchmark(doc: Any, rounds: int = 3) -> Dict[str, Any]:
+    """基准：逐图框渲染的吞吐（图框/秒）"""
+    rasterizer = DXFRasterizer()
+    frames = find_frames(doc)
+    ModelSpaceIndex.of(doc)
+
+    start = time.perf_counter()
+    primitives = 0
+    pixels = 0
+    for _ in range(rounds):
+        for bounds in frames:
+            result = rasterizer.render(doc, bounds)
+            primitives += result['primitive_count']
+            pixels += result['image'].size
+    elapsed = time.perf_counter() - start
+    renders = rounds * len(frames)
+    return {
+        'frames': len(frames),
+        'dpi': rasterizer.dpi,
+        'avg_megapixels': round(pixels / renders / 1e6, 1),
+        'avg_primitives': primitives // renders,
+        'seconds_per_frame': round(elapsed / renders, 3),
+        'frames_per_second': round(renders / elapsed, 2)
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    from ..core.entity_index import synthetic_document
+    args = argv if argv is not None else sys.argv[1:]
+    if len(args) == 2 and args[0] == '--synthetic':
+        doc = synthetic_document(int(args[1]))
+    elif len(args) == 1:
+        doc = ezdxf.readfile(args[0])
+    else:
+        print("用法: python -m app.services.dwg_processing.exporters.dxf_rasterizer <file.dxf> | --synthetic <N>")
+        return 1
+    for key, value in benchmark(doc).items():
+        print(f"{key:<20}{value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
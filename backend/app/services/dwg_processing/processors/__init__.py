@@ -7,5 +7,6 @@
 
 from .component_calculator import ComponentCalculator, ComponentInfo
 from .summary_generator import SummaryGenerator
+from .vector_takeoff import VectorTakeoffEngine
 
-__all__ = ['ComponentCalculator', 'ComponentInfo', 'SummaryGenerator'] 
\ No newline at end of file
+__all__ = ['ComponentCalculator', 'ComponentInfo', 'SummaryGenerator', 'VectorTakeoffEngine'] 
\ No newline at end of file
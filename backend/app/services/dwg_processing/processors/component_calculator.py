@@ -21,6 +21,7 @@ class ComponentInfo:
     length: float = 0.0 # 长度(mm)
     thickness: float = 0.0 # 厚度(mm)
     quantity: int = 1   # 数量
+    area: float = 0.0   # 几何面积(mm²)，矢量提取时直接给出
 
 class ComponentCalculator:
     """构件计算器类"""
@@ -93,8 +94,9 @@ class ComponentCalculator:
             unit = self.component_types.get(component.type, {}).get('unit', '个')
             
             if calc_method == 'area':
-                # 面积计算 (m²)
-                area = (component.width * component.length) / 1000000  # mm² → m²
+                # 面积计算 (m²)，优先使用几何面积
+                area_mm2 = component.area or component.width * component.length
+                area = area_mm2 / 1000000  # mm² → m²
                 value = area * component.quantity
             elif calc_method == 'volume':
                 # 体积计算 (m³)
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DXF矢量工程量提取
+按图层名/块名把实体归类为柱、梁、墙、板、楼梯，直接用几何计算工程量：
+闭合多段线/填充的面积（鞋带公式）、墙梁线长、柱块参照计数、尺寸标注值。
+图纸单位按 $INSUNITS 换算为毫米后计量，与栅格化引擎一致。
+坐标一次性收集后用NumPy整批计算，结果为 ComponentInfo，可直接交给 ComponentCalculator。
+
+用法:
+    python -m app.services.dwg_processing.processors.vector_takeoff <file.dxf>
+"""
+
+import logging
+import math
+import re
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import ezdxf
+    from ezdxf import bbox as ezdxf_bbox
+    from ezdxf import path as ezdxf_path
+except ImportError:
+    ezdxf = None
+
+from app.core.config import settings
+from ..core.entity_index import ModelSpaceIndex, units_to_mm
+from .component_calculator import ComponentInfo
+
+logger = logging.getLogger(__name__)
+
+Bounds = Tuple[float, float, float, float]
+
+# 图层名/块名关键词 -> 构件类型（按顺序匹配，先匹配先得）
+CATEGORY_KEYWORDS = [
+    ('楼梯', ('楼梯', 'STAIR')),
+    ('柱', ('柱', 'COLU', 'COLUMN')),
+    ('梁', ('梁', 'BEAM')),
+    ('墙', ('墙', 'WALL')),
+    ('板', ('板', 'SLAB')),
+]
+# 块名形如 KZ1 / GZ2 / Z3 的柱
+_COLUMN_BLOCK = re.compile(r'^(KZ|GZ|XZ|Z)\d', re.IGNORECASE)
+# 中心线图层：线长即构件长度；其余视为双线轮廓，线长取一半
+_CENTRE_KEYWORDS = ('中心', 'CEN', 'AXIS')
+# 柱截面分组的取整精度（mm）
+_SECTION_ROUNDING = 10.0
+_CURVE_TOLERANCE = 1.0
+
+
+def classify_name(name: str) -> Optional[str]:
+    """按关键词判断图层/块名对应的构件类型"""
+    upper = (name or '').upper()
+    for category, keywords in CATEGORY_KEYWORDS:
+        if any(keyword in upper for keyword in keywords):
+            return category
+    return None
+
+
+def polygon_areas(vertices: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    批量鞋带公式
+
+    Args:
+        vertices: 所有多边形顶点首尾拼接 (N, 2)
+        counts: 每个多边形的顶点数
+    """
+    if len(counts) == 0:
+        return np.zeros(0)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    # 每个顶点的“下一个”顶点，多边形最后一个顶点回到自身起点
+    next_index = np.arange(len(vertices)) + 1
+    next_index[starts + counts - 1] = starts
+    x, y = vertices[:, 0], vertices[:, 1]
+    cross = x * y[next_index] - x[next_index] * y
+    return np.abs(np.add.reduceat(cross, starts)) / 2.0
+
+
+def polyline_lengths(vertices: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """批量计算折线长度（不跨越折线连接）"""
+    if len(counts) == 0:
+        return np.zeros(0)
+    # segment[i] 为顶点 i 到 i+1 的距离，每条折线最后一个顶点没有出边
+    segment = np.append(np.hypot(*np.diff(vertices, axis=0).T), 0.0)
+    segment[np.cumsum(counts) - 1] = 0.0
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return np.add.reduceat(segment, starts)
+
+
+def polygon_extents(vertices: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """批量计算每组顶点的包围盒尺寸 (宽, 高)"""
+    if len(counts) == 0:
+        return np.zeros((0, 2))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return np.maximum.reduceat(vertices, starts, axis=0) - np.minimum.reduceat(vertices, starts, axis=0)
+
+
+class _Batch:
+    """按类别收集的顶点批"""
+
+    def __init__(self):
+        self.vertices: List[np.ndarray] = []
+        self.layers: List[str] = []
+
+    def add(self, points: np.ndarray, layer: str):
+        if len(points) >= 2:
+            self.vertices.append(points)
+            self.layers.append(layer)
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        if not self.vertices:
+            return np.zeros((0, 2)), np.zeros(0, dtype=np.int64)
+        counts = np.fromiter((len(v) for v in self.vertices), dtype=np.int64)
+        return np.concatenate(self.vertices), counts
+
+
+class VectorTakeoffEngine:
+    """DXF矢量工程量提取引擎"""
+
+    def __init__(self, wall_height: float = None):
+        self.wall_height = wall_height or settings.VECTOR_TAKEOFF_WALL_HEIGHT
+        self._layer_cache: Dict[str, Optional[str]] = {}
+        self._block_sections: Dict[str, Tuple[float, float]] = {}
+
+    def _category(self, layer: str) -> Optional[str]:
+        if layer not in self._layer_cache:
+            self._layer_cache[layer] = classify_name(layer)
+        return self._layer_cache[layer]
+
+    def takeoff(self, doc: Any, bounds: Bounds = None) -> Dict[str, Any]:
+        """
+        提取图框（或整个模型空间）的矢量工程量
+
+        Returns:
+            {"components": [ComponentInfo], "dimensions": 尺寸标注统计, "statistics": 分类实体数和耗时}
+        """
+        start = time.perf_counter()
+        unit_scale = units_to_mm(doc)
+        index = ModelSpaceIndex.of(doc)
+        entities = index.query(bounds) if bounds else index.entities
+
+        polygons: Dict[str, _Batch] = defaultdict(_Batch)
+        hatch_areas: Dict[str, List[Tuple[str, float]]] = defaultdict(list)
+        linework: Dict[str, _Batch] = defaultdict(_Batch)
+        inserts: Dict[Tuple[str, str], List[Any]] = defaultdict(list)
+        dimensions: List[Tuple[str, float]] = []
+        classified = 0
+
+        for entity in entities:
+            try:
+                dxftype = entity.dxftype()
+                layer = entity.dxf.layer
+                if dxftype == 'DIMENSION':
+                    dimensions.append((layer, float(entity.get_measurement()) * unit_scale))
+                    continue
+                if dxftype == 'INSERT':
+                    category = classify_name(entity.dxf.name) or self._category(layer)
+                    if category is None and _COLUMN_BLOCK.match(entity.dxf.name):
+                        category = '柱'
+                    if category:
+                        inserts[(category, entity.dxf.name)].append(entity)
+                        classified += 1
+                    continue
+
+                category = self._category(layer)
+                if category is None:
+                    continue
+                classified += 1
+                if dxftype == 'HATCH':
+                    hatch_areas[category].append((layer, self._hatch_area(entity) * unit_scale ** 2))
+                elif dxftype == 'LINE':
+                    start_point, end_point = entity.dxf.start, entity.dxf.end
+                    linework[category].add(np.array([(start_point.x, start_point.y), (end_point.x, end_point.y)]) * unit_scale,
+                                            layer)
+                elif dxftype in ('LWPOLYLINE', 'POLYLINE'):
+                    points, closed = self._polyline_points(entity)
+                    (polygons if closed and len(points) >= 3 else linework)[category].add(points * unit_scale, layer)
+            except Exception:
+                continue
+
+        components: List[ComponentInfo] = []
+        components += self._columns(polygons.pop('柱', None), inserts, unit_scale)
+        components += self._linear('墙', polygons.pop('墙', None), linework.pop('墙', None))
+        components += self._linear('梁', polygons.pop('梁', None), linework.pop('梁', None))
+        components += self._slabs(polygons.pop('板', None), hatch_areas.pop('板', []))
+        components += self._counted('楼梯', polygons.pop('楼梯', None), inserts)
+
+        dimension_values = np.array([value for _, value in dimensions], dtype=float)
+        elapsed = time.perf_counter() - start
+        return {
+            'components': components,
+            'dimensions': {
+                'count': len(dimensions),
+                'min': float(dimension_values.min()) if len(dimension_values) else None,
+                'max': float(dimension_values.max()) if len(dimension_values) else None,
+                'values': sorted(set(np.round(dimension_values, 1).tolist()))[:200]
+            },
+            'statistics': {
+                'entities': len(entities),
+                'classified_entities': classified,
+                'components': len(components),
+                'seconds': round(elapsed, 4)
+            }
+        }
+
+    def _polyline_points(self, entity: Any) -> Tuple[np.ndarray, bool]:
+        """多段线顶点，带凸度的按容差离散"""
+        closed = entity.closed if entity.dxftype() == 'LWPOLYLINE' else entity.is_closed
+        if entity.dxftype() == 'LWPOLYLINE':
+            # 直接读取顶点存储 (x, y, 起始宽, 终止宽, 凸度)，避免逐点构造元组
+            packed = np.asarray(entity.lwpoints.values, dtype=float).reshape(-1, 5)
+            if not packed[:, 4].any():
+                return packed[:, :2].copy(), closed
+        path = ezdxf_path.make_path(entity)
+        points = np.asarray([(v.x, v.y) for v in path.flattening(_CURVE_TOLERANCE)], dtype=float)
+        if closed and len(points) > 1 and np.allclose(points[0], points[-1]):
+            points = points[:-1]
+        return points, closed
+
+    def _hatch_area(self, hatch: Any) -> float:
+        """填充面积：外边界面积减去内部孤岛"""
+        areas = []
+        external = []
+        for boundary in hatch.paths:
+            path = ezdxf_path.from_hatch_boundary_path(boundary)
+            points = np.asarray([(v.x, v.y) for v in path.flattening(_CURVE_TOLERANCE)], dtype=float)
+            if len(points) < 3:
+                continue
+            areas.append(polygon_areas(points, np.array([len(points)]))[0])
+            external.append(bool(boundary.path_type_flags & 1))
+        if not areas:
+            return 0.0
+        areas = np.asarray(areas)
+        external = np.asarray(external)
+        if not external.any():
+            external[np.argmax(areas)] = True
+        return float(max(areas[external].sum() - areas[~external].sum(), 0.0))
+
+    def _block_section(self, insert: Any) -> Tuple[float, float]:
+        """块参照的截面尺寸（块定义范围 × 插入比例）"""
+        name = insert.dxf.name
+        if name not in self._block_sections:
+            extents = ezdxf_bbox.extents(insert.block(), fast=True)
+            self._block_sections[name] = (extents.size.x, extents.size.y) if extents.has_data else (0.0, 0.0)
+        width, height = self._block_sections[name]
+        return width * abs(insert.dxf.xscale), height * abs(insert.dxf.yscale)
+
+    def _columns(self, batch: Optional[_Batch], inserts: Dict[Tuple[str, str], List[Any]],
+                 unit_scale: float = 1.0) -> List[ComponentInfo]:
+        """柱：闭合轮廓按截面分组计数，柱块按块名计数（块截面按 unit_scale 换算为毫米）"""
+        components = []
+        if batch and batch.vertices:
+            # 截面按长边×短边取整后分组计数
+            sizes = np.sort(polygon_extents(*batch.arrays()), axis=1)[:, ::-1]
+            sections, counts = np.unique(np.round(sizes / _SECTION_ROUNDING) * _SECTION_ROUNDING,
+                                         axis=0, return_counts=True)
+            for (width, height), count in zip(sections, counts):
+                components.append(ComponentInfo(type='柱', code=f"KZ {width:.0f}×{height:.0f}",
+                                                width=float(width), height=float(height), quantity=int(count)))
+        for (category, name), refs in sorted(inserts.items()):
+            if category != '柱':
+                continue
+            width, height = (size * unit_scale for size in self._block_section(refs[0]))
+            components.append(ComponentInfo(type='柱', code=name, width=round(width, 1),
+                                            height=round(height, 1), quantity=len(refs)))
+        return components
+
+    def _linear(self, category: str, polygons: Optional[_Batch], linework: Optional[_Batch]) -> List[ComponentInfo]:
+        """
+        墙/梁：按图层汇总线长，轮廓图层（双线）取一半作为中心线长度
+
+        开口线在轮廓图层上两条边线算一根构件；闭合轮廓本身就是一根构件的外轮廓，每个计一根。
+        """
+        per_layer = defaultdict(float)
+        open_counts = defaultdict(int)
+        closed_counts = defaultdict(int)
+        for batch, closed in ((linework, False), (polygons, True)):
+            if not batch or not batch.vertices:
+                continue
+            vertices, vertex_counts = batch.arrays()
+            if closed:
+                # 闭合轮廓补上回到起点的边
+                vertices = np.concatenate([np.vstack([v, v[:1]]) for v in batch.vertices])
+                vertex_counts = vertex_counts + 1
+            lengths = polyline_lengths(vertices, vertex_counts)
+            counts = closed_counts if closed else open_counts
+            for layer, length in zip(batch.layers, lengths):
+                per_layer[layer] += float(length)
+                counts[layer] += 1
+
+        components = []
+        for layer, length in sorted(per_layer.items()):
+            is_centre = any(keyword in layer.upper() for keyword in _CENTRE_KEYWORDS)
+            centre_length = length if is_centre else length / 2.0
+            if category == '墙':
+                components.append(ComponentInfo(type='墙', code=layer, length=round(centre_length, 1),
+                                                height=self.wall_height,
+                                                area=centre_length * self.wall_height))
+            else:
+                open_members = open_counts[layer] if is_centre else math.ceil(open_counts[layer] / 2)
+                quantity = max(1, closed_counts[layer] + open_members)
+                components.append(ComponentInfo(type='梁', code=layer, length=round(centre_length, 1),
+                                                quantity=quantity))
+        return components
+
+    def _slabs(self, polygons: Optional[_Batch], hatches: List[Tuple[str, float]]) -> List[ComponentInfo]:
+        """板：每个闭合轮廓/填充一块板，面积取鞋带公式结果"""
+        components = []
+        if polygons and polygons.vertices:
+            vertices, counts = polygons.arrays()
+            areas = polygon_areas(vertices, counts)
+            sizes = np.round(polygon_extents(vertices, counts), 1).tolist()
+            for i, (layer, area, (width, length)) in enumerate(zip(polygons.layers, areas.tolist(), sizes)):
+                components.append(ComponentInfo(type='板', code=f"{layer}-{i + 1}", width=width,
+                                                length=length, area=area))
+        for i, (layer, area) in enumerate(hatches):
+            if area > 0:
+                components.append(ComponentInfo(type='板', code=f"{layer}-H{i + 1}", area=area))
+        return components
+
+    def _counted(self, category: str, polygons: Optional[_Batch],
+                 inserts: Dict[Tuple[str, str], List[Any]]) -> List[ComponentInfo]:
+        """按个数计量的构件（楼梯）"""
+        components = []
+        if polygons and polygons.vertices:
+            components.append(ComponentInfo(type=category, code=polygons.layers[0], quantity=len(polygons.vertices)))
+        for (insert_category, name), refs in sorted(inserts.items()):
+            if insert_category == category:
+                components.append(ComponentInfo(type=category, code=name, quantity=len(refs)))
+        return components
+
+
+def main(argv: List[str] = None) -> int:
+    args = argv if argv is not None else sys.argv[1:]
+    if len(args) != 1:
+        print("用法: python -m app.services.dwg_processing.processors.vector_takeoff <file.dxf>")
+        return 1
+    doc = ezdxf.readfile(args[0])
+    ModelSpaceIndex.of(doc)
+    result = VectorTakeoffEngine().takeoff(doc)
+    for component in result['components']:
+        print(component)
+    print(result['dimensions']['count'], "dimensions;", result['statistics'])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
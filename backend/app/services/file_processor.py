@@ -8,27 +8,27 @@
 import os
 import logging
 import tempfile
+import time
 import uuid
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Iterator, Tuple
 from pathlib import Path
 
 # 导入各种文件处理库
 try:
     import pdf2image
-    from pdf2image import convert_from_path
+    from pdf2image import convert_from_path, pdfinfo_from_path
 except ImportError:
     pdf2image = None
 
 try:
-    import ezdxf
+    import fitz  # PyMuPDF
 except ImportError:
-    ezdxf = None
+    fitz = None
 
 try:
-    import matplotlib.pyplot as plt
-    import matplotlib.patches as patches
+    import ezdxf
 except ImportError:
-    plt = None
+    ezdxf = None
 
 try:
     import cv2
@@ -38,6 +38,13 @@ except ImportError:
 
 from PIL import Image
 
+from app.core.config import settings
+from app.services.pdf_vector_text import PDFVectorTextExtractor, summarize_pages
+from app.services.pdf_raster_planner import plan_page_dpi
+from app.services.page_raster import page_raster_mode, compact_page_file, RASTER_MODE_COLOR, RASTER_MODE_BILEVEL
+from app.services.dwg_processing.exporters.dxf_rasterizer import DXFRasterizer, vector_text_page
+from app.services.dwg_processing.core.dxf_stream import stream_dxf, should_stream
+
 # Disable decompression bomb check to handle large high-resolution images
 Image.MAX_IMAGE_PIXELS = None
 
@@ -55,13 +62,15 @@ class FileProcessor:
             'image': ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']
         }
     
-    def process_file(self, file_path: str, file_type: str) -> Dict[str, Any]:
+    def process_file(self, file_path: str, file_type: str,
+                     on_page: Optional[Callable[[int, str], None]] = None) -> Dict[str, Any]:
         """
         根据文件类型处理文件
         
         Args:
             file_path: 文件路径
             file_type: 文件类型
+            on_page: 页面图片就绪回调 (页码, 图片路径)，PDF逐页渲染时每页完成即调用
             
         Returns:
             Dict: 处理结果
@@ -77,7 +86,7 @@ class FileProcessor:
             file_ext = Path(file_path).suffix.lower()
             
             if file_ext == '.pdf':
-                return self.process_pdf(file_path)
+                return self.process_pdf(file_path, on_page=on_page)
             elif file_ext in ['.dwg', '.dxf']:
                 return self.process_cad(file_path)
             elif file_ext in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']:
@@ -95,16 +104,88 @@ class FileProcessor:
                 'processing_method': 'unknown'
             }
     
-    def process_pdf(self, pdf_path: str) -> Dict[str, Any]:
+    def iter_pdf_pages(self, pdf_path: str, dpi: int = None,
+                       page_window: int = None) -> Iterator[Tuple[int, str, Dict[str, Any]]]:
+        """
+        按页窗口逐段栅格化PDF，逐页产出 (页码, 图片路径, 分辨率规划)
+        
+        poppler 直接把PNG写入临时目录，这里只返回路径，不在内存中保留整份文档的页面图像，
+        峰值内存由 page_window 页的渲染量决定。未指定 dpi 时按页面幅面和文字高度逐页选择。
+        
+        Args:
+            pdf_path: PDF文件路径
+            dpi: 固定渲染分辨率，None 表示自适应
+            page_window: 每次渲染的页数
+        """
+        page_window = max(1, page_window or settings.PDF_RASTER_PAGE_WINDOW)
+        total_pages = int(pdfinfo_from_path(pdf_path).get("Pages", 0))
+        page_uuid = str(uuid.uuid4())
+        
+        raster_mode = page_raster_mode()
+        adaptive = dpi is None and settings.PDF_ADAPTIVE_DPI and fitz is not None
+        plan_doc = fitz.open(pdf_path) if adaptive else None
+        try:
+            for first_page in range(1, total_pages + 1, page_window):
+                last_page = min(first_page + page_window - 1, total_pages)
+                plans = [self._plan_page_raster(plan_doc, page_number - 1, dpi)
+                         for page_number in range(first_page, last_page + 1)]
+                
+                # 窗口内DPI相同的连续页面合并为一次 poppler 调用
+                run_start = first_page
+                while run_start <= last_page:
+                    run_dpi = plans[run_start - first_page]["dpi"]
+                    run_end = run_start
+                    while run_end < last_page and plans[run_end + 1 - first_page]["dpi"] == run_dpi:
+                        run_end += 1
+                    
+                    page_paths = convert_from_path(
+                        pdf_path,
+                        dpi=run_dpi,
+                        first_page=run_start,
+                        last_page=run_end,
+                        output_folder=self.temp_dir,
+                        # 每次调用使用独立前缀，pdf2image 按前缀回收输出文件
+                        output_file=f"temp_page_{page_uuid}_{run_start:05d}_",
+                        fmt='png',
+                        paths_only=True,
+                        # 图纸默认由 poppler 直接输出灰度PNG，颜色编码图纸需显式启用 color 模式
+                        grayscale=raster_mode != RASTER_MODE_COLOR,
+                        thread_count=max(1, min(settings.PDF_RASTER_THREADS, run_end - run_start + 1))
+                    )
+                    # poppler 输出文件名带零填充页码，排序即页序
+                    for offset, page_path in enumerate(sorted(page_paths)):
+                        page_index = run_start - 1 + offset
+                        if raster_mode == RASTER_MODE_BILEVEL:
+                            compact_page_file(page_path, raster_mode)
+                        yield page_index, page_path, plans[page_index + 1 - first_page]
+                    run_start = run_end + 1
+        finally:
+            if plan_doc is not None:
+                plan_doc.close()
+    
+    def _plan_page_raster(self, plan_doc, page_index: int, dpi: Optional[int]) -> Dict[str, Any]:
+        """单页分辨率规划；固定DPI或规划失败时使用 PDF_MAX_DPI"""
+        if plan_doc is None:
+            return {"dpi": dpi or settings.PDF_MAX_DPI, "reason": "固定DPI"}
+        try:
+            return plan_page_dpi(plan_doc[page_index], default_dpi=settings.PDF_MAX_DPI)
+        except Exception as plan_error:
+            logger.warning(f"⚠️ PDF第{page_index+1}页分辨率规划失败，使用{settings.PDF_MAX_DPI} DPI: {plan_error}")
+            return {"dpi": settings.PDF_MAX_DPI, "reason": f"规划失败: {plan_error}"}
+    
+    def process_pdf(self, pdf_path: str,
+                    on_page: Optional[Callable[[int, str], None]] = None) -> Dict[str, Any]:
         """
         处理PDF文件 - 转换为图片
         
         Args:
             pdf_path: PDF文件路径
+            on_page: 页面图片就绪回调 (页码, 图片路径)，便于下游边渲染边处理
             
         Returns:
             Dict: 处理结果
         """
+        image_paths = []
         try:
             logger.info(f"📄 开始处理PDF文件: {pdf_path}")
             
@@ -127,48 +208,72 @@ class FileProcessor:
             except Exception as header_error:
                 logger.warning(f"PDF文件头验证失败: {header_error}")
             
-            # 使用300 DPI进行转换
+            # 矢量文本提取与栅格化同步逐页进行，坐标对齐到相同DPI的页面图像
+            vector_extractor = None
+            vector_doc = None
+            vector_text = {}
+            vector_elapsed = 0.0
+            if settings.PDF_VECTOR_TEXT_ENABLED and PDFVectorTextExtractor.is_available():
+                try:
+                    vector_extractor = PDFVectorTextExtractor()
+                    vector_doc = fitz.open(pdf_path)
+                except Exception as vector_error:
+                    logger.warning(f"⚠️ 矢量文本提取不可用，全部页面走OCR: {vector_error}")
+                    vector_extractor = None
+            
+            # 按页自适应DPI，按页窗口流式转换
+            page_rasters = []
             try:
-                images = convert_from_path(
-                    pdf_path,
-                    dpi=300,  # 使用300 DPI平衡性能和精度
-                    output_folder=self.temp_dir,
-                    fmt='png',
-                    thread_count=4 # 利用多核加速转换
-                )
+                for page_index, image_path, raster_plan in self.iter_pdf_pages(pdf_path):
+                    image_paths.append(image_path)
+                    page_rasters.append({"page": page_index + 1, "image": Path(image_path).name, **raster_plan})
+                    logger.info(f"📄 PDF第{page_index+1}页已转换为图片 ({raster_plan['dpi']} DPI, "
+                                f"{raster_plan['reason']}): {image_path}")
+                    if vector_extractor:
+                        page_start = time.time()
+                        try:
+                            vector_text[image_path] = vector_extractor.extract_page(
+                                vector_doc[page_index], dpi=raster_plan['dpi']
+                            )
+                            logger.info(f"📝 PDF第{page_index+1}页文本类型: {vector_text[image_path]['mode']}, "
+                                        f"{len(vector_text[image_path]['text_regions'])} 行矢量文本")
+                        except Exception as vector_error:
+                            logger.warning(f"⚠️ PDF第{page_index+1}页矢量文本提取失败: {vector_error}")
+                        vector_elapsed += time.time() - page_start
+                    if on_page:
+                        on_page(page_index, image_path)
             except Exception as convert_error:
-                logger.error(f"PDF在300 DPI下转换失败: {convert_error}", exc_info=True)
+                logger.error(f"PDF转换失败: {convert_error}", exc_info=True)
                 raise Exception(f"PDF转换失败: {convert_error}")
+            finally:
+                if vector_doc is not None:
+                    vector_doc.close()
             
-            if not images:
+            if not image_paths:
                 raise ValueError("PDF转换后没有生成任何图片页面")
             
-            image_paths = []
-            page_uuid = str(uuid.uuid4())
-            
-            for i, image in enumerate(images):
-                # 保存每页图片
-                image_path = os.path.join(
-                    self.temp_dir, 
-                    f"temp_page_{page_uuid}_{i}.png"
-                )
-                image.save(image_path, 'PNG')
-                image_paths.append(image_path)
-                
-                logger.info(f"📄 PDF第{i+1}页已转换为图片: {image_path}")
-            
             logger.info(f"✅ PDF处理完成，共转换 {len(image_paths)} 页图片")
             
-            return {
+            result = {
                 'status': 'success',
                 'image_paths': image_paths,
-                'text_content': '',  # PDF文本提取需要另外处理
+                'text_content': '\n'.join(page['all_text'] for page in vector_text.values() if page['all_text']),
                 'processing_method': 'pdf_to_images',
-                'total_pages': len(image_paths)
+                'total_pages': len(image_paths),
+                # 每页实际使用的DPI及选择依据
+                'page_rasters': page_rasters
             }
+            if vector_text:
+                # 按图片路径索引，OCR阶段据此跳过有可用矢量文本的页面
+                result['vector_text'] = vector_text
+                result['vector_text_statistics'] = summarize_pages(list(vector_text.values()), vector_elapsed)
+                logger.info(f"📝 矢量文本提取统计: {result['vector_text_statistics']}")
+            return result
             
         except Exception as e:
             logger.error(f"❌ PDF处理失败: {str(e)}")
+            # 已渲染的页面不会再交给调用方，直接清理
+            self.cleanup_temp_files(image_paths)
             return {
                 'status': 'error',
                 'error': str(e),
@@ -217,12 +322,17 @@ class FileProcessor:
             
             logger.info(f"📐 读取DXF文件: {dxf_path}")
             
-            # 读取DXF文件
-            doc = ezdxf.readfile(dxf_path)
-            msp = doc.modelspace()
-            
-            # 尝试提取文字实体
-            text_content = self._extract_text_from_dxf(msp)
+            # 读取DXF文件（大文件流式读取为列式存储）
+            if should_stream(dxf_path):
+                doc = stream_dxf(dxf_path)
+                msp = doc.modelspace()
+                text_content = '\n'.join(msp.text_strings)
+            else:
+                doc = ezdxf.readfile(dxf_path)
+                msp = doc.modelspace()
+                
+                # 尝试提取文字实体
+                text_content = self._extract_text_from_dxf(msp)
             
             if text_content.strip():
                 logger.info(f"✅ 从DXF提取到文字内容: {len(text_content)} 字符")
@@ -236,14 +346,27 @@ class FileProcessor:
             else:
                 # 如果没有文字实体，渲染为图片
                 logger.info("📐 DXF文件没有文字实体，渲染为图片...")
-                image_path = self._render_dxf_to_image(msp)
+                render_result = self._render_dxf_to_image(msp)
+                if not render_result:
+                    return {
+                        'status': 'success',
+                        'image_paths': [],
+                        'text_content': '',
+                        'processing_method': 'dxf_to_image',
+                        'has_text_entities': False
+                    }
                 
+                # 块属性等文字不画进位图，以矢量文本随页面传给OCR阶段
+                image_path = render_result['output_path']
+                vector_page = vector_text_page(render_result)
                 return {
                     'status': 'success',
-                    'image_paths': [image_path] if image_path else [],
-                    'text_content': '',
+                    'image_paths': [image_path],
+                    'text_content': vector_page['all_text'],
                     'processing_method': 'dxf_to_image',
-                    'has_text_entities': False
+                    'has_text_entities': False,
+                    'vector_text': {image_path: vector_page},
+                    'vector_text_statistics': summarize_pages([vector_page], render_result['render_seconds'])
                 }
                 
         except Exception as e:
@@ -292,45 +415,24 @@ class FileProcessor:
             logger.error(f"❌ 提取DXF文字失败: {str(e)}")
             return ''
     
-    def _render_dxf_to_image(self, msp) -> Optional[str]:
-        """将DXF渲染为图片"""
+    def _render_dxf_to_image(self, msp) -> Optional[Dict[str, Any]]:
+        """将DXF模型空间批量栅格化为图片，返回含 output_path 和矢量文本区域的渲染结果"""
         try:
-            if not plt:
-                logger.warning("matplotlib 未安装，无法渲染DXF为图片")
+            rasterizer = DXFRasterizer()
+            if not rasterizer.is_available():
+                logger.warning("opencv 未安装，无法渲染DXF为图片")
                 return None
             
             logger.info("🎨 渲染DXF为图片...")
             
-            fig, ax = plt.subplots(figsize=(12, 8))
-            
-            # 渲染线条实体
-            for line in msp.query('LINE'):
-                start = line.dxf.start
-                end = line.dxf.end
-                ax.plot([start.x, end.x], [start.y, end.y], 'k-', linewidth=0.5)
-            
-            # 渲染圆形实体
-            for circle in msp.query('CIRCLE'):
-                center = circle.dxf.center
-                radius = circle.dxf.radius
-                circle_patch = plt.Circle((center.x, center.y), radius, 
-                                        fill=False, edgecolor='black', linewidth=0.5)
-                ax.add_patch(circle_patch)
-            
-            # 设置图形属性
-            ax.set_aspect('equal')
-            ax.axis('off')
-            
-            # 保存为图片
             cad_uuid = str(uuid.uuid4())
             image_path = os.path.join(self.temp_dir, f"temp_cad_{cad_uuid}.png")
+            result = rasterizer.render_to_file(msp.doc, None, image_path)
             
-            plt.savefig(image_path, dpi=300, bbox_inches='tight', 
-                       facecolor='white', edgecolor='none')
-            plt.close()
-            
-            logger.info(f"✅ DXF渲染完成: {image_path}")
-            return image_path
+            logger.info(f"✅ DXF渲染完成: {image_path} ({result['width']}x{result['height']}, "
+                        f"{result['entity_count']} 个实体, {len(result['text_regions'])} 行矢量文本, "
+                        f"{result['render_seconds']}s)")
+            return result
             
         except Exception as e:
             logger.error(f"❌ DXF渲染失败: {str(e)}")
@@ -431,6 +533,7 @@ class FileProcessor:
             )
             
             cv2.imwrite(processed_path, binary)
+            compact_page_file(processed_path)
             
             logger.info(f"✅ 图像预处理完成: {processed_path}")
             return processed_path
@@ -52,7 +52,7 @@ class GridSliceOCRProcessor:
         
         # 验证切片数据完整性
         for i, slice_info in enumerate(slice_infos):
-            if not hasattr(slice_info, 'base64_data') or not slice_info.base64_data:
+            if not getattr(slice_info, 'base64_data', None) and not getattr(slice_info, 'spool_path', None):
                 logger.error(f"❌ 切片 {i} 缺少base64数据")
                 return False
         
@@ -77,7 +77,7 @@ class GridSliceOCRProcessor:
             for i, slice_data in enumerate(slice_infos):
                 # 创建临时切片文件
                 try:
-                    slice_image_data = base64.b64decode(slice_data.base64_data)
+                    slice_image_data = base64.b64decode(slice_data.load_base64())
                     temp_slice_file = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
                     temp_slice_file.write(slice_image_data)
                     temp_slice_file.close()
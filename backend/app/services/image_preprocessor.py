@@ -13,6 +13,7 @@ from pathlib import Path
 import math
 from PIL import Image, ImageEnhance, ImageFilter
 from ..core.config import settings
+from .page_raster import page_raster_mode, RASTER_MODE_COLOR
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +22,7 @@ class ImagePreprocessor:
     
     def __init__(self):
         self.target_dpi = settings.PADDLE_OCR_TARGET_DPI
+        self.target_text_height = settings.PADDLE_OCR_TARGET_TEXT_HEIGHT
         self.min_text_height = settings.PADDLE_OCR_MIN_HEIGHT
         self.max_size = settings.PADDLE_OCR_MAX_SIZE
         self.smart_scale = settings.PADDLE_OCR_SMART_SCALE
@@ -28,7 +30,7 @@ class ImagePreprocessor:
         self.noise_reduction = settings.PADDLE_OCR_NOISE_REDUCTION
         
         logger.info(f"🔧 ImagePreprocessor initialized with DPI={self.target_dpi}, "
-                   f"min_height={self.min_text_height}, max_size={self.max_size}")
+                   f"text_height={self.target_text_height}(min {self.min_text_height}), max_size={self.max_size}")
     
     def auto_resize_for_ocr(self, image_path: Union[str, Path]) -> str:
         """
@@ -53,8 +55,11 @@ class ImagePreprocessor:
             original_size = pil_image.size
             logger.info(f"📏 原始尺寸: {original_size[0]}x{original_size[1]}")
             
-            # 转换为OpenCV格式进行处理
-            cv_image = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
+            # 转换为OpenCV格式进行处理：默认全程单通道灰度，仅彩色模式保留BGR
+            if page_raster_mode() == RASTER_MODE_COLOR:
+                cv_image = cv2.cvtColor(np.array(pil_image.convert('RGB')), cv2.COLOR_RGB2BGR)
+            else:
+                cv_image = np.array(pil_image.convert('L'))
             
             # 步骤1: 计算最佳缩放比例
             optimal_scale = self._calculate_optimal_scale(cv_image)
@@ -92,7 +97,7 @@ class ImagePreprocessor:
             
             if estimated_text_height > 0:
                 # 基于文字高度计算缩放比例
-                text_scale = self.min_text_height / estimated_text_height
+                text_scale = self.target_text_height / estimated_text_height
                 logger.info(f"📝 基于文字高度的缩放比例: {text_scale:.2f}")
                 
                 # 确保不超过最大尺寸限制
@@ -102,6 +107,9 @@ class ImagePreprocessor:
                 optimal_scale = min(text_scale, size_scale)
                 optimal_scale = max(0.5, min(3.0, optimal_scale))
                 
+                if estimated_text_height * optimal_scale < self.min_text_height:
+                    logger.warning(f"⚠️ 缩放后文字高度约{estimated_text_height * optimal_scale:.0f}px，"
+                                   f"低于最小高度{self.min_text_height}px")
                 return optimal_scale
         
         # 常规缩放逻辑
@@ -116,7 +124,7 @@ class ImagePreprocessor:
         """估计图像中文字的平均高度"""
         try:
             # 转换为灰度图
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             
             # 边缘检测
             edges = cv2.Canny(gray, 50, 150)
@@ -180,7 +188,7 @@ class ImagePreprocessor:
             logger.info("✨ 应用更保守的图像增强流程...")
 
             # 1. 转换为灰度图
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
             # 2. 使用CLAHE（对比度受限的自适应直方图均衡化）增强低对比度区域
             # clipLimit: 对比度限制，值越小，对比度增强越温和
@@ -196,9 +204,8 @@ class ImagePreprocessor:
             morph_opened = cv2.morphologyEx(clahe_enhanced, cv2.MORPH_OPEN, kernel, iterations=1)
             logger.info("✨ 步骤2/2: 形态学开运算去噪完成。")
 
-            # 将处理后的单通道灰度图转换回BGR三通道格式
-            enhanced_image = cv2.cvtColor(morph_opened, cv2.COLOR_GRAY2BGR)
-            return enhanced_image
+            # 保持单通道输出，PaddleOCR读取文件时自行扩展为三通道
+            return morph_opened
 
         except Exception as e:
             logger.warning(f"⚠️ 图像质量增强失败: {e}", exc_info=True)
@@ -230,7 +237,9 @@ class ImagePreprocessor:
     def get_image_info(self, image_path: Union[str, Path]) -> dict:
         """获取图像信息用于调试"""
         try:
-            image = cv2.imread(str(image_path))
+            # 彩色模式按三通道读取，与预处理时的输入一致
+            read_flag = cv2.IMREAD_COLOR if page_raster_mode() == RASTER_MODE_COLOR else cv2.IMREAD_GRAYSCALE
+            image = cv2.imread(str(image_path), read_flag)
             if image is None:
                 return {"error": "无法读取图像"}
             
@@ -244,6 +253,7 @@ class ImagePreprocessor:
                 "width": width,
                 "height": height,
                 "max_side": max(width, height),
+                "channels": 1 if image.ndim == 2 else image.shape[2],
                 "file_size_mb": file_size / (1024 * 1024),
                 "estimated_text_height": text_height,
                 "recommended_scale": self._calculate_optimal_scale(image)
@@ -8,6 +8,8 @@ from dataclasses import dataclass, asdict
 import asyncio
 import logging
 
+from app.services.box_overlap import boxes_array, overlap_groups
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -493,31 +495,21 @@ class IntelligentFusionEngine:
         return candidates
     
     def _group_conflict_candidates(self, candidates: List[FusionCandidate]) -> Tuple[List[List[FusionCandidate]], List[FusionCandidate]]:
-        """分组冲突候选项"""
+        """
+        分组冲突候选项
+
+        冲突组为空间重叠图的连通分量（A与B重叠、B与C重叠时三者同组），
+        重叠边由扫描线在框数组上求出（见 box_overlap），重叠判定与 _has_spatial_overlap 一致。
+        """
         conflict_groups = []
         single_candidates = []
-        processed = set()
         
-        for i, candidate in enumerate(candidates):
-            if i in processed:
-                continue
-            
-            # 查找与当前候选项冲突的其他候选项
-            conflict_group = [candidate]
-            processed.add(i)
-            
-            for j, other_candidate in enumerate(candidates[i+1:], i+1):
-                if j in processed:
-                    continue
-                
-                if self._has_spatial_overlap(candidate, other_candidate):
-                    conflict_group.append(other_candidate)
-                    processed.add(j)
-            
-            if len(conflict_group) > 1:
-                conflict_groups.append(conflict_group)
+        boxes = boxes_array([candidate.spatial_info for candidate in candidates])
+        for group in overlap_groups(boxes):
+            if len(group) > 1:
+                conflict_groups.append([candidates[i] for i in group])
             else:
-                single_candidates.append(candidate)
+                single_candidates.append(candidates[group[0]])
         
         return conflict_groups, single_candidates
     
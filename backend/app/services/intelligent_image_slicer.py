@@ -9,21 +9,32 @@ import logging
 import base64
 import json
 import math
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Tuple, Optional, Callable
 from pathlib import Path
 from PIL import Image, ImageDraw
 import numpy as np
 from dataclasses import dataclass
 import asyncio
+import time
+import threading
 import aiofiles
+from concurrent.futures import ThreadPoolExecutor, Future, wait
 
 from app.core.config import settings
 from app.services.sealos_storage import SealosStorage
 from app.services.dual_storage_service import DualStorageService
 from app.services.s3_service import S3Service
+from app.services.page_raster import to_compact
+from app.services.result_mergers.component_merge import bbox_array, cluster_duplicates, normalise_component_key
 
 logger = logging.getLogger(__name__)
 
+# 切片持久化线程池（进程共享），上传不阻塞切片计算
+_slice_persist_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "VISION_SLICE_PERSIST_WORKERS", 8),
+    thread_name_prefix="slice-persist"
+)
+
 @dataclass
 class SliceInfo:
     """切片信息"""
@@ -39,6 +50,28 @@ class SliceInfo:
     base64_data: str
     file_size_kb: float
     slice_path: str
+    spool_path: str = ""
+    
+    def spool(self, spool_dir: str) -> str:
+        """
+        将切片PNG写入本地暂存文件并释放内存中的base64数据
+        
+        之后通过 load_base64() 从暂存文件读回，多页图纸不必同时在内存中保留所有页面的切片
+        """
+        if self.spool_path or not self.base64_data:
+            return self.spool_path
+        path = Path(spool_dir) / f"{self.slice_id}.png"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(base64.b64decode(self.base64_data))
+        self.spool_path = str(path)
+        self.base64_data = ""
+        return self.spool_path
+    
+    def load_base64(self) -> str:
+        """返回切片PNG的base64数据；已暂存的切片按需从文件读回，不再缓存在内存中"""
+        if not self.base64_data and self.spool_path:
+            return base64.b64encode(Path(self.spool_path).read_bytes()).decode('utf-8')
+        return self.base64_data
 
 @dataclass
 class SliceAnalysisResult:
@@ -66,6 +99,17 @@ class IntelligentImageSlicer:
         self.primary_storage = self.s3_service
         self.fallback_storage = self.sealos_storage
         
+        # 切线沿低墨迹缝隙选取，减少文字/尺寸标注被切断
+        self.seam_aware = getattr(settings, "VISION_SLICE_SEAM_AWARE", True)
+        
+        # 切片持久化模式：background(切片后后台并行上传) / on_demand(使用方请求时上传) / none
+        self.persist_mode = getattr(settings, "VISION_SLICE_PERSIST_MODE", "background")
+        self.persist_concurrency = getattr(settings, "VISION_SLICE_PERSIST_WORKERS", 8)
+        self._persist_futures: Dict[str, Future] = {}
+        self._persist_lock = threading.Lock()
+        # 切片计算与持久化耗时分别统计
+        self.last_timing = {"slicing_seconds": 0.0, "persistence_seconds": 0.0}
+        
     def is_available(self) -> bool:
         """检查智能切片器是否可用"""
         try:
@@ -139,18 +183,20 @@ class IntelligentImageSlicer:
         
         return strategy_info
     
-    def slice_image(self, image: Image.Image, task_id: str) -> List[SliceInfo]:
+    def slice_image(self, image: Image.Image, task_id: str, persist: bool = None) -> List[SliceInfo]:
         """
-        智能切片图像
+        智能切片图像（纯计算，不等待上传）
         
         Args:
             image: PIL图像对象
             task_id: 任务ID
+            persist: 是否在后台持久化切片，缺省按 persist_mode 决定
             
         Returns:
             切片信息列表
         """
         logger.info(f"开始智能切片 - 任务ID: {task_id}")
+        start_time = time.time()
         
         image_width, image_height = image.size
         strategy = self.calculate_optimal_slicing(image_width, image_height)
@@ -161,6 +207,7 @@ class IntelligentImageSlicer:
             # 不需要切片，直接处理整张图
             slice_info = self._create_single_slice(image, task_id, "full")
             slices.append(slice_info)
+            self.last_timing = {"slicing_seconds": time.time() - start_time, "persistence_seconds": 0.0}
             logger.info("图像尺寸满足要求，无需切片")
             return slices
         
@@ -169,19 +216,135 @@ class IntelligentImageSlicer:
         slice_width, slice_height = strategy['slice_size']
         overlap_x, overlap_y = strategy['overlap_size']
         
-        for row in range(slices_y):
-            for col in range(slices_x):
-                slice_info = self._create_slice(
-                    image, task_id, row, col, 
-                    slices_x, slices_y,
-                    slice_width, slice_height,
-                    overlap_x, overlap_y
-                )
-                slices.append(slice_info)
+        if self.seam_aware:
+            slices = self._slice_along_seams(image, task_id, slice_width, slice_height, overlap_x, overlap_y)
+        else:
+            for row in range(slices_y):
+                for col in range(slices_x):
+                    slice_info = self._create_slice(
+                        image, task_id, row, col, 
+                        slices_x, slices_y,
+                        slice_width, slice_height,
+                        overlap_x, overlap_y
+                    )
+                    slices.append(slice_info)
+        
+        slicing_seconds = time.time() - start_time
+        self.last_timing = {"slicing_seconds": slicing_seconds, "persistence_seconds": 0.0}
+        logger.info(f"切片完成: 生成 {len(slices)} 个切片, 切片耗时 {slicing_seconds:.2f}s")
+        
+        if persist is None:
+            persist = self.persist_mode == "background"
+        if persist:
+            self.persist_slices_async(slices, task_id)
         
-        logger.info(f"切片完成: 生成 {len(slices)} 个切片")
         return slices
     
+    def persist_slices_async(self, slices: List[SliceInfo], task_id: str) -> List[Future]:
+        """将切片提交到线程池并行上传，返回各切片的Future"""
+        submitted_at = time.time()
+        # 绑定本次切片的耗时记录，避免后续切片覆盖
+        timing = self.last_timing
+        futures = []
+        remaining = {"count": 0}
+        remaining_lock = threading.Lock()
+        
+        def on_done(_):
+            with remaining_lock:
+                remaining["count"] -= 1
+                finished = remaining["count"] == 0
+            if finished:
+                timing["persistence_seconds"] = time.time() - submitted_at
+                logger.info(f"✅ 切片后台持久化完成: {len(futures)} 个, "
+                            f"持久化耗时 {timing['persistence_seconds']:.2f}s - 任务ID: {task_id}")
+        
+        with self._persist_lock:
+            for slice_info in slices:
+                if slice_info.slice_path or slice_info.slice_id in self._persist_futures:
+                    continue
+                future = _slice_persist_executor.submit(self._persist_slice, slice_info, task_id)
+                self._persist_futures[slice_info.slice_id] = future
+                futures.append(future)
+            remaining["count"] = len(futures)
+        
+        for future in futures:
+            future.add_done_callback(on_done)
+        
+        if futures:
+            logger.info(f"📤 已提交 {len(futures)} 个切片后台持久化 - 任务ID: {task_id}")
+        return futures
+    
+    def ensure_slice_persisted(self, slice_info: SliceInfo, task_id: str, timeout: float = 60.0) -> str:
+        """按需持久化单个切片（调试界面等使用方请求时调用），返回存储路径"""
+        if slice_info.slice_path:
+            return slice_info.slice_path
+        with self._persist_lock:
+            future = self._persist_futures.get(slice_info.slice_id)
+        if future is not None:
+            return future.result(timeout=timeout)
+        return self._persist_slice(slice_info, task_id)
+    
+    def wait_persistence(self, timeout: float = 60.0) -> bool:
+        """等待所有已提交的切片持久化完成"""
+        with self._persist_lock:
+            pending = [f for f in self._persist_futures.values() if not f.done()]
+        if not pending:
+            return True
+        _, not_done = wait(pending, timeout=timeout)
+        if not_done:
+            logger.warning(f"⚠️ 仍有 {len(not_done)} 个切片未完成持久化")
+        return not not_done
+    
+    def after_persistence(self, callback: Callable[[], None]):
+        """所有已提交的切片持久化结束（无论成败）后执行回调；没有未完成任务时立即执行"""
+        with self._persist_lock:
+            pending = [f for f in self._persist_futures.values() if not f.done()]
+        if not pending:
+            callback()
+            return
+        
+        remaining = {"count": len(pending)}
+        remaining_lock = threading.Lock()
+        
+        def on_done(_):
+            with remaining_lock:
+                remaining["count"] -= 1
+                finished = remaining["count"] == 0
+            if finished:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.warning(f"⚠️ 切片持久化完成回调执行失败: {e}")
+        
+        for future in pending:
+            future.add_done_callback(on_done)
+    
+    def _persist_slice(self, slice_info: SliceInfo, task_id: str) -> str:
+        """上传单个切片到S3，失败时降级写入本地目录；回填并返回 slice_path"""
+        slice_filename = f"{slice_info.slice_id}.png"
+        slice_image_bytes = base64.b64decode(slice_info.load_base64())
+        try:
+            from io import BytesIO
+            upload_result = self.s3_service.upload_file(
+                file_obj=BytesIO(slice_image_bytes),
+                file_name=slice_filename,
+                content_type='image/png',
+                folder=f"slices/{task_id}"
+            )
+            slice_path = upload_result.get("s3_key")
+            logger.debug(f"✅ 成功上传切片到S3: {slice_path}")
+        except Exception as e:
+            logger.error(f"❌ 上传切片到S3失败: {e}")
+            # 降级到本地存储
+            local_slice_dir = Path(f"temp_slices/{task_id}")
+            local_slice_dir.mkdir(parents=True, exist_ok=True)
+            slice_path = local_slice_dir / slice_filename
+            slice_path.write_bytes(slice_image_bytes)
+            logger.warning(f"⚠️ 已将切片保存到本地备用路径: {slice_path}")
+        
+        slice_info.slice_path = str(slice_path or "")
+        return slice_info.slice_path
+    
     def _create_single_slice(self, image: Image.Image, task_id: str, suffix: str) -> SliceInfo:
         """创建单个切片（无需切片的情况）"""
         slice_id = f"{task_id}_{suffix}"
@@ -231,6 +394,46 @@ class IntelligentImageSlicer:
         overlap_right = overlap_x if col < total_cols - 1 else 0
         overlap_bottom = overlap_y if row < total_rows - 1 else 0
         
+        return self._build_slice(image, task_id, row, col, (start_x, start_y, end_x, end_y),
+                                 (overlap_left, overlap_top, overlap_right, overlap_bottom))
+    
+    def _slice_along_seams(self, image: Image.Image, task_id: str,
+                           slice_width: int, slice_height: int,
+                           overlap_x: int, overlap_y: int) -> List[SliceInfo]:
+        """
+        在名义切分位置附近选取墨迹最少的缝隙作为切线
+        
+        墨迹积分图只构建一次：先选水平切线，再在每一行带内独立选竖直切线。
+        切线落在空白处时重叠区缩小为1/4。
+        """
+        from app.services.adaptive_slicing_engine import InkIntegralImage
+        
+        ink_index = InkIntegralImage.from_gray(np.asarray(image.convert('L')))
+        width, height = image.size
+        
+        slices = []
+        row_spans = ink_index.find_cuts(0, 0, height, 0, width,
+                                        slice_height, overlap_y, overlap_y // 4)
+        for row, (start_y, end_y) in enumerate(row_spans):
+            col_spans = ink_index.find_cuts(1, 0, width, start_y, end_y,
+                                            slice_width, overlap_x, overlap_x // 4)
+            for col, (start_x, end_x) in enumerate(col_spans):
+                overlaps = (
+                    col_spans[col - 1][1] - start_x if col > 0 else 0,
+                    row_spans[row - 1][1] - start_y if row > 0 else 0,
+                    end_x - col_spans[col + 1][0] if col < len(col_spans) - 1 else 0,
+                    end_y - row_spans[row + 1][0] if row < len(row_spans) - 1 else 0
+                )
+                slices.append(self._build_slice(image, task_id, row, col,
+                                                (start_x, start_y, end_x, end_y), overlaps))
+        return slices
+    
+    def _build_slice(self, image: Image.Image, task_id: str, row: int, col: int,
+                     box: Tuple[int, int, int, int], overlaps: Tuple[int, int, int, int]) -> SliceInfo:
+        """按给定区域裁剪并编码切片"""
+        start_x, start_y, end_x, end_y = box
+        overlap_left, overlap_top, overlap_right, overlap_bottom = overlaps
+        
         # 裁剪图像
         slice_image = image.crop((start_x, start_y, end_x, end_y))
         
@@ -244,36 +447,7 @@ class IntelligentImageSlicer:
         logger.debug(f"创建切片 {slice_id}: 位置({start_x},{start_y})-({end_x},{end_y}), "
                     f"尺寸{slice_image.width}×{slice_image.height}, 大小{file_size_kb:.1f}KB")
         
-        slice_path = ""
-        try:
-            # 使用正确的S3服务上传
-            slice_filename = f"{slice_id}.png"
-            slice_image_bytes = base64.b64decode(base64_data)
-            
-            # 创建一个临时的BytesIO对象来模拟文件
-            from io import BytesIO
-            file_obj = BytesIO(slice_image_bytes)
-
-            # 调用一个接受文件对象的上传方法 (假设存在于S3Service中)
-            # 根据s3_service.py的实现，它有 upload_file 方法
-            upload_result = self.s3_service.upload_file(
-                file_obj=file_obj,
-                file_name=slice_filename,
-                content_type='image/png',
-                folder=f"slices/{task_id}"
-            )
-            slice_path = upload_result.get("s3_key")
-            
-            logger.info(f"✅ 成功上传切片到S3: {slice_path}")
-        except Exception as e:
-            logger.error(f"❌ 上传切片到S3失败: {e}", exc_info=True)
-            # 降级到本地存储
-            local_slice_dir = Path(f"temp_slices/{task_id}")
-            local_slice_dir.mkdir(parents=True, exist_ok=True)
-            slice_path = local_slice_dir / slice_filename
-            slice_image.save(slice_path)
-            logger.warning(f"⚠️ 已将切片保存到本地备用路径: {slice_path}")
-        
+        # 持久化延后到后台或按需执行，slice_path 在上传完成后回填
         return SliceInfo(
             slice_id=slice_id,
             x=start_x,
@@ -286,16 +460,16 @@ class IntelligentImageSlicer:
             overlap_bottom=overlap_bottom,
             base64_data=base64_data,
             file_size_kb=file_size_kb,
-            slice_path=str(slice_path)
+            slice_path=""
         )
     
     def _image_to_base64(self, image: Image.Image) -> str:
         """将图像转换为base64编码"""
         import io
         
-        # 确保图像是RGB模式
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
+        # 灰度/二值切片直接编码，不再扩展为RGB；其余模式（调色板、透明等）按页面栅格模式规整
+        if image.mode not in ('RGB', 'L', '1'):
+            image = to_compact(image)
         
         # 保存为字节流
         buffer = io.BytesIO()
@@ -351,28 +525,33 @@ class IntelligentImageSlicer:
         logger.info(f"保存 {len(slices)} 个切片到云存储 - 任务ID: {task_id}")
         
         slice_urls = {}
-        
-        for slice_info in slices:
-            try:
-                # 构建文件路径
-                file_path = f"slices/{task_id}/{slice_info.slice_id}.png"
-                
-                # 解码base64数据
-                image_data = base64.b64decode(slice_info.base64_data)
-                
-                # 上传到云存储
-                url = await self._upload_to_cloud_storage(
-                    file_data=image_data,
-                    file_path=file_path,
-                    content_type="image/png"
-                )
-                
-                slice_urls[slice_info.slice_id] = url
-                logger.debug(f"切片 {slice_info.slice_id} 上传成功: {url}")
-                
-            except Exception as e:
-                logger.error(f"上传切片 {slice_info.slice_id} 失败: {e}")
-                slice_urls[slice_info.slice_id] = None
+        semaphore = asyncio.Semaphore(max(1, self.persist_concurrency))
+        
+        async def upload_one(slice_info: SliceInfo):
+            async with semaphore:
+                try:
+                    # 构建文件路径
+                    file_path = f"slices/{task_id}/{slice_info.slice_id}.png"
+                    
+                    # 解码base64数据
+                    image_data = base64.b64decode(slice_info.load_base64())
+                    
+                    # 上传到云存储
+                    url = await self._upload_to_cloud_storage(
+                        file_data=image_data,
+                        file_path=file_path,
+                        content_type="image/png"
+                    )
+                    
+                    slice_urls[slice_info.slice_id] = url
+                    logger.debug(f"切片 {slice_info.slice_id} 上传成功: {url}")
+                    
+                except Exception as e:
+                    logger.error(f"上传切片 {slice_info.slice_id} 失败: {e}")
+                    slice_urls[slice_info.slice_id] = None
+        
+        # 并行上传
+        await asyncio.gather(*(upload_one(slice_info) for slice_info in slices))
         
         # 保存切片元数据
         metadata = {
@@ -424,7 +603,7 @@ class IntelligentImageSlicer:
         """
         logger.info(f"开始合并 {len(slice_results)} 个切片的分析结果")
         
-        merged_components = []
+        adjusted_components = []
         total_confidence = 0
         total_processing_time = 0
         
@@ -456,13 +635,14 @@ class IntelligentImageSlicer:
                     component, offset_x, offset_y, overlap
                 )
                 
-                # 检查是否与已有组件重复（去重）
-                if not self._is_duplicate_component(adjusted_component, merged_components):
-                    merged_components.append(adjusted_component)
+                adjusted_components.append(adjusted_component)
             
             total_confidence += result.confidence_score
             total_processing_time += result.processing_time
         
+        # 重叠区内被相邻切片重复识别的组件去重
+        merged_components = self._deduplicate_components(adjusted_components)
+        
         # 计算平均置信度
         avg_confidence = total_confidence / len(slice_results) if slice_results else 0
         
@@ -530,56 +710,31 @@ class IntelligentImageSlicer:
         
         return adjusted
     
-    def _is_duplicate_component(self, component: Dict[str, Any], 
-                              existing_components: List[Dict[str, Any]]) -> bool:
-        """检查组件是否重复（在重叠区域）"""
-        if 'bbox' not in component:
-            return False
-        
-        bbox1 = component['bbox']
-        
-        for existing in existing_components:
-            if 'bbox' not in existing:
+    def _deduplicate_components(self, components: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        同类型且 IoU > 0.5 的组件视为重复（按重复关系的连通分量分组，见 component_merge），
+        每组保留置信度最高的组件，并记录其余成员的切片来源和成员框的公共重叠区
+        """
+        types = [normalise_component_key(component.get('type', 'unknown')) for component in components]
+        clusters = cluster_duplicates(bbox_array(components), [types])
+        
+        deduplicated = []
+        for cluster in clusters:
+            members = [components[i] for i in cluster.indices]
+            if len(members) == 1:
+                deduplicated.append(members[0])
                 continue
             
-            bbox2 = existing['bbox']
-            
-            # 计算IoU (Intersection over Union)
-            iou = self._calculate_iou(bbox1, bbox2)
-            
-            # 如果IoU > 0.5，认为是重复组件
-            if iou > 0.5:
-                # 比较置信度，保留置信度更高的
-                conf1 = component.get('confidence', 0)
-                conf2 = existing.get('confidence', 0)
-                
-                if conf1 <= conf2:
-                    return True  # 当前组件置信度更低，认为是重复
-        
-        return False
-    
-    def _calculate_iou(self, bbox1: List[float], bbox2: List[float]) -> float:
-        """计算两个边界框的IoU"""
-        x1_min, y1_min, x1_max, y1_max = bbox1
-        x2_min, y2_min, x2_max, y2_max = bbox2
-        
-        # 计算交集
-        inter_x_min = max(x1_min, x2_min)
-        inter_y_min = max(y1_min, y2_min)
-        inter_x_max = min(x1_max, x2_max)
-        inter_y_max = min(y1_max, y2_max)
-        
-        if inter_x_max <= inter_x_min or inter_y_max <= inter_y_min:
-            return 0.0
-        
-        inter_area = (inter_x_max - inter_x_min) * (inter_y_max - inter_y_min)
-        
-        # 计算并集
-        area1 = (x1_max - x1_min) * (y1_max - y1_min)
-        area2 = (x2_max - x2_min) * (y2_max - y2_min)
-        union_area = area1 + area2 - inter_area
+            best = max(members, key=lambda component: component.get('confidence', 0))
+            kept = dict(best)
+            kept['slice_source'] = dict(best.get('slice_source', {}))
+            kept['slice_source']['duplicate_offsets'] = [
+                member.get('slice_source', {}).get('offset') for member in members if member is not best
+            ]
+            kept['slice_source']['overlap_bbox'] = cluster.overlap_bbox
+            deduplicated.append(kept)
         
-        return inter_area / union_area if union_area > 0 else 0.0
+        return deduplicated
     
     def _is_in_overlap_region(self, component: Dict[str, Any], 
                             overlap: Tuple[int, int, int, int]) -> bool:
@@ -698,11 +853,14 @@ class IntelligentImageSlicer:
             image = Image.open(image_path)
             original_size = image.size
             
-            # 2. 智能切片
-            slices = self.slice_image(image, task_id)
+            # 2. 智能切片（此处随后统一上传，不再提交后台持久化）
+            slices = self.slice_image(image, task_id, persist=False)
+            slicing_seconds = self.last_timing["slicing_seconds"]
             
             # 3. 保存切片到Sealos
+            persist_start = time.time()
             slice_urls = await self.save_slices_to_cloud(slices, task_id)
+            persistence_seconds = time.time() - persist_start
             
             # 4. 构建处理结果
             result = {
@@ -720,10 +878,15 @@ class IntelligentImageSlicer:
                     }
                     for s in slices
                 ],
-                'ready_for_analysis': True
+                'ready_for_analysis': True,
+                'timing': {
+                    'slicing_seconds': slicing_seconds,
+                    'persistence_seconds': persistence_seconds
+                }
             }
             
-            logger.info(f"图像切片处理完成 - 生成 {len(slices)} 个切片")
+            logger.info(f"图像切片处理完成 - 生成 {len(slices)} 个切片, "
+                        f"切片 {slicing_seconds:.2f}s, 持久化 {persistence_seconds:.2f}s")
             return result
             
         except Exception as e:
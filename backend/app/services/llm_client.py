@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享LLM调用客户端
+为各处的 chat.completions 调用提供统一的尾延迟控制：
+
+- 截止时间：按任务剩余预算（对齐Celery软超时）限制每次调用的超时
+- 重试：指数退避+抖动，遵循 Retry-After / retry-after-ms 响应头
+- 对冲：调用耗时超过该调用点的p95时，补发一个重复请求，取先返回者
+- 熔断：服务商持续异常时熔断，调用方据此降级到仅OCR路径
+- 指标：按调用点统计延迟直方图和重试/对冲/熔断计数
+"""
+
+import asyncio
+import contextvars
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class LLMCircuitOpenError(Exception):
+    """熔断器打开，拒绝LLM调用"""
+
+
+class LLMDeadlineExceeded(Exception):
+    """任务剩余预算不足以完成LLM调用"""
+
+
+# ---------------------------------------------------------------------------
+# 任务截止时间
+# ---------------------------------------------------------------------------
+
+_task_deadline: contextvars.ContextVar = contextvars.ContextVar("llm_task_deadline", default=None)
+
+
+def set_task_deadline(budget_seconds: Optional[float]):
+    """
+    设置LLM调用的任务截止时间（单调时钟），返回用于 clear_task_deadline 的令牌
+
+    asyncio任务和 asyncio.to_thread 会继承该上下文；嵌套时取更早的截止时间。
+    """
+    if not budget_seconds or budget_seconds <= 0:
+        return None
+    deadline = time.monotonic() + budget_seconds
+    current = _task_deadline.get()
+    return _task_deadline.set(min(deadline, current) if current else deadline)
+
+
+def clear_task_deadline(token):
+    if token is not None:
+        _task_deadline.reset(token)
+
+
+@contextmanager
+def llm_task_deadline(budget_seconds: Optional[float]):
+    """在上下文中设置LLM调用的任务截止时间"""
+    token = set_task_deadline(budget_seconds)
+    try:
+        yield
+    finally:
+        clear_task_deadline(token)
+
+
+def remaining_budget() -> Optional[float]:
+    """返回当前任务剩余预算（秒），未设置截止时间时返回None"""
+    deadline = _task_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+# ---------------------------------------------------------------------------
+# 延迟直方图
+# ---------------------------------------------------------------------------
+
+class LatencyHistogram:
+    """固定分桶的延迟直方图，并保留最近样本用于分位数估计"""
+
+    BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, float("inf"))
+
+    def __init__(self, recent_size: int = 200):
+        self.counts = [0] * len(self.BUCKETS)
+        self.total = 0
+        self.sum = 0.0
+        self._recent = deque(maxlen=recent_size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            for index, upper in enumerate(self.BUCKETS):
+                if seconds <= upper:
+                    self.counts[index] += 1
+                    break
+            self.total += 1
+            self.sum += seconds
+            self._recent.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._recent)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(q * (len(samples) - 1))))
+        return samples[index]
+
+    def sample_count(self) -> int:
+        with self._lock:
+            return len(self._recent)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            buckets = {("+Inf" if upper == float("inf") else str(upper)): count
+                       for upper, count in zip(self.BUCKETS, self.counts)}
+            total, total_sum = self.total, self.sum
+        return {
+            "count": total,
+            "sum": round(total_sum, 3),
+            "buckets": buckets,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99)
+        }
+
+
+# ---------------------------------------------------------------------------
+# 熔断器
+# ---------------------------------------------------------------------------
+
+class CircuitBreaker:
+    """
+    连续失败熔断器
+
+    closed: 正常放行；连续失败达到阈值后转为 open
+    open: 拒绝调用，冷却期结束后转为 half_open
+    half_open: 放行一次探测调用，成功则关闭，失败则重新打开
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown_seconds: float = 60.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_seconds = cooldown_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trip_count = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.cooldown_seconds:
+                    return False
+                self.state = "half_open"
+                self._probe_in_flight = False
+            # half_open：只放行一个探测请求
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def is_open(self) -> bool:
+        """熔断器是否处于拒绝状态（冷却期已过时视为可探测）"""
+        with self._lock:
+            return self.state == "open" and time.monotonic() - self.opened_at < self.cooldown_seconds
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info("✅ LLM熔断器恢复关闭")
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.trip_count += 1
+                    logger.warning(f"🔌 LLM熔断器打开: 连续失败 {self.consecutive_failures} 次，"
+                                   f"冷却 {self.cooldown_seconds:.0f}s")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def release_probe(self):
+        """未产生有效结论的调用，归还半开状态下的探测名额"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "trip_count": self.trip_count
+            }
+
+
+# ---------------------------------------------------------------------------
+# 共享LLM客户端
+# ---------------------------------------------------------------------------
+
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+_RETRYABLE_NAMES = {"APITimeoutError", "APIConnectionError", "RateLimitError",
+                    "InternalServerError", "TimeoutError", "ReadTimeout", "ConnectTimeout"}
+
+
+def _is_retryable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in _RETRYABLE_STATUS
+    return type(error).__name__ in _RETRYABLE_NAMES or isinstance(error, (TimeoutError, ConnectionError))
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """从错误响应头解析 Retry-After（秒数或HTTP日期）"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms:
+            return float(retry_after_ms) / 1000.0
+        retry_after = headers.get("retry-after")
+        if not retry_after:
+            return None
+        try:
+            return float(retry_after)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+class _CallSiteStats:
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.counters = {"calls": 0, "success": 0, "failures": 0, "retries": 0,
+                         "hedged": 0, "hedge_wins": 0, "circuit_rejected": 0, "deadline_exceeded": 0}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+        return {"latency": self.latency.snapshot(), **counters}
+
+
+class ResilientLLMClient:
+    """带截止时间、重试、对冲和熔断的LLM调用封装"""
+
+    def __init__(self,
+                 max_retries: int = 3,
+                 base_delay: float = 1.0,
+                 max_delay: float = 30.0,
+                 default_timeout: float = 120.0,
+                 min_attempt_seconds: float = 5.0,
+                 hedge_enabled: bool = False,
+                 hedge_min_samples: int = 20,
+                 hedge_max_workers: int = 8,
+                 breaker: CircuitBreaker = None):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.default_timeout = default_timeout
+        self.min_attempt_seconds = min_attempt_seconds
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self._stats: Dict[str, _CallSiteStats] = {}
+        self._stats_lock = threading.Lock()
+        self._hedge_executor = ThreadPoolExecutor(max_workers=hedge_max_workers,
+                                                  thread_name_prefix="llm-hedge")
+        # 按调用点共享的异步并发限流器：{call_site: (事件循环, 信号量)}
+        self._limiters: Dict[str, tuple] = {}
+        self._limiters_lock = threading.Lock()
+
+    # ----------------------------- 公共接口 -----------------------------
+
+    def create(self, client, call_site: str, hedge: bool = None, **request_kwargs):
+        """同步执行 chat.completions.create"""
+        return self.call(
+            call_site,
+            lambda timeout: self.with_timeout(client, timeout).chat.completions.create(**request_kwargs),
+            hedge=hedge
+        )
+
+    async def acreate(self, client, call_site: str, hedge: bool = None, **request_kwargs):
+        """异步执行 chat.completions.create（client 为 AsyncOpenAI）"""
+        return await self.acall(
+            call_site,
+            lambda timeout: self.with_timeout(client, timeout).chat.completions.create(**request_kwargs),
+            hedge=hedge
+        )
+
+    def call(self, call_site: str, func: Callable[[float], Any], hedge: bool = None):
+        """
+        同步执行任意LLM调用
+
+        Args:
+            call_site: 调用点名称（指标维度）
+            func: 接收本次尝试超时（秒）并执行调用的函数
+            hedge: 是否允许对冲（流式调用应关闭）
+        """
+        stats = self._get_stats(call_site)
+        stats.incr("calls")
+        attempt = 0
+        while True:
+            timeout = self._attempt_timeout(call_site, stats)
+            started = time.monotonic()
+            try:
+                if self._should_hedge(hedge, stats):
+                    result = self._call_hedged(func, timeout, stats)
+                else:
+                    result = func(timeout)
+            except Exception as e:
+                delay = self._handle_failure(call_site, stats, e, attempt)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._record_success(stats, time.monotonic() - started)
+            return result
+
+    async def acall(self, call_site: str, func: Callable[[float], Any], hedge: bool = None):
+        """异步执行任意LLM调用（func 返回协程）"""
+        stats = self._get_stats(call_site)
+        stats.incr("calls")
+        attempt = 0
+        while True:
+            timeout = self._attempt_timeout(call_site, stats)
+            started = time.monotonic()
+            try:
+                if self._should_hedge(hedge, stats):
+                    result = await self._acall_hedged(func, timeout, stats)
+                else:
+                    result = await asyncio.wait_for(func(timeout), timeout=timeout)
+            except Exception as e:
+                delay = self._handle_failure(call_site, stats, e, attempt)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self._record_success(stats, time.monotonic() - started)
+            return result
+
+    @staticmethod
+    def with_timeout(client, timeout: float):
+        """禁用SDK内置重试并设置本次超时，由本封装统一重试"""
+        with_options = getattr(client, "with_options", None)
+        if callable(with_options):
+            return with_options(timeout=timeout, max_retries=0)
+        return client
+
+    def concurrency_limiter(self, call_site: str, max_concurrency: int) -> asyncio.Semaphore:
+        """
+        获取调用点在当前事件循环上共享的并发限流器
+
+        同一进程内所有使用该调用点的分析器共用一个信号量；事件循环更换时重建。
+        """
+        loop = asyncio.get_running_loop()
+        with self._limiters_lock:
+            entry = self._limiters.get(call_site)
+            if entry is None or entry[0] is not loop:
+                entry = (loop, asyncio.Semaphore(max(1, max_concurrency)))
+                self._limiters[call_site] = entry
+            return entry[1]
+
+    def reset_limiters(self):
+        """丢弃所有并发限流器（测试或配置变更后使用）"""
+        with self._limiters_lock:
+            self._limiters.clear()
+
+    def is_degraded(self) -> bool:
+        """服务商是否处于熔断状态（调用方据此走仅OCR路径）"""
+        return self.breaker.is_open()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """导出各调用点的延迟直方图和计数"""
+        with self._stats_lock:
+            sites = dict(self._stats)
+        return {
+            "circuit_breaker": self.breaker.snapshot(),
+            "call_sites": {name: stats.snapshot() for name, stats in sites.items()}
+        }
+
+    def log_metrics_summary(self):
+        for name, snapshot in self.get_metrics()["call_sites"].items():
+            latency = snapshot["latency"]
+            logger.info(
+                f"📈 LLM调用点 {name}: 调用 {snapshot['calls']} 次, 成功 {snapshot['success']}, "
+                f"重试 {snapshot['retries']}, 对冲 {snapshot['hedged']}(胜 {snapshot['hedge_wins']}), "
+                f"p50={latency['p50']} p95={latency['p95']} p99={latency['p99']}"
+            )
+
+    # ----------------------------- 内部实现 -----------------------------
+
+    def _get_stats(self, call_site: str) -> _CallSiteStats:
+        with self._stats_lock:
+            stats = self._stats.get(call_site)
+            if stats is None:
+                stats = self._stats[call_site] = _CallSiteStats()
+            return stats
+
+    def _attempt_timeout(self, call_site: str, stats: _CallSiteStats) -> float:
+        if not self.breaker.allow_request():
+            stats.incr("circuit_rejected")
+            raise LLMCircuitOpenError(f"LLM熔断器打开，拒绝调用: {call_site}")
+        remaining = remaining_budget()
+        if remaining is None:
+            return self.default_timeout
+        if remaining < self.min_attempt_seconds:
+            stats.incr("deadline_exceeded")
+            # 未实际发出请求，释放半开状态下的探测名额
+            self.breaker.release_probe()
+            raise LLMDeadlineExceeded(f"任务剩余预算 {remaining:.1f}s 不足，跳过调用: {call_site}")
+        return min(self.default_timeout, remaining)
+
+    def _should_hedge(self, hedge: Optional[bool], stats: _CallSiteStats) -> bool:
+        enabled = self.hedge_enabled if hedge is None else hedge
+        return enabled and stats.latency.sample_count() >= self.hedge_min_samples
+
+    def _handle_failure(self, call_site: str, stats: _CallSiteStats, error: Exception, attempt: int) -> float:
+        """
+        记录失败并返回重试前的等待时间；不可重试时直接抛出
+
+        只有最终失败（不再重试）且非限流的错误才计入熔断器，重试中的单次失败和429不计。
+        """
+        retryable = _is_retryable(error)
+        if not retryable or attempt >= self.max_retries:
+            stats.incr("failures")
+            self._record_terminal_failure(error, retryable)
+            raise error
+
+        delay = _retry_after_seconds(error)
+        if delay is None:
+            delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+            delay = random.uniform(0, delay)  # full jitter
+
+        remaining = remaining_budget()
+        if remaining is not None and delay + self.min_attempt_seconds > remaining:
+            stats.incr("failures")
+            stats.incr("deadline_exceeded")
+            self._record_terminal_failure(error, retryable)
+            raise LLMDeadlineExceeded(f"重试等待 {delay:.1f}s 超出任务剩余预算: {call_site}") from error
+
+        stats.incr("retries")
+        logger.warning(f"⚠️ LLM调用 {call_site} 失败 (尝试 {attempt + 1}/{self.max_retries + 1}): "
+                       f"{error}，{delay:.1f}s 后重试")
+        return delay
+
+    def _record_terminal_failure(self, error: Exception, retryable: bool):
+        if retryable and not _is_rate_limited(error):
+            self.breaker.record_failure()
+        else:
+            # 客户端错误和限流不代表服务商退化，释放探测名额
+            self.breaker.release_probe()
+
+    def _record_success(self, stats: _CallSiteStats, latency: float):
+        self.breaker.record_success()
+        stats.latency.observe(latency)
+        stats.incr("success")
+
+    def _call_hedged(self, func: Callable[[float], Any], timeout: float, stats: _CallSiteStats):
+        hedge_delay = stats.latency.percentile(0.95)
+        started = time.monotonic()
+        primary = self._hedge_executor.submit(contextvars.copy_context().run, func, timeout)
+        done, _ = wait([primary], timeout=hedge_delay)
+        if done:
+            return primary.result()
+
+        stats.incr("hedged")
+        hedge_timeout = max(self.min_attempt_seconds, timeout - (time.monotonic() - started))
+        secondary = self._hedge_executor.submit(contextvars.copy_context().run, func, hedge_timeout)
+        pending = {primary, secondary}
+        last_error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, timeout - (time.monotonic() - started)),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f"对冲调用超时 ({timeout:.1f}s)")
+            for future in done:
+                if future.exception() is None:
+                    if future is secondary:
+                        stats.incr("hedge_wins")
+                    return future.result()
+                last_error = future.exception()
+        raise last_error
+
+    async def _acall_hedged(self, func: Callable[[float], Any], timeout: float, stats: _CallSiteStats):
+        hedge_delay = stats.latency.percentile(0.95)
+        started = time.monotonic()
+        primary = asyncio.ensure_future(func(timeout))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+        if done:
+            return primary.result()
+
+        stats.incr("hedged")
+        hedge_timeout = max(self.min_attempt_seconds, timeout - (time.monotonic() - started))
+        secondary = asyncio.ensure_future(func(hedge_timeout))
+        pending = {primary, secondary}
+        last_error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, timeout - (time.monotonic() - started)),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise asyncio.TimeoutError(f"对冲调用超时 ({timeout:.1f}s)")
+                for task in done:
+                    if task.exception() is None:
+                        if task is secondary:
+                            stats.incr("hedge_wins")
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+def _build_default_client() -> ResilientLLMClient:
+    try:
+        from app.core.config import settings
+        return ResilientLLMClient(
+            max_retries=settings.LLM_MAX_RETRIES,
+            default_timeout=settings.LLM_CALL_TIMEOUT,
+            hedge_enabled=settings.LLM_HEDGE_ENABLED,
+            breaker=CircuitBreaker(
+                failure_threshold=settings.LLM_BREAKER_FAILURE_THRESHOLD,
+                cooldown_seconds=settings.LLM_BREAKER_COOLDOWN
+            )
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ 读取LLM客户端配置失败，使用默认值: {e}")
+        return ResilientLLMClient()
+
+
+# 全局实例
+llm_client = _build_default_client()
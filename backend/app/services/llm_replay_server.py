@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地LLM录制/回放替身服务
+提供与OpenAI兼容的 /v1/chat/completions 接口，用于离线压测和回归测试：
+
+- record 模式：将请求转发到真实OpenAI接口，并把请求/响应对写入录制文件（cassette）
+- replay 模式：按请求内容确定性地回放录制的响应，可注入延迟、抖动、429和超时
+
+录制文件也可由 OpenAIInteractionLogger 保存的会话记录导入（见 import_interaction_logs）。
+
+使用示例:
+    python -m app.services.llm_replay_server --mode replay --cassette llm_cassettes/pipeline.jsonl \\
+        --latency 1.5 --jitter 0.5 --rate-429 0.05 --rate-timeout 0.01
+
+    # 在 .env 中将客户端指向替身服务
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_UPSTREAM = "https://api.openai.com/v1"
+
+
+def normalize_request(request_body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    规范化请求用于匹配：只保留模型和消息，图像内容以摘要代替
+    （交互记录中的图像仅保留元信息，因此图像不参与精确匹配）
+    """
+    messages = []
+    for message in request_body.get("messages", []):
+        content = message.get("content", "")
+        if isinstance(content, list):
+            normalized_content = []
+            for item in content:
+                if isinstance(item, dict) and item.get("type") == "image_url":
+                    normalized_content.append({"type": "image_url"})
+                elif isinstance(item, dict) and item.get("type") == "text":
+                    normalized_content.append({"type": "text", "text": item.get("text", "")})
+            content = normalized_content
+        messages.append({"role": message.get("role"), "content": content})
+    return {"model": request_body.get("model", ""), "messages": messages}
+
+
+def request_key(request_body: Dict[str, Any]) -> str:
+    """计算请求的匹配键"""
+    canonical = json.dumps(normalize_request(request_body), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """录制文件：每行一条 {key, request, response, latency, recorded_at}"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.entries: List[Dict[str, Any]] = []
+        self._by_key: Dict[str, List[Dict[str, Any]]] = {}
+        self._replay_counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        self.entries = []
+        self._by_key = {}
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    self._index(json.loads(line))
+        logger.info(f"📼 载入录制文件: {self.path} ({len(self.entries)} 条)")
+
+    def _index(self, entry: Dict[str, Any]):
+        self.entries.append(entry)
+        self._by_key.setdefault(entry["key"], []).append(entry)
+
+    def append(self, request_body: Dict[str, Any], response_body: Dict[str, Any], latency: float):
+        entry = {
+            "key": request_key(request_body),
+            "request": normalize_request(request_body),
+            "response": response_body,
+            "latency": round(latency, 3),
+            "recorded_at": time.time()
+        }
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._index(entry)
+        return entry
+
+    def match(self, request_body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        确定性匹配：按请求键精确匹配（同键多条时按调用次数轮转），
+        未命中时返回None，不以其他请求的录制代替
+        """
+        key = request_key(request_body)
+        with self._lock:
+            candidates = self._by_key.get(key)
+            if not candidates:
+                return None
+            index = self._replay_counters.get(key, 0)
+            self._replay_counters[key] = index + 1
+            return candidates[index % len(candidates)]
+
+
+def import_interaction_logs(log_paths: List[str], cassette: Cassette) -> int:
+    """
+    从 OpenAIInteractionLogger 保存的会话记录导入请求/响应对
+
+    会话记录中 api_calls 的每一项需包含 request_data 和 response_data
+    """
+    imported = 0
+    for log_path in log_paths:
+        with open(log_path, "r", encoding="utf-8") as f:
+            session = json.load(f)
+        for call in session.get("api_calls", []):
+            request_data = call.get("request_data") or {}
+            response_data = call.get("response_data") or {}
+            content = response_data.get("content")
+            if not request_data.get("messages") or content is None:
+                continue
+            cassette.append(
+                request_data,
+                _build_completion(request_data.get("model", ""), content,
+                                  response_data.get("finish_reason", "stop")),
+                call.get("duration_seconds", 0.0)
+            )
+            imported += 1
+    logger.info(f"📥 从交互记录导入 {imported} 条请求/响应")
+    return imported
+
+
+def _build_completion(model: str, content: str, finish_reason: str = "stop") -> Dict[str, Any]:
+    return {
+        "id": f"chatcmpl-replay-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": finish_reason
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    }
+
+
+class ReplayConfig:
+    """回放故障注入配置"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, use_recorded_latency: bool = False,
+                 rate_429: float = 0.0, rate_timeout: float = 0.0, timeout_seconds: float = 120.0,
+                 seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.use_recorded_latency = use_recorded_latency
+        self.rate_429 = rate_429
+        self.rate_timeout = rate_timeout
+        self.timeout_seconds = timeout_seconds
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self, recorded_latency: float) -> Dict[str, Any]:
+        with self._lock:
+            roll = self.random.random()
+            jitter = self.random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        base = recorded_latency if self.use_recorded_latency else self.latency
+        if roll < self.rate_429:
+            fault = "429"
+        elif roll < self.rate_429 + self.rate_timeout:
+            fault = "timeout"
+        else:
+            fault = None
+        return {"delay": max(0.0, base + jitter), "fault": fault}
+
+
+class LLMReplayServer:
+    """OpenAI兼容的录制/回放HTTP服务"""
+
+    def __init__(self, mode: str, cassette: Cassette, replay_config: ReplayConfig = None,
+                 upstream_url: str = DEFAULT_UPSTREAM, upstream_api_key: str = "",
+                 host: str = "127.0.0.1", port: int = 8765, strict: bool = False):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"不支持的模式: {mode}")
+        self.mode = mode
+        self.cassette = cassette
+        self.replay_config = replay_config or ReplayConfig()
+        self.upstream_url = upstream_url.rstrip("/")
+        self.upstream_api_key = upstream_api_key
+        # 严格模式：回放未命中即视为回归失败，停止服务并以非零状态退出
+        self.strict = strict
+        self.stats = {"requests": 0, "replayed": 0, "recorded": 0, "misses": 0,
+                      "injected_429": 0, "injected_timeout": 0}
+        self._stats_lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+
+    def serve_forever(self):
+        host, port = self.httpd.server_address[:2]
+        logger.info(f"🚀 LLM替身服务启动 ({self.mode}): http://{host}:{port}/v1")
+        self.httpd.serve_forever()
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def handle_chat_completion(self, request_body: Dict[str, Any], auth_header: str) -> Dict[str, Any]:
+        """处理一次chat completion请求，返回 {status, body, delay}"""
+        self._count("requests")
+
+        if self.mode == "record":
+            start = time.time()
+            status, response_body = self._forward_upstream(request_body, auth_header)
+            if status == 200:
+                self.cassette.append(request_body, response_body, time.time() - start)
+                self._count("recorded")
+            return {"status": status, "body": response_body, "delay": 0.0}
+
+        entry = self.cassette.match(request_body)
+        if entry is None:
+            self._count("misses")
+            key = request_key(request_body)
+            logger.warning(f"⚠️ 回放未命中: model={request_body.get('model', '')} key={key[:12]}")
+            if self.strict:
+                logger.error("❌ 严格模式下回放未命中，停止服务")
+                threading.Thread(target=self.httpd.shutdown, daemon=True).start()
+            return {"status": 404, "delay": 0.0,
+                    "body": {"error": {"message": f"录制文件中没有匹配的请求: {key}", "type": "replay_miss"}}}
+
+        sampled = self.replay_config.sample(entry.get("latency", 0.0))
+        if sampled["fault"] == "429":
+            self._count("injected_429")
+            return {"status": 429, "delay": sampled["delay"], "retry_after": 1,
+                    "body": {"error": {"message": "Rate limit reached (injected)",
+                                       "type": "rate_limit_exceeded"}}}
+        if sampled["fault"] == "timeout":
+            self._count("injected_timeout")
+            return {"status": 504, "delay": self.replay_config.timeout_seconds,
+                    "body": {"error": {"message": "Upstream timeout (injected)", "type": "timeout"}}}
+
+        self._count("replayed")
+        response_body = dict(entry["response"])
+        response_body["model"] = request_body.get("model", response_body.get("model"))
+        return {"status": 200, "body": response_body, "delay": sampled["delay"]}
+
+    def _forward_upstream(self, request_body: Dict[str, Any], auth_header: str):
+        upstream_body = dict(request_body)
+        # 录制时统一以非流式请求上游，流式响应由替身服务合成
+        upstream_body.pop("stream", None)
+        upstream_body.pop("stream_options", None)
+        headers = {"Content-Type": "application/json"}
+        if self.upstream_api_key:
+            headers["Authorization"] = f"Bearer {self.upstream_api_key}"
+        elif auth_header:
+            headers["Authorization"] = auth_header
+
+        request = urllib.request.Request(
+            f"{self.upstream_url}/chat/completions",
+            data=json.dumps(upstream_body).encode("utf-8"),
+            headers=headers,
+            method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=300) as response:
+                return response.status, json.loads(response.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            try:
+                return e.code, json.loads(e.read().decode("utf-8"))
+            except Exception:
+                return e.code, {"error": {"message": str(e)}}
+        except Exception as e:
+            logger.error(f"❌ 上游请求失败: {e}")
+            return 502, {"error": {"message": str(e), "type": "upstream_error"}}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                logger.debug("replay-server: " + format % args)
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/models"):
+                    models = sorted({e["request"].get("model", "") for e in server.cassette.entries})
+                    self._send_json(200, {"object": "list", "data": [
+                        {"id": m, "object": "model", "owned_by": "replay"} for m in models if m
+                    ]})
+                elif self.path.rstrip("/").endswith("/stats"):
+                    self._send_json(200, dict(server.stats))
+                else:
+                    self._send_json(404, {"error": {"message": "not found"}})
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    request_body = json.loads(self.rfile.read(length).decode("utf-8"))
+                except json.JSONDecodeError:
+                    self._send_json(400, {"error": {"message": "invalid JSON body"}})
+                    return
+
+                result = server.handle_chat_completion(request_body, self.headers.get("Authorization", ""))
+                if result["delay"]:
+                    time.sleep(result["delay"])
+
+                extra_headers = {}
+                if result.get("retry_after"):
+                    extra_headers["Retry-After"] = str(result["retry_after"])
+
+                if result["status"] == 200 and request_body.get("stream"):
+                    self._send_stream(result["body"])
+                else:
+                    self._send_json(result["status"], result["body"], extra_headers)
+
+            def _send_json(self, status: int, body: Dict[str, Any], extra_headers: Dict[str, str] = None):
+                payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (extra_headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_stream(self, completion: Dict[str, Any], piece_size: int = 16):
+                """将完整响应拆分为SSE增量块"""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                choice = (completion.get("choices") or [{}])[0]
+                content = (choice.get("message") or {}).get("content") or ""
+                base = {"id": completion.get("id"), "object": "chat.completion.chunk",
+                        "created": completion.get("created"), "model": completion.get("model")}
+
+                def emit(delta: Dict[str, Any], finish_reason=None):
+                    chunk = dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": finish_reason}])
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+                emit({"role": "assistant", "content": ""})
+                for start in range(0, len(content), piece_size):
+                    emit({"content": content[start:start + piece_size]})
+                emit({}, choice.get("finish_reason", "stop"))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="本地LLM录制/回放替身服务")
+    parser.add_argument("--mode", choices=["record", "replay"], default="replay")
+    parser.add_argument("--cassette", default="llm_cassettes/default.jsonl", help="录制文件路径(JSONL)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--upstream", default=DEFAULT_UPSTREAM, help="record模式的上游接口地址")
+    parser.add_argument("--upstream-api-key", default="", help="record模式的上游API Key（缺省透传请求头）")
+    parser.add_argument("--latency", type=float, default=0.0, help="回放基础延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟抖动幅度（秒）")
+    parser.add_argument("--recorded-latency", action="store_true", help="使用录制时的真实延迟")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="注入429的概率")
+    parser.add_argument("--rate-timeout", type=float, default=0.0, help="注入超时的概率")
+    parser.add_argument("--timeout-seconds", type=float, default=120.0, help="注入超时的挂起时长")
+    parser.add_argument("--seed", type=int, default=None, help="故障注入随机种子")
+    parser.add_argument("--strict", action="store_true", help="回放未命中时停止服务并以非零状态退出")
+    parser.add_argument("--import-logs", nargs="*", default=[], help="导入OpenAIInteractionLogger会话记录")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    cassette = Cassette(args.cassette)
+    if args.import_logs:
+        import_interaction_logs(args.import_logs, cassette)
+
+    server = LLMReplayServer(
+        mode=args.mode,
+        cassette=cassette,
+        replay_config=ReplayConfig(
+            latency=args.latency, jitter=args.jitter, use_recorded_latency=args.recorded_latency,
+            rate_429=args.rate_429, rate_timeout=args.rate_timeout,
+            timeout_seconds=args.timeout_seconds, seed=args.seed
+        ),
+        upstream_url=args.upstream,
+        upstream_api_key=args.upstream_api_key,
+        host=args.host,
+        port=args.port,
+        strict=args.strict
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.httpd.server_close()
+    logger.info(f"🛑 LLM替身服务停止，统计: {server.stats}")
+    if args.strict and server.stats["misses"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
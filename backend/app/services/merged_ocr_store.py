@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合并OCR结果本地存储
+在进程内保存合并后的PaddleOCR结果，供OCRResultCorrector直接读取；
+对象存储的持久化在后台线程中完成，不阻塞OCR→纠正的关键路径，存储键仍用于审计追溯
+"""
+
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from typing import Dict, Any, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class MergedOCRResultStore:
+    """进程内合并OCR结果存储（按存储键索引）"""
+
+    def __init__(self, max_workers: int = 2):
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._futures: Dict[str, Future] = {}
+        self._task_keys: Dict[Optional[str], Set[str]] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="merged-ocr-persist")
+
+    def put(self, s3_key: str, data: Dict[str, Any]):
+        """登记合并结果，后续可通过存储键在本地解析"""
+        with self._lock:
+            self._results[s3_key] = data
+
+    def resolve(self, s3_key: str) -> Optional[Dict[str, Any]]:
+        """优先从本地解析存储键，未命中时返回None"""
+        with self._lock:
+            return self._results.get(s3_key)
+
+    def release(self, s3_key: str):
+        """释放本地缓存（持久化任务不受影响）"""
+        with self._lock:
+            self._results.pop(s3_key, None)
+
+    def persist_async(self, s3_key: str, data: Dict[str, Any], storage_service=None,
+                      task_id: str = None) -> Future:
+        """在后台线程中序列化并上传合并结果（按任务登记，供 wait_pending 等待）"""
+        future = self._executor.submit(self._persist, s3_key, data, storage_service)
+        with self._lock:
+            self._futures[s3_key] = future
+            self._task_keys.setdefault(task_id, set()).add(s3_key)
+        return future
+
+    def wait_persisted(self, s3_key: str, timeout: float = 30.0) -> bool:
+        """等待指定存储键上传完成，仅上传成功时返回True（调用方据此决定是否记录存储键）"""
+        with self._lock:
+            future = self._futures.get(s3_key)
+        if future is None:
+            return False
+        done, _ = wait([future], timeout=timeout)
+        if not done:
+            logger.warning(f"⚠️ 合并OCR结果 {timeout:.0f}s 内未完成持久化: {s3_key}")
+            return False
+        try:
+            return bool(future.result().get("success"))
+        except Exception:
+            return False
+
+    def wait_pending(self, task_id: str = None, timeout: float = 30.0) -> bool:
+        """等待指定任务提交的持久化任务（任务结束前调用，避免worker退出时丢失）"""
+        with self._lock:
+            keys = self._task_keys.pop(task_id, set())
+            futures = [self._futures.pop(key) for key in keys if key in self._futures]
+        futures = [f for f in futures if not f.done()]
+        if not futures:
+            return True
+        done, not_done = wait(futures, timeout=timeout)
+        if not_done:
+            logger.warning(f"⚠️ 任务 {task_id} 仍有 {len(not_done)} 个合并OCR结果未完成持久化")
+        return not not_done
+
+    @staticmethod
+    def _persist(s3_key: str, data: Dict[str, Any], storage_service=None) -> Dict[str, Any]:
+        try:
+            if storage_service is None:
+                from app.services.dual_storage_service import DualStorageService
+                storage_service = DualStorageService()
+
+            # 紧凑序列化，无缩进
+            content = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+            result = storage_service.upload_content_sync(
+                content=content,
+                s3_key=s3_key,
+                content_type="application/json"
+            )
+            if result.get("success"):
+                logger.info(f"✅ 合并OCR结果已后台保存: {s3_key}")
+            else:
+                logger.error(f"❌ 合并OCR结果后台保存失败: {result.get('error')}")
+            return result
+        except Exception as e:
+            logger.error(f"❌ 合并OCR结果后台保存异常: {e}", exc_info=True)
+            return {"success": False, "error": str(e)}
+
+
+# 全局实例
+merged_ocr_store = MergedOCRResultStore()
@@ -24,6 +24,8 @@ except ImportError:
     PaddleOCR = None
 
 from app.core.config import settings
+from app.services.result_mergers.text_layout import compute_layout, layout_boxes
+from app.services.page_raster import load_page_array, to_model_bgr
 from app.utils.image_processing import correct_skew, enhance_image, calculate_image_clarity
 
 # 导入图像预处理器
@@ -167,7 +169,8 @@ class PaddleOCRService:
             try:
                 # 修复: 使用正确的PaddleOCR API
                 # PaddleOCR的ocr方法返回格式: [[[x1,y1], [x2,y2], [x3,y3], [x4,y4]], (text, confidence)]
-                ocr_result = self.ocr.ocr(str(image_file), rec=True)
+                # 页面按紧凑栅格模式读取，只在模型调用边界展开为三通道BGR
+                ocr_result = self.ocr.ocr(to_model_bgr(load_page_array(str(image_file))), rec=True)
 
                 if ocr_result is None or not ocr_result:
                     logger.warning("OCR detection returned no results.")
@@ -727,32 +730,24 @@ class PaddleOCRService:
             lines.append("纯文本内容:")
             lines.append("-"*40)
             
-            # 添加纯文本内容（按位置从上到下，从左到右排序）
-            text_with_positions = []
+            # 添加纯文本内容（版面分析的阅读顺序，同一行的文本以空格拼接）
+            regions, texts = [], []
             for line in actual_results:
-                if line and len(line) > 1:
-                    try:
-                        points, (text, confidence) = line
-                        y_coords = [p[1] for p in points]
-                        x_coords = [p[0] for p in points]
-                        avg_y = sum(y_coords) / len(y_coords)
-                        avg_x = sum(x_coords) / len(x_coords)
-                        text_with_positions.append((avg_y, avg_x, text))
-                    except:
-                        continue
-            
-            # 按Y坐标排序（从上到下），然后按X坐标排序（从左到右）
-            text_with_positions.sort(key=lambda x: (x[0], x[1]))
-            
-            for _, _, text in text_with_positions:
-                lines.append(text)
+                try:
+                    points, (text, confidence) = line
+                except (TypeError, ValueError):
+                    points, text = None, ''
+                regions.append({'bbox': points})
+                texts.append(text or '')
+            layout = compute_layout(layout_boxes(regions))
+            lines.extend(layout.row_texts(texts))
             
             lines.append("")
             lines.append("="*60)
             lines.append("说明:")
             lines.append("- 文本按置信度从高到低排序")
             lines.append("- 位置坐标为像素坐标系")
-            lines.append("- 纯文本内容按图像位置从上到下、从左到右排序")
+            lines.append("- 纯文本内容按图像位置从上到下、从左到右排序，同一行的文本合并为一行")
             lines.append("="*60)
             
             return "\n".join(lines)
@@ -19,6 +19,7 @@ import uuid
 from app.services.intelligent_image_slicer import IntelligentImageSlicer, SliceInfo
 from app.services.ocr.paddle_ocr import PaddleOCRService
 from app.services.dual_storage_service import DualStorageService
+from app.services.result_mergers.text_similarity import text_similarity
 
 logger = logging.getLogger(__name__)
 
@@ -465,18 +466,8 @@ class PaddleOCRWithSlicing:
         return deduplicated
     
     def _calculate_text_similarity(self, text1: str, text2: str) -> float:
-        """计算文本相似度"""
-        if not text1 or not text2:
-            return 0.0
-        
-        # 简单的字符级相似度计算
-        set1 = set(text1)
-        set2 = set(text2)
-        
-        intersection = len(set1 & set2)
-        union = len(set1 | set2)
-        
-        return intersection / union if union > 0 else 0.0
+        """计算文本相似度（有界编辑距离，低于0.5的相似度不参与重复判定，直接返回0）"""
+        return text_similarity(text1, text2, min_similarity=0.5)
     
     def _calculate_bbox_overlap(self, bbox1: List[int], bbox2: List[int]) -> float:
         """计算边界框重叠率"""
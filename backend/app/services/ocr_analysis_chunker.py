@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR分析分块器
+用于超大图纸的GPT分析map-reduce：按空间区域划分合并后的OCR文本行，
+按token预算自适应分块，并对各块的 component_list / global_notes 结果做确定性合并
+"""
+
+import logging
+import re
+from typing import Dict, List, Any
+
+logger = logging.getLogger(__name__)
+
+# 本地tokenizer（可选依赖）
+try:
+    import tiktoken
+    _TOKEN_ENCODER = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _TOKEN_ENCODER = None
+
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]')
+
+def estimate_tokens(text: str) -> int:
+    """估算文本token数：优先使用tiktoken，否则按中文1字1token、其余4字符1token估算"""
+    if not text:
+        return 0
+    if _TOKEN_ENCODER is not None:
+        try:
+            return len(_TOKEN_ENCODER.encode(text))
+        except Exception:
+            pass
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    return cjk_count + (len(text) - cjk_count + 3) // 4
+
+
+class OCRAnalysisChunker:
+    """按空间区域和token预算划分OCR文本行"""
+
+    # 标题栏通常位于图纸右下角
+    TITLE_BLOCK_X_RATIO = 0.7
+    TITLE_BLOCK_Y_RATIO = 0.75
+
+    def __init__(self, token_budget: int = 6000):
+        self.token_budget = max(200, token_budget)
+
+    def needs_chunking(self, plain_text: str) -> bool:
+        """判断全文是否超出单次调用的token预算"""
+        return estimate_tokens(plain_text) > self.token_budget
+
+    def partition(self, lines: List[Dict[str, Any]],
+                  image_info: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """
+        将文本行划分为若干块
+
+        Args:
+            lines: 文本行列表，每行包含 text, x1, y1, x2, y2
+            image_info: 原图信息（width/height），缺省时由文本行范围推算
+
+        Returns:
+            分块列表，标题栏块在前，正文块按从上到下、从左到右排列
+        """
+        if not lines:
+            return []
+
+        width = (image_info or {}).get("width") or max(l["x2"] for l in lines)
+        height = (image_info or {}).get("height") or max(l["y2"] for l in lines)
+
+        title_lines, body_lines = [], []
+        for line in lines:
+            if (line["x1"] >= width * self.TITLE_BLOCK_X_RATIO
+                    and line["y1"] >= height * self.TITLE_BLOCK_Y_RATIO):
+                title_lines.append(line)
+            else:
+                body_lines.append(line)
+
+        # 每行token数只估算一次（按对象身份缓存，不写入调用方的行数据）
+        line_tokens = {id(line): estimate_tokens(line["text"]) + 1 for line in lines}
+
+        chunks = []
+        # 标题栏单独成块，超预算时同样继续切分
+        for region_lines in self._split_by_budget(title_lines, line_tokens):
+            chunks.append(self._make_chunk(region_lines, "title_block"))
+        for region_lines in self._split_by_budget(body_lines, line_tokens):
+            chunks.append(self._make_chunk(region_lines, "body"))
+
+        for index, chunk in enumerate(chunks):
+            chunk["chunk_id"] = index
+            chunk["chunk_count"] = len(chunks)
+
+        logger.info(f"🧩 OCR文本分块完成: {len(lines)} 行 -> {len(chunks)} 块 "
+                    f"(预算 {self.token_budget} tokens)")
+        return chunks
+
+    def _split_by_budget(self, lines: List[Dict[str, Any]],
+                         line_tokens: Dict[int, int]) -> List[List[Dict[str, Any]]]:
+        """沿较长边在中位数处递归二分，直到每块不超过token预算"""
+        if not lines:
+            return []
+
+        total_tokens = sum(line_tokens[id(l)] for l in lines)
+        if total_tokens <= self.token_budget or len(lines) == 1:
+            return [lines]
+
+        x_span = max(l["x2"] for l in lines) - min(l["x1"] for l in lines)
+        y_span = max(l["y2"] for l in lines) - min(l["y1"] for l in lines)
+        if x_span > y_span:
+            ordered = sorted(lines, key=lambda l: ((l["x1"] + l["x2"]) / 2, l["y1"]))
+        else:
+            ordered = sorted(lines, key=lambda l: ((l["y1"] + l["y2"]) / 2, l["x1"]))
+
+        mid = len(ordered) // 2
+        return (self._split_by_budget(ordered[:mid], line_tokens)
+                + self._split_by_budget(ordered[mid:], line_tokens))
+
+    def _make_chunk(self, lines: List[Dict[str, Any]], region: str) -> Dict[str, Any]:
+        # 块内恢复阅读顺序
+        ordered = sorted(lines, key=lambda l: (l["y1"], l["x1"]))
+        text = '\n'.join(l["text"] for l in ordered)
+        return {
+            "region": region,
+            "bbox": [
+                min(l["x1"] for l in ordered), min(l["y1"] for l in ordered),
+                max(l["x2"] for l in ordered), max(l["y2"] for l in ordered)
+            ],
+            "line_count": len(ordered),
+            "text": text,
+            "token_count": estimate_tokens(text)
+        }
+
+
+def merge_chunk_results(chunk_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    确定性合并各块分析结果
+
+    - drawing_basic_info: 按块顺序（标题栏优先）取第一个非空值
+    - component_list: 按规范化构件编号去重，字段取先出现的非空值
+    - global_notes: 按内容去重，保持出现顺序
+    """
+    ordered_results = sorted(
+        (r for r in chunk_results if isinstance(r, dict)),
+        key=lambda r: (0 if r.get("_region") == "title_block" else 1, r.get("_chunk_id", 0))
+    )
+
+    drawing_info: Dict[str, Any] = {}
+    components: Dict[str, Dict[str, Any]] = {}
+    component_order: List[str] = []
+    notes: List[Dict[str, Any]] = []
+    seen_notes = set()
+
+    for result in ordered_results:
+        for key, value in (result.get("drawing_basic_info") or {}).items():
+            if value not in (None, "", [], {}) and key not in drawing_info:
+                drawing_info[key] = value
+
+        for component in result.get("component_list") or []:
+            if not isinstance(component, dict):
+                continue
+            comp_key = _normalize_component_id(component.get("component_id", ""))
+            if not comp_key:
+                comp_key = f"_anonymous_{len(component_order)}"
+            existing = components.get(comp_key)
+            if existing is None:
+                merged = dict(component)
+                merged["source_chunks"] = [result.get("_chunk_id")]
+                components[comp_key] = merged
+                component_order.append(comp_key)
+                continue
+            for field, value in component.items():
+                if value not in (None, "", [], {}) and existing.get(field) in (None, "", [], {}):
+                    existing[field] = value
+            if result.get("_chunk_id") not in existing["source_chunks"]:
+                existing["source_chunks"].append(result.get("_chunk_id"))
+
+        for note in result.get("global_notes") or []:
+            if isinstance(note, str):
+                note = {"note_type": "说明", "content": note, "importance": "medium"}
+            if not isinstance(note, dict):
+                continue
+            note_key = re.sub(r'\s+', '', str(note.get("content", "")))
+            if note_key and note_key not in seen_notes:
+                seen_notes.add(note_key)
+                notes.append(note)
+
+    return {
+        "drawing_basic_info": drawing_info,
+        "component_list": [components[k] for k in component_order],
+        "global_notes": notes
+    }
+
+
+def _normalize_component_id(component_id: Any) -> str:
+    return re.sub(r'[\s\-_]+', '', str(component_id or "")).upper()
@@ -8,14 +8,24 @@ OCR结果智能纠正服务
 
 import json
 import time
+import asyncio
 import logging
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, asdict
 import re
 from pathlib import Path
 
+from app.services.merged_ocr_store import merged_ocr_store
+from app.services.result_mergers.text_layout import TextLayout, compute_layout, layout_boxes, layout_for
+from app.services.ocr_analysis_chunker import OCRAnalysisChunker, merge_chunk_results
+from app.services.llm_client import llm_client
+from app.utils.analysis_optimizations import GPTResponseParser
+
 logger = logging.getLogger(__name__)
 
+# 分块分析响应无法解析为JSON时的重试次数
+CHUNK_PARSE_RETRIES = 1
+
 @dataclass
 class CorrectedOCRResult:
     """纠正后的OCR结果"""
@@ -112,15 +122,17 @@ class OCRResultCorrector:
                                merged_ocr_key: str, 
                                drawing_id: int, 
                                task_id: str,
-                               original_image_info: Dict[str, Any] = None) -> CorrectedOCRResult:
+                               original_image_info: Dict[str, Any] = None,
+                               merged_ocr_result: Dict[str, Any] = None) -> CorrectedOCRResult:
         """
         对合并的OCR结果进行智能纠正
         
         Args:
-            merged_ocr_key: 合并OCR结果的存储键
+            merged_ocr_key: 合并OCR结果的存储键（仍用于审计记录）
             drawing_id: 图纸ID
             task_id: 任务ID
             original_image_info: 原始图像信息
+            merged_ocr_result: 内存中的合并OCR结果；未提供时先从本地存储解析，再回退到下载
             
         Returns:
             纠正后的OCR结果
@@ -129,8 +141,10 @@ class OCRResultCorrector:
         start_time = time.time()
         
         try:
-            # 1. 下载原始OCR结果
-            original_result = await self._download_ocr_result(merged_ocr_key)
+            # 1. 获取原始OCR结果（内存 > 本地存储 > 下载）
+            original_result = self._resolve_local_ocr_result(merged_ocr_key, merged_ocr_result)
+            if original_result is None:
+                original_result = await self._download_ocr_result(merged_ocr_key)
             if not original_result:
                 raise ValueError(f"无法下载OCR结果: {merged_ocr_key}")
             
@@ -264,24 +278,14 @@ class OCRResultCorrector:
             if not merged_result:
                 merged_result = original_content_json.get("merged_result")
             text_regions = []
+            regions_key = None
             if merged_result:
-                # 优先支持text_regions
-                text_regions = merged_result.get("text_regions", [])
-                # 兼容all_text_regions
-                if not text_regions:
-                    text_regions = merged_result.get("all_text_regions", [])
-                # 兼容texts
-                if not text_regions:
-                    text_regions = merged_result.get("texts", [])
-                # 兼容ocr_results
-                if not text_regions:
-                    text_regions = merged_result.get("ocr_results", [])
-                # 兼容regions
-                if not text_regions:
-                    text_regions = merged_result.get("regions", [])
-                # 兼容text_results
-                if not text_regions:
-                    text_regions = merged_result.get("text_results", [])
+                # 优先支持text_regions，依次兼容all_text_regions/texts/ocr_results/regions/text_results
+                for key in ("text_regions", "all_text_regions", "texts", "ocr_results", "regions", "text_results"):
+                    text_regions = merged_result.get(key, [])
+                    if text_regions:
+                        regions_key = key
+                        break
             
             logger.info(f"🔍 OCR结果数据结构调试:")
             logger.info(f"   - merged_result keys: {list(merged_result.keys()) if merged_result else 'None'}")
@@ -291,8 +295,19 @@ class OCRResultCorrector:
                 logger.warning("⚠️ 未找到OCR文本区域，返回空结果")
                 return {"success": False, "message": "未找到OCR文本区域", "text_regions": []}
             
+            # 版面分析优先复用合并结果上缓存的结果，没有时计算一次并写回
+            layout = layout_for(merged_result, regions_key)
+            
             # 构建GPT分析提示词（文本区域排序、相邻合并、纯文本）
-            prompt, ocr_plain_text = self._build_gpt_analysis_prompt(text_regions, original_image_info, return_plain_text=True)
+            prompt, ocr_plain_text = self._build_gpt_analysis_prompt(
+                text_regions, original_image_info, return_plain_text=True, layout=layout
+            )
+            
+            # 超大图纸：按区域分块并发分析后合并
+            if self.ai_analyzer and self._should_use_chunked_analysis(ocr_plain_text):
+                return await self._apply_gpt_analysis_chunked(
+                    text_regions, original_content_json, task_id, original_image_info, layout
+                )
 
             # 输出全图文本概览（前5行和后5行）
             plain_lines = ocr_plain_text.split('\n')
@@ -366,6 +381,110 @@ class OCRResultCorrector:
             logger.error(f"❌ GPT智能分析异常: {e}", exc_info=True)
             return self._create_fallback_result(text_regions if 'text_regions' in locals() else [])
     
+    def _should_use_chunked_analysis(self, ocr_plain_text: str) -> bool:
+        """判断OCR全文是否超出单次GPT调用的token预算"""
+        try:
+            from app.core.config import settings
+            if not getattr(settings, "OCR_GPT_CHUNKING_ENABLED", True):
+                return False
+            token_budget = getattr(settings, "OCR_GPT_CHUNK_TOKEN_BUDGET", 6000)
+        except Exception:
+            token_budget = 6000
+        return OCRAnalysisChunker(token_budget).needs_chunking(ocr_plain_text)
+    
+    async def _apply_gpt_analysis_chunked(self,
+                                        text_regions: List[Dict],
+                                        original_content_json: Dict[str, Any],
+                                        task_id: str,
+                                        original_image_info: Dict[str, Any] = None,
+                                        layout: Optional[TextLayout] = None) -> Dict[str, Any]:
+        """
+        分块map-reduce分析：按空间区域（标题栏/正文区域）划分文本行，
+        在共享限流器下并发分析各块，再确定性合并 component_list / global_notes
+        """
+        try:
+            from app.core.config import settings
+            token_budget = getattr(settings, "OCR_GPT_CHUNK_TOKEN_BUDGET", 6000)
+            concurrency = getattr(settings, "OCR_GPT_CHUNK_CONCURRENCY", 3)
+        except Exception:
+            token_budget, concurrency = 6000, 3
+        
+        start_time = time.time()
+        lines = self._merge_regions_into_lines(text_regions, layout)
+        chunks = OCRAnalysisChunker(token_budget).partition(lines, original_image_info)
+        limiter = llm_client.concurrency_limiter("ocr_chunk_analysis", concurrency)
+        
+        async def analyze_chunk(chunk: Dict[str, Any]) -> Dict[str, Any]:
+            prompt = self._build_gpt_chunk_prompt(chunk)
+            failed = {"_chunk_id": chunk["chunk_id"], "_region": chunk["region"], "_failed": True}
+            # 响应无法解析为JSON时重试，仍失败则按失败块处理（不把降级响应当作分析结果合并）
+            for attempt in range(1 + CHUNK_PARSE_RETRIES):
+                async with limiter:
+                    response = await self.ai_analyzer.analyze_text_async(
+                        prompt=prompt,
+                        session_id=f"ocr_analysis_{task_id}_chunk{chunk['chunk_id']}",
+                        context_data={"task_type": "ocr_chunk_analysis", "drawing_id": task_id}
+                    )
+                if not response.get("success"):
+                    logger.warning(f"⚠️ 分块 {chunk['chunk_id']} GPT分析失败: {response.get('error')}")
+                    return failed
+                parsed = GPTResponseParser.try_extract_json(response.get("response", ""))
+                if parsed is not None:
+                    parsed["_chunk_id"] = chunk["chunk_id"]
+                    parsed["_region"] = chunk["region"]
+                    return parsed
+                logger.warning(f"⚠️ 分块 {chunk['chunk_id']} GPT响应无法解析为JSON（第 {attempt + 1} 次）")
+            return failed
+        
+        logger.info(f"🧩 OCR文本超出token预算，分 {len(chunks)} 块并发分析（并发上限 {concurrency}）")
+        chunk_results = await asyncio.gather(*(analyze_chunk(c) for c in chunks))
+        
+        failed_count = sum(1 for r in chunk_results if r.get("_failed"))
+        if failed_count == len(chunk_results):
+            logger.error("❌ 所有分块GPT分析均失败")
+            return self._create_fallback_result(text_regions)
+        
+        merged = merge_chunk_results([r for r in chunk_results if not r.get("_failed")])
+        
+        # 复用JSON→自然语言摘要的转换逻辑
+        analyzed_result = self._parse_gpt_analysis_response(
+            json.dumps(merged, ensure_ascii=False), original_content_json
+        )
+        analyzed_result["chunked_analysis"] = {
+            "chunk_count": len(chunks),
+            "failed_chunks": failed_count,
+            "token_budget": token_budget,
+            "chunks": [
+                {k: c[k] for k in ("chunk_id", "region", "bbox", "line_count", "token_count")}
+                for c in chunks
+            ],
+            "processing_time": time.time() - start_time
+        }
+        logger.info(f"✅ 分块分析合并完成: {len(merged['component_list'])} 个构件, "
+                    f"{len(merged['global_notes'])} 条说明, 耗时 {time.time() - start_time:.2f}s")
+        return analyzed_result
+    
+    def _build_gpt_chunk_prompt(self, chunk: Dict[str, Any]) -> str:
+        """构建单个分块的GPT分析提示词（要求JSON输出以便合并）"""
+        region_desc = "图纸标题栏区域" if chunk["region"] == "title_block" else "图纸正文区域"
+        return f"""你是一位经验丰富的建筑工程造价师。以下是一张大幅建筑图纸中【{region_desc}】（第{chunk['chunk_id'] + 1}/{chunk['chunk_count']}块）的PaddleOCR识别文本，已按阅读顺序排列。
+
+## OCR文本
+{chunk['text']}
+
+## 任务
+1. 纠正明显的OCR识别错误（数字/字母混淆、常见错别字），构件编号、材料标号、尺寸数字保持原样
+2. 仅提取本块文本中实际出现的信息，不要推测其他区域的内容
+
+## 输出要求
+只输出JSON，格式如下：
+{{
+  "drawing_basic_info": {{"drawing_type": "", "project_name": "", "drawing_number": "", "scale": "", "structure_type": "", "axis_lines": ""}},
+  "component_list": [{{"component_id": "", "component_type": "", "material": "", "dimensions": "", "location": ""}}],
+  "global_notes": [{{"note_type": "", "content": "", "importance": "medium"}}]
+}}
+"""
+    
     def _create_fallback_result(self, text_regions: List[Dict]) -> Dict[str, Any]:
         """创建备用结果"""
         return {
@@ -376,53 +495,28 @@ class OCRResultCorrector:
             "text_regions_analyzed": text_regions
         }
 
+    def _merge_regions_into_lines(self, text_regions: List[dict],
+                                  layout: Optional[TextLayout] = None) -> List[Dict[str, Any]]:
+        """文本区域按阅读顺序相邻合并为行，保留每行的包围盒（x1, y1, x2, y2）"""
+        if layout is None:
+            layout = compute_layout(layout_boxes(text_regions))
+        merged_lines = []
+        for line_id, group in enumerate(layout.lines()):
+            text = ' '.join(t for t in (text_regions[i].get('text', '').strip() for i in group) if t)
+            if not text:
+                continue
+            x1, y1, x2, y2 = layout.line_boxes[line_id].tolist()
+            merged_lines.append({"text": text, "x1": x1, "y1": y1, "x2": x2, "y2": y2})
+        return merged_lines
+    
     def _build_gpt_analysis_prompt(self, 
                                  text_regions: List[dict], 
                                  image_info: Dict[str, Any] = None,
-                                 return_plain_text: bool = False) -> str:
+                                 return_plain_text: bool = False,
+                                 layout: Optional[TextLayout] = None) -> str:
         """构建GPT分析提示词（文本区域排序、相邻合并、纯文本），可返回纯文本内容"""
-        # 1. 按y升序、x升序排序
-        sorted_regions = sorted(
-            text_regions,
-            key=lambda r: (r.get('bbox', r.get('box', [[0,0],[0,0],[0,0],[0,0]]))[0][1],
-                           r.get('bbox', r.get('box', [[0,0],[0,0],[0,0],[0,0]]))[0][0])
-        )
-        # 2. 相邻合并（高度接近、x间距小）
-        merged_lines = []
-        line_buffer = []
-        last_y = None
-        last_h = None
-        last_x2 = None
-        y_threshold = 10  # 像素容差
-        x_gap_threshold = 30  # x间距容差
-        for region in sorted_regions:
-            text = region.get('text', '').strip()
-            if not text:
-                continue
-            box = region.get('bbox', region.get('box', [[0,0],[0,0],[0,0],[0,0]]))
-            y = box[0][1]
-            x1 = box[0][0]
-            x2 = box[2][0]
-            h = abs(box[2][1] - box[0][1])
-            if last_y is not None and abs(y - last_y) <= y_threshold and last_h is not None and abs(h - last_h) <= y_threshold:
-                # 同一行，判断x间距
-                if last_x2 is not None and (x1 - last_x2) <= x_gap_threshold:
-                    line_buffer.append(text)
-                    last_x2 = x2
-                    continue
-                else:
-                    merged_lines.append(' '.join(line_buffer))
-                    line_buffer = [text]
-                    last_x2 = x2
-            else:
-                if line_buffer:
-                    merged_lines.append(' '.join(line_buffer))
-                line_buffer = [text]
-                last_x2 = x2
-            last_y = y
-            last_h = h
-        if line_buffer:
-            merged_lines.append(' '.join(line_buffer))
+        # 1-2. 按版面分析的文本行合并相邻文本框
+        merged_lines = [line["text"] for line in self._merge_regions_into_lines(text_regions, layout)]
         # 3. 拼接为纯文本
         ocr_plain_text = '\n'.join(merged_lines)
         prompt = f"""你是一位经验丰富的建筑工程造价师，现在需要对PaddleOCR识别的文本结果进行智能分析和结构化提取。
@@ -728,6 +822,16 @@ class OCRResultCorrector:
                 "analysis_summary": {"error": f"自然语言解析失败: {e}"}
             }
 
+    def _resolve_local_ocr_result(self, ocr_key: str,
+                                  merged_ocr_result: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
+        """在本地解析合并OCR结果，返回与下载结果一致的包装结构"""
+        if merged_ocr_result is None:
+            merged_ocr_result = merged_ocr_store.resolve(ocr_key)
+        if merged_ocr_result is None:
+            return None
+        logger.info(f"♻️ 使用内存中的合并OCR结果，跳过下载: {ocr_key}")
+        return {"success": True, "data": merged_ocr_result}
+    
     async def _download_ocr_result(self, ocr_key: str) -> Optional[Dict[str, Any]]:
         """下载OCR合并结果"""
         logger.info(f"🔽 正在下载OCR结果: {ocr_key}")
@@ -128,7 +128,55 @@ class OpenAIInteractionLogger:
     def log_api_call_error(self, call_id: str, error_message: str, error_type: str = None):
         """记录API调用错误"""
         logger.error(f"❌ API调用失败: {call_id} - {error_message}")
-    
+
+    def log_api_call(self,
+                     session_id: str = None,
+                     step_name: str = None,
+                     request_data: Optional[Dict] = None,
+                     response_data: Optional[Dict] = None,
+                     task_id: str = None,
+                     drawing_id: Any = None,
+                     duration_seconds: float = None,
+                     success: bool = True,
+                     **kwargs):
+        """
+        记录一次完整的API请求/响应对（可导入本地回放服务的录制文件）
+        Args:
+            session_id: 调用方标识
+            step_name: 分析步骤名称
+            request_data: 请求数据（model/messages），图片仅保留元信息
+            response_data: 响应数据（content等）
+        """
+        if not getattr(self, "session_id", None):
+            logger.debug("会话未开始，跳过API调用记录")
+            return
+
+        request_data = dict(request_data or {})
+        if request_data.get("messages"):
+            request_data["messages"] = self._safe_process_messages(request_data["messages"])
+
+        call_record = {
+            "call_id": str(uuid.uuid4()),
+            "caller_session_id": session_id,
+            "step_name": step_name,
+            "task_id": task_id,
+            "drawing_id": drawing_id,
+            "timestamp": datetime.now().isoformat(),
+            "duration_seconds": duration_seconds,
+            "success": success,
+            "request_data": request_data,
+            "response_data": response_data or {}
+        }
+        self.interaction_data["api_calls"].append(call_record)
+
+        metadata = self.interaction_data["metadata"]
+        metadata["total_api_calls"] += 1
+        if success:
+            metadata["success_calls"] += 1
+        else:
+            metadata["failed_calls"] += 1
+        logger.debug(f"📝 记录API调用: {step_name}")
+
     def start_session(self, 
                      task_id: str, 
                      drawing_id: int, 
@@ -19,6 +19,8 @@ from app.services.intelligent_image_slicer import (
     SliceAnalysisResult
 )
 from app.services.fallback_strategy import fallback_strategy, FallbackLevel
+from app.services.llm_client import llm_client
+from app.services.tile_pyramid import tile_pyramid_store
 
 logger = logging.getLogger(__name__)
 
@@ -28,10 +30,8 @@ class OpenAIVisionSlicer:
     def __init__(self):
         """初始化Vision切片分析器"""
         self.slicer = IntelligentImageSlicer()
-        self.client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL or None)
         self.model = "gpt-4-vision-preview"  # 支持Vision的模型
-        self.max_retries = 3
-        self.retry_delay = 2
         
     async def analyze_image_with_slicing(self, image_path: str, task_id: str,
                                        analysis_prompt: str = None) -> Dict[str, Any]:
@@ -215,66 +215,58 @@ class OpenAIVisionSlicer:
         
         start_time = time.time()
         
-        for attempt in range(self.max_retries):
-            try:
-                # 构建消息
-                messages = [
+        # 构建消息
+        messages = [
+            {
+                "role": "system",
+                "content": analysis_prompt
+            },
+            {
+                "role": "user",
+                "content": [
                     {
-                        "role": "system",
-                        "content": analysis_prompt
+                        "type": "text",
+                        "text": f"请分析这个图纸切片（切片ID: {slice_id}，位置: {slice_info['position']}，尺寸: {slice_info['size']}）中的建筑构件。"
                     },
                     {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": f"请分析这个图纸切片（切片ID: {slice_id}，位置: {slice_info['position']}，尺寸: {slice_info['size']}）中的建筑构件。"
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{slice_info.get('base64_data', '')}",
-                                    "detail": "high"
-                                }
-                            }
-                        ]
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/png;base64,{slice_info.get('base64_data', '')}",
+                            "detail": "high"
+                        }
                     }
                 ]
-                
-                # 调用OpenAI API
-                response = await self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    max_tokens=2000,
-                    temperature=0.1
-                )
-                
-                # 解析响应
-                analysis_text = response.choices[0].message.content
-                
-                # 解析分析结果
-                parsed_result = self._parse_analysis_result(analysis_text, slice_id)
-                
-                processing_time = time.time() - start_time
-                
-                result = SliceAnalysisResult(
-                    slice_id=slice_id,
-                    analysis_result=parsed_result,
-                    components=parsed_result.get('components', []),
-                    confidence_score=parsed_result.get('confidence_score', 0.8),
-                    processing_time=processing_time
-                )
-                
-                logger.debug(f"切片 {slice_id} 分析成功，耗时 {processing_time:.2f}s")
-                return result
-                
-            except Exception as e:
-                logger.warning(f"切片 {slice_id} 分析失败 (尝试 {attempt + 1}/{self.max_retries}): {e}")
-                
-                if attempt < self.max_retries - 1:
-                    await asyncio.sleep(self.retry_delay * (attempt + 1))
-                else:
-                    raise e
+            }
+        ]
+        
+        # 调用OpenAI API（截止时间、重试、对冲由共享LLM客户端统一处理）
+        response = await llm_client.acreate(
+            self.client,
+            "vision_slicer.slice",
+            model=self.model,
+            messages=messages,
+            max_tokens=2000,
+            temperature=0.1
+        )
+        
+        # 解析响应
+        analysis_text = response.choices[0].message.content
+        
+        # 解析分析结果
+        parsed_result = self._parse_analysis_result(analysis_text, slice_id)
+        
+        processing_time = time.time() - start_time
+        
+        result = SliceAnalysisResult(
+            slice_id=slice_id,
+            analysis_result=parsed_result,
+            components=parsed_result.get('components', []),
+            confidence_score=parsed_result.get('confidence_score', 0.8),
+            processing_time=processing_time
+        )
+        
+        logger.debug(f"切片 {slice_id} 分析成功，耗时 {processing_time:.2f}s")
+        return result
     
     def _parse_analysis_result(self, analysis_text: str, slice_id: str) -> Dict[str, Any]:
         """
@@ -462,11 +454,10 @@ class OpenAIVisionSlicer:
             import base64
             import io
             
-            # 加载并编码图像
-            image = Image.open(image_path)
-            
-            # 如果图像太大，先压缩到OpenAI限制内
+            # 如果图像太大，先压缩到OpenAI限制内；已有瓦片金字塔时直接取对应分辨率
             max_size = 2048
+            image = tile_pyramid_store.get_downscaled(image_path, max_size) or Image.open(image_path)
+            
             if max(image.size) > max_size:
                 ratio = max_size / max(image.size)
                 new_size = (int(image.width * ratio), int(image.height * ratio))
@@ -505,7 +496,9 @@ class OpenAIVisionSlicer:
             # 调用OpenAI API
             start_time = time.time()
             
-            response = await self.client.chat.completions.create(
+            response = await llm_client.acreate(
+                self.client,
+                "vision_slicer.full_image",
                 model=self.model,
                 messages=messages,
                 max_tokens=3000,
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图纸页面的紧凑栅格表示
+图纸基本是白底黑线，页面默认以8位灰度保存和传递，可选1位二值（内存中按位打包）；
+颜色编码的图纸通过 RASTER_PAGE_MODE=color 显式保留彩色。
+只有确实需要三通道输入的模型才在调用边界用 to_model_rgb 转换。
+
+用法（统计样例图纸的内存与PNG体积节省）:
+    python -m app.services.page_raster test_images/*.png
+"""
+
+import io
+import logging
+import sys
+from dataclasses import dataclass
+from typing import Dict, Any, List, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Image.MAX_IMAGE_PIXELS = None
+
+RASTER_MODE_GRAY = "gray"
+RASTER_MODE_BILEVEL = "bilevel"
+RASTER_MODE_COLOR = "color"
+
+
+def page_raster_mode() -> str:
+    """当前页面栅格模式，未知取值按灰度处理"""
+    mode = (settings.RASTER_PAGE_MODE or RASTER_MODE_GRAY).lower()
+    return mode if mode in (RASTER_MODE_GRAY, RASTER_MODE_BILEVEL, RASTER_MODE_COLOR) else RASTER_MODE_GRAY
+
+
+@dataclass
+class PackedBilevel:
+    """按位打包的二值页面（1表示墨迹），每像素1 bit"""
+    bits: np.ndarray
+    shape: Tuple[int, int]
+
+    @classmethod
+    def from_gray(cls, gray: np.ndarray, threshold: int = None) -> "PackedBilevel":
+        threshold = settings.RASTER_BILEVEL_THRESHOLD if threshold is None else threshold
+        return cls(bits=np.packbits(gray < threshold, axis=1), shape=gray.shape)
+
+    @property
+    def nbytes(self) -> int:
+        return self.bits.nbytes
+
+    @classmethod
+    def from_image(cls, image: Image.Image) -> "PackedBilevel":
+        """由PIL图像构建；'1' 模式直接按位打包，其余模式按阈值二值化"""
+        if image.mode == "1":
+            white = np.asarray(image)
+            return cls(bits=np.packbits(~white, axis=1), shape=white.shape)
+        return cls.from_gray(np.asarray(image if image.mode == "L" else to_compact(image, RASTER_MODE_GRAY)))
+
+    def ink_mask(self) -> np.ndarray:
+        """解包为布尔墨迹掩码"""
+        return np.unpackbits(self.bits, axis=1, count=self.shape[1]).astype(bool)
+
+    def to_gray(self) -> np.ndarray:
+        """解包为白底黑线的8位灰度"""
+        return np.where(self.ink_mask(), 0, 255).astype(np.uint8)
+
+
+def to_compact(image: Image.Image, mode: str = None) -> Image.Image:
+    """
+    将页面图像转换为紧凑模式：gray -> 'L'，bilevel -> '1'，color 保持原样（去除alpha）
+    """
+    mode = mode or page_raster_mode()
+    if image.mode in ("RGBA", "LA", "P"):
+        # 透明背景按白色处理，避免转换后变黑
+        rgba = image.convert("RGBA")
+        background = Image.new("RGBA", rgba.size, (255, 255, 255, 255))
+        image = Image.alpha_composite(background, rgba).convert("RGB")
+
+    if mode == RASTER_MODE_COLOR:
+        return image if image.mode in ("RGB", "L", "1") else image.convert("RGB")
+
+    gray = image if image.mode == "L" else image.convert("L")
+    if mode == RASTER_MODE_BILEVEL:
+        threshold = settings.RASTER_BILEVEL_THRESHOLD
+        return gray.point(lambda v: 255 if v >= threshold else 0, mode="1")
+    return gray
+
+
+def compact_page_file(image_path: str, mode: str = None) -> str:
+    """按当前栅格模式原地重写页面文件（已是目标模式时不重新编码）"""
+    mode = mode or page_raster_mode()
+    target = {RASTER_MODE_GRAY: "L", RASTER_MODE_BILEVEL: "1"}.get(mode)
+    with Image.open(image_path) as image:
+        if target is None or image.mode == target:
+            return image_path
+        compact = to_compact(image, mode)
+    compact.save(image_path, format="PNG", optimize=True)
+    return image_path
+
+
+def load_page_array(image_path: str, mode: str = None) -> Union[np.ndarray, PackedBilevel]:
+    """
+    按栅格模式读取页面：gray -> 8位灰度数组，bilevel -> PackedBilevel，color -> RGB数组
+    """
+    mode = mode or page_raster_mode()
+    with Image.open(image_path) as image:
+        compact = to_compact(image, mode)
+        if mode == RASTER_MODE_BILEVEL:
+            return PackedBilevel.from_image(compact)
+        if mode == RASTER_MODE_COLOR:
+            return np.asarray(compact.convert("RGB"))
+        return np.asarray(compact)
+
+
+def to_model_rgb(image: Union[Image.Image, np.ndarray, PackedBilevel]) -> Image.Image:
+    """模型调用边界：转换为需要三通道输入的模型所用的RGB图像"""
+    if isinstance(image, PackedBilevel):
+        image = image.to_gray()
+    if isinstance(image, np.ndarray):
+        image = Image.fromarray(image)
+    return image if image.mode == "RGB" else image.convert("RGB")
+
+
+def to_model_bgr(image: Union[Image.Image, np.ndarray, PackedBilevel]) -> np.ndarray:
+    """模型调用边界：OpenCV/PaddleOCR 约定的三通道BGR数组"""
+    return np.ascontiguousarray(np.asarray(to_model_rgb(image))[:, :, ::-1])
+
+
+def _png_size(image: Image.Image) -> int:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.tell()
+
+
+def measure_page_modes(image_path: str) -> Dict[str, Any]:
+    """统计单张页面在 RGB / 灰度 / 二值 三种表示下的内存和PNG体积"""
+    with Image.open(image_path) as source:
+        rgb = to_compact(source, RASTER_MODE_COLOR).convert("RGB")
+    gray = to_compact(rgb, RASTER_MODE_GRAY)
+    bilevel = to_compact(gray, RASTER_MODE_BILEVEL)
+    gray_array = np.asarray(gray)
+    packed = PackedBilevel.from_gray(gray_array)
+
+    rgb_bytes = rgb.width * rgb.height * 3
+    rgb_png = _png_size(rgb)
+    gray_png = _png_size(gray)
+    bilevel_png = _png_size(bilevel)
+    return {
+        "image": image_path,
+        "size": [rgb.width, rgb.height],
+        "memory_bytes": {"rgb": rgb_bytes, "gray": gray_array.nbytes, "bilevel_packed": packed.nbytes},
+        "png_bytes": {"rgb": rgb_png, "gray": gray_png, "bilevel": bilevel_png},
+        "memory_reduction": {"gray": round(rgb_bytes / gray_array.nbytes, 1),
+                             "bilevel_packed": round(rgb_bytes / packed.nbytes, 1)},
+        "png_reduction": {"gray": round(rgb_png / gray_png, 1), "bilevel": round(rgb_png / bilevel_png, 1)}
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    paths = argv if argv is not None else sys.argv[1:]
+    if not paths:
+        print("用法: python -m app.services.page_raster <image> [<image> ...]")
+        return 1
+    print(f"{'image':<28}{'size':>12}{'mem gray':>10}{'mem 1bit':>10}{'png gray':>10}{'png 1bit':>10}")
+    for path in paths:
+        stats = measure_page_modes(path)
+        size = "x".join(str(v) for v in stats["size"])
+        print(f"{path.split('/')[-1]:<28}{size:>12}"
+              f"{stats['memory_reduction']['gray']:>9}x{stats['memory_reduction']['bilevel_packed']:>9}x"
+              f"{stats['png_reduction']['gray']:>9}x{stats['png_reduction']['bilevel']:>9}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
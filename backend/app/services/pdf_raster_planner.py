@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF逐页栅格化分辨率规划
+根据页面幅面和主导文字高度为每页选择DPI：让文字落在PaddleOCR最易识别的像素高度，
+同时受单页像素预算约束，避免A0/A1图纸按固定300 DPI渲染出上亿像素的整页图像。
+
+文字高度优先取自矢量文本的字号；没有矢量文本时用低DPI探测渲染估计字符高度。
+"""
+
+import logging
+import math
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 大写字母/汉字字形高度约为字号的0.7
+_GLYPH_HEIGHT_RATIO = 0.7
+# 低DPI探测估计文字高度所需的最少字符数
+_MIN_PROBE_GLYPHS = 30
+
+
+def _weighted_median(values, weights) -> float:
+    order = np.argsort(values)
+    values = np.asarray(values, dtype=float)[order]
+    cumulative = np.cumsum(np.asarray(weights, dtype=float)[order])
+    return float(values[np.searchsorted(cumulative, cumulative[-1] / 2.0)])
+
+
+def vector_text_height_pt(page) -> Optional[float]:
+    """按字符数加权的主导字形高度（pt），页面无矢量文本时返回None"""
+    sizes, weights = [], []
+    for block in page.get_text("dict").get("blocks", []):
+        for line in block.get("lines", []):
+            for span in line.get("spans", []):
+                chars = len(span.get("text", "").strip())
+                if chars and span.get("size", 0) > 0:
+                    sizes.append(span["size"])
+                    weights.append(chars)
+    if sum(weights) < settings.PDF_VECTOR_TEXT_MIN_CHARS:
+        return None
+    return _weighted_median(sizes, weights) * _GLYPH_HEIGHT_RATIO
+
+
+def probe_text_height_pt(page, probe_dpi: int = None) -> Optional[float]:
+    """
+    低DPI渲染页面，按连通域统计字符高度的中位数（pt）
+
+    只保留近似字符形状的连通域：高度在合理范围内、宽度不超过高度的两倍，过滤线条和填充。
+    """
+    if cv2 is None:
+        return None
+    probe_dpi = probe_dpi or settings.PDF_DPI_PROBE
+    pixmap = page.get_pixmap(dpi=probe_dpi, colorspace=fitz.csGRAY, alpha=False)
+    gray = np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.stride)[:, :pixmap.width]
+
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    if count <= 1:
+        return None
+
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    max_height = max(4, int(min(pixmap.width, pixmap.height) * 0.05))
+    glyphs = (heights >= 3) & (heights <= max_height) & (widths <= heights * 2) & (areas >= 4)
+    if int(glyphs.sum()) < _MIN_PROBE_GLYPHS:
+        return None
+    return float(np.median(heights[glyphs])) * 72.0 / probe_dpi
+
+
+def plan_page_dpi(page, default_dpi: int = 300) -> Dict[str, Any]:
+    """
+    为单页选择栅格化DPI
+
+    Returns:
+        {"dpi", "reason", "text_height_pt", "text_height_source", "text_dpi", "budget_dpi", "page_size_mm"}
+    """
+    # poppler 按 MediaBox 渲染
+    width_in, height_in = page.mediabox.width / 72.0, page.mediabox.height / 72.0
+    min_dpi, max_dpi = settings.PDF_MIN_DPI, settings.PDF_MAX_DPI
+    budget_dpi = int(math.sqrt(settings.PDF_MAX_PAGE_MEGAPIXELS * 1e6 / max(width_in * height_in, 1e-6)))
+
+    text_height_pt = vector_text_height_pt(page)
+    source = "vector" if text_height_pt else None
+    if text_height_pt is None:
+        text_height_pt = probe_text_height_pt(page)
+        source = "probe" if text_height_pt else None
+
+    if text_height_pt:
+        target_height = settings.PADDLE_OCR_TARGET_TEXT_HEIGHT
+        text_dpi = int(math.ceil(target_height * 72.0 / text_height_pt))
+        dpi = max(min_dpi, min(max_dpi, text_dpi))
+        reason = f"文字高度{text_height_pt:.1f}pt({source})对应{text_dpi} DPI可达{target_height}px"
+    else:
+        text_dpi = None
+        dpi = default_dpi
+        reason = "未检测到文字，使用默认DPI"
+
+    if dpi > budget_dpi:
+        dpi = max(72, budget_dpi)
+        reason += f"；受单页{settings.PDF_MAX_PAGE_MEGAPIXELS}MP像素预算限制"
+
+    if text_height_pt and text_height_pt * dpi / 72.0 < settings.PADDLE_OCR_MIN_HEIGHT:
+        reason += f"；文字仅{text_height_pt * dpi / 72.0:.0f}px，低于最小高度{settings.PADDLE_OCR_MIN_HEIGHT}px"
+
+    return {
+        "dpi": int(dpi),
+        "reason": reason,
+        "text_height_pt": round(text_height_pt, 2) if text_height_pt else None,
+        "text_height_source": source,
+        "text_dpi": text_dpi,
+        "budget_dpi": budget_dpi,
+        "page_size_mm": [round(width_in * 25.4), round(height_in * 25.4)]
+    }
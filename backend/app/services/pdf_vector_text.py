@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+矢量PDF文本提取
+直接从PDF内容流读取带位置的文字（CAD直接导出的结构图纸通常保留真实文本对象），
+转换为与 PaddleOCRService 相同的 text_regions 结构，坐标为栅格化后页面图像的像素坐标。
+按页判断“矢量/扫描/混合”，只有无可用文本的页面或页面中的嵌入栅格区域才需要OCR。
+"""
+
+import logging
+import time
+import unicodedata
+from difflib import SequenceMatcher
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PAGE_MODE_VECTOR = "vector"
+PAGE_MODE_MIXED = "mixed"
+PAGE_MODE_SCANNED = "scanned"
+
+# 嵌入图片面积超过页面该比例时，视为需要OCR的栅格区域
+_MIN_IMAGE_AREA_RATIO = 0.02
+
+
+def analyze_text_type(text: str) -> Dict[str, bool]:
+    """分析文本类型（与PaddleOCR结果字段保持一致）"""
+    return {
+        'is_numeric': text.replace('.', '', 1).isdigit(),
+        'is_alphanumeric': text.isalnum(),
+        'contains_letters': any(c.isalpha() for c in text),
+        'contains_digits': any(c.isdigit() for c in text)
+    }
+
+
+def _is_garbled_char(char: str) -> bool:
+    """无法映射到Unicode的字形（缺少ToUnicode表时常见）"""
+    if char == '\ufffd':
+        return True
+    category = unicodedata.category(char)
+    return category in ('Co', 'Cc', 'Cn')
+
+
+def _normalize_text(text: str) -> str:
+    return ''.join(text.split()).lower()
+
+
+def region_box(region: Dict[str, Any]) -> Optional[Tuple[float, float, float, float]]:
+    """读取文本区域的 (x1, y1, x2, y2)，兼容 bbox 列表和 bbox_xyxy 字典两种格式"""
+    bbox = region.get('bbox')
+    if isinstance(bbox, (list, tuple)) and len(bbox) >= 4:
+        return float(bbox[0]), float(bbox[1]), float(bbox[2]), float(bbox[3])
+    xyxy = region.get('bbox_xyxy')
+    if isinstance(xyxy, dict):
+        return xyxy['x_min'], xyxy['y_min'], xyxy['x_max'], xyxy['y_max']
+    return None
+
+
+class PDFVectorTextExtractor:
+    """矢量PDF文本提取器"""
+
+    def __init__(self, min_chars: int = None, max_garbled_ratio: float = None):
+        self.min_chars = min_chars if min_chars is not None else settings.PDF_VECTOR_TEXT_MIN_CHARS
+        self.max_garbled_ratio = max_garbled_ratio if max_garbled_ratio is not None \
+            else settings.PDF_VECTOR_TEXT_MAX_GARBLED
+
+    @staticmethod
+    def is_available() -> bool:
+        return fitz is not None
+
+    def _page_transform(self, page, dpi: int):
+        """
+        构造 PDF 坐标 -> 栅格像素坐标 的变换
+
+        PyMuPDF 的文字坐标相对于未旋转的 CropBox 左上角；poppler 按 MediaBox 渲染并应用 /Rotate，
+        因此先平移到 MediaBox，再按顺时针旋转，最后按 DPI 缩放。
+        """
+        scale = dpi / 72.0
+        offset_x, offset_y = page.cropbox_position.x, page.cropbox_position.y
+        media_w, media_h = page.mediabox.width, page.mediabox.height
+        rotation = page.rotation % 360
+
+        def transform(x: float, y: float) -> Tuple[float, float]:
+            x, y = x + offset_x, y + offset_y
+            if rotation == 90:
+                x, y = media_h - y, x
+            elif rotation == 180:
+                x, y = media_w - x, media_h - y
+            elif rotation == 270:
+                x, y = y, media_w - x
+            return x * scale, y * scale
+
+        def transform_rect(rect) -> List[float]:
+            x0, y0 = transform(rect[0], rect[1])
+            x1, y1 = transform(rect[2], rect[3])
+            return [min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)]
+
+        return transform_rect
+
+    def extract_page(self, page, dpi: int = 300) -> Dict[str, Any]:
+        """
+        提取单页文本并分类
+
+        Returns:
+            {
+                "mode": vector/mixed/scanned,
+                "dpi": 渲染分辨率,
+                "text_regions": PaddleOCR 结构的文本区域（行级）,
+                "all_text": 全部文本,
+                "ocr_regions": 需要OCR的嵌入栅格区域（像素坐标）,
+                "statistics": 字符数、乱码比例、图片覆盖率等
+            }
+        """
+        transform_rect = self._page_transform(page, dpi)
+        page_area = max(page.rect.width * page.rect.height, 1.0)
+
+        text_regions = []
+        all_text = []
+        image_rects = []
+        char_count = 0
+        garbled_count = 0
+
+        page_dict = page.get_text("dict")
+        for block in page_dict.get("blocks", []):
+            if block.get("type") == 1:
+                # 图块坐标为未旋转空间，先旋转到 page.rect 所在空间再裁剪，裁剪结果转回未旋转空间
+                rect = (fitz.Rect(block["bbox"]) * page.rotation_matrix) & page.rect
+                if not rect.is_empty and rect.width * rect.height / page_area >= _MIN_IMAGE_AREA_RATIO:
+                    image_rects.append(rect * page.derotation_matrix)
+                continue
+
+            for line in block.get("lines", []):
+                spans = [span for span in line.get("spans", []) if span.get("text", "").strip()]
+                if not spans:
+                    continue
+                text = "".join(span["text"] for span in spans).strip()
+                visible = [c for c in text if not c.isspace()]
+                char_count += len(visible)
+                garbled_count += sum(1 for c in visible if _is_garbled_char(c))
+
+                bbox = transform_rect(line["bbox"])
+                text_regions.append({
+                    'id': len(text_regions),
+                    'text': text,
+                    'confidence': 1.0,
+                    'bbox': bbox,
+                    'bbox_xyxy': {'x_min': bbox[0], 'y_min': bbox[1], 'x_max': bbox[2], 'y_max': bbox[3]},
+                    'type_analysis': analyze_text_type(text),
+                    'font_size': max(span.get("size", 0) for span in spans) * dpi / 72.0,
+                    'source': 'pdf_vector'
+                })
+                all_text.append(text)
+
+        garbled_ratio = garbled_count / char_count if char_count else 0.0
+        image_coverage = min(1.0, sum(r.width * r.height for r in image_rects) / page_area)
+
+        if char_count < self.min_chars or garbled_ratio > self.max_garbled_ratio:
+            mode = PAGE_MODE_SCANNED
+            text_regions, all_text = [], []
+        elif image_rects:
+            mode = PAGE_MODE_MIXED
+        else:
+            mode = PAGE_MODE_VECTOR
+
+        return {
+            "mode": mode,
+            "dpi": dpi,
+            "text_regions": text_regions,
+            "all_text": "\n".join(all_text),
+            "ocr_regions": [transform_rect(r) for r in image_rects] if mode == PAGE_MODE_MIXED else [],
+            "statistics": {
+                "total_regions": len(text_regions),
+                "char_count": char_count,
+                "garbled_ratio": round(garbled_ratio, 4),
+                "image_coverage": round(image_coverage, 4),
+                "avg_confidence": 1.0 if text_regions else 0
+            }
+        }
+
+    def extract_document(self, pdf_path: str, dpi: int = 300) -> Dict[str, Any]:
+        """逐页提取整份PDF，附带吞吐统计"""
+        start = time.time()
+        pages = []
+        with fitz.open(pdf_path) as doc:
+            for page in doc:
+                pages.append(self.extract_page(page, dpi=dpi))
+        return {"pages": pages, "statistics": summarize_pages(pages, time.time() - start)}
+
+
+def summarize_pages(pages: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    """汇总矢量提取结果：各类页面数量和吞吐"""
+    modes = [p["mode"] for p in pages]
+    return {
+        "total_pages": len(pages),
+        "vector_pages": modes.count(PAGE_MODE_VECTOR),
+        "mixed_pages": modes.count(PAGE_MODE_MIXED),
+        "scanned_pages": modes.count(PAGE_MODE_SCANNED),
+        "total_regions": sum(len(p["text_regions"]) for p in pages),
+        "extraction_seconds": round(elapsed, 3),
+        "pages_per_second": round(len(pages) / elapsed, 2) if elapsed > 0 else None
+    }
+
+
+def compare_with_ocr(vector_regions: List[Dict[str, Any]], ocr_regions: List[Dict[str, Any]],
+                     similarity_threshold: float = 0.8) -> Dict[str, Any]:
+    """
+    评估矢量文本与OCR结果的一致性
+
+    OCR区域中心落在某个矢量文本行内即视为定位命中，命中后比较归一化文本的相似度。
+    """
+    vector_boxes = [(region_box(r), _normalize_text(r.get('text', ''))) for r in vector_regions]
+    located = 0
+    agreed = 0
+    for region in ocr_regions:
+        box = region_box(region)
+        text = _normalize_text(region.get('text', ''))
+        if box is None or not text:
+            continue
+        cx, cy = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+        candidates = [vtext for vbox, vtext in vector_boxes
+                      if vbox and vbox[0] <= cx <= vbox[2] and vbox[1] <= cy <= vbox[3]]
+        if not candidates:
+            continue
+        located += 1
+        if any(text in vtext or SequenceMatcher(None, text, vtext).ratio() >= similarity_threshold
+               for vtext in candidates):
+            agreed += 1
+
+    total = len(ocr_regions)
+    return {
+        "ocr_regions": total,
+        "vector_regions": len(vector_regions),
+        "located": located,
+        "agreed": agreed,
+        "location_rate": round(located / total, 4) if total else None,
+        "text_agreement": round(agreed / located, 4) if located else None
+    }
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+跨切片构件去重合并内核
+同一构件落在相邻切片的重叠区时会被各切片重复识别。扫描线取出相交的构件框对，
+按归一化后的构件编号/类型过滤后批量计算 IoU，IoU 超过阈值的构件两两连通，按连通分量合并，
+并记录各分量成员在重叠区的交集范围作为来源依据。
+
+判定与 VisionResultCoordinator 原有规则一致：任一键（如构件编号、构件类型）相同且 IoU > 阈值即为重复。
+"""
+
+import logging
+import re
+import sys
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.box_overlap import component_labels, intersecting_pairs
+
+logger = logging.getLogger(__name__)
+
+IOU_THRESHOLD = 0.5
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+@dataclass
+class ComponentCluster:
+    """一组互为重复的构件"""
+    indices: List[int]                      # 成员在输入列表中的下标（升序）
+    bbox: Optional[List[float]]             # 成员边界框的并集
+    overlap_bbox: Optional[List[float]]     # 成员边界框的交集（单个构件时为 None）
+
+
+def normalise_component_key(value: Any) -> Optional[str]:
+    """构件编号/类型归一化：全角转半角、去空白、转大写；空值返回 None（不参与按键分桶）"""
+    if value is None:
+        return None
+    text = _WHITESPACE.sub('', unicodedata.normalize('NFKC', str(value))).upper()
+    return text or None
+
+
+def component_keys(components: Sequence[Dict[str, Any]], field: str) -> List[Optional[str]]:
+    return [normalise_component_key(component.get(field)) for component in components]
+
+
+def bbox_array(components: Sequence[Dict[str, Any]], key: str = 'bbox') -> np.ndarray:
+    """构件边界框 [x1, y1, x2, y2] 转为 (n, 4) 数组，缺失、格式不对或面积为0的框记为 NaN（不与任何构件重复）"""
+    boxes = np.full((len(components), 4), np.nan)
+    for i, component in enumerate(components):
+        bbox = component.get(key) if isinstance(component, dict) else None
+        if not isinstance(bbox, (list, tuple)) or len(bbox) < 4:
+            continue
+        try:
+            x1, y1, x2, y2 = (float(value) for value in bbox[:4])
+        except (TypeError, ValueError):
+            continue
+        if x2 > x1 and y2 > y1:
+            boxes[i] = (x1, y1, x2, y2)
+    return boxes
+
+
+def _key_codes(field_keys: Sequence[Optional[str]]) -> np.ndarray:
+    """键转为整数编码，空键为 -1"""
+    codes: Dict[str, int] = {}
+    return np.asarray([-1 if key is None else codes.setdefault(key, len(codes)) for key in field_keys],
+                      dtype=np.int64)
+
+
+def duplicate_pairs(boxes: np.ndarray, keys: Sequence[Sequence[Optional[str]]],
+                    iou_threshold: float = IOU_THRESHOLD) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    找出所有重复构件对 (i, j)，i < j
+
+    IoU > 0 要求两框相交，因此先由扫描线取出相交的框对，再按键编码过滤（相当于分桶）并批量计算 IoU，
+    避免在同类型的大桶内计算稠密 IoU 矩阵。
+
+    Args:
+        boxes: bbox_array 的结果
+        keys: 若干组与构件一一对应的归一化键，任一组键相同（且非空）的构件才比较 IoU
+    """
+    codes = [_key_codes(field_keys) for field_keys in keys]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+    left_parts, right_parts = [], []
+    for first, second, inter in intersecting_pairs(boxes):
+        same_key = np.zeros(len(first), dtype=bool)
+        for field_codes in codes:
+            same_key |= (field_codes[first] >= 0) & (field_codes[first] == field_codes[second])
+        first, second, inter = first[same_key], second[same_key], inter[same_key]
+        union = areas[first] + areas[second] - inter
+        keep = inter / union > iou_threshold
+        left_parts.append(first[keep])
+        right_parts.append(second[keep])
+
+    if not left_parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    left, right = np.concatenate(left_parts), np.concatenate(right_parts)
+    return np.minimum(left, right), np.maximum(left, right)
+
+
+def cluster_duplicates(boxes: np.ndarray, keys: Sequence[Sequence[Optional[str]]],
+                       iou_threshold: float = IOU_THRESHOLD) -> List[ComponentCluster]:
+    """重复关系的连通分量（包含单个构件），按最小下标排序"""
+    n = len(boxes)
+    if not n:
+        return []
+    labels = component_labels(n, *duplicate_pairs(boxes, keys, iou_threshold))
+    order = np.argsort(labels, kind='stable')
+    split_at = np.flatnonzero(np.diff(labels[order])) + 1
+
+    starts = np.concatenate([[0], split_at])
+    sorted_boxes = boxes[order]
+    # 按分量分段归约：并集取最小起点/最大终点，交集取最大起点/最小终点（含 NaN 的分量为 NaN）
+    union = np.hstack([np.minimum.reduceat(sorted_boxes[:, :2], starts),
+                       np.maximum.reduceat(sorted_boxes[:, 2:], starts)])
+    overlap = np.hstack([np.maximum.reduceat(sorted_boxes[:, :2], starts),
+                         np.minimum.reduceat(sorted_boxes[:, 2:], starts)])
+    sizes = np.diff(np.append(starts, n))
+    # 单个构件没有重叠区；链式连通的成员可能没有公共交集
+    has_overlap = (sizes > 1) & (overlap[:, 2] > overlap[:, 0]) & (overlap[:, 3] > overlap[:, 1])
+    has_box = np.isfinite(union).all(axis=1)
+
+    clusters = []
+    for k, group in enumerate(np.split(order, split_at)):
+        clusters.append(ComponentCluster(
+            indices=group.tolist(),
+            bbox=union[k].tolist() if has_box[k] else None,
+            overlap_bbox=overlap[k].tolist() if has_overlap[k] else None
+        ))
+    return clusters
+
+
+def cluster_components(components: Sequence[Dict[str, Any]], key_fields: Sequence[str],
+                       iou_threshold: float = IOU_THRESHOLD, bbox_key: str = 'bbox') -> List[ComponentCluster]:
+    """按 key_fields 中任一字段分桶、桶内按 IoU 聚类构件"""
+    keys = [component_keys(components, field) for field in key_fields]
+    return cluster_duplicates(bbox_array(components, bbox_key), keys, iou_threshold)
+
+
+def brute_force_clusters(boxes: np.ndarray, keys: Sequence[Sequence[Optional[str]]],
+                         iou_threshold: float = IOU_THRESHOLD) -> List[List[int]]:
+    """逐对比较的参考实现，用于对照测试和基准"""
+    n = len(boxes)
+    items = boxes.tolist()
+    labels = list(range(n))
+
+    def find(i):
+        while labels[i] != i:
+            labels[i] = labels[labels[i]]
+            i = labels[i]
+        return i
+
+    for i in range(n):
+        for j in range(i + 1, n):
+            if not any(field[i] is not None and field[i] == field[j] for field in keys):
+                continue
+            a, b = items[i], items[j]
+            if a[0] != a[0] or b[0] != b[0]:
+                continue
+            inter = max(0, min(a[2], b[2]) - max(a[0], b[0])) * max(0, min(a[3], b[3]) - max(a[1], b[1]))
+            union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+            if union > 0 and inter / union > iou_threshold:
+                root_i, root_j = find(i), find(j)
+                labels[max(root_i, root_j)] = min(root_i, root_j)
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(n):
+        groups.setdefault(find(i), []).append(i)
+    return sorted(groups.values())
+
+
+def synthetic_components(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    模拟 2048 切片、200 像素重叠的整图识别结果（每个切片约150个构件）：
+    重叠区内的构件被相邻切片各识别一次，框带抖动
+    """
+    rng = np.random.default_rng(seed)
+    types = ['框架柱', '框架梁', '剪力墙', '楼板', '基础']
+    slice_size, overlap = 2048, 200
+    extent = max(1.0, (n / 150) ** 0.5) * slice_size
+    components = []
+    while len(components) < n:
+        x, y = rng.uniform(0, extent, 2)
+        width, height = rng.uniform(30, 400, 2)
+        kind = int(rng.integers(len(types)))
+        component_id = f"{'KZ' if kind == 0 else 'KL'}{int(rng.integers(1, 40))}"
+        # 落在切片重叠带内的构件重复出现
+        in_overlap = (x % (slice_size - overlap)) < overlap or (y % (slice_size - overlap)) < overlap
+        for copy in range(2 if in_overlap else 1):
+            jitter = rng.normal(0, 4, 4)
+            components.append({
+                'component_id': component_id if rng.random() > 0.1 else f" {component_id.lower()} ",
+                'component_type': types[kind],
+                'bbox': [x + jitter[0], y + jitter[1], x + width + jitter[2], y + height + jitter[3]],
+                'confidence': float(rng.uniform(0.5, 1.0)),
+                'quantity': 1,
+                'slice_source': {'slice_id': f"slice_{copy}"},
+            })
+    return components[:n]
+
+
+def benchmark(sizes: Sequence[int] = (1000, 5000, 20000), brute_force_limit: int = 2000,
+              repeat: int = 3) -> List[Dict[str, Any]]:
+    """基准：扫描线 IoU 聚类（取 repeat 次最短耗时）与逐对参考实现的对比（超过 brute_force_limit 的规模不跑逐对版本）"""
+    rows = []
+    for n in sizes:
+        components = synthetic_components(n)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            keys = [component_keys(components, 'component_id'), component_keys(components, 'component_type')]
+            boxes = bbox_array(components)
+            clusters = cluster_duplicates(boxes, keys)
+            timings.append((time.perf_counter() - start) * 1000)
+        row = {'components': n, 'clusters': len(clusters),
+               'merged': sum(1 for cluster in clusters if len(cluster.indices) > 1),
+               'kernel_ms': round(min(timings), 1)}
+        if n <= brute_force_limit:
+            start = time.perf_counter()
+            reference = brute_force_clusters(boxes, keys)
+            row['brute_force_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            row['identical'] = reference == [cluster.indices for cluster in clusters]
+        rows.append(row)
+    return rows
+
+
+def main(argv: List[str] = None) -> int:
+    args = argv if argv is not None else sys.argv[1:]
+    sizes = [int(arg) for arg in args] or [1000, 5000, 20000]
+    for row in benchmark(sizes):
+        print("  ".join(f"{key}={value}" for key, value in row.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
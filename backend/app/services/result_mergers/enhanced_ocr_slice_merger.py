@@ -16,6 +16,8 @@ import logging
 from collections import defaultdict
 import re
 
+from .text_similarity import text_similarity
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -424,49 +426,9 @@ class EnhancedOCRSliceMerger:
         return False
     
     def _calculate_text_similarity_enhanced(self, text1: str, text2: str) -> float:
-        """增强文本相似度计算"""
-        
-        if not text1 or not text2:
-            return 0.0
-        
-        # 标准化文本
-        clean_text1 = re.sub(r'\s+', '', text1.strip().upper())
-        clean_text2 = re.sub(r'\s+', '', text2.strip().upper())
+        """增强文本相似度计算（有界编辑距离，低于0.7的相似度不参与任何判定规则，直接返回0）"""
         
-        if clean_text1 == clean_text2:
-            return 1.0
-        
-        # 计算编辑距离相似度
-        def levenshtein_ratio(s1, s2):
-            if len(s1) == 0 or len(s2) == 0:
-                return 0.0
-            
-            max_len = max(len(s1), len(s2))
-            distance = self._levenshtein_distance(s1, s2)
-            return 1.0 - (distance / max_len)
-        
-        return levenshtein_ratio(clean_text1, clean_text2)
-    
-    def _levenshtein_distance(self, s1: str, s2: str) -> int:
-        """计算编辑距离"""
-        
-        if len(s1) < len(s2):
-            return self._levenshtein_distance(s2, s1)
-        
-        if len(s2) == 0:
-            return len(s1)
-        
-        previous_row = list(range(len(s2) + 1))
-        for i, c1 in enumerate(s1):
-            current_row = [i + 1]
-            for j, c2 in enumerate(s2):
-                insertions = previous_row[j + 1] + 1
-                deletions = current_row[j] + 1
-                substitutions = previous_row[j] + (c1 != c2)
-                current_row.append(min(insertions, deletions, substitutions))
-            previous_row = current_row
-        
-        return previous_row[-1]
+        return text_similarity(text1, text2, min_similarity=0.7)
     
     def _calculate_bbox_overlap_ratio(self, bbox1: List[int], bbox2: List[int]) -> float:
         """计算边界框重叠比例"""
@@ -16,6 +16,9 @@ import logging
 from collections import defaultdict
 import re
 
+from .text_layout import LAYOUT_KEY, TextLayout, compute_layout, layout_boxes
+from .text_similarity import normalise_text, text_similarity
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -100,7 +103,7 @@ class EnhancedPaddleOCRMerger:
         logger.info(f"✅ 目标2完成: 去重移除 {duplicate_count} 个重复区域")
         
         # 🎯 目标3: 正确排序 - 按图纸阅读顺序重新排列
-        sorted_regions = self._objective3_correct_reading_order(
+        sorted_regions, layout = self._objective3_correct_reading_order(
             deduplicated_regions, original_image_info
         )
         logger.info(f"✅ 目标3完成: 阅读排序 {len(sorted_regions)} 个区域")
@@ -123,7 +126,7 @@ class EnhancedPaddleOCRMerger:
         
         # 生成最终结果
         final_result = self._generate_enhanced_final_result(
-            sorted_regions, original_image_info, task_id, stats
+            sorted_regions, original_image_info, task_id, stats, layout
         )
         
         logger.info(f"🎉 增强合并完成: {total_input_regions} -> {len(sorted_regions)} 个区域，"
@@ -537,48 +540,23 @@ class EnhancedPaddleOCRMerger:
         return False, ""
 
     def _calculate_text_similarity_enhanced(self, text1: str, text2: str) -> float:
-        """增强版文本相似度计算"""
+        """增强版文本相似度计算（有界编辑距离，低于0.6的相似度不参与任何判定规则，直接返回0）"""
         
         if not text1 or not text2:
             return 0.0
         
         # 标准化文本（去除空格、统一大小写）
-        clean_text1 = re.sub(r'\s+', '', text1.strip().upper())
-        clean_text2 = re.sub(r'\s+', '', text2.strip().upper())
+        clean_text1 = normalise_text(text1)
+        clean_text2 = normalise_text(text2)
         
         if clean_text1 == clean_text2:
             return 1.0
         
         # 对于短文本，使用更严格的判断
         if len(clean_text1) <= 3 or len(clean_text2) <= 3:
-            return 1.0 if clean_text1 == clean_text2 else 0.0
-        
-        # 使用编辑距离计算相似度
-        distance = self._levenshtein_distance(clean_text1, clean_text2)
-        max_len = max(len(clean_text1), len(clean_text2))
+            return 0.0
         
-        return 1.0 - (distance / max_len) if max_len > 0 else 0.0
-
-    def _levenshtein_distance(self, s1: str, s2: str) -> int:
-        """计算编辑距离"""
-        
-        if len(s1) < len(s2):
-            return self._levenshtein_distance(s2, s1)
-        
-        if len(s2) == 0:
-            return len(s1)
-        
-        previous_row = list(range(len(s2) + 1))
-        for i, c1 in enumerate(s1):
-            current_row = [i + 1]
-            for j, c2 in enumerate(s2):
-                insertions = previous_row[j + 1] + 1
-                deletions = current_row[j] + 1
-                substitutions = previous_row[j] + (c1 != c2)
-                current_row.append(min(insertions, deletions, substitutions))
-            previous_row = current_row
-        
-        return previous_row[-1]
+        return text_similarity(clean_text1, clean_text2, min_similarity=0.6)
 
     def _calculate_bbox_overlap_ratio(self, bbox1: List[int], bbox2: List[int]) -> float:
         """计算边界框重叠比例（IoU）"""
@@ -628,40 +606,22 @@ class EnhancedPaddleOCRMerger:
 
     def _objective3_correct_reading_order(self, 
                                         regions: List[EnhancedTextRegion], 
-                                        original_image_info: Dict[str, Any]) -> List[EnhancedTextRegion]:
-        """🎯 目标3: 正确排序 - 按图纸阅读顺序排列（从上到下，从左到右）"""
+                                        original_image_info: Dict[str, Any]) -> Tuple[List[EnhancedTextRegion], TextLayout]:
+        """🎯 目标3: 正确排序 - 按图纸阅读顺序排列（从上到下，从左到右），同时返回排序后区域的版面分析"""
         
         logger.info("🎯 执行目标3: 正确排序 - 图纸阅读顺序排列")
         
         if not regions:
-            return []
+            return [], compute_layout(layout_boxes([]))
         
         image_width = original_image_info.get('width', 2000)
         image_height = original_image_info.get('height', 2000)
         
-        # 计算每个区域的阅读顺序权重
-        for i, region in enumerate(regions):
-            bbox = region.bbox
-            if len(bbox) >= 4:
-                x1, y1, x2, y2 = bbox
-                center_x = (x1 + x2) / 2
-                center_y = (y1 + y2) / 2
-                
-                # 使用相对位置计算阅读顺序
-                relative_y = center_y / image_height if image_height > 0 else 0
-                relative_x = center_x / image_width if image_width > 0 else 0
-                
-                # 阅读顺序权重：主要按Y坐标（行），次要按X坐标（列）
-                # Y坐标权重为1000，确保行优先级
-                reading_weight = relative_y * 1000 + relative_x
-                region.reading_order = reading_weight
-            else:
-                region.reading_order = float('inf')  # 无效bbox放在最后
-        
-        # 按阅读顺序排序
-        sorted_regions = sorted(regions, key=lambda x: x.reading_order)
+        # 一次版面分析得到行聚类和阅读顺序（行从上到下，行内从左到右；无效bbox排在最后）
+        layout = compute_layout(layout_boxes(regions))
+        sorted_regions = layout.ordered(regions)
         
-        # 重新分配连续的序号
+        # 分配连续的序号
         for i, region in enumerate(sorted_regions):
             region.reading_order = i
         
@@ -669,7 +629,8 @@ class EnhancedPaddleOCRMerger:
         self._validate_reading_order(sorted_regions, image_width, image_height)
         
         logger.info(f"📖 阅读排序完成: {len(sorted_regions)} 个区域按从上到下、从左到右排列")
-        return sorted_regions
+        # 排序后区域对应的版面结果，生成最终结果时直接复用
+        return sorted_regions, layout.reindexed()
 
     def _validate_reading_order(self, regions: List[EnhancedTextRegion], 
                                image_width: int, image_height: int):
@@ -700,12 +661,15 @@ class EnhancedPaddleOCRMerger:
                                       regions: List[EnhancedTextRegion], 
                                       original_image_info: Dict[str, Any],
                                       task_id: str,
-                                      stats: MergeStatistics) -> Dict[str, Any]:
-        """生成增强版最终结果"""
+                                      stats: MergeStatistics,
+                                      layout: Optional[TextLayout] = None) -> Dict[str, Any]:
+        """生成增强版最终结果，layout 为按阅读顺序排列后区域的版面分析"""
+        
+        if layout is None:
+            layout = compute_layout(layout_boxes(regions))
         
         # 转换为标准格式
         text_regions_data = []
-        full_text_lines = []
         
         for region in regions:
             region_data = {
@@ -723,10 +687,9 @@ class EnhancedPaddleOCRMerger:
                 region_data['polygon'] = region.polygon
             
             text_regions_data.append(region_data)
-            full_text_lines.append(region.text)
         
-        # 生成完整文本
-        full_text_content = '\n'.join(full_text_lines)
+        # 生成完整文本：同一行的文本以空格拼接
+        full_text_content = '\n'.join(layout.row_texts([region.text for region in regions]))
         
         # 按类型分组统计
         type_stats = defaultdict(int)
@@ -747,6 +710,7 @@ class EnhancedPaddleOCRMerger:
             'text_regions': text_regions_data,
             'full_text_content': full_text_content,
             'total_text_regions': len(regions),
+            LAYOUT_KEY: layout.to_dict('text_regions'),
             
             # 🎯 四大目标实现情况
             'four_objectives_status': {
@@ -9,6 +9,9 @@ from typing import Dict, List, Any, Tuple, Optional
 from dataclasses import dataclass
 import logging
 
+from .text_layout import TextLayout, compute_layout, layout_boxes
+from .text_similarity import text_similarity
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -34,6 +37,9 @@ class OCRFullResult:
     processing_summary: Dict[str, Any]
     merge_metadata: Dict[str, Any]
     timestamp: float
+    
+    # 版面分析（行聚类、分列、阅读顺序），下标对应 all_text_regions
+    text_layout: Optional[Dict[str, Any]] = None
 
 class OCRSliceMerger:
     """OCR切片结果合并器"""
@@ -88,9 +94,10 @@ class OCRSliceMerger:
         # 2. 去除重叠区域的重复文本
         deduplicated_regions = self._remove_overlapping_duplicates(all_text_regions)
         
-        # 3. 按位置排序和分组
+        # 3. 版面分析（行聚类、分列、阅读顺序），按位置排序和分组
+        layout = compute_layout(layout_boxes(deduplicated_regions))
         positioned_text = self._organize_text_by_position(
-            deduplicated_regions, original_image_info
+            deduplicated_regions, original_image_info, layout
         )
         
         # 4. 生成完整文本内容
@@ -129,7 +136,8 @@ class OCRSliceMerger:
                 'slices_processed': len(slice_results),
                 'merge_time': time.time() - start_time
             },
-            timestamp=time.time()
+            timestamp=time.time(),
+            text_layout=layout.to_dict('all_text_regions')
         )
         
         logger.info(f"✅ OCR切片合并完成: {len(all_text_regions)} -> {len(deduplicated_regions)} 个文本区域")
@@ -245,70 +253,66 @@ class OCRSliceMerger:
     
     def _organize_text_by_position(self, 
                                  text_regions: List[Dict[str, Any]], 
-                                 original_image_info: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """按位置组织文本"""
+                                 original_image_info: Dict[str, Any],
+                                 layout: Optional[TextLayout] = None) -> List[Dict[str, Any]]:
+        """按版面分析的阅读顺序组织文本（行从上到下，行内从左到右），无效bbox的区域不参与"""
+        
+        boxes = layout_boxes(text_regions)
+        if layout is None:
+            layout = compute_layout(boxes)
+        centers = (boxes[:, :2] + boxes[:, 2:]) / 2
         
         image_width = original_image_info.get('width', 0)
         image_height = original_image_info.get('height', 0)
         
-        # 将图像分成网格区域进行位置分组
+        # 网格位置保留作粗略的区域定位
         grid_rows = 10
         grid_cols = 10
         
         positioned_text = []
         
-        for region in text_regions:
-            bbox = region.get('bbox', [0, 0, 0, 0])
-            if len(bbox) >= 4:
-                # 计算文本中心点
-                center_x = (bbox[0] + bbox[2]) / 2
-                center_y = (bbox[1] + bbox[3]) / 2
-                
-                # 计算所在网格
-                grid_x = int(center_x / image_width * grid_cols) if image_width > 0 else 0
-                grid_y = int(center_y / image_height * grid_rows) if image_height > 0 else 0
-                
-                positioned_region = region.copy()
-                positioned_region['position_info'] = {
-                    'center': (center_x, center_y),
-                    'grid': (grid_x, grid_y),
-                    'relative_position': (
-                        center_x / image_width if image_width > 0 else 0,
-                        center_y / image_height if image_height > 0 else 0
-                    )
-                }
-                
-                positioned_text.append(positioned_region)
-        
-        # 按位置排序（从上到下，从左到右）
-        positioned_text.sort(key=lambda x: (
-            x['position_info']['grid'][1],  # Y网格优先
-            x['position_info']['grid'][0]   # 然后X网格
-        ))
+        for index in layout.reading_order.tolist():
+            if layout.row_ids[index] < 0:
+                continue
+            region = text_regions[index]
+            center_x, center_y = centers[index].tolist()
+            
+            grid_x = int(center_x / image_width * grid_cols) if image_width > 0 else 0
+            grid_y = int(center_y / image_height * grid_rows) if image_height > 0 else 0
+            
+            positioned_region = region.copy()
+            positioned_region['position_info'] = {
+                'center': (center_x, center_y),
+                'grid': (grid_x, grid_y),
+                'relative_position': (
+                    center_x / image_width if image_width > 0 else 0,
+                    center_y / image_height if image_height > 0 else 0
+                ),
+                'row': int(layout.row_ids[index]),
+                'line': int(layout.line_ids[index]),
+                'column': int(layout.column_ids[index])
+            }
+            
+            positioned_text.append(positioned_region)
         
         return positioned_text
     
     def _generate_full_text_content(self, positioned_text: List[Dict[str, Any]]) -> str:
-        """生成完整的文本内容"""
-        
-        if not positioned_text:
-            return ""
-        
-        # 按行分组
-        lines = {}
-        for region in positioned_text:
-            grid_y = region['position_info']['grid'][1]
-            if grid_y not in lines:
-                lines[grid_y] = []
-            lines[grid_y].append(region)
+        """生成完整的文本内容：positioned_text 已按阅读顺序排列，同一行的文本以空格拼接"""
         
-        # 生成文本
         full_text_lines = []
-        for y in sorted(lines.keys()):
-            line_regions = sorted(lines[y], key=lambda x: x['position_info']['grid'][0])
-            line_text = ' '.join(region.get('text', '').strip() for region in line_regions)
-            if line_text.strip():
-                full_text_lines.append(line_text.strip())
+        current_row, current_texts = None, []
+        for region in positioned_text:
+            row = region['position_info']['row']
+            if row != current_row and current_texts:
+                full_text_lines.append(' '.join(current_texts))
+                current_texts = []
+            current_row = row
+            text = region.get('text', '').strip()
+            if text:
+                current_texts.append(text)
+        if current_texts:
+            full_text_lines.append(' '.join(current_texts))
         
         return '\n'.join(full_text_lines)
     
@@ -392,18 +396,8 @@ class OCRSliceMerger:
         }
     
     def _calculate_text_similarity(self, text1: str, text2: str) -> float:
-        """计算文本相似度"""
-        if not text1 or not text2:
-            return 0.0
-        
-        # 简单的字符级相似度计算
-        set1 = set(text1.lower())
-        set2 = set(text2.lower())
-        
-        intersection = len(set1 & set2)
-        union = len(set1 | set2)
-        
-        return intersection / union if union > 0 else 0.0
+        """计算文本相似度（有界编辑距离，低于0.5的相似度不参与重复判定，直接返回0）"""
+        return text_similarity(text1, text2, min_similarity=0.5)
     
     def _calculate_bbox_overlap(self, bbox1: List[int], bbox2: List[int]) -> float:
         """计算边界框重叠率"""
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR 文本版面分析（行聚类、分列、阅读顺序）
+合并后的文本区域只做一次版面分析，GPT 提示词、TXT 导出、表格提取共用同一份结果:
+    1. 行: 按框中心 y 排序，相邻中心差超过容差即换行；为避免密集文字链式串成一大行，
+       同一段内再按中位字高分档（容差随中位字高缩放）
+    2. 文本行: 行内按 x1 排序，与前面文本框的最大右边界间距超过阈值即断开（对应原来的相邻合并）
+    3. 列: 框中心 x 排序后相邻间距超过列间距即分列（与原表格提取的列边界规则一致）
+    4. 阅读顺序: 行从上到下、行内从左到右；无效框排在最后，保持输入顺序
+
+版面结果以可 JSON 序列化的字典缓存在合并结果的 text_layout 字段上，
+下游读取同一份合并结果时直接复用，不再各自排序。
+"""
+
+import logging
+import sys
+import time
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LAYOUT_KEY = 'text_layout'
+LAYOUT_VERSION = 1
+
+ROW_MIN_TOLERANCE = 10.0      # 行容差下限（像素）
+ROW_TOLERANCE_FACTOR = 0.5    # 行容差 = 中位字高 × 系数
+LINE_MIN_GAP = 30.0           # 行内断开的水平间距下限（像素）
+LINE_GAP_FACTOR = 1.0         # 行内断开间距 = 中位字高 × 系数
+COLUMN_GAP = 50.0             # 分列的水平间距（像素）
+
+
+def _parse_box(value: Any) -> Optional[List[float]]:
+    """
+    解析单个文本框为 [x1, y1, x2, y2]
+
+    支持 [x1, y1, x2, y2]、多边形顶点 [[x, y], ...] 以及 {'x_min', 'y_min', 'x_max', 'y_max'}；
+    无法解析返回 None
+    """
+    try:
+        if isinstance(value, dict):
+            x1, y1, x2, y2 = (float(value[key]) for key in ('x_min', 'y_min', 'x_max', 'y_max'))
+        elif isinstance(value, (list, tuple)) and value and isinstance(value[0], (list, tuple)):
+            xs = [float(point[0]) for point in value]
+            ys = [float(point[1]) for point in value]
+            x1, y1, x2, y2 = min(xs), min(ys), max(xs), max(ys)
+        elif isinstance(value, (list, tuple)) and len(value) >= 4:
+            x1, y1, x2, y2 = (float(v) for v in value[:4])
+        else:
+            return None
+    except (TypeError, ValueError, KeyError, IndexError):
+        return None
+    if not (x2 >= x1 and y2 >= y1):
+        return None
+    return [x1, y1, x2, y2]
+
+
+def layout_boxes(regions: Sequence[Any], keys: Sequence[str] = ('bbox', 'box', 'bbox_xyxy')) -> np.ndarray:
+    """
+    文本区域转为 (n, 4) 数组，无法解析的框记为 NaN
+
+    区域可以是字典（依次尝试 keys 中的字段）或带 bbox 属性的对象
+    """
+    # 常见情况：所有区域都有 [x1, y1, x2, y2] 形式的 bbox，整体转换
+    if regions and all(isinstance(region, dict) for region in regions):
+        try:
+            boxes = np.array([region[keys[0]] for region in regions], dtype=float)
+        except (KeyError, TypeError, ValueError):
+            boxes = None
+        if boxes is not None and boxes.shape == (len(regions), 4):
+            boxes[~((boxes[:, 2] >= boxes[:, 0]) & (boxes[:, 3] >= boxes[:, 1]))] = np.nan
+            return boxes
+
+    boxes = np.full((len(regions), 4), np.nan)
+    for i, region in enumerate(regions):
+        for key in keys:
+            value = region.get(key) if isinstance(region, dict) else getattr(region, key, None)
+            if value is None:
+                continue
+            box = _parse_box(value)
+            if box is not None:
+                boxes[i] = box
+                break
+    return boxes
+
+
+def _segment_starts(labels: np.ndarray) -> np.ndarray:
+    """已排序标签数组中每段的起始下标"""
+    return np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]]) if len(labels) else np.empty(0, dtype=np.int64)
+
+
+@dataclass
+class TextLayout:
+    """一组文本区域的版面分析结果（下标均指向输入区域列表）"""
+    reading_order: np.ndarray    # 阅读顺序排列的区域下标
+    row_ids: np.ndarray          # 每个区域所在行（从上到下编号），无效框为 -1
+    line_ids: np.ndarray         # 每个区域所在文本行（按阅读顺序编号），无效框为 -1
+    column_ids: np.ndarray       # 每个区域所在列（从左到右编号），无效框为 -1
+    line_boxes: np.ndarray       # 每个文本行的包围盒 (num_lines, 4)
+
+    @property
+    def region_count(self) -> int:
+        return len(self.row_ids)
+
+    @property
+    def column_count(self) -> int:
+        return int(self.column_ids.max()) + 1 if len(self.column_ids) and self.column_ids.max() >= 0 else 0
+
+    def _groups(self, ids: np.ndarray) -> List[List[int]]:
+        ordered = self.reading_order[ids[self.reading_order] >= 0]
+        if not len(ordered):
+            return []
+        bounds = _segment_starts(ids[ordered]).tolist() + [len(ordered)]
+        ordered = ordered.tolist()
+        return [ordered[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+    def rows(self) -> List[List[int]]:
+        """按行分组的区域下标，行内从左到右"""
+        return self._groups(self.row_ids)
+
+    def lines(self) -> List[List[int]]:
+        """按文本行分组的区域下标，行内从左到右"""
+        return self._groups(self.line_ids)
+
+    def ordered(self, items: Sequence[Any]) -> List[Any]:
+        """按阅读顺序重排与区域一一对应的列表"""
+        return [items[i] for i in self.reading_order.tolist()]
+
+    def reindexed(self) -> 'TextLayout':
+        """区域按阅读顺序重排后对应的版面结果（阅读顺序即下标顺序）"""
+        order = self.reading_order
+        return TextLayout(np.arange(len(order)), self.row_ids[order], self.line_ids[order],
+                          self.column_ids[order], self.line_boxes)
+
+    @staticmethod
+    def _join(texts: Sequence[str], groups: List[List[int]]) -> List[str]:
+        joined = []
+        for group in groups:
+            text = ' '.join(t for t in ((texts[i] or '').strip() for i in group) if t)
+            if text:
+                joined.append(text)
+        return joined
+
+    def row_texts(self, texts: Sequence[str]) -> List[str]:
+        """每行拼接为一段文本（空行省略）"""
+        return self._join(texts, self.rows())
+
+    def line_texts(self, texts: Sequence[str]) -> List[str]:
+        """每个文本行拼接为一段文本（空行省略）"""
+        return self._join(texts, self.lines())
+
+    def to_dict(self, regions_key: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            'version': LAYOUT_VERSION,
+            'regions_key': regions_key,
+            'region_count': self.region_count,
+            'reading_order': self.reading_order.tolist(),
+            'row_ids': self.row_ids.tolist(),
+            'line_ids': self.line_ids.tolist(),
+            'column_ids': self.column_ids.tolist(),
+            'line_boxes': self.line_boxes.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TextLayout':
+        return cls(
+            reading_order=np.asarray(data['reading_order'], dtype=np.int64),
+            row_ids=np.asarray(data['row_ids'], dtype=np.int64),
+            line_ids=np.asarray(data['line_ids'], dtype=np.int64),
+            column_ids=np.asarray(data['column_ids'], dtype=np.int64),
+            line_boxes=np.asarray(data['line_boxes'], dtype=float).reshape(-1, 4),
+        )
+
+
+def compute_layout(boxes: np.ndarray, column_gap: float = COLUMN_GAP) -> TextLayout:
+    """
+    对 (n, 4) 文本框数组做一次版面分析
+
+    Args:
+        boxes: layout_boxes 的结果，含 NaN 的行视为无效框
+        column_gap: 分列的水平间距
+    """
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+    n = len(boxes)
+    row_ids = np.full(n, -1, dtype=np.int64)
+    line_ids = np.full(n, -1, dtype=np.int64)
+    column_ids = np.full(n, -1, dtype=np.int64)
+    valid = np.flatnonzero(np.isfinite(boxes).all(axis=1))
+    invalid = np.setdiff1d(np.arange(n), valid)
+    if not len(valid):
+        return TextLayout(invalid, row_ids, line_ids, column_ids, np.empty((0, 4)))
+
+    x1, y1, x2, y2 = boxes[valid].T
+    heights = y2 - y1
+    median_height = float(np.median(heights))
+    row_tolerance = max(ROW_MIN_TOLERANCE, ROW_TOLERANCE_FACTOR * median_height)
+    line_gap = max(LINE_MIN_GAP, LINE_GAP_FACTOR * median_height)
+
+    # 1. 行：中心 y 单链接分段，段内再按字高分档
+    center_y = (y1 + y2) / 2
+    by_y = np.argsort(center_y, kind='stable')
+    sorted_y = center_y[by_y]
+    band = np.cumsum(np.r_[0, np.diff(sorted_y) > row_tolerance])
+    band_start = sorted_y[_segment_starts(band)][band]
+    tier = np.floor((sorted_y - band_start) / max(median_height, row_tolerance)).astype(np.int64)
+    rows = np.cumsum(np.r_[0, (np.diff(band) > 0) | (np.diff(tier) > 0)])
+    valid_rows = np.empty(len(valid), dtype=np.int64)
+    valid_rows[by_y] = rows
+
+    # 2. 行内按 x1 排序（即阅读顺序），与同行已出现的最大右边界比较断开文本行；
+    #    按行号叠加偏移后一次累积最大值，行与行之间互不影响
+    order = np.lexsort((center_y, x1, valid_rows))
+    span = float(np.nanmax(x2) - np.nanmin(x1))
+    offset = valid_rows[order] * (span + line_gap + 1.0)
+    left = x1[order] + offset
+    running_right = np.maximum.accumulate(x2[order] + offset)
+    breaks = np.r_[True, left[1:] - running_right[:-1] > line_gap]
+    lines = np.cumsum(breaks) - 1
+
+    line_starts = np.flatnonzero(breaks)
+    ordered_boxes = boxes[valid][order]
+    line_boxes = np.hstack([np.minimum.reduceat(ordered_boxes[:, :2], line_starts),
+                            np.maximum.reduceat(ordered_boxes[:, 2:], line_starts)])
+
+    # 3. 列：中心 x 单链接分段
+    center_x = (x1 + x2) / 2
+    by_x = np.argsort(center_x, kind='stable')
+    columns = np.cumsum(np.r_[0, np.diff(center_x[by_x]) > column_gap])
+
+    row_ids[valid] = valid_rows
+    line_ids[valid[order]] = lines
+    column_ids[valid[by_x]] = columns
+    reading_order = np.concatenate([valid[order], invalid])
+    return TextLayout(reading_order, row_ids, line_ids, column_ids, line_boxes)
+
+
+def layout_for(result: Dict[str, Any], regions_key: str = 'text_regions',
+               regions: Optional[Sequence[Any]] = None) -> TextLayout:
+    """
+    取合并结果上缓存的版面分析，没有或与区域列表不一致时计算并写回 result[LAYOUT_KEY]
+
+    Args:
+        result: 合并结果字典
+        regions_key: 版面下标对应的区域列表字段
+        regions: 区域列表，默认取 result[regions_key]
+    """
+    if regions is None:
+        regions = result.get(regions_key) or []
+    cached = result.get(LAYOUT_KEY)
+    if (isinstance(cached, dict) and cached.get('version') == LAYOUT_VERSION
+            and cached.get('regions_key') == regions_key and cached.get('region_count') == len(regions)):
+        try:
+            return TextLayout.from_dict(cached)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"⚠️ 缓存的版面分析无法解析，重新计算: {e}")
+
+    layout = compute_layout(layout_boxes(regions))
+    result[LAYOUT_KEY] = layout.to_dict(regions_key)
+    return layout
+
+
+def synthetic_regions(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """模拟整张图纸的 OCR 结果：若干说明文字段落、表格区和零散标注"""
+    rng = np.random.default_rng(seed)
+    words = ['KZ1', 'KL2', 'C30', 'HRB400', '300x600', '梁顶标高', '详见说明', '@200', 'Φ8', '±0.000']
+    regions = []
+    while len(regions) < n:
+        kind = rng.random()
+        origin_x, origin_y = rng.uniform(0, 8000, 2)
+        height = rng.uniform(18, 40)
+        if kind < 0.6:
+            # 段落/表格：多行多列排布，带轻微倾斜误差
+            for row in range(int(rng.integers(3, 12))):
+                x = origin_x
+                for _ in range(int(rng.integers(2, 8))):
+                    width = rng.uniform(40, 240)
+                    y = origin_y + row * height * 1.6 + rng.normal(0, 2)
+                    regions.append({'text': str(rng.choice(words)),
+                                    'bbox': [x, y, x + width, y + height],
+                                    'confidence': float(rng.uniform(0.6, 1.0))})
+                    x += width + rng.uniform(5, 60)
+        else:
+            width = rng.uniform(30, 200)
+            regions.append({'text': str(rng.choice(words)),
+                            'bbox': [origin_x, origin_y, origin_x + width, origin_y + height],
+                            'confidence': float(rng.uniform(0.6, 1.0))})
+    return regions[:n]
+
+
+def legacy_passes(regions: Sequence[Dict[str, Any]]) -> int:
+    """原来各下游分别做的排序+分桶循环（网格排序拼全文、y 容差聚行、相邻合并），用于基准对照"""
+    boxes = [region['bbox'] for region in regions]
+    texts = [region['text'] for region in regions]
+    width = max(box[2] for box in boxes) or 1
+    height = max(box[3] for box in boxes) or 1
+
+    # 网格排序 + 按网格行拼全文（OCRSliceMerger / ResultMergerService）
+    grid = sorted(range(len(boxes)), key=lambda i: (int((boxes[i][1] + boxes[i][3]) / 2 / height * 10),
+                                                     int((boxes[i][0] + boxes[i][2]) / 2 / width * 10)))
+    grid_rows: Dict[int, List[int]] = {}
+    for i in grid:
+        grid_rows.setdefault(int((boxes[i][1] + boxes[i][3]) / 2 / height * 10), []).append(i)
+    count = len(grid_rows)
+
+    # y_min 容差聚行（TableExtractorService）
+    by_y = sorted(range(len(boxes)), key=lambda i: (boxes[i][1], boxes[i][0]))
+    table_lines, current = [], [by_y[0]]
+    for i in by_y[1:]:
+        if abs(boxes[current[-1]][1] - boxes[i][1]) < 10:
+            current.append(i)
+        else:
+            table_lines.append(sorted(current, key=lambda k: boxes[k][0]))
+            current = [i]
+    table_lines.append(current)
+    count += len(table_lines)
+
+    # 相邻合并为句（OCRResultCorrector）
+    merged, last = [], None
+    for i in by_y:
+        x1, y, x2, _ = boxes[i]
+        if last is not None and abs(y - last[1]) <= 10 and x1 - last[2] <= 30:
+            merged[-1].append(texts[i])
+            last = (x1, y, x2)
+            continue
+        merged.append([texts[i]])
+        last = (x1, y, x2)
+    return count + len(merged)
+
+
+def benchmark(sizes: Sequence[int] = (1000, 10000, 50000), repeat: int = 3) -> List[Dict[str, Any]]:
+    """基准：一次向量化版面分析（含三个下游复用）与原有三次排序+循环的耗时对比（取 repeat 次最短）"""
+    rows = []
+    for n in sizes:
+        regions = synthetic_regions(n)
+        texts = [region['text'] for region in regions]
+        legacy, shared = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            legacy_passes(regions)
+            legacy.append((time.perf_counter() - start) * 1000)
+
+            result = {'text_regions': regions}
+            start = time.perf_counter()
+            layout = layout_for(result)
+            layout.row_texts(texts)
+            layout_for(result).line_texts(texts)
+            layout_for(result).rows()
+            shared.append((time.perf_counter() - start) * 1000)
+        rows.append({'regions': n, 'rows': int(layout.row_ids.max()) + 1, 'lines': len(layout.line_boxes),
+                     'columns': layout.column_count, 'legacy_ms': round(min(legacy), 1),
+                     'layout_ms': round(min(shared), 1),
+                     'speedup': round(min(legacy) / min(shared), 1) if min(shared) else None})
+    return rows
+
+
+def main(argv: List[str] = None) -> int:
+    args = argv if argv is not None else sys.argv[1:]
+    sizes = [int(arg) for arg in args] or [1000, 10000, 50000]
+    for row in benchmark(sizes):
+        print("  ".join(f"{key}={value}" for key, value in row.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
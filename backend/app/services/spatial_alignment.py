@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR↔Vision 元素空间对齐
+以容差为边长的哈希网格只为相邻单元内的元素生成候选对，相似度按候选对向量化计算，
+再在候选二分图的每个连通分量上求最优指派（总匹配度最大），替代逐对贪心的 O(n·m) 双重循环。
+
+评分与 SpatialAlignmentEngine 原有定义一致:
+    spatial = 0.6 * max(0, 1 - 中心距离 / 容差) + 0.4 * 面积比
+    overall = 0.7 * spatial + 0.3 * semantic，仅 overall > 0.5 的候选对可以匹配
+
+中心距离不小于容差时 overall <= 0.28 + 0.3 * semantic，只有语义完全一致（文本与标签相同）
+才可能超过0.5，因此候选对 = 网格邻域内的元素对 ∪ 文本与标签相同的元素对，不会遗漏可匹配的组合。
+"""
+
+import logging
+import sys
+import time
+from typing import List, Dict, Any, Callable, Sequence, Tuple
+
+import numpy as np
+
+from app.services.box_overlap import component_labels
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # scipy 属于可选依赖 (requirements-ai.txt)
+    linear_sum_assignment = None
+
+logger = logging.getLogger(__name__)
+
+MIN_MATCH_SCORE = 0.5
+# 单个连通分量的稠密指派矩阵上限（行×列），以及无 scipy 时较短一边的上限，
+# 超过时该分量退化为按分数降序的贪心
+MAX_ASSIGNMENT_CELLS = 4000000
+MAX_FALLBACK_SIDE = 400
+
+_NEIGHBOURS = tuple((dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1))
+
+
+def element_boxes(elements: Sequence[Dict[str, Any]], key: str) -> np.ndarray:
+    """
+    元素框转为 (n, 4) 数组 [x, y, width, height]
+
+    与 _calculate_spatial_similarity 一致：框为空或无法解析的元素记为 NaN（不参与匹配），缺失的分量按0处理。
+    """
+    boxes = np.full((len(elements), 4), np.nan)
+    for i, element in enumerate(elements):
+        box = element.get(key)
+        if not box or not isinstance(box, dict):
+            continue
+        try:
+            boxes[i] = [float(box.get(name, 0)) for name in ('x', 'y', 'width', 'height')]
+        except (TypeError, ValueError):
+            continue
+    return boxes
+
+
+def _centres(boxes: np.ndarray) -> np.ndarray:
+    return boxes[:, :2] + boxes[:, 2:] / 2
+
+
+def grid_pairs(a_xy: np.ndarray, b_xy: np.ndarray, radius: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    找出 a、b 两组点之间中心距离小于半径的所有点对 (i, j)
+
+    b 按所在网格单元排序，对 a 的每个邻域偏移用 searchsorted 定位单元区间，一次性展开候选对。
+    """
+    empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+    a_valid = np.flatnonzero(np.isfinite(a_xy).all(axis=1))
+    b_valid = np.flatnonzero(np.isfinite(b_xy).all(axis=1))
+    if not len(a_valid) or not len(b_valid) or radius <= 0:
+        return empty
+
+    a_cells = np.floor(a_xy[a_valid] / radius).astype(np.int64)
+    b_cells = np.floor(b_xy[b_valid] / radius).astype(np.int64)
+    origin = np.minimum(a_cells.min(axis=0), b_cells.min(axis=0)) - 1
+    a_cells -= origin
+    b_cells -= origin
+    stride = int(max(a_cells[:, 1].max(), b_cells[:, 1].max())) + 2
+    a_keys = a_cells[:, 0] * stride + a_cells[:, 1]
+    b_keys = b_cells[:, 0] * stride + b_cells[:, 1]
+
+    order = np.argsort(b_keys, kind='stable')
+    sorted_keys = b_keys[order]
+    members = b_valid[order]
+
+    left_parts, right_parts = [], []
+    for dx, dy in _NEIGHBOURS:
+        target = a_keys + dx * stride + dy
+        starts = np.searchsorted(sorted_keys, target, side='left')
+        counts = np.searchsorted(sorted_keys, target, side='right') - starts
+        total = int(counts.sum())
+        if total == 0:
+            continue
+        rows = np.repeat(np.arange(len(a_keys)), counts)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        left_parts.append(a_valid[rows])
+        right_parts.append(members[starts[rows] + offsets])
+
+    if not left_parts:
+        return empty
+    left = np.concatenate(left_parts)
+    right = np.concatenate(right_parts)
+    delta = a_xy[left] - b_xy[right]
+    keep = np.hypot(delta[:, 0], delta[:, 1]) < radius
+    return left[keep], right[keep]
+
+
+def identical_label_pairs(texts: Sequence[str], labels: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """文本（小写）与标签（小写）完全相同的元素对，按哈希连接生成"""
+    by_label: Dict[str, List[int]] = {}
+    for j, label in enumerate(labels):
+        if label:
+            by_label.setdefault(label, []).append(j)
+    left, right = [], []
+    for i, text in enumerate(texts):
+        matches = by_label.get(text) if text else None
+        if matches:
+            left.extend([i] * len(matches))
+            right.extend(matches)
+    return np.asarray(left, dtype=np.int64), np.asarray(right, dtype=np.int64)
+
+
+def _lower_strings(elements: Sequence[Dict[str, Any]], key: str) -> List[str]:
+    values = []
+    for element in elements:
+        value = element.get(key, "")
+        values.append(value.lower() if isinstance(value, str) else "")
+    return values
+
+
+def pair_scores(ocr_boxes: np.ndarray, vision_boxes: np.ndarray, first: np.ndarray, second: np.ndarray,
+                tolerance: float, semantic: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """候选对的空间相似度与综合匹配度（向量化）"""
+    a, b = ocr_boxes[first], vision_boxes[second]
+    delta = _centres(a) - _centres(b)
+    distance = np.hypot(delta[:, 0], delta[:, 1])
+    distance_score = np.maximum(0.0, 1 - distance / tolerance)
+
+    a_area = a[:, 2] * a[:, 3]
+    b_area = b[:, 2] * b[:, 3]
+    positive = (a_area > 0) & (b_area > 0)
+    size_score = np.zeros(len(first))
+    size_score[positive] = (np.minimum(a_area, b_area)[positive] /
+                            np.maximum(a_area, b_area)[positive])
+
+    spatial = distance_score * 0.6 + size_score * 0.4
+    return spatial, spatial * 0.7 + semantic * 0.3
+
+
+def _hungarian(cost: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    最小代价指派（行数不大于列数），scipy 不可用时使用
+
+    最短增广路形式的匈牙利算法，对列的松弛更新用 NumPy 完成，复杂度 O(n²·m)。
+    """
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)    # p[j]: 分配到第 j 列的行（1起，0表示未分配）
+    way = np.zeros(m + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            improve = free & (reduced < minv[1:])
+            minv[1:][improve] = reduced[improve]
+            way[1:][improve] = j0
+            candidates = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[1:][free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    cols = np.flatnonzero(p[1:])
+    rows = p[1:][cols] - 1
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+
+def max_weight_assignment(scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """稠密分数矩阵上总分最大的指派，分数为0的位置视为不可匹配"""
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(scores, maximize=True)
+    elif scores.shape[0] <= scores.shape[1]:
+        rows, cols = _hungarian(-scores)
+    else:
+        cols, rows = _hungarian(-scores.T)
+    keep = scores[rows, cols] > 0
+    return rows[keep], cols[keep]
+
+
+def _assignment_fits(n_rows: int, n_cols: int) -> bool:
+    if n_rows * n_cols > MAX_ASSIGNMENT_CELLS:
+        return False
+    return linear_sum_assignment is not None or min(n_rows, n_cols) <= MAX_FALLBACK_SIDE
+
+
+def _greedy_by_score(first: np.ndarray, second: np.ndarray, score: np.ndarray) -> np.ndarray:
+    """按分数降序贪心选边（与输入顺序无关），返回被选中的边下标"""
+    order = np.lexsort((second, first, -score))
+    used_first, used_second, chosen = set(), set(), []
+    for k in order.tolist():
+        i, j = int(first[k]), int(second[k])
+        if i in used_first or j in used_second:
+            continue
+        used_first.add(i)
+        used_second.add(j)
+        chosen.append(k)
+    return np.asarray(chosen, dtype=np.int64)
+
+
+def _assign_components(n_ocr: int, first: np.ndarray, second: np.ndarray,
+                       score: np.ndarray) -> Tuple[np.ndarray, Dict[str, int]]:
+    """在候选二分图的每个连通分量上求最优指派，返回被选中的边下标和分量统计"""
+    stats = {'components': 0, 'largest_component': 0, 'greedy_components': 0}
+    if not len(first):
+        return np.empty(0, dtype=np.int64), stats
+
+    labels = component_labels(n_ocr + int(second.max()) + 1, first, second + n_ocr)[first]
+    order = np.argsort(labels, kind='stable')
+    split_at = np.flatnonzero(np.diff(labels[order])) + 1
+
+    chosen = []
+    for edges in np.split(order, split_at):
+        stats['components'] += 1
+        if len(edges) == 1:
+            chosen.append(edges)
+            stats['largest_component'] = max(stats['largest_component'], 2)
+            continue
+        rows, row_index = np.unique(first[edges], return_inverse=True)
+        cols, col_index = np.unique(second[edges], return_inverse=True)
+        stats['largest_component'] = max(stats['largest_component'], len(rows) + len(cols))
+        if not _assignment_fits(len(rows), len(cols)):
+            stats['greedy_components'] += 1
+            chosen.append(edges[_greedy_by_score(first[edges], second[edges], score[edges])])
+            continue
+        matrix = np.zeros((len(rows), len(cols)))
+        edge_at = np.full((len(rows), len(cols)), -1, dtype=np.int64)
+        matrix[row_index, col_index] = score[edges]
+        edge_at[row_index, col_index] = edges
+        picked_rows, picked_cols = max_weight_assignment(matrix)
+        chosen.append(edge_at[picked_rows, picked_cols])
+    return np.concatenate(chosen), stats
+
+
+def optimal_alignment(ocr_elements: Sequence[Dict[str, Any]], vision_elements: Sequence[Dict[str, Any]],
+                      tolerance: float, semantic_similarity: Callable[[Dict, Dict], float],
+                      min_score: float = MIN_MATCH_SCORE) -> Dict[str, Any]:
+    """
+    OCR 与 Vision 元素的最优一对一对齐
+
+    Args:
+        tolerance: 中心距离容差（像素）
+        semantic_similarity: 语义相似度函数，按 (文本, 标签) 去重后只对候选对调用
+
+    Returns:
+        {'pairs': [(ocr_index, vision_index, score, spatial_score)]（按 OCR 下标排序）, 'stats': {...}}
+    """
+    ocr_boxes = element_boxes(ocr_elements, 'coordinates')
+    vision_boxes = element_boxes(vision_elements, 'bbox')
+    texts = _lower_strings(ocr_elements, 'text')
+    labels = _lower_strings(vision_elements, 'label')
+
+    near_first, near_second = grid_pairs(_centres(ocr_boxes), _centres(vision_boxes), tolerance)
+    same_first, same_second = identical_label_pairs(texts, labels)
+    if len(same_first):
+        valid = np.isfinite(ocr_boxes[same_first]).all(axis=1) & np.isfinite(vision_boxes[same_second]).all(axis=1)
+        same_first, same_second = same_first[valid], same_second[valid]
+    first = np.concatenate([near_first, same_first])
+    second = np.concatenate([near_second, same_second])
+    if len(first):
+        # 近邻且同名的元素对会出现两次
+        _, unique_at = np.unique(first * max(len(vision_elements), 1) + second, return_index=True)
+        first, second = first[unique_at], second[unique_at]
+
+    # 语义相似度只在候选对上按 (文本, 标签) 去重计算
+    cache: Dict[Tuple[int, int], float] = {}
+    text_ids: Dict[str, int] = {}
+    label_ids: Dict[str, int] = {}
+    semantic = np.empty(len(first))
+    for k, (i, j) in enumerate(zip(first.tolist(), second.tolist())):
+        key = (text_ids.setdefault(texts[i], i), label_ids.setdefault(labels[j], j))
+        value = cache.get(key)
+        if value is None:
+            value = cache[key] = semantic_similarity(ocr_elements[i], vision_elements[j])
+        semantic[k] = value
+
+    spatial, score = pair_scores(ocr_boxes, vision_boxes, first, second, tolerance, semantic)
+    keep = score > min_score
+    first, second, spatial, score = first[keep], second[keep], spatial[keep], score[keep]
+
+    chosen, stats = _assign_components(len(ocr_elements), first, second, score)
+    chosen = chosen[np.argsort(first[chosen], kind='stable')]
+    stats.update({'candidates': int(len(near_first) + len(same_first)), 'edges': int(len(first))})
+    pairs = list(zip(first[chosen].tolist(), second[chosen].tolist(),
+                     score[chosen].tolist(), spatial[chosen].tolist()))
+    return {'pairs': pairs, 'stats': stats}
+
+
+def greedy_alignment(ocr_elements: Sequence[Dict[str, Any]], vision_elements: Sequence[Dict[str, Any]],
+                     spatial_similarity: Callable[[Dict, Dict], float],
+                     semantic_similarity: Callable[[Dict, Dict], float],
+                     min_score: float = MIN_MATCH_SCORE) -> List[Tuple[int, int, float]]:
+    """原有的逐对贪心对齐，用于对照测试和基准"""
+    pairs, vision_matched = [], set()
+    for i, ocr_elem in enumerate(ocr_elements):
+        best_score, best_j = 0.0, -1
+        for j, vision_elem in enumerate(vision_elements):
+            if j in vision_matched:
+                continue
+            overall = (spatial_similarity(ocr_elem, vision_elem) * 0.7 +
+                       semantic_similarity(ocr_elem, vision_elem) * 0.3)
+            if overall > best_score and overall > min_score:
+                best_score, best_j = overall, j
+        if best_j >= 0:
+            pairs.append((i, best_j, best_score))
+            vision_matched.add(best_j)
+    return pairs
+
+
+def synthetic_elements(n_ocr: int, n_vision: int, seed: int = 0) -> Tuple[List[Dict], List[Dict]]:
+    """
+    模拟一页图纸的识别结果：Vision 构件框成簇分布，每个构件附近有1~2条 OCR 文本
+    （编号或尺寸标注，位置和大小带扰动），其余 OCR 文本均匀分散
+    """
+    rng = np.random.default_rng(seed)
+    prefixes = ['KZ', 'KL', 'LL', 'Q', 'B', 'GZ']
+    clusters = rng.uniform(0, 20000, size=(max(1, n_vision // 8), 2))
+    vision, ocr = [], []
+    for j in range(n_vision):
+        centre = clusters[rng.integers(len(clusters))] + rng.normal(0, 120, 2)
+        width, height = rng.uniform(20, 80, 2)
+        label = f"{prefixes[rng.integers(len(prefixes))]}{rng.integers(1, 30)}"
+        vision.append({'id': f"vision_{j}", 'label': label, 'confidence': 0.9,
+                       'bbox': {'x': centre[0] - width / 2, 'y': centre[1] - height / 2,
+                                'width': width, 'height': height}})
+        for variant in range(rng.integers(1, 3)):
+            if len(ocr) >= n_ocr:
+                break
+            shift = rng.normal(0, 12, 2)
+            scale = rng.uniform(0.7, 1.3, 2)
+            text = label if variant == 0 else f"{label} {int(rng.integers(200, 900))}x{int(rng.integers(200, 900))}"
+            ocr.append({'text': text, 'confidence': 0.8,
+                        'coordinates': {'x': centre[0] + shift[0] - width * scale[0] / 2,
+                                        'y': centre[1] + shift[1] - height * scale[1] / 2,
+                                        'width': width * scale[0], 'height': height * scale[1]}})
+    while len(ocr) < n_ocr:
+        x, y = rng.uniform(0, 20000, 2)
+        ocr.append({'text': f"{prefixes[rng.integers(len(prefixes))]}{rng.integers(1, 30)}",
+                    'confidence': 0.8,
+                    'coordinates': {'x': x, 'y': y, 'width': rng.uniform(20, 80), 'height': rng.uniform(20, 80)}})
+    order = rng.permutation(len(ocr))
+    return [ocr[k] for k in order], vision
+
+
+def benchmark(sizes: Sequence[Tuple[int, int]] = ((2000, 400), (10000, 2000)),
+              greedy_limit: int = 2000 * 400) -> List[Dict[str, Any]]:
+    """基准：候选网格+分量最优指派与原有贪心的耗时和对齐质量对比（n·m 超过 greedy_limit 不跑贪心）"""
+    from app.services.cross_modal_validation_engine import SpatialAlignmentEngine
+
+    engine = SpatialAlignmentEngine()
+    rows = []
+    for n_ocr, n_vision in sizes:
+        ocr, vision = synthetic_elements(n_ocr, n_vision)
+        start = time.perf_counter()
+        result = optimal_alignment(ocr, vision, engine.coordinate_tolerance,
+                                   engine._calculate_semantic_similarity)
+        row = {'ocr': n_ocr, 'vision': n_vision,
+               'optimal_ms': round((time.perf_counter() - start) * 1000, 1),
+               'matched': len(result['pairs']),
+               'total_score': round(sum(pair[2] for pair in result['pairs']), 2),
+               'largest_component': result['stats']['largest_component'],
+               'solver': 'scipy' if linear_sum_assignment is not None else 'numpy'}
+        if n_ocr * n_vision <= greedy_limit:
+            start = time.perf_counter()
+            reference = greedy_alignment(ocr, vision, engine._calculate_spatial_similarity,
+                                         engine._calculate_semantic_similarity)
+            row['greedy_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            row['greedy_matched'] = len(reference)
+            row['greedy_total_score'] = round(sum(pair[2] for pair in reference), 2)
+        rows.append(row)
+    return rows
+
+
+def main(argv: List[str] = None) -> int:
+    args = argv if argv is not None else sys.argv[1:]
+    sizes = [tuple(int(value) for value in arg.split('x')) for arg in args] or [(2000, 400), (10000, 2000)]
+    for row in benchmark(sizes):
+        print("  ".join(f"{key}={value}" for key, value in row.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
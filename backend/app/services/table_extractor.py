@@ -6,7 +6,9 @@ Table Extractor Service - 从OCR结果中识别和提取表格数据
 import logging
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+from app.services.result_mergers.text_layout import TextLayout, compute_layout, layout_boxes
 
 logger = logging.getLogger(__name__)
 
@@ -14,14 +16,18 @@ class TableExtractorService:
     """
     使用Pandas和正则表达式从OCR结果中提取表格数据。
     """
-    def __init__(self, ocr_results: List[Dict[str, Any]]):
+    def __init__(self, ocr_results: List[Dict[str, Any]], layout: Optional[TextLayout] = None):
         """
         初始化表格提取器。
         
         Args:
             ocr_results (List[Dict[str, Any]]): 经过处理的、包含'text'和'bbox_xyxy'的OCR区域列表。
+            layout (TextLayout, optional): 合并结果上已有的版面分析（下标对应 ocr_results），缺省时计算一次。
         """
-        self.ocr_results = sorted(ocr_results, key=lambda r: (r['bbox_xyxy']['y_min'], r['bbox_xyxy']['x_min']))
+        self.layout = layout if layout is not None else compute_layout(layout_boxes(ocr_results))
+        # 按阅读顺序排列，版面分析的行/列号随之重排
+        self.ocr_results = self.layout.ordered(ocr_results)
+        self._row_ids = self.layout.row_ids[self.layout.reading_order]
         self.raw_texts = [res['text'] for res in self.ocr_results]
         logger.info(f"TableExtractorService initialized with {len(self.ocr_results)} OCR text regions.")
 
@@ -87,12 +93,9 @@ class TableExtractorService:
         logger.info(f"Table extraction complete. Found {len(extracted_dataframes)} valid tables.")
         return extracted_dataframes
 
-    def _cluster_text_into_lines(self, y_tolerance: int = 10) -> List[List[Dict]]:
+    def _cluster_text_into_lines(self) -> List[List[Dict]]:
         """
-        将离散的文本块按垂直位置聚类成行。
-        
-        Args:
-            y_tolerance (int): 垂直方向上合并为一行的容差（像素）。
+        将离散的文本块按版面分析的行分组。
         
         Returns:
             List[List[Dict]]: 文本行的列表，每行是按x坐标排序的文本块列表。
@@ -101,23 +104,15 @@ class TableExtractorService:
             return []
             
         lines = []
-        current_line = [self.ocr_results[0]]
-        
-        for i in range(1, len(self.ocr_results)):
-            prev_bbox = current_line[-1]['bbox_xyxy']
-            curr_bbox = self.ocr_results[i]['bbox_xyxy']
-            
-            # 检查Y坐标是否在容差范围内
-            is_same_line = abs(prev_bbox['y_min'] - curr_bbox['y_min']) < y_tolerance
-            
-            if is_same_line:
-                current_line.append(self.ocr_results[i])
-            else:
-                lines.append(sorted(current_line, key=lambda r: r['bbox_xyxy']['x_min']))
-                current_line = [self.ocr_results[i]]
-        
-        # 添加最后一行
-        lines.append(sorted(current_line, key=lambda r: r['bbox_xyxy']['x_min']))
+        current_row = None
+        for item, row in zip(self.ocr_results, self._row_ids.tolist()):
+            # 无效bbox的文本块排在最后，不参与成行
+            if row < 0:
+                break
+            if row != current_row:
+                lines.append([])
+                current_row = row
+            lines[-1].append(item)
         
         logger.info(f"Clustered {len(self.ocr_results)} text blocks into {len(lines)} lines.")
         return lines
@@ -125,14 +120,23 @@ class TableExtractorService:
     def _identify_table_blocks(self, lines: List[List[Dict]], min_lines_for_table: int = 2) -> List[List[List[Dict]]]:
         """
         (简化实现) 从文本行中识别出可能是表格的块。
-        这里简单地将所有行视为一个大表格块。
+        连续的多单元格行（至少两个文本块）构成一个表格块，单个文本块的行（标题、说明等）将块断开。
         """
-        if len(lines) >= min_lines_for_table:
-            logger.info("Identified one potential table block from all lines.")
-            return [lines]
+        blocks = []
+        current = []
+        for line in lines + [[]]:
+            if len(line) >= 2:
+                current.append(line)
+                continue
+            if len(current) >= min_lines_for_table:
+                blocks.append(current)
+            current = []
+
+        if blocks:
+            logger.info(f"Identified {len(blocks)} potential table blocks.")
         else:
-            logger.warning(f"Not enough lines ({len(lines)}) to form a table (min: {min_lines_for_table}).")
-            return []
+            logger.warning(f"No run of at least {min_lines_for_table} multi-cell lines found to form a table.")
+        return blocks
 
     def _build_dataframe_from_block(self, block: List[List[Dict]]) -> pd.DataFrame:
         """
@@ -142,39 +146,22 @@ class TableExtractorService:
         if not block:
             return pd.DataFrame()
 
-        # 估算列边界
-        # 策略：找到所有文本块的x中点，然后对这些中点进行聚类
-        x_centers = []
-        for line in block:
-            for item in line:
-                bbox = item['bbox_xyxy']
-                x_centers.append((bbox['x_min'] + bbox['x_max']) / 2)
-        
-        # 简单的聚类：对x中心点排序并寻找大的间隔来定义列
-        sorted_x_centers = sorted(list(set(x_centers)))
-        if not sorted_x_centers:
+        # 列边界只按本块的文本计算：x中点排序后间隔大于列间距（50像素）即为新列，
+        # 表格外的文本不会填补列间隔把相邻列并成一列
+        items = [item for line in block for item in line]
+        column_ids = compute_layout(layout_boxes(items)).column_ids.tolist()
+        column_count = max(column_ids) + 1 if column_ids else 0
+        if column_count <= 0:
             return pd.DataFrame()
-            
-        column_boundaries = [sorted_x_centers[0] -1]
-        for i in range(1, len(sorted_x_centers)):
-            # 如果两个文本中心的距离大于一个典型的字符宽度（估算值），则认为是一个新的列
-            if sorted_x_centers[i] - sorted_x_centers[i-1] > 50: # 50像素作为一个阈值
-                column_boundaries.append((sorted_x_centers[i] + sorted_x_centers[i-1]) / 2)
-        column_boundaries.append(sorted_x_centers[-1] + 50)
 
         # 构建表格数据
         table_data = []
+        k = 0
         for line in block:
-            row_data = ["" for _ in range(len(column_boundaries) - 1)]
+            row_data = ["" for _ in range(column_count)]
             for item in line:
-                bbox = item['bbox_xyxy']
-                center_x = (bbox['x_min'] + bbox['x_max']) / 2
-                
-                # 找到这个item属于哪一列
-                for j in range(len(column_boundaries) - 1):
-                    if column_boundaries[j] <= center_x < column_boundaries[j+1]:
-                        row_data[j] += f" {item['text']}" # 同一单元格可能有多个文本块
-                        break
+                row_data[column_ids[k]] += f" {item['text']}" # 同一单元格可能有多个文本块
+                k += 1
             table_data.append([cell.strip() for cell in row_data])
 
         try:
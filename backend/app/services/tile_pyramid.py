@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图纸多分辨率瓦片金字塔
+栅格化完成后为每张图纸页面生成一次：按2的幂逐级缩小，固定瓦片尺寸，以内容哈希寻址。
+各分析阶段按所需分辨率从金字塔取图或取区域，前端查看器按需拉取瓦片，而不再各自解码整页大图。
+
+目录结构:
+    {TILE_PYRAMID_DIR}/{content_hash}/manifest.json
+    {TILE_PYRAMID_DIR}/{content_hash}/{level}/{col}_{row}.png
+
+level 0 为原始分辨率，level k 的边长为原图的 1/2^k，直到整页可容纳于单个瓦片。
+本地目录按最近使用（manifest.json 的mtime）做LRU淘汰，总量不超过 TILE_PYRAMID_MAX_MB。
+"""
+
+import hashlib
+import io
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+from PIL import Image
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_HASH_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+# 构建中的金字塔数（解除PIL像素阈值的引用计数）
+_unbounded_pixel_users = 0
+_saved_pixel_limit = None
+_pixel_limit_lock = threading.Lock()
+
+
+@contextmanager
+def _unbounded_image_pixels():
+    """
+    构建期间临时解除PIL解压炸弹阈值（图纸页面可能超过默认阈值），最后一个构建结束时恢复
+
+    多个构建线程并发时按引用计数处理，避免提前恢复。
+    """
+    global _unbounded_pixel_users, _saved_pixel_limit
+    with _pixel_limit_lock:
+        if _unbounded_pixel_users == 0:
+            _saved_pixel_limit = Image.MAX_IMAGE_PIXELS
+            Image.MAX_IMAGE_PIXELS = None
+        _unbounded_pixel_users += 1
+    try:
+        yield
+    finally:
+        with _pixel_limit_lock:
+            _unbounded_pixel_users -= 1
+            if _unbounded_pixel_users == 0:
+                Image.MAX_IMAGE_PIXELS = _saved_pixel_limit
+
+
+def compute_content_hash(image_path: str, chunk_size: int = 1 << 20) -> str:
+    """计算图像文件内容哈希（sha256前32位）"""
+    digest = hashlib.sha256()
+    with open(image_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+class TilePyramidStore:
+    """瓦片金字塔存储（本地目录，可选镜像到对象存储）"""
+
+    # 最近使用时间的刷新间隔（秒），避免每次读取瓦片都写文件系统
+    TOUCH_INTERVAL = 60
+
+    def __init__(self, root_dir: str = None, tile_size: int = None, upload_to_s3: bool = None,
+                 max_bytes: int = None):
+        self.root_dir = Path(root_dir or getattr(settings, "TILE_PYRAMID_DIR", "tile_pyramids"))
+        self.tile_size = tile_size or getattr(settings, "TILE_PYRAMID_TILE_SIZE", 512)
+        self.upload_to_s3 = getattr(settings, "TILE_PYRAMID_UPLOAD_S3", False) \
+            if upload_to_s3 is None else upload_to_s3
+        self.max_bytes = max_bytes if max_bytes is not None else \
+            getattr(settings, "TILE_PYRAMID_MAX_MB", 2048) * 1024 * 1024
+        self._manifests: Dict[str, Dict[str, Any]] = {}
+        self._path_index: Dict[Tuple[str, float], str] = {}
+        self._building: Dict[str, Future] = {}
+        self._touched: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._build_executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "TILE_PYRAMID_BUILD_WORKERS", 2), thread_name_prefix="pyramid-build")
+        self._upload_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="pyramid-upload")
+
+    # ----------------------------- 构建 -----------------------------
+
+    def build(self, image_path: str) -> Dict[str, Any]:
+        """
+        为图像构建瓦片金字塔（内容相同的图像只构建一次）
+
+        Returns:
+            金字塔清单 manifest
+        """
+        return self.submit(image_path).result()
+
+    def submit(self, image_path: str) -> Future:
+        """
+        在后台线程构建瓦片金字塔，返回结果为 manifest 的Future
+
+        同一内容的并发请求共享一次构建；构建完成前 lookup 查不到该页，使用方回退到读取原图。
+        """
+        content_hash = compute_content_hash(image_path)
+        manifest = self.get_manifest(content_hash)
+        if manifest is not None:
+            self._register_path(image_path, content_hash)
+            done = Future()
+            done.set_result(manifest)
+            return done
+
+        with self._lock:
+            future = self._building.get(content_hash)
+            if future is None:
+                future = self._build_executor.submit(self._build_and_evict, image_path, content_hash)
+                self._building[content_hash] = future
+        return future
+
+    def _build_and_evict(self, image_path: str, content_hash: str) -> Dict[str, Any]:
+        try:
+            manifest = self._build_levels(image_path, content_hash)
+            self._register_path(image_path, content_hash)
+        finally:
+            with self._lock:
+                self._building.pop(content_hash, None)
+        self.evict()
+        return manifest
+
+    def _build_levels(self, image_path: str, content_hash: str) -> Dict[str, Any]:
+        pyramid_dir = self.root_dir / content_hash
+        levels = []
+        tile_count = 0
+
+        with _unbounded_image_pixels(), Image.open(image_path) as source:
+            # 灰度/二值页面统一为8位灰度瓦片（二值图无法平滑缩小），彩色页面保留RGB
+            level_image = source.copy() if source.mode in ("RGB", "L") else \
+                source.convert("L" if source.mode == "1" else "RGB")
+
+        width, height = level_image.size
+        level = 0
+        while True:
+            level_dir = pyramid_dir / str(level)
+            level_dir.mkdir(parents=True, exist_ok=True)
+            cols = math.ceil(level_image.width / self.tile_size)
+            rows = math.ceil(level_image.height / self.tile_size)
+            for row in range(rows):
+                for col in range(cols):
+                    box = (col * self.tile_size, row * self.tile_size,
+                           min((col + 1) * self.tile_size, level_image.width),
+                           min((row + 1) * self.tile_size, level_image.height))
+                    level_image.crop(box).save(level_dir / f"{col}_{row}.png", format="PNG")
+            tile_count += cols * rows
+            levels.append({"level": level, "width": level_image.width, "height": level_image.height,
+                           "cols": cols, "rows": rows})
+
+            if max(level_image.size) <= self.tile_size:
+                break
+            # 由上一级缩小一半，避免每级都从原图重采样
+            next_size = (max(1, level_image.width // 2), max(1, level_image.height // 2))
+            level_image = level_image.resize(next_size, Image.Resampling.BOX)
+            level += 1
+
+        manifest = {
+            "content_hash": content_hash,
+            "width": width,
+            "height": height,
+            "tile_size": self.tile_size,
+            "format": "png",
+            "mode": level_image.mode,
+            "levels": levels,
+            "bytes": sum(f.stat().st_size for f in pyramid_dir.rglob("*.png"))
+        }
+        with open(pyramid_dir / "manifest.json", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+
+        with self._lock:
+            self._manifests[content_hash] = manifest
+
+        logger.info(f"🗺️ 瓦片金字塔生成完成: {content_hash} ({width}x{height}, "
+                    f"{len(levels)} 级, {tile_count} 个瓦片)")
+
+        if self.upload_to_s3:
+            self._upload_executor.submit(self._upload_pyramid, content_hash)
+        return manifest
+
+    def evict(self):
+        """超出容量时按最近使用时间淘汰最旧的金字塔（构建中的不淘汰，至少保留最近一个）"""
+        if not self.root_dir.exists():
+            return
+        with self._lock:
+            building = set(self._building)
+
+        entries = []
+        total = 0
+        for pyramid_dir in self.root_dir.iterdir():
+            if not _HASH_PATTERN.match(pyramid_dir.name) or pyramid_dir.name in building:
+                continue
+            manifest_path = pyramid_dir / "manifest.json"
+            try:
+                if manifest_path.exists():
+                    last_used = manifest_path.stat().st_mtime
+                    with open(manifest_path, "r", encoding="utf-8") as f:
+                        size = json.load(f).get("bytes", 0)
+                else:
+                    # 中断的构建：没有清单，优先淘汰
+                    last_used, size = 0.0, 0
+            except (OSError, ValueError):
+                continue
+            entries.append((last_used, size, pyramid_dir))
+            total += size
+        if total <= self.max_bytes:
+            return
+
+        entries.sort(key=lambda entry: entry[0])
+        for last_used, size, pyramid_dir in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(pyramid_dir, ignore_errors=True)
+            total -= size
+            self._forget(pyramid_dir.name)
+            logger.info(f"🧹 淘汰瓦片金字塔: {pyramid_dir.name}")
+
+    def _forget(self, content_hash: str):
+        with self._lock:
+            self._manifests.pop(content_hash, None)
+            self._touched.pop(content_hash, None)
+            for key in [key for key, value in self._path_index.items() if value == content_hash]:
+                del self._path_index[key]
+
+    def _upload_pyramid(self, content_hash: str):
+        """后台镜像金字塔到对象存储"""
+        try:
+            from app.services.dual_storage_service import DualStorageService
+            storage = DualStorageService()
+            pyramid_dir = self.root_dir / content_hash
+            for file_path in sorted(pyramid_dir.rglob("*")):
+                if not file_path.is_file():
+                    continue
+                relative = file_path.relative_to(pyramid_dir).as_posix()
+                storage.upload_file_sync(
+                    file_obj=file_path.read_bytes(),
+                    s3_key=f"tile_pyramids/{content_hash}/{relative}",
+                    content_type="application/json" if file_path.suffix == ".json" else "image/png"
+                )
+            logger.info(f"☁️ 瓦片金字塔已镜像到对象存储: {content_hash}")
+        except Exception as e:
+            logger.warning(f"⚠️ 瓦片金字塔上传失败: {content_hash}, {e}")
+
+    # ----------------------------- 查询 -----------------------------
+
+    def get_manifest(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        if not _HASH_PATTERN.match(content_hash or ""):
+            return None
+        manifest_path = self.root_dir / content_hash / "manifest.json"
+        with self._lock:
+            manifest = self._manifests.get(content_hash)
+        if manifest is None:
+            if not manifest_path.exists():
+                return None
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            with self._lock:
+                self._manifests[content_hash] = manifest
+        self._touch(content_hash, manifest_path)
+        return manifest
+
+    def _touch(self, content_hash: str, manifest_path: Path):
+        """刷新最近使用时间，供LRU淘汰参考"""
+        now = time.time()
+        with self._lock:
+            if now - self._touched.get(content_hash, 0.0) < self.TOUCH_INTERVAL:
+                return
+            self._touched[content_hash] = now
+        try:
+            os.utime(manifest_path, None)
+        except OSError:
+            # 已被淘汰
+            self._forget(content_hash)
+
+    def lookup(self, image_path: str) -> Optional[Dict[str, Any]]:
+        """按图像路径查找已构建的金字塔（文件被修改后视为未构建）"""
+        try:
+            key = (os.path.abspath(image_path), os.path.getmtime(image_path))
+        except OSError:
+            return None
+        with self._lock:
+            content_hash = self._path_index.get(key)
+        return self.get_manifest(content_hash) if content_hash else None
+
+    def get_tile(self, content_hash: str, level: int, col: int, row: int) -> Optional[bytes]:
+        """读取单个瓦片的PNG字节"""
+        if not _HASH_PATTERN.match(content_hash or ""):
+            return None
+        tile_path = self.root_dir / content_hash / str(int(level)) / f"{int(col)}_{int(row)}.png"
+        if not tile_path.exists():
+            return None
+        return tile_path.read_bytes()
+
+    @staticmethod
+    def choose_level(manifest: Dict[str, Any], extent: int, max_dim: int) -> int:
+        """对最长边为 extent 的区域，选择缩小后仍不小于 max_dim 的最粗一级"""
+        if not max_dim or extent <= max_dim:
+            return 0
+        level = int(math.floor(math.log2(extent / max_dim)))
+        return max(0, min(level, len(manifest["levels"]) - 1))
+
+    def get_region(self, content_hash: str, bbox: Tuple[int, int, int, int],
+                   max_dim: int = None, level: int = None) -> Optional[Image.Image]:
+        """
+        读取原图坐标系下的区域
+
+        Args:
+            bbox: (x1, y1, x2, y2)，level 0 坐标
+            max_dim: 输出最长边上限，未指定 level 时据此选择金字塔级别
+            level: 直接指定级别
+        """
+        manifest = self.get_manifest(content_hash)
+        if manifest is None:
+            return None
+
+        x1, y1, x2, y2 = [max(0, int(v)) for v in bbox]
+        x2, y2 = min(x2, manifest["width"]), min(y2, manifest["height"])
+        if x2 <= x1 or y2 <= y1:
+            return None
+
+        if level is None:
+            level = self.choose_level(manifest, max(x2 - x1, y2 - y1), max_dim)
+        level = max(0, min(int(level), len(manifest["levels"]) - 1))
+        level_info = manifest["levels"][level]
+        factor = 2 ** level
+        tile_size = manifest["tile_size"]
+
+        lx1, ly1 = x1 // factor, y1 // factor
+        lx2 = min(level_info["width"], math.ceil(x2 / factor))
+        ly2 = min(level_info["height"], math.ceil(y2 / factor))
+
+        region_mode = manifest.get("mode", "RGB")
+        region = Image.new(region_mode, (max(1, lx2 - lx1), max(1, ly2 - ly1)), "white")
+        for row in range(ly1 // tile_size, (ly2 - 1) // tile_size + 1):
+            for col in range(lx1 // tile_size, (lx2 - 1) // tile_size + 1):
+                tile_bytes = self.get_tile(content_hash, level, col, row)
+                if tile_bytes is None:
+                    continue
+                with Image.open(io.BytesIO(tile_bytes)) as tile:
+                    region.paste(tile.convert(region_mode), (col * tile_size - lx1, row * tile_size - ly1))
+
+        if max_dim and max(region.size) > max_dim:
+            ratio = max_dim / max(region.size)
+            region = region.resize((max(1, int(region.width * ratio)), max(1, int(region.height * ratio))),
+                                   Image.Resampling.LANCZOS)
+        return region
+
+    def get_image(self, content_hash: str, max_dim: int) -> Optional[Image.Image]:
+        """读取整页缩略到 max_dim 的图像"""
+        manifest = self.get_manifest(content_hash)
+        if manifest is None:
+            return None
+        return self.get_region(content_hash, (0, 0, manifest["width"], manifest["height"]), max_dim=max_dim)
+
+    def get_downscaled(self, image_path: str, max_dim: int) -> Optional[Image.Image]:
+        """
+        按图像路径读取缩略图：已构建金字塔时由瓦片拼接，否则返回None由调用方自行处理
+        """
+        manifest = self.lookup(image_path)
+        if manifest is None:
+            return None
+        return self.get_image(manifest["content_hash"], max_dim)
+
+    def _register_path(self, image_path: str, content_hash: str):
+        try:
+            key = (os.path.abspath(image_path), os.path.getmtime(image_path))
+        except OSError:
+            return
+        with self._lock:
+            self._path_index[key] = content_hash
+
+
+# 全局实例
+tile_pyramid_store = TilePyramidStore()
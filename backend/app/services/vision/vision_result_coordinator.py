@@ -11,6 +11,8 @@ import time
 from typing import Dict, Any, List, Optional
 from pathlib import Path
 
+from app.services.result_mergers.component_merge import cluster_components
+
 logger = logging.getLogger(__name__)
 
 class VisionResultCoordinator:
@@ -162,104 +164,31 @@ class VisionResultCoordinator:
     def _merge_duplicate_components(self, components: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         合并重复构件 - 增强版
-        使用基于空间重叠和ID相似性的策略
+        构件编号或构件类型相同且 IoU > 0.5 的构件互为重复，按重复关系的连通分量合并（见 component_merge）
         """
         if not components:
             return []
 
-        # 1. 对构件进行预处理和标准化
-        processed_components = []
-        for i, comp in enumerate(components):
-            comp['temp_id'] = i  # 添加临时唯一ID
-            comp['merged'] = False
-            # 确保bbox存在且有效
+        # 确保bbox存在且有效
+        for comp in components:
             if 'bbox' not in comp or not isinstance(comp.get('bbox'), list) or len(comp.get('bbox')) != 4:
                 comp['bbox'] = [0, 0, 0, 0] # 提供一个默认bbox避免后续错误
-            processed_components.append(comp)
-
-        # 2. 迭代合并，直到没有构件可以合并为止
-        merged_run = True
-        while merged_run:
-            merged_run = False
-            merged_indices = set()
-            new_components_list = []
-            
-            # 使用索引来遍历，方便在循环中修改列表
-            for i in range(len(processed_components)):
-                if processed_components[i]['merged']:
-                    continue
 
-                group_to_merge = [processed_components[i]]
-                
-                for j in range(i + 1, len(processed_components)):
-                    if processed_components[j]['merged']:
-                        continue
-                    
-                    # 检查是否应该合并
-                    if self._should_merge(processed_components[i], processed_components[j]):
-                        group_to_merge.append(processed_components[j])
-                        processed_components[j]['merged'] = True
-                        merged_run = True # 标记发生了合并
+        clusters = cluster_components(components, key_fields=("component_id", "component_type"))
 
-                if len(group_to_merge) > 1:
-                    merged_component = self._merge_component_group(group_to_merge)
-                    merged_component['merged'] = False # 重置合并状态
-                    new_components_list.append(merged_component)
-                else:
-                    new_components_list.append(processed_components[i])
-
-            processed_components = new_components_list
-
-        final_components = [comp for comp in processed_components if not comp.get('merged')]
+        final_components = []
+        for cluster in clusters:
+            if len(cluster.indices) > 1:
+                merged_component = self._merge_component_group([components[i] for i in cluster.indices])
+                if cluster.overlap_bbox:
+                    merged_component["overlap_region"] = cluster.overlap_bbox
+                final_components.append(merged_component)
+            else:
+                final_components.append(components[cluster.indices[0]])
         
         logger.info(f"🔄 构件合并完成: {len(components)} → {len(final_components)} 个构件")
         return final_components
 
-    def _should_merge(self, comp1: Dict[str, Any], comp2: Dict[str, Any], iou_threshold: float = 0.5) -> bool:
-        """判断两个构件是否应该合并"""
-        
-        # 规则1: 基于ID的精确匹配 (如果ID可靠)
-        id1 = comp1.get("component_id")
-        id2 = comp2.get("component_id")
-        if id1 and id2 and id1 == id2:
-             # 如果ID相同，计算IoU来确认是否为同一实例
-            iou = self._calculate_iou(comp1.get('bbox', []), comp2.get('bbox', []))
-            if iou > iou_threshold:
-                return True
-
-        # 规则2: 基于类型和空间重叠
-        type1 = comp1.get("component_type")
-        type2 = comp2.get("component_type")
-        if type1 and type2 and type1 == type2:
-            iou = self._calculate_iou(comp1.get('bbox', []), comp2.get('bbox', []))
-            if iou > iou_threshold:
-                return True
-        
-        return False
-
-    def _calculate_iou(self, box1: List[float], box2: List[float]) -> float:
-        """计算两个边界框的交并比 (IoU)"""
-        if not box1 or not box2:
-            return 0.0
-
-        x1_inter = max(box1[0], box2[0])
-        y1_inter = max(box1[1], box2[1])
-        x2_inter = min(box1[2], box2[2])
-        y2_inter = min(box1[3], box2[3])
-
-        inter_area = max(0, x2_inter - x1_inter) * max(0, y2_inter - y1_inter)
-        if inter_area == 0:
-            return 0.0
-
-        box1_area = (box1[2] - box1[0]) * (box1[3] - box1[1])
-        box2_area = (box2[2] - box2[0]) * (box2[3] - box2[1])
-        
-        union_area = box1_area + box2_area - inter_area
-        if union_area == 0:
-            return 0.0
-            
-        return inter_area / union_area
-
     def _merge_component_group(self, group: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         合并一组相同ID的构件 - 增强版
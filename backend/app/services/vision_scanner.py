@@ -12,7 +12,7 @@ import os
 import io
 import base64
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from pathlib import Path
 
 from app.services.ai_analyzer import AIAnalyzerService
@@ -23,6 +23,7 @@ from app.utils.analysis_optimizations import (
     AnalyzerInstanceManager, AnalysisLogger, AnalysisMetadata
 )
 from app.core.config import AnalysisSettings
+from app.services.result_mergers.component_merge import bbox_array, cluster_duplicates, normalise_component_key
 
 logger = logging.getLogger(__name__)
 
@@ -608,7 +609,7 @@ class VisionScannerService:
                     # 使用切片数据
                     slice_infos = slice_info.get('slice_infos', [])
                     for slice_data in slice_infos:
-                        encoded_slice = slice_data.base64_data
+                        encoded_slice = slice_data.load_base64()
                         vision_image_data.append({
                             "type": "image_url",
                             "image_url": {
@@ -963,17 +964,23 @@ class VisionScannerService:
         
         logger.info(f"🔄 开始构件去重合并: {len(components)} 个构件")
         
-        merged = {}
-        
+        valid_components = []
         for component in components:
             # 🔧 修复：确保构件是字典类型
             if not isinstance(component, dict):
                 logger.warning(f"⚠️ 跳过非字典类型构件: {type(component)}")
                 continue
-                
-            # 生成构件唯一标识
-            component_key = self._generate_component_key(component)
-            
+            valid_components.append(component)
+        
+        # 生成构件唯一标识
+        component_keys = [self._generate_component_key(component) for component in valid_components]
+        
+        # 🔧 相邻切片重叠区内的同一构件会被重复识别，先合并为一个实例，避免按键汇总时重复计数
+        instances = self._collapse_slice_duplicates(valid_components, component_keys)
+        
+        merged = {}
+        
+        for component, component_key in instances:
             if component_key in merged:
                 # 合并重复构件
                 existing = merged[component_key]
@@ -985,9 +992,9 @@ class VisionScannerService:
                 
                 # 合并切片来源信息
                 existing_sources = existing.get('slice_sources', [])
-                new_source = component.get('slice_source', {})
-                if new_source and new_source not in existing_sources:
-                    existing_sources.append(new_source)
+                for new_source in component.get('slice_sources') or [component.get('slice_source', {})]:
+                    if new_source and new_source not in existing_sources:
+                        existing_sources.append(new_source)
                 existing['slice_sources'] = existing_sources
                 
                 # 更新边界框（取最大范围）
@@ -1009,7 +1016,7 @@ class VisionScannerService:
             else:
                 # 新构件
                 component_copy = component.copy()
-                component_copy['slice_sources'] = [component.get('slice_source', {})]
+                component_copy['slice_sources'] = list(component.get('slice_sources') or [component.get('slice_source', {})])
                 merged[component_key] = component_copy
                 logger.debug(f"➕ 新构件: {component_key}")
         
@@ -1019,6 +1026,48 @@ class VisionScannerService:
         
         return result
     
+    def _collapse_slice_duplicates(self, components: List[Dict[str, Any]],
+                                   component_keys: List[str]) -> List[Tuple[Dict[str, Any], str]]:
+        """
+        合并跨切片重复识别的同一构件实例
+        
+        标识相同且 IoU > 0.5 的构件按连通分量归为同一实例（见 component_merge）：
+        保留置信度最高的识别结果，数量取各次识别的最大值而非相加，
+        并记录所有切片来源和成员框的公共重叠区。
+        
+        Returns:
+            (构件, 构件标识) 列表，按首次出现的顺序排列
+        """
+        keys = [normalise_component_key(key) for key in component_keys]
+        clusters = cluster_duplicates(bbox_array(components), [keys])
+        
+        instances = []
+        for cluster in clusters:
+            members = [components[i] for i in cluster.indices]
+            component_key = component_keys[cluster.indices[0]]
+            if len(members) == 1:
+                instances.append((members[0], component_key))
+                continue
+            
+            instance = max(members, key=lambda member: member.get('confidence', 0)).copy()
+            quantities = [member.get('quantity') for member in members
+                          if isinstance(member.get('quantity'), (int, float))]
+            if quantities:
+                instance['quantity'] = max(quantities)
+            instance['bbox'] = cluster.bbox
+            instance['slice_sources'] = []
+            for member in members:
+                source = member.get('slice_source', {})
+                if source and source not in instance['slice_sources']:
+                    instance['slice_sources'].append(source)
+            instance['overlap_region'] = cluster.overlap_bbox
+            instance['duplicate_count'] = len(members)
+            instances.append((instance, component_key))
+        
+        if len(instances) < len(components):
+            logger.info(f"🔗 跨切片重复识别合并: {len(components)} -> {len(instances)} 个构件实例")
+        return instances
+    
     def _generate_component_key(self, component: Dict[str, Any]) -> str:
         """
         生成构件的唯一标识键
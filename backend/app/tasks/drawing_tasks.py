@@ -8,10 +8,13 @@ import os
 import sys
 import logging
 import tempfile
+import shutil
 import asyncio
+import threading
 import time
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+from concurrent.futures import wait as wait_futures
 from pathlib import Path
 
 from celery import Task
@@ -27,6 +30,7 @@ from app.database import get_celery_db_session
 from app.models.drawing import Drawing
 from app.models.user import User
 from app.core.celery_app import celery_app
+from app.core.config import settings
 from app.services.s3_service import S3Service
 from app.services.file_processor import FileProcessor
 from app.services.unified_quantity_engine import UnifiedQuantityEngine
@@ -37,16 +41,86 @@ from app.tasks.real_time_task_manager import RealTimeTaskManager, TaskStatus, Ta
 from ..services.s3_service import s3_service
 from ..services.file_processor import FileProcessor
 from ..services.vision_scanner import VisionScannerService
+from ..services.llm_client import llm_client, set_task_deadline, clear_task_deadline
+from ..services.ai_analysis.streaming_parser import stream_component_sink
 from ..database import SessionLocal
 from .task_status_pusher import track_progress
 from . import task_manager  # 直接从 tasks 包导入唯一的实例
 
 logger = logging.getLogger(__name__)
 
+def _recognize_vector_page(image_path: str, vector_page: Dict[str, Any], drawing_id: int,
+                           ocr_service: Optional[PaddleOCRService] = None) -> Dict[str, Any]:
+    """
+    矢量PDF页面：直接使用内容流中的文本，仅对嵌入的栅格区域执行OCR
+
+    ocr_service 由调用方按文档创建一次并在各页复用（仅在需要OCR时使用）
+    """
+    from app.services.pdf_vector_text import compare_with_ocr
+    
+    text_regions = [dict(region) for region in vector_page.get('text_regions', [])]
+    all_text = [vector_page.get('all_text', '')]
+    ocr_region_count = 0
+    
+    if vector_page.get('ocr_regions'):
+        from PIL import Image
+        basic_ocr = ocr_service or PaddleOCRService()
+        
+        with Image.open(image_path) as page_image:
+            for box in vector_page['ocr_regions']:
+                x1, y1 = max(0, int(box[0])), max(0, int(box[1]))
+                x2, y2 = min(page_image.width, int(box[2])), min(page_image.height, int(box[3]))
+                if x2 <= x1 or y2 <= y1:
+                    continue
+                temp_region_file = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
+                temp_region_file.close()
+                try:
+                    page_image.crop((x1, y1, x2, y2)).save(temp_region_file.name)
+                    region_result = basic_ocr.recognize_text(temp_region_file.name, save_to_sealos=False)
+                finally:
+                    os.unlink(temp_region_file.name)
+                
+                for region in region_result.get('text_regions', []):
+                    xyxy = region.get('bbox_xyxy', {})
+                    bbox = [xyxy.get('x_min', 0) + x1, xyxy.get('y_min', 0) + y1,
+                            xyxy.get('x_max', 0) + x1, xyxy.get('y_max', 0) + y1]
+                    region = dict(region, id=len(text_regions), bbox=bbox, source='ocr_region',
+                                  bbox_xyxy={'x_min': bbox[0], 'y_min': bbox[1], 'x_max': bbox[2], 'y_max': bbox[3]})
+                    text_regions.append(region)
+                    ocr_region_count += 1
+                if region_result.get('all_text'):
+                    all_text.append(region_result['all_text'])
+    
+    result = {
+        'success': True,
+        'text_regions': text_regions,
+        'all_text': '\n'.join(t for t in all_text if t),
+        'statistics': {
+            'total_regions': len(text_regions),
+            'vector_regions': len(vector_page.get('text_regions', [])),
+            'ocr_regions': ocr_region_count,
+            'avg_confidence': calculate_average_confidence(text_regions)
+        },
+        'processing_method': f"pdf_vector_text_{vector_page.get('mode')}"
+    }
+    
+    # 可选：整页OCR对照，统计矢量文本与OCR的一致性
+    if settings.PDF_VECTOR_TEXT_VERIFY_OCR:
+        try:
+            verify_result = (ocr_service or PaddleOCRService()).recognize_text(image_path, save_to_sealos=False)
+            result['ocr_agreement'] = compare_with_ocr(vector_page.get('text_regions', []),
+                                                       verify_result.get('text_regions', []))
+            logger.info(f"  📊 矢量文本与OCR一致性: {result['ocr_agreement']}")
+        except Exception as verify_error:
+            logger.warning(f"  ⚠️ 矢量文本OCR对照失败: {verify_error}")
+    
+    return result
+
 async def process_images_with_shared_slices(image_paths: List[str], 
                                           shared_slice_results: Dict[str, Any],
                                           drawing_id: int, 
-                                          task_id: str) -> Dict[str, Any]:
+                                          task_id: str,
+                                          vector_text_pages: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     使用共享智能切片结果处理图像OCR
     
@@ -55,6 +129,7 @@ async def process_images_with_shared_slices(image_paths: List[str],
         shared_slice_results: 统一智能切片的结果
         drawing_id: 图纸ID
         task_id: 任务ID
+        vector_text_pages: 矢量PDF文本提取结果（按图片路径索引），有可用文本的页面不再整页OCR
         
     Returns:
         OCR处理结果
@@ -65,14 +140,28 @@ async def process_images_with_shared_slices(image_paths: List[str],
     total_text_regions = 0
     successful_images = 0
     total_slices_processed = 0
+    vector_text_pages = vector_text_pages or {}
+    # 矢量页面的栅格区域OCR/对照OCR共用一个服务实例（按文档创建一次）
+    vector_ocr_service = None
     
     for i, image_path in enumerate(image_paths):
         try:
             logger.info(f"处理图像 {i+1}/{len(image_paths)}: {Path(image_path).name}")
             
             slice_info = shared_slice_results.get(image_path, {})
+            vector_page = vector_text_pages.get(image_path)
             
-            if slice_info.get('sliced', False):
+            if vector_page and vector_page.get('mode') != 'scanned':
+                # 矢量文本页面：跳过整页OCR
+                if vector_ocr_service is None and (vector_page.get('ocr_regions') or settings.PDF_VECTOR_TEXT_VERIFY_OCR):
+                    vector_ocr_service = PaddleOCRService()
+                result = _recognize_vector_page(image_path, vector_page, drawing_id, vector_ocr_service)
+                all_results.append(result)
+                total_text_regions += len(result['text_regions'])
+                successful_images += 1
+                logger.info(f"  📝 使用矢量文本: {result['statistics']['vector_regions']} 行, "
+                            f"栅格区域OCR {result['statistics']['ocr_regions']} 个文本区域")
+            elif slice_info.get('sliced', False):
                 # 使用切片结果进行OCR
                 slice_infos = slice_info.get('slice_infos', [])
                 logger.info(f"  🔪 使用共享切片结果: {len(slice_infos)} 个切片")
@@ -85,7 +174,7 @@ async def process_images_with_shared_slices(image_paths: List[str],
                         import base64
                         import tempfile
                         
-                        slice_image_data = base64.b64decode(slice_data.base64_data)
+                        slice_image_data = base64.b64decode(slice_data.load_base64())
                         temp_slice_file = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
                         temp_slice_file.write(slice_image_data)
                         temp_slice_file.close()
@@ -214,6 +303,8 @@ async def process_images_with_shared_slices(image_paths: List[str],
             'statistics': {
                 'total_regions': total_text_regions,
                 'total_slices_processed': total_slices_processed,
+                'vector_text_pages': sum(1 for r in all_results
+                                         if r.get('processing_method', '').startswith('pdf_vector_text')),
                 'avg_confidence': calculate_average_confidence(all_text_regions),
                 'processing_time': sum(r.get('statistics', {}).get('processing_time', 0) for r in all_results)
             },
@@ -236,6 +327,10 @@ async def process_images_with_shared_slices(image_paths: List[str],
             }
         }
         
+        ocr_agreements = [r['ocr_agreement'] for r in all_results if r.get('ocr_agreement')]
+        if ocr_agreements:
+            final_result['statistics']['vector_ocr_agreement'] = ocr_agreements
+        
         # 为了兼容现有代码，生成一个主要的result_s3_key（如果有存储结果的话）
         primary_s3_key = None
         if storage_summaries:
@@ -313,18 +408,18 @@ def _save_merged_paddleocr_result(final_result: Dict[str, Any],
                                 drawing_id: int, 
                                 task_id: str) -> Dict[str, Any]:
     """
-    保存合并后的PaddleOCR结果到存储服务。
+    保存合并后的PaddleOCR结果。
     文件名是固定的，但基于task_id是唯一的。
-    【最终修复】精确匹配下游服务期望的JSON结构。
+    结果先登记到进程内存储供OCRResultCorrector直接读取，对象存储上传在后台完成，
+    不再阻塞后续的纠正阶段；存储键照常返回用于审计。
     """
-    from app.services.dual_storage_service import DualStorageService
-    storage_service = DualStorageService()
+    from app.services.merged_ocr_store import merged_ocr_store
 
     try:
         # 从final_result中提取所有文本区域
         all_regions = final_result.get("text_regions", [])
         
-        # 【最终修复】构建与 ocr_result_corrector.py 中
+        # 构建与 ocr_result_corrector.py 中
         # _preprocess_ocr_text_simple 函数期望完全一致的结构
         merged_data = {
             "task_id": task_id,
@@ -339,23 +434,17 @@ def _save_merged_paddleocr_result(final_result: Dict[str, Any],
         # 使用基于 task_id 的固定文件名
         s3_key = f"ocr_results/{drawing_id}/merged_ocr_result_{task_id}.json"
         
-        # 上传合并结果
-        result_upload = storage_service.upload_content_sync(
-            content=json.dumps(merged_data, ensure_ascii=False, indent=2),
-            s3_key=s3_key,
-            content_type="application/json"
-        )
-        
-        if result_upload.get("success"):
-            logger.info(f"✅ 合并OCR结果已保存到存储: {s3_key}")
-            return {
-                "success": True,
-                "s3_key": s3_key,
-                "message": "合并OCR结果保存成功"
-            }
+        # 本地登记 + 后台持久化
+        merged_ocr_store.put(s3_key, merged_data)
+        merged_ocr_store.persist_async(s3_key, merged_data, task_id=task_id)
         
-        logger.error(f"❌ 保存合并OCR结果失败: {result_upload.get('error')}")
-        return {"success": False, "error": result_upload.get('error')}
+        logger.info(f"✅ 合并OCR结果已登记，后台保存中: {s3_key}")
+        return {
+            "success": True,
+            "s3_key": s3_key,
+            "persist_status": "pending",
+            "message": "合并OCR结果已登记，后台保存中"
+        }
 
     except Exception as e:
         logger.error(f"保存合并OCR结果时发生异常: {e}", exc_info=True)
@@ -470,6 +559,94 @@ quantity_engine = UnifiedQuantityEngine()
 from app.services.ocr.paddle_ocr_with_slicing import PaddleOCRWithSlicing
 paddle_ocr_service = PaddleOCRWithSlicing()
 
+def _correct_merged_ocr(loop, merged_ocr_key: str, drawing, task_id: str,
+                        original_image_info: Dict[str, Any]):
+    """
+    对合并OCR结果执行智能纠正
+    无论纠正成功还是抛出异常，都释放本地合并结果（后台持久化不受影响）
+    """
+    from app.services.merged_ocr_store import merged_ocr_store
+    
+    try:
+        # 初始化OCR纠正服务
+        from app.services.ocr_result_corrector import OCRResultCorrector
+        from app.services.ai_analyzer import AIAnalyzerService
+        from app.services.dual_storage_service import DualStorageService
+        
+        ai_analyzer = AIAnalyzerService()
+        storage_service = DualStorageService()
+        
+        # 确保storage_service已正确初始化
+        if not storage_service:
+            raise Exception("存储服务未初始化，无法进行OCR智能纠正")
+        
+        ocr_corrector = OCRResultCorrector(ai_analyzer=ai_analyzer, storage_service=storage_service)
+        
+        # 执行OCR纠正
+        return loop.run_until_complete(
+            ocr_corrector.correct_ocr_result(
+                merged_ocr_key=merged_ocr_key,
+                drawing_id=drawing.id,
+                task_id=task_id,
+                original_image_info={
+                    'width': original_image_info.get('size', (0,0))[0],
+                    'height': original_image_info.get('size', (0,0))[1],
+                    'filename': drawing.filename
+                }
+            )
+        )
+    finally:
+        merged_ocr_store.release(merged_ocr_key)
+
+# 流式Vision分析中每识别多少个构件推送一次进度
+COMPONENT_PROGRESS_INTERVAL = 5
+
+
+def _component_progress_sink(loop, task_id: str, progress: int):
+    """
+    构造流式构件回调：Vision流式输出中每闭合若干个构件，推送一次任务进度
+
+    回调可能在分析器的工作线程中触发，非任务主线程时在独立事件循环中推送。
+    """
+    owner_thread = threading.get_ident()
+    lock = threading.Lock()
+    counter = {"components": 0}
+
+    def on_component(component: Dict[str, Any]):
+        with lock:
+            counter["components"] += 1
+            count = counter["components"]
+        if count % COMPONENT_PROGRESS_INTERVAL:
+            return
+        update = task_manager.update_task_status(
+            task_id, TaskStatus.PROCESSING, TaskStage.GPT_ANALYSIS,
+            progress=progress, message=f"Celery Worker 正在进行大模型图纸扫描，已流式识别 {count} 个构件..."
+        )
+        if threading.get_ident() == owner_thread:
+            loop.run_until_complete(update)
+        else:
+            asyncio.run(update)
+
+    return on_component
+
+def _collect_tile_pyramids(pyramid_futures: List[Tuple[str, Any]]) -> List[Dict[str, Any]]:
+    """等待后台瓦片金字塔构建完成，返回写入结果的金字塔摘要（构建失败的页面跳过）"""
+    tile_pyramids = []
+    for image_path, future in pyramid_futures:
+        try:
+            manifest = future.result()
+        except Exception as pyramid_error:
+            logger.warning(f"⚠️ 瓦片金字塔生成失败 {image_path}: {pyramid_error}")
+            continue
+        tile_pyramids.append({
+            "image": Path(image_path).name,
+            "content_hash": manifest["content_hash"],
+            "width": manifest["width"],
+            "height": manifest["height"],
+            "levels": len(manifest["levels"])
+        })
+    return tile_pyramids
+
 class CallbackTask(Task):
     """带回调的 Celery 任务基类"""
     
@@ -500,6 +677,16 @@ def process_drawing_celery_task(self, db_drawing_id: int, task_id: str):
     
     local_file_path = None
     temp_files = []
+    pyramid_futures = []
+    # 切片逐页落盘暂存，内存中只保留当前页面的切片数据
+    slice_spool_dir = tempfile.mkdtemp(prefix=f"slice_spool_{task_id}_")
+    
+    # LLM调用截止时间对齐Celery软超时，预留收尾时间
+    soft_time_limit = (getattr(self.request, 'timelimit', None) or (None, None))[1] \
+        or celery_app.conf.task_soft_time_limit
+    deadline_token = set_task_deadline(
+        soft_time_limit - settings.LLM_DEADLINE_MARGIN if soft_time_limit else None
+    )
     
     try:
         with get_celery_db_session() as db:
@@ -547,7 +734,6 @@ def process_drawing_celery_task(self, db_drawing_id: int, task_id: str):
                 logger.warning(f"⚠️ 双重存储下载失败，尝试使用本地备份: {drawing.file_path}")
                 if drawing.file_path and os.path.exists(drawing.file_path):
                     try:
-                        import shutil
                         shutil.copy2(drawing.file_path, local_file_path)
                         logger.info(f"✅ 使用本地备份文件成功: {drawing.file_path}")
                         download_success = True
@@ -597,9 +783,120 @@ def process_drawing_celery_task(self, db_drawing_id: int, task_id: str):
                 )
             )
             
-            # 3️⃣ 统一文件预处理（转换为图片）
+            # 3️⃣ 统一文件预处理（转换为图片），页面边渲染边生成金字塔和切片
             logger.info(f"🔄 开始统一文件预处理: {drawing.file_type}")
-            file_processing_result = file_processor.process_file(local_file_path, drawing.file_type)
+            shared_slice_results = {}
+            original_images = {}
+            unified_slicer = None
+            unified_slice_error = None
+            prepared_pages = set()
+            
+            try:
+                from app.services.intelligent_image_slicer import IntelligentImageSlicer
+                unified_slicer = IntelligentImageSlicer()
+            except Exception as slicer_init_error:
+                logger.error(f"❌ 统一智能切片初始化失败: {slicer_init_error}")
+                unified_slice_error = slicer_init_error
+            
+            def _build_page_pyramid(image_path: str):
+                """栅格化后在后台生成瓦片金字塔，不阻塞切片与识别，后续阶段按需取所需分辨率"""
+                if not settings.TILE_PYRAMID_ENABLED:
+                    return
+                try:
+                    from app.services.tile_pyramid import tile_pyramid_store
+                    pyramid_futures.append((image_path, tile_pyramid_store.submit(image_path)))
+                except Exception as pyramid_error:
+                    logger.warning(f"⚠️ 瓦片金字塔生成失败 {image_path}: {pyramid_error}")
+            
+            def _slice_page(image_path: str):
+                """统一智能切片：判断单页是否需要切片并执行"""
+                if unified_slicer is None:
+                    return
+                try:
+                    logger.info(f"🔍 分析图片切片需求: {Path(image_path).name}")
+                
+                    # 检查图片尺寸和文件大小
+                    file_size = os.path.getsize(image_path)
+                
+                    from PIL import Image
+                    with Image.open(image_path) as img:
+                        width, height = img.size
+                        logger.info(f"📏 图片尺寸: {width}x{height}, 文件大小: {file_size / 1024 / 1024:.2f} MB")
+                    
+                        # 统一切片判断条件：尺寸>2048x2048 或 文件大小>1.5MB
+                        max_dimension = 2048
+                        max_file_size = int(1.5 * 1024 * 1024)  # 1.5MB
+                    
+                        needs_slicing = (width > max_dimension or height > max_dimension or file_size > max_file_size)
+                    
+                        if needs_slicing:
+                            slice_reason = []
+                            if width > max_dimension or height > max_dimension:
+                                slice_reason.append(f"尺寸{width}x{height}超过{max_dimension}x{max_dimension}")
+                            if file_size > max_file_size:
+                                slice_reason.append(f"文件大小{file_size / 1024 / 1024:.1f}MB超过1.5MB")
+                        
+                            logger.info(f"🔪 执行智能切片: {', '.join(slice_reason)}")
+                        
+                            # 执行智能切片
+                            task_slice_id = f"unified_{task_id}_{Path(image_path).stem}"
+                            slice_infos = unified_slicer.slice_image(img, task_slice_id)
+                        
+                            if slice_infos and len(slice_infos) > 0:
+                                for slice_info in slice_infos:
+                                    slice_info.spool(slice_spool_dir)
+                                shared_slice_results[image_path] = {
+                                    'sliced': True,
+                                    'slice_count': len(slice_infos),
+                                    'slice_infos': slice_infos,
+                                    'original_size': (width, height),
+                                    'slice_reason': slice_reason,
+                                    # 切片计算耗时；持久化在后台进行，完成后回填 persistence_seconds
+                                    'timing': unified_slicer.last_timing
+                                }
+                                logger.info(f"✅ 智能切片完成: {len(slice_infos)} 个切片")
+                            else:
+                                logger.warning("⚠️ 智能切片返回空结果，使用原图")
+                                shared_slice_results[image_path] = {
+                                    'sliced': False,
+                                    'reason': 'slice_failed',
+                                    'error_to_original': True
+                                }
+                        else:
+                            logger.info(f"✅ 图片尺寸适中，无需切片")
+                            shared_slice_results[image_path] = {
+                                'sliced': False,
+                                'reason': 'size_appropriate',
+                                'original_size': (width, height)
+                            }
+                    
+                        # 保存原图引用
+                        original_images[image_path] = {
+                            'path': image_path,
+                            'size': (width, height),
+                            'file_size': file_size
+                        }
+            
+                except Exception as slice_error:
+                    logger.error(f"❌ 图片切片失败 {image_path}: {slice_error}")
+                    shared_slice_results[image_path] = {
+                        'sliced': False,
+                        'reason': 'slice_error',
+                        'error': str(slice_error),
+                        'error_to_original': True
+                    }
+            
+            def _prepare_page(page_index: int, image_path: str):
+                """页面就绪回调：PDF每渲染完一页即处理，不必等待整份文档"""
+                if image_path in prepared_pages:
+                    return
+                prepared_pages.add(image_path)
+                _build_page_pyramid(image_path)
+                _slice_page(image_path)
+            
+            file_processing_result = file_processor.process_file(
+                local_file_path, drawing.file_type, on_page=_prepare_page
+            )
             
             if file_processing_result.get('status') != 'success':
                 raise Exception(f"文件预处理失败: {file_processing_result.get('error')}")
@@ -610,7 +907,7 @@ def process_drawing_celery_task(self, db_drawing_id: int, task_id: str):
             
             logger.info(f"✅ 文件预处理完成: {len(temp_files)} 个图片文件 (来源: {source_type})")
             
-            # ========= 新增：统一智能切片阶段 =========
+            # ========= 统一智能切片阶段（处理未经逐页回调的图片，如CAD渲染图和普通图片）=========
             loop.run_until_complete(
                 task_manager.update_task_status(
                     task_id, TaskStatus.PROCESSING, TaskStage.FILE_PROCESSING,
@@ -618,95 +915,18 @@ def process_drawing_celery_task(self, db_drawing_id: int, task_id: str):
                 )
             )
             
-            # 3️⃣ 统一智能切片预处理
             logger.info("🔪 开始统一智能切片预处理...")
-            shared_slice_results = {}
-            original_images = {}
+            for page_index, image_path in enumerate(temp_files):
+                _prepare_page(page_index, image_path)
             
-            try:
-                from app.services.intelligent_image_slicer import IntelligentImageSlicer
-                unified_slicer = IntelligentImageSlicer()
-                
-                for image_path in temp_files:
-                    try:
-                        logger.info(f"🔍 分析图片切片需求: {Path(image_path).name}")
-                        
-                        # 检查图片尺寸和文件大小
-                        file_size = os.path.getsize(image_path)
-                        
-                        from PIL import Image
-                        with Image.open(image_path) as img:
-                            width, height = img.size
-                            logger.info(f"📏 图片尺寸: {width}x{height}, 文件大小: {file_size / 1024 / 1024:.2f} MB")
-                            
-                            # 统一切片判断条件：尺寸>2048x2048 或 文件大小>1.5MB
-                            max_dimension = 2048
-                            max_file_size = int(1.5 * 1024 * 1024)  # 1.5MB
-                            
-                            needs_slicing = (width > max_dimension or height > max_dimension or file_size > max_file_size)
-                            
-                            if needs_slicing:
-                                slice_reason = []
-                                if width > max_dimension or height > max_dimension:
-                                    slice_reason.append(f"尺寸{width}x{height}超过{max_dimension}x{max_dimension}")
-                                if file_size > max_file_size:
-                                    slice_reason.append(f"文件大小{file_size / 1024 / 1024:.1f}MB超过1.5MB")
-                                
-                                logger.info(f"🔪 执行智能切片: {', '.join(slice_reason)}")
-                                
-                                # 执行智能切片
-                                task_slice_id = f"unified_{task_id}_{Path(image_path).stem}"
-                                slice_infos = unified_slicer.slice_image(img, task_slice_id)
-                                
-                                if slice_infos and len(slice_infos) > 0:
-                                    shared_slice_results[image_path] = {
-                                        'sliced': True,
-                                        'slice_count': len(slice_infos),
-                                        'slice_infos': slice_infos,
-                                        'original_size': (width, height),
-                                        'slice_reason': slice_reason
-                                    }
-                                    logger.info(f"✅ 智能切片完成: {len(slice_infos)} 个切片")
-                                else:
-                                    logger.warning("⚠️ 智能切片返回空结果，使用原图")
-                                    shared_slice_results[image_path] = {
-                                        'sliced': False,
-                                        'reason': 'slice_failed',
-                                        'error_to_original': True
-                                    }
-                            else:
-                                logger.info(f"✅ 图片尺寸适中，无需切片")
-                                shared_slice_results[image_path] = {
-                                    'sliced': False,
-                                    'reason': 'size_appropriate',
-                                    'original_size': (width, height)
-                                }
-                            
-                            # 保存原图引用
-                            original_images[image_path] = {
-                                'path': image_path,
-                                'size': (width, height),
-                                'file_size': file_size
-                            }
-                    
-                    except Exception as slice_error:
-                        logger.error(f"❌ 图片切片失败 {image_path}: {slice_error}")
-                        shared_slice_results[image_path] = {
-                            'sliced': False,
-                            'reason': 'slice_error',
-                            'error': str(slice_error),
-                            'error_to_original': True
-                        }
-                
+            if unified_slice_error is None:
                 # 统计切片结果
                 total_images = len(temp_files)
                 sliced_images = sum(1 for result in shared_slice_results.values() if result.get('sliced', False))
                 total_slices = sum(result.get('slice_count', 0) for result in shared_slice_results.values())
                 
                 logger.info(f"🎯 统一智能切片完成: {sliced_images}/{total_images} 张图片被切片, 总计 {total_slices} 个切片")
-                
-            except Exception as unified_slice_error:
-                logger.error(f"❌ 统一智能切片失败: {unified_slice_error}")
+            else:
                 # 已移除降级处理
                 shared_slice_results = {}
                 for image_path in temp_files:
@@ -741,7 +961,10 @@ def process_drawing_celery_task(self, db_drawing_id: int, task_id: str):
                 logger.info("轨道 1: 🔍 开始 PaddleOCR 分析（使用共享智能切片结果）...")
                 # 使用共享切片结果的增强版PaddleOCR服务
                 ocr_result = loop.run_until_complete(
-                    process_images_with_shared_slices(temp_files, shared_slice_results, drawing.id, task_id)
+                    process_images_with_shared_slices(
+                        temp_files, shared_slice_results, drawing.id, task_id,
+                        vector_text_pages=file_processing_result.get('vector_text')
+                    )
                 )
                 
                 if ocr_result.get("success"):
@@ -792,10 +1015,10 @@ def process_drawing_celery_task(self, db_drawing_id: int, task_id: str):
             logger.info("🧠 开始OCR结果智能纠正阶段...")
             ocr_correction_success = False
             corrected_ocr_result = None
+            merged_ocr_key = None
             
             try:
                 # 🔧 【最终修复】直接从 ocr_result 中查找S3 Key
-                merged_ocr_key = None
                 
                 logger.info(f"🔍 在 ocr_result 中搜索合并OCR结果存储键...")
                 if ocr_success and isinstance(ocr_result, dict):
@@ -808,37 +1031,12 @@ def process_drawing_celery_task(self, db_drawing_id: int, task_id: str):
                 if merged_ocr_key:
                     logger.info(f"🎯 确认使用OCR存储键: {merged_ocr_key}")
                     
-                    # 初始化OCR纠正服务
-                    from app.services.ocr_result_corrector import OCRResultCorrector
-                    from app.services.ai_analyzer import AIAnalyzerService
-                    from app.services.dual_storage_service import DualStorageService
-                    
-                    ai_analyzer = AIAnalyzerService()
-                    storage_service = DualStorageService()
-                    
-                    # 确保storage_service已正确初始化
-                    if not storage_service:
-                        raise Exception("存储服务未初始化，无法进行OCR智能纠正")
-                    
-                    ocr_corrector = OCRResultCorrector(ai_analyzer=ai_analyzer, storage_service=storage_service)
-                    
-                    # 执行OCR纠正
-                    corrected_ocr_result = loop.run_until_complete(
-                        ocr_corrector.correct_ocr_result(
-                            merged_ocr_key=merged_ocr_key,
-                            drawing_id=drawing.id,
-                            task_id=task_id,
-                            original_image_info={
-                                'width': original_image_info.get('size', (0,0))[0],
-                                'height': original_image_info.get('size', (0,0))[1],
-                                'filename': drawing.filename
-                            }
-                        )
+                    corrected_ocr_result = _correct_merged_ocr(
+                        loop, merged_ocr_key, drawing, task_id, original_image_info
                     )
                     
                     if corrected_ocr_result:
-                        # 保存纠正结果到数据库
-                        drawing.ocr_merged_result_key = merged_ocr_key
+                        # 保存纠正结果到数据库（合并结果存储键在上传成功后再记录）
                         drawing.ocr_corrected_result_key = corrected_ocr_result.corrected_result_key
                         drawing.ocr_correction_summary = {
                             "processing_time": corrected_ocr_result.processing_metadata.get("processing_time"),
@@ -883,29 +1081,35 @@ def process_drawing_celery_task(self, db_drawing_id: int, task_id: str):
             
             vision_success = False
             try:
-                logger.info("轨道 2: 🤖 开始 Vision Scan 分析（使用共享智能切片结果 + 纠正后OCR结果）...")
-                vision_scanner = VisionScannerService()
+                if llm_client.is_degraded():
+                    # 服务商熔断中，直接走仅OCR路径
+                    logger.warning("轨道 2: 🔌 LLM服务熔断中，跳过Vision扫描，仅使用OCR结果")
+                    vision_scan_result = {"success": False, "error": "LLM circuit open, OCR-only"}
+                else:
+                    logger.info("轨道 2: 🤖 开始 Vision Scan 分析（使用共享智能切片结果 + 纠正后OCR结果）...")
+                    vision_scanner = VisionScannerService()
                 
-                # 【最终修复】确保使用正确的OCR结果变量
-                # enhanced_ocr_result 在上面已经从 ocr_result 复制而来
-                if ocr_correction_success and corrected_ocr_result:
-                    # 如果纠正成功，将纠正数据添加到 enhanced_ocr_result
-                    enhanced_ocr_result['corrected_data'] = {
-                        "drawing_basic_info": corrected_ocr_result.drawing_basic_info,
-                        "component_list": corrected_ocr_result.component_list,
-                        "global_notes": corrected_ocr_result.global_notes,
-                        "corrected_text_regions": corrected_ocr_result.text_regions_corrected,
-                        "correction_summary": corrected_ocr_result.correction_summary
-                    }
-                    logger.info(f"📋 将纠正后的OCR数据传递给Vision分析: {len(corrected_ocr_result.component_list)} 个构件")
+                    # 【最终修复】确保使用正确的OCR结果变量
+                    # enhanced_ocr_result 在上面已经从 ocr_result 复制而来
+                    if ocr_correction_success and corrected_ocr_result:
+                        # 如果纠正成功，将纠正数据添加到 enhanced_ocr_result
+                        enhanced_ocr_result['corrected_data'] = {
+                            "drawing_basic_info": corrected_ocr_result.drawing_basic_info,
+                            "component_list": corrected_ocr_result.component_list,
+                            "global_notes": corrected_ocr_result.global_notes,
+                            "corrected_text_regions": corrected_ocr_result.text_regions_corrected,
+                            "correction_summary": corrected_ocr_result.correction_summary
+                        }
+                        logger.info(f"📋 将纠正后的OCR数据传递给Vision分析: {len(corrected_ocr_result.component_list)} 个构件")
                 
-                vision_scan_result = vision_scanner.scan_images_with_shared_slices(
-                    temp_files, 
-                    shared_slice_results,
-                    drawing.id, 
-                    task_id=task_id,
-                    ocr_result=enhanced_ocr_result  # 传递包含纠正信息的OCR结果
-                )
+                    with stream_component_sink(_component_progress_sink(loop, task_id, progress=60)):
+                        vision_scan_result = vision_scanner.scan_images_with_shared_slices(
+                            temp_files, 
+                            shared_slice_results,
+                            drawing.id, 
+                            task_id=task_id,
+                            ocr_result=enhanced_ocr_result  # 传递包含纠正信息的OCR结果
+                        )
 
                 if vision_scan_result.get("success"):
                     logger.info("轨道 2: ✅ Vision 扫描成功。")
@@ -1077,14 +1281,25 @@ def process_drawing_celery_task(self, db_drawing_id: int, task_id: str):
             
             # 6️⃣ 将最终结果保存到数据库
             logger.info("💾 开始保存最终结果到数据库...")
+            # 合并OCR结果后台上传成功后才记录存储键，避免图纸记录指向不存在的对象
+            if merged_ocr_key:
+                from app.services.merged_ocr_store import merged_ocr_store
+                if merged_ocr_store.wait_persisted(merged_ocr_key, timeout=60):
+                    drawing.ocr_merged_result_key = merged_ocr_key
+                else:
+                    logger.warning(f"⚠️ 合并OCR结果未成功持久化，不记录存储键: {merged_ocr_key}")
+            tile_pyramids = _collect_tile_pyramids(pyramid_futures)
             final_result_payload = {
                 "vision_scan_result": vision_scan_result,
                 "ocr_result": ocr_result,
                 "quantity_result": quantity_result,
+                "tile_pyramids": tile_pyramids,
                 "processing_summary": {
                     "ocr_success": ocr_success,
                     "vision_success": vision_success,
                     "components_count": len(components),
+                    "vector_text": file_processing_result.get('vector_text_statistics'),
+                    "page_rasters": file_processing_result.get('page_rasters'),
                     "merged_results": {
                         "ocr_full_generated": bool(ocr_success and ocr_result.get('merged_full_result')),
                         "vision_full_generated": bool(vision_success and vision_scan_result.get('merged_full_result')),
@@ -1150,6 +1365,20 @@ def process_drawing_celery_task(self, db_drawing_id: int, task_id: str):
         if 'loop' in locals() and loop:
             loop.close()
         
+        clear_task_deadline(deadline_token)
+        llm_client.log_metrics_summary()
+        
+        # 等待后台持久化的合并OCR结果上传完成
+        try:
+            from app.services.merged_ocr_store import merged_ocr_store
+            merged_ocr_store.wait_pending(task_id, timeout=60)
+        except Exception as persist_error:
+            logger.warning(f"等待合并OCR结果持久化失败: {persist_error}")
+        
+        # 后台构建中的瓦片金字塔仍在读取页面图片，清理前等待完成
+        if pyramid_futures:
+            wait_futures([future for _, future in pyramid_futures], timeout=120)
+        
         # 清理临时文件
         logger.info("🧹 开始清理临时文件...")
         try:
@@ -1161,6 +1390,13 @@ def process_drawing_celery_task(self, db_drawing_id: int, task_id: str):
             # 清理文件处理产生的临时文件
             if temp_files:
                 file_processor.cleanup_temp_files(temp_files)
+            
+            # 后台切片持久化仍可能读取暂存文件：超时未完成时，在全部结束后再删除暂存目录
+            if 'unified_slicer' in locals() and unified_slicer:
+                unified_slicer.wait_persistence(timeout=60)
+                unified_slicer.after_persistence(lambda: shutil.rmtree(slice_spool_dir, ignore_errors=True))
+            else:
+                shutil.rmtree(slice_spool_dir, ignore_errors=True)
                 
         except Exception as cleanup_error:
             logger.warning(f"清理临时文件失败: {cleanup_error}")
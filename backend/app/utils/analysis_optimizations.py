@@ -209,10 +209,16 @@ class GPTResponseParser:
     
     @staticmethod
     def extract_json_from_response(response_text: str) -> Dict[str, Any]:
-        """从GPT响应中提取JSON数据"""
+        """从GPT响应中提取JSON数据，解析失败时返回降级响应"""
+        parsed = GPTResponseParser.try_extract_json(response_text)
+        return parsed if parsed is not None else GPTResponseParser._create_fallback_response()
+    
+    @staticmethod
+    def try_extract_json(response_text: str) -> Optional[Dict[str, Any]]:
+        """从GPT响应中提取JSON对象，无法解析或不是对象时返回None"""
         try:
             # 清理响应文本
-            cleaned_response = response_text.strip()
+            cleaned_response = (response_text or "").strip()
             
             # 如果响应包含```json标记，提取其中的JSON
             json_match = re.search(r'```json\s*(.*?)\s*```', cleaned_response, re.DOTALL)
@@ -226,11 +232,12 @@ class GPTResponseParser:
                     cleaned_response = '\n'.join(lines[1:-1]) if lines[-1].strip() == '```' else '\n'.join(lines[1:])
             
             # 尝试解析JSON
-            return json.loads(cleaned_response)
+            parsed = json.loads(cleaned_response)
             
         except json.JSONDecodeError as e:
             logger.warning(f"⚠️ GPT响应JSON解析失败: {e}")
-            return GPTResponseParser._create_fallback_response()
+            return None
+        return parsed if isinstance(parsed, dict) else None
     
     @staticmethod
     def _create_fallback_response() -> Dict[str, Any]:
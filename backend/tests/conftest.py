@@ -32,6 +32,14 @@ def test_db():
         if os.path.exists("test.db"):
             os.remove("test.db")
 
+@pytest.fixture
+def reset_llm_client():
+    """重置共享LLM客户端的并发限流器，避免跨测试复用信号量"""
+    from app.services.llm_client import llm_client
+    llm_client.reset_limiters()
+    yield llm_client
+    llm_client.reset_limiters()
+
 @pytest.fixture
 def temp_dir():
     """创建临时目录"""
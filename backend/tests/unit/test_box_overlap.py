@@ -0,0 +1,69 @@
+import numpy as np
+
+from app.services import box_overlap
+from app.services.box_overlap import boxes_array, brute_force_overlap_groups, overlap_groups, synthetic_boxes
+from app.services.intelligent_fusion_engine import FusionCandidate, IntelligentFusionEngine
+
+
+def _candidate(index, spatial_info):
+    return FusionCandidate(element_id=f"c{index}", source="vision", confidence=0.9,
+                           attributes={"label": "KZ1", "type": "column"}, spatial_info=spatial_info,
+                           fusion_score=0.9, conflict_indicators=[])
+
+
+def _engine_reference_groups(engine, candidates):
+    """用 _has_spatial_overlap 逐对建图后求连通分量"""
+    n = len(candidates)
+    labels = list(range(n))
+    for i in range(n):
+        for j in range(i + 1, n):
+            if engine._has_spatial_overlap(candidates[i], candidates[j]):
+                old, new = max(labels[i], labels[j]), min(labels[i], labels[j])
+                labels = [new if label == old else label for label in labels]
+    groups = {}
+    for i, label in enumerate(labels):
+        groups.setdefault(label, []).append(i)
+    return sorted(groups.values())
+
+
+def test_sweep_groups_match_brute_force(monkeypatch):
+    # 小批次上限让扫描线走分批展开的路径
+    monkeypatch.setattr(box_overlap, "_CHUNK_PAIRS", 64)
+    for seed in range(3):
+        boxes = synthetic_boxes(1500, seed=seed)
+        boxes[::50] = boxes[1::50]      # 完全重合
+        boxes[7] = np.nan
+        assert overlap_groups(boxes) == brute_force_overlap_groups(boxes)
+
+
+def test_conflict_groups_are_connected_components():
+    engine = IntelligentFusionEngine()
+    rng = np.random.default_rng(4)
+    infos = []
+    for _ in range(250):
+        x, y = rng.uniform(0, 600, 2)
+        infos.append({"x": x, "y": y, "width": rng.uniform(5, 60), "height": rng.uniform(5, 60)})
+    infos[3] = {}
+    infos[9] = {"x": 10, "y": 10, "width": 0, "height": 40}
+    candidates = [_candidate(i, info) for i, info in enumerate(infos)]
+
+    conflict_groups, singles = engine._group_conflict_candidates(candidates)
+    index = {id(candidate): i for i, candidate in enumerate(candidates)}
+    groups = sorted([[index[id(c)] for c in group] for group in conflict_groups] +
+                    [[index[id(c)]] for c in singles])
+    assert groups == _engine_reference_groups(engine, candidates)
+    assert np.isnan(boxes_array([{"x": 10, "y": 10, "width": None, "height": 40}])).all()
+
+
+def test_transitive_chain_forms_one_group():
+    engine = IntelligentFusionEngine()
+    # A 与 C 不重叠，但都与 B 重叠（重叠40%）；C 排在最前
+    candidates = [
+        _candidate(0, {"x": 120, "y": 0, "width": 100, "height": 100}),
+        _candidate(1, {"x": 0, "y": 0, "width": 100, "height": 100}),
+        _candidate(2, {"x": 60, "y": 0, "width": 100, "height": 100}),
+        _candidate(3, {"x": 1000, "y": 0, "width": 100, "height": 100}),
+    ]
+    conflict_groups, singles = engine._group_conflict_candidates(candidates)
+    assert [[c.element_id for c in group] for group in conflict_groups] == [["c0", "c1", "c2"]]
+    assert [c.element_id for c in singles] == ["c3"]
@@ -0,0 +1,72 @@
+import numpy as np
+
+from app.services.result_mergers.component_merge import (
+    bbox_array, brute_force_clusters, cluster_components, cluster_duplicates, component_keys,
+    normalise_component_key, synthetic_components
+)
+from app.services.vision.vision_result_coordinator import VisionResultCoordinator
+from app.services.vision_scanner import VisionScannerService
+
+
+def test_clusters_match_brute_force():
+    for seed in range(3):
+        components = synthetic_components(1200, seed=seed)
+        components[5]['bbox'] = None
+        components[6]['bbox'] = [10, 10, 10, 50]
+        keys = [component_keys(components, 'component_id'), component_keys(components, 'component_type')]
+        boxes = bbox_array(components)
+        clusters = cluster_duplicates(boxes, keys)
+        assert [cluster.indices for cluster in clusters] == brute_force_clusters(boxes, keys)
+
+    assert normalise_component_key(' kz１ ') == 'KZ1'
+    assert normalise_component_key('  ') is None
+
+
+def test_cluster_provenance():
+    components = [
+        {'component_id': 'KZ1', 'bbox': [0, 0, 100, 100]},
+        {'component_id': 'kz1', 'bbox': [10, 0, 110, 100]},
+        {'component_id': 'KZ1', 'bbox': [20, 0, 120, 100]},
+        {'component_id': 'KZ2', 'bbox': [0, 0, 100, 100]},
+    ]
+    clusters = cluster_components(components, key_fields=('component_id',))
+    assert [cluster.indices for cluster in clusters] == [[0, 1, 2], [3]]
+    assert clusters[0].bbox == [0, 0, 120, 100]
+    assert clusters[0].overlap_bbox == [20, 0, 100, 100]
+    assert clusters[1].overlap_bbox is None
+
+
+def test_scanner_does_not_double_count_overlap_duplicates():
+    scanner = VisionScannerService.__new__(VisionScannerService)
+    components = [
+        # 同一根柱在两个相邻切片的重叠区各被识别一次
+        {'component_id': 'KZ1', 'bbox': [1900, 100, 1990, 190], 'quantity': 1, 'confidence': 0.7,
+         'slice_source': {'slice_id': 'slice_0'}},
+        {'component_id': 'KZ1', 'bbox': [1902, 101, 1991, 192], 'quantity': 1, 'confidence': 0.9,
+         'slice_source': {'slice_id': 'slice_1'}},
+        # 另一处的同编号柱仍按数量汇总
+        {'component_id': 'KZ1', 'bbox': [500, 500, 590, 590], 'quantity': 1, 'confidence': 0.8,
+         'slice_source': {'slice_id': 'slice_0'}},
+        {'component_id': 'KL1', 'quantity': 2, 'slice_source': {'slice_id': 'slice_1'}},
+    ]
+    merged = scanner._merge_duplicate_components(components)
+    by_key = {component['component_id']: component for component in merged}
+    assert by_key['KZ1']['quantity'] == 2
+    assert [source['slice_id'] for source in by_key['KZ1']['slice_sources']] == ['slice_0', 'slice_1']
+    assert by_key['KL1']['quantity'] == 2
+
+
+def test_coordinator_merges_connected_duplicates():
+    coordinator = VisionResultCoordinator()
+    components = [
+        {'component_id': 'KL1', 'component_type': '梁', 'bbox': [0, 0, 100, 20], 'quantity': 1, 'batch_index': 0},
+        {'component_id': 'KL2', 'component_type': '梁', 'bbox': [5, 0, 105, 20], 'quantity': 1, 'batch_index': 1},
+        {'component_id': 'KZ1', 'component_type': '柱', 'bbox': [0, 0, 100, 20], 'quantity': 1, 'batch_index': 1},
+        {'component_id': 'KZ2', 'component_type': '柱', 'bbox': [500, 500, 520, 520], 'quantity': 1},
+    ]
+    merged = coordinator._merge_duplicate_components(components)
+    assert len(merged) == 3
+    assert merged[0]['merged_from_count'] == 2
+    assert merged[0]['merge_sources'] == [0, 1]
+    assert merged[0]['overlap_region'] == [5, 0, 100, 20]
+    assert np.isnan(bbox_array([{'bbox': 'bad'}])).all()
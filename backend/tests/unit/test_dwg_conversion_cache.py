@@ -0,0 +1,146 @@
+import os
+
+import ezdxf
+
+from app.services.dwg_processing.converters.conversion_cache import DXFConversionCache
+from app.services.dwg_processing.converters.dwg_converter import DWGConverter
+
+
+def _write_dwg(path, label):
+    path.write_bytes(b"AC1032" + label.encode() + b"\0" * 200)
+    return str(path)
+
+
+def test_second_conversion_hits_cache(tmp_path):
+    sources = [_write_dwg(tmp_path / f"plan_{i}.dwg", f"P{i}") for i in range(3)]
+    converter = DWGConverter(cache=DXFConversionCache(root_dir=str(tmp_path / "cache"), upload_to_s3=False))
+    job_dirs = []
+
+    def fake_oda(dwg_path, job_dir=None):
+        # 代替ODA可执行文件：在各自独立的作业目录里输出DXF
+        job_dirs.append(job_dir)
+        doc = ezdxf.new()
+        doc.modelspace().add_text(dwg_path)
+        out = job_dir / "out.dxf"
+        doc.saveas(str(out))
+        return str(out)
+
+    converter.oda_available = True
+    converter._convert_with_oda = fake_oda
+
+    first = converter.batch_convert(sources, max_workers=3)
+    assert all(first.values()) and len(set(first.values())) == 3
+    assert len(set(job_dirs)) == 3
+    assert {r['method'] for r in converter.conversion_records.values()} == {'oda'}
+
+    second = converter.batch_convert(sources, max_workers=3)
+    assert second == first and len(job_dirs) == 3
+    stats = converter.get_statistics()
+    assert stats['cache_hits'] == 3 and stats['failures'] == 0 and stats['methods'] == {'cache': 3}
+    assert converter.cache.get_statistics()['hit_rate'] == 0.5
+    converter.cleanup()
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = DXFConversionCache(root_dir=str(tmp_path / "cache"), max_bytes=1, upload_to_s3=False)
+    for name in ("a", "b"):
+        src = tmp_path / f"{name}.dxf"
+        src.write_text(name * 100)
+        cache.put(name, str(src))
+    assert cache.get("a") is None and cache.get("b") is not None
+
+
+def test_eviction_skips_pinned_entries(tmp_path):
+    cache = DXFConversionCache(root_dir=str(tmp_path / "cache"), max_bytes=1, upload_to_s3=False)
+    cache.pin("a")
+    for i, name in enumerate(("a", "b", "c")):
+        src = tmp_path / f"{name}.dxf"
+        src.write_text(name * 100)
+        cache.put(name, str(src))
+        os.utime(tmp_path / "cache" / f"{name}.dxf", (1000 + i, 1000 + i))
+    # a 使用中不淘汰，b 被淘汰，最新的 c 保留
+    assert sorted(p.stem for p in (tmp_path / "cache").glob("*.dxf")) == ["a", "c"]
+
+    cache.unpin("a")
+    cache._evict()
+    assert [p.stem for p in (tmp_path / "cache").glob("*.dxf")] == ["c"]
+
+
+def test_converter_releases_hash_locks_and_pins(tmp_path):
+    source = _write_dwg(tmp_path / "plan.dwg", "P")
+    cache = DXFConversionCache(root_dir=str(tmp_path / "cache"), max_bytes=1, upload_to_s3=False)
+    converter = DWGConverter(cache=cache)
+
+    def fake_oda(dwg_path, job_dir=None):
+        out = job_dir / "out.dxf"
+        ezdxf.new().saveas(str(out))
+        return str(out)
+
+    converter.oda_available = True
+    converter._convert_with_oda = fake_oda
+    dxf_path = converter.convert_to_dxf(source)
+    assert dxf_path and converter._hash_locks == {}
+
+    # 转换结果被调用方使用期间，其他条目写入也不会把它淘汰
+    other = tmp_path / "other.dxf"
+    other.write_text("x" * 1000)
+    cache.put("other", str(other))
+    assert os.path.exists(dxf_path)
+
+    converter.cleanup()
+    assert cache._pins == {}
+
+
+def test_invalid_conversion_is_not_cached(tmp_path):
+    source = _write_dwg(tmp_path / "broken.dwg", "B")
+    cache = DXFConversionCache(root_dir=str(tmp_path / "cache"), upload_to_s3=False)
+    converter = DWGConverter(cache=cache)
+
+    def broken_oda(dwg_path, job_dir=None):
+        out = job_dir / "out.dxf"
+        out.write_bytes(b"\0")
+        return str(out)
+
+    converter.oda_available = True
+    converter._convert_with_oda = broken_oda
+    converter._manual_convert = lambda dwg_path, job_dir=None: None
+
+    assert converter.convert_to_dxf(source) is None
+    assert list((tmp_path / "cache").glob("*.dxf")) == []
+    assert cache._pins == {}
+    converter.cleanup()
+
+
+def test_conversion_deduplicated_across_converter_instances(tmp_path):
+    import threading
+    import time
+
+    source = _write_dwg(tmp_path / "shared.dwg", "S")
+    calls = []
+
+    def slow_oda(dwg_path, job_dir=None):
+        calls.append(dwg_path)
+        time.sleep(0.2)
+        out = job_dir / "out.dxf"
+        ezdxf.new().saveas(str(out))
+        return str(out)
+
+    # 不同转换器实例（各自的缓存对象）共享同一缓存目录，只靠目录中的文件锁互斥
+    converters = []
+    for _ in range(2):
+        converter = DWGConverter(cache=DXFConversionCache(root_dir=str(tmp_path / "cache"), upload_to_s3=False))
+        converter.oda_available = True
+        converter._convert_with_oda = slow_oda
+        converters.append(converter)
+
+    results = []
+    threads = [threading.Thread(target=lambda c=c: results.append(c.convert_to_dxf(source))) for c in converters]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == 2 and results[0] == results[1] and results[0]
+    for converter in converters:
+        converter.cleanup()
@@ -0,0 +1,68 @@
+import ezdxf
+import numpy as np
+
+from app.services.dwg_processing.exporters.dxf_rasterizer import DXFRasterizer
+
+
+def _doc():
+    doc = ezdxf.new()
+    doc.units = ezdxf.units.MM
+    return doc
+
+
+def test_renders_every_entity_without_cap():
+    doc = _doc()
+    msp = doc.modelspace()
+    # 3000条互不重叠的竖线，旧渲染器在1000个实体后截断
+    for i in range(3000):
+        msp.add_line((i * 2.0, 0), (i * 2.0, 10))
+
+    result = DXFRasterizer(dpi=25.4, max_megapixels=100).render(doc, (0, 0, 5999, 10))
+    image = result['image']
+    assert result['entity_count'] == 3000
+    assert image.shape == (11, 6000)
+    inked_columns = np.nonzero((image[5] == 0))[0]
+    assert len(inked_columns) == 3000
+
+
+def test_block_geometry_and_text_regions():
+    doc = _doc()
+    msp = doc.modelspace()
+    block = doc.blocks.new('COLUMN')
+    block.add_circle((0, 0), 10)
+    block.add_text('KZ1', dxfattribs={'height': 5, 'insert': (-5, -2.5)})
+    msp.add_blockref('COLUMN', (50, 50))
+
+    result = DXFRasterizer(dpi=25.4).render(doc, (0, 0, 100, 100))
+    image = result['image']
+    # 块内圆在 (40..60, 40..60)，图像y轴向下
+    assert image[50, 40] == 0 and image[50, 60] == 0 and image[40, 50] == 0
+    assert image[50, 50] == 255
+
+    regions = result['text_regions']
+    assert [r['text'] for r in regions] == ['KZ1']
+    x1, y1, x2, y2 = regions[0]['bbox']
+    assert abs(x1 - 45) < 1 and abs(y2 - 52.5) < 1 and y1 < y2
+    assert regions[0]['source'] == 'dxf_vector'
+
+
+def test_rendered_dxf_passes_vector_text_to_ocr(tmp_path):
+    from app.services.file_processor import FileProcessor
+
+    doc = _doc()
+    block = doc.blocks.new('COLUMN')
+    block.add_circle((0, 0), 10)
+    block.add_text('KZ1', dxfattribs={'height': 5, 'insert': (-5, -2.5)})
+    doc.modelspace().add_blockref('COLUMN', (50, 50))
+    dxf_path = str(tmp_path / 'block_text.dxf')
+    doc.saveas(dxf_path)
+
+    processor = FileProcessor()
+    processor.temp_dir = str(tmp_path)
+    result = processor.process_cad(dxf_path)
+
+    image_path = result['image_paths'][0]
+    page = result['vector_text'][image_path]
+    assert page['mode'] == 'vector'
+    assert [r['text'] for r in page['text_regions']] == ['KZ1']
+    assert result['vector_text_statistics']['vector_pages'] == 1
@@ -0,0 +1,101 @@
+import ezdxf
+import numpy as np
+import pytest
+from ezdxf import bbox as ezdxf_bbox
+
+from app.services.dwg_processing.core.dxf_stream import stream_dxf
+from app.services.dwg_processing.core.entity_index import ModelSpaceIndex
+from app.services.dwg_processing.detectors.frame_detector import FrameDetector
+from app.services.dwg_processing.detectors.text_parser import TextParser
+from app.services.dwg_processing.exporters.dxf_rasterizer import DXFRasterizer
+
+
+def _sample_dxf(path):
+    doc = ezdxf.new()
+    doc.units = ezdxf.units.MM
+    msp = doc.modelspace()
+    w, h = 42000.0, 29700.0  # A3 @ 1:100
+    msp.add_lwpolyline([(0, 0), (w, 0), (w, h), (0, h)], close=True, dxfattribs={'layer': 'TK'})
+    msp.add_lwpolyline([(2500, 500), (w - 500, 500), (w - 500, h - 500), (2500, h - 500)], close=True,
+                       dxfattribs={'layer': 'TK'})
+    msp.add_line((1000, 1000), (9000, 1000), dxfattribs={'layer': 'WALL'})
+    msp.add_circle((5000, 5000), 400, dxfattribs={'layer': 'COLU'})
+    msp.add_text("图号: S-07", dxfattribs={'insert': (40000, 500), 'height': 350})
+    msp.add_mtext("比例 1:100", dxfattribs={'insert': (40000, 1500), 'char_height': 350})
+    block = doc.blocks.new('KZ', base_point=(100, 100))
+    block.add_lwpolyline([(0, 0), (200, 0), (200, 200), (0, 200)], close=True)
+    block.add_arc((100, 100), 50, 0, 90)
+    block.add_attdef('NO', (0, 0))
+    ref = msp.add_blockref('KZ', (20000, 10000), dxfattribs={'rotation': 90, 'xscale': 2, 'yscale': 2})
+    ref.add_attrib('NO', 'KZ-1', (20000, 10000), dxfattribs={'height': 250})
+    msp.add_line((0, 0), (1, 1)).dxf.paperspace = 0
+    doc.layouts.get('Layout1').add_line((0, 0), (5, 5))  # 图纸空间实体不进入模型空间
+    doc.saveas(str(path))
+    return doc
+
+
+def test_streamed_columns_match_readfile(tmp_path):
+    path = tmp_path / "plan.dxf"
+    _sample_dxf(path)
+    full = ezdxf.readfile(str(path))
+    streamed = stream_dxf(str(path))
+
+    full_index, stream_index = ModelSpaceIndex.of(full), ModelSpaceIndex.of(streamed)
+    assert stream_index.types == ['LWPOLYLINE', 'LWPOLYLINE', 'LINE', 'CIRCLE', 'TEXT', 'MTEXT', 'INSERT', 'TEXT', 'LINE']
+    assert stream_index.extent() == pytest.approx(full_index.extent())
+    insert_row = stream_index.types.index('INSERT')
+    # 块几何 (0..200) 减基点 (100, 100)、放大2倍、旋转90度后平移到插入点
+    assert stream_index.boxes[insert_row] == pytest.approx([19800, 9800, 20200, 10200])
+
+    parser = TextParser()
+    frame = FrameDetector().detect(streamed)[0]
+    assert frame['sheet'] == 'A3' and frame['source'] == 'LWPOLYLINE'
+    texts = parser.extract_texts_from_area(streamed, frame['bounds'])
+    assert parser.parse_title_block(texts)['drawing_number'] == 'S-07'
+    # 流式读取把可见块属性也作为文本行
+    full_texts = [t['text'] for t in parser.extract_texts_from_area(full, frame['bounds'])]
+    assert sorted(t['text'] for t in texts) == sorted(full_texts + ['KZ-1'])
+
+    rasterizer = DXFRasterizer(dpi=50)
+    image_streamed = rasterizer.render(streamed, frame['bounds'])
+    image_full = rasterizer.render(full, frame['bounds'])
+    assert image_streamed['image'].shape == image_full['image'].shape
+    # 块内多段线/圆弧按插入变换展开后与完整文档渲染结果一致
+    assert np.mean(image_streamed['image'] != image_full['image']) < 0.001
+    assert {r['text'] for r in image_streamed['text_regions']} == {r['text'] for r in image_full['text_regions']}
+
+
+def test_streamed_polylines_keep_every_vertex(tmp_path):
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    # 快速路径、带凸度和非默认拉伸方向（慢速路径）的多段线
+    msp.add_lwpolyline([(0, 0), (100, 0), (100, 50), (0, 50)], close=True)
+    msp.add_lwpolyline([(0, 100, 0, 0, 0.5), (100, 100, 0, 0, 0), (100, 150, 0, 0, 0), (0, 150, 0, 0, 0)],
+                       format='xyseb')
+    msp.add_lwpolyline([(200, 0), (300, 0), (300, 80)], dxfattribs={'extrusion': (0, 0, -1)})
+    msp.add_text("默认字高", dxfattribs={'insert': (0, 300)})
+    path = tmp_path / "polylines.dxf"
+    doc.saveas(str(path))
+    # 去掉文本的字高组码，检查缺省值
+    path.write_text(path.read_text(encoding='utf-8').replace(" 40\n2.5\n  1\n默认字高", "  1\n默认字高"),
+                    encoding='utf-8')
+
+    full = ezdxf.readfile(str(path))
+    stream_index = ModelSpaceIndex.of(stream_dxf(str(path)))
+    # 与 ezdxf 按完整几何（凸度、OCS）计算的范围一致
+    for row, entity in zip(stream_index.boxes, full.modelspace().query('LWPOLYLINE')):
+        extents = ezdxf_bbox.extents([entity])
+        assert row == pytest.approx([extents.extmin.x, extents.extmin.y, extents.extmax.x, extents.extmax.y])
+    rows = stream_index.entities
+    assert len(rows[0].points_xy()) == 4
+    # 凸度段离散后仍以最后一个顶点结束
+    assert rows[1].points_xy()[-1].tolist() == pytest.approx([0, 150])
+    assert len(rows[2].points_xy()) == 3
+    # 快速路径与慢速路径的文本缺省字高一致
+    assert stream_index.texts[0]['height'] == 10.0
+
+
+def test_ezdxf_stream_internals_available():
+    # 流式读取依赖 ezdxf 内部接口，锁定版本升级后若接口缺失应在此明确失败
+    from app.services.dwg_processing.core import dxf_stream
+    assert dxf_stream._internals_error is None
@@ -0,0 +1,54 @@
+import ezdxf
+import numpy as np
+
+from app.services.dwg_processing.core.entity_index import ModelSpaceIndex, entity_bounds
+from app.services.dwg_processing.detectors.text_parser import TextParser
+
+
+def _build_doc():
+    rng = np.random.default_rng(42)
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    # 跨越整个图面的大图框，走超大实体分支
+    msp.add_lwpolyline([(0, 0), (2000, 0), (2000, 1500), (0, 1500)], close=True)
+    for i, (x, y) in enumerate(rng.random((600, 2)) * (2000, 1500)):
+        if i % 4 == 0:
+            msp.add_text(f"T{i}", dxfattribs={'insert': (x, y), 'height': 3.5})
+        elif i % 4 == 1:
+            msp.add_circle((x, y), 5 + rng.random() * 30)
+        else:
+            msp.add_line((x, y), (x + rng.random() * 80, y + rng.random() * 60))
+    return doc
+
+
+def _intersects(box, bounds):
+    return box is not None and box[2] >= bounds[0] and box[0] <= bounds[2] and \
+        box[3] >= bounds[1] and box[1] <= bounds[3]
+
+
+def test_queries_match_brute_force():
+    doc = _build_doc()
+    msp = doc.modelspace()
+    index = ModelSpaceIndex.of(doc)
+    assert ModelSpaceIndex.of(msp) is index
+
+    for bounds in [(100, 100, 400, 300), (1500, 900, 2100, 1600), (-50, -50, 10, 10), (0, 0, 2000, 1500)]:
+        expected = [e for e in msp if _intersects(entity_bounds(e), bounds)]
+        assert index.query(bounds) == expected
+
+        expected_texts = [e.dxf.text for e in msp if e.dxftype() == 'TEXT'
+                          and bounds[0] <= e.dxf.insert[0] <= bounds[2] and bounds[1] <= e.dxf.insert[1] <= bounds[3]]
+        assert [t['text'] for t in index.query_texts(bounds)] == expected_texts
+        assert [t['text'] for t in TextParser().extract_texts_from_area(doc, bounds, max_texts=5)] == expected_texts[:5]
+
+    circles = index.query((0, 0, 2000, 1500), types=('CIRCLE',))
+    assert circles and all(e.dxftype() == 'CIRCLE' for e in circles)
+
+
+def test_index_rebuilds_when_modelspace_changes():
+    doc = _build_doc()
+    index = ModelSpaceIndex.of(doc)
+    doc.modelspace().add_text("NEW", dxfattribs={'insert': (5000, 5000)})
+    rebuilt = ModelSpaceIndex.of(doc)
+    assert rebuilt is not index
+    assert [t['text'] for t in rebuilt.query_texts((4900, 4900, 5100, 5100))] == ["NEW"]
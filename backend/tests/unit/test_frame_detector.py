@@ -0,0 +1,65 @@
+import ezdxf
+import pytest
+
+from app.services.dwg_processing.detectors.frame_detector import FrameDetector, SheetSizeTable
+
+
+def _add_line_rectangle(msp, x0, y0, x1, y1):
+    corners = [(x0, y0), (x1, y0), (x1, y1), (x0, y1)]
+    for a, b in zip(corners, corners[1:] + corners[:1]):
+        msp.add_line(a, b)
+
+
+def test_sheet_size_matching():
+    table = SheetSizeTable()
+    assert table.match(84100, 59400)['sheet'] == 'A1' and table.match(84100, 59400)['scale'] == '1:100'
+    assert table.match(594, 841 * 1.5)['sheet'] == 'A1+0.5'
+    assert table.match(1000, 700) is None
+
+
+def test_detects_polyline_line_and_block_frames():
+    doc = ezdxf.new()
+    doc.units = ezdxf.units.MM
+    msp = doc.modelspace()
+    w, h = 42000.0, 29700.0  # A3 @ 1:100
+    msp.add_lwpolyline([(0, 0), (w, 0), (w, h), (0, h)], close=True)
+    msp.add_lwpolyline([(2500, 500), (w - 500, 500), (w - 500, h - 500), (2500, h - 500)], close=True)
+    _add_line_rectangle(msp, 50000, 0, 50000 + w, h)
+    _add_line_rectangle(msp, 52500, 500, 50000 + w - 500, h - 500)
+    block = doc.blocks.new('TK_A2')
+    block.add_lwpolyline([(0, 0), (594, 0), (594, 420), (0, 420)], close=True)
+    block.add_lwpolyline([(25, 10), (584, 10), (584, 410), (25, 410)], close=True)
+    msp.add_blockref('TK_A2', (0, 40000), dxfattribs={'xscale': 100, 'yscale': 100})
+    msp.add_lwpolyline([(100, 100), (1100, 100), (1100, 800), (100, 800)], close=True)  # 非标准尺寸
+    msp.add_text("图号: S-01", dxfattribs={'insert': (w - 100, 100), 'height': 350})
+
+    frames = FrameDetector().detect(doc)
+    by_source = {frame['source']: frame for frame in frames}
+    assert set(by_source) == {'INSERT', 'LWPOLYLINE', 'LINE'}
+    assert by_source['INSERT']['sheet'] == 'A2' and by_source['INSERT']['bounds'][2] == pytest.approx(59400)
+    assert by_source['LINE']['bounds'] == pytest.approx((50000, 0, 50000 + w, h))
+    assert by_source['LWPOLYLINE']['sheet'] == 'A3' and by_source['LWPOLYLINE']['children'] == []
+    assert all('standard_compliance' in frame for frame in frames)
+
+
+def test_standard_size_rectangle_without_frame_features_is_rejected():
+    doc = ezdxf.new()
+    doc.units = ezdxf.units.MM
+    msp = doc.modelspace()
+    w, h = 42000.0, 29700.0  # A3 @ 1:100
+    # 尺寸恰好符合图幅的房间轮廓，没有图框线和图签
+    msp.add_lwpolyline([(0, 0), (w, 0), (w, h), (0, h)], close=True)
+    # 真实图框：幅面线、图框线和图签文字
+    msp.add_lwpolyline([(50000, 0), (50000 + w, 0), (50000 + w, h), (50000, h)], close=True)
+    msp.add_lwpolyline([(52500, 500), (50000 + w - 500, 500), (50000 + w - 500, h - 500), (52500, h - 500)],
+                       close=True)
+    for i, text in enumerate(("图号: S-02", "比例 1:100", "设计")):
+        msp.add_text(text, dxfattribs={'insert': (50000 + w - 15000, 1000 + i * 1500), 'height': 350})
+
+    detector = FrameDetector()
+    frames = detector.detect(doc)
+    assert [frame['bounds'] for frame in frames] == [pytest.approx((50000, 0, 50000 + w, h))]
+    assert frames[0]['standard_compliance'] >= detector.min_score
+    assert frames[0]['compliance_details']['border_integrity'] == 2.0
+    # 不评分时保留所有顶层候选
+    assert len(detector.detect_bounds(doc)) == 2
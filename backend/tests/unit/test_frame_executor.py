@@ -0,0 +1,84 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import ezdxf
+
+from app.services.dwg_processing.core.dwg_processor import DWGProcessor
+from app.services.dwg_processing.core import frame_executor
+from app.services.dwg_processing.core.frame_executor import FrameExecutor, MODE_PROCESS, MODE_SEQUENTIAL, MODE_THREAD
+
+
+def _multi_frame_doc(numbers):
+    doc = ezdxf.new()
+    doc.units = ezdxf.units.MM
+    msp = doc.modelspace()
+    for i, number in enumerate(numbers):
+        ox = i * 1000.0
+        msp.add_lwpolyline([(ox, 0), (ox + 841, 0), (ox + 841, 594), (ox, 594)], close=True)
+        msp.add_line((ox + 100, 100), (ox + 700, 500))
+        msp.add_text(f"图号:{number}", dxfattribs={'insert': (ox + 700, 30), 'height': 5})
+    return doc
+
+
+def _frame_summary(doc, index, bounds):
+    from app.services.dwg_processing.core.entity_index import ModelSpaceIndex
+    return {'index': index, 'texts': [t['text'] for t in ModelSpaceIndex.of(doc).query_texts(bounds)]}
+
+
+def test_process_pool_matches_sequential():
+    doc = _multi_frame_doc(['S-01', 'S-02', 'S-03'])
+    frames = [(i * 1000.0, 0, i * 1000.0 + 841, 594) for i in range(3)]
+
+    parallel = FrameExecutor(max_workers=2, enabled=True)
+    assert parallel.choose_mode(len(frames)) == MODE_PROCESS
+    parallel_results, stats = parallel.map(doc, frames, _frame_summary)
+    sequential_results, sequential_stats = FrameExecutor(enabled=False).map(doc, frames, _frame_summary)
+
+    assert stats['mode'] == MODE_PROCESS and sequential_stats['mode'] == MODE_SEQUENTIAL
+    assert parallel_results == sequential_results
+    assert [r['texts'] for r in parallel_results] == [['图号:S-01'], ['图号:S-02'], ['图号:S-03']]
+
+
+def test_concurrent_maps_keep_their_own_documents():
+    docs = [_multi_frame_doc([f'A-{i}' for i in range(3)]), _multi_frame_doc([f'B-{i}' for i in range(3)])]
+    frames = [(i * 1000.0, 0, i * 1000.0 + 841, 594) for i in range(3)]
+    executor = FrameExecutor(max_workers=2, enabled=True)
+    with ThreadPoolExecutor(max_workers=2) as callers:
+        outputs = list(callers.map(lambda doc: executor.map(doc, frames, _frame_summary), docs))
+    assert [[r['texts'][0] for r in results] for results, _ in outputs] == \
+        [['图号:A-0', '图号:A-1', '图号:A-2'], ['图号:B-0', '图号:B-1', '图号:B-2']]
+
+
+def test_multithreaded_parent_avoids_fork(monkeypatch):
+    monkeypatch.setattr(frame_executor.threading, 'active_count', lambda: 2)
+    doc = _multi_frame_doc(['S-01', 'S-02'])
+    frames = [(i * 1000.0, 0, i * 1000.0 + 841, 594) for i in range(2)]
+    executor = FrameExecutor(max_workers=2, enabled=True)
+
+    results, stats = executor.map(doc, frames, _frame_summary)
+    assert stats['mode'] == MODE_PROCESS and stats['start_method'] in ('forkserver', 'spawn')
+    assert [r['texts'] for r in results] == [['图号:S-01'], ['图号:S-02']]
+
+    # 处理函数无法序列化时退化为线程池
+    lock = threading.Lock()
+    results, stats = executor.map(doc, frames, lambda d, i, b: {'index': i, 'lock': lock.locked()})
+    assert stats['mode'] == MODE_THREAD
+    assert [r['index'] for r in results] == [0, 1]
+
+
+def test_drawings_sorted_by_number(tmp_path):
+    doc = _multi_frame_doc(['S-10', 'S-2', 'S-1'])
+    processor = DWGProcessor()
+    processor.temp_dir = str(tmp_path)
+    processor.frame_executor = FrameExecutor(max_workers=2, enabled=True)
+
+    drawings = processor._process_drawings(doc, "multi.dwg")
+    assert [d['drawing_number'] for d in drawings] == ['S-1', 'S-2', 'S-10']
+    assert all(d['success'] and (tmp_path / f"frame_{d['index']:03d}.png").exists() for d in drawings)
+    # 没有可归类构件的图框交给OCR阶段，不生成演示数据
+    assert all(d['quantity_source'] == 'ocr' and d['components'] == [] for d in drawings)
+    assert 'component_data' not in drawings[0]
+    assert processor.last_frame_execution['mode'] == MODE_PROCESS
+    # 图框文字以矢量文本随结果返回
+    assert [[r['text'] for r in d['vector_text']['text_regions']] for d in drawings] == \
+        [['图号:S-1'], ['图号:S-2'], ['图号:S-10']]
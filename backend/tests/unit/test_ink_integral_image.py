@@ -0,0 +1,85 @@
+import numpy as np
+from app.services.adaptive_slicing_engine import InkIntegralImage
+
+def _labelled_sheet(seed=0):
+    rng = np.random.default_rng(seed)
+    mask = np.zeros((3000, 5000), dtype=bool)
+    labels = []
+    for _ in range(300):
+        x, y = int(rng.integers(0, 4880)), int(rng.integers(0, 2970))
+        mask[y:y + 20, x:x + 110] = True
+        labels.append((x, y, x + 110, y + 20))
+    return mask, labels
+
+def test_rectangle_queries_match_brute_force():
+    mask, _ = _labelled_sheet()
+    index = InkIntegralImage(mask, max_dim=10000)
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+        x0, x1 = sorted(rng.integers(0, 5000, 2))
+        y0, y1 = sorted(rng.integers(0, 3000, 2))
+        assert index.ink(x0, y0, x1, y1) == int(mask[y0:y1, x0:x1].sum())
+
+def test_seam_cuts_cover_sheet_and_split_fewer_labels():
+    mask, labels = _labelled_sheet()
+    index = InkIntegralImage(mask)
+    spans = index.find_cuts(1, 0, 5000, 0, 3000, tile_size=1024, overlap=102, min_overlap=25)
+    assert spans[0][0] == 0 and spans[-1][1] == 5000
+    assert all(end - start <= 1024 for start, end in spans)
+    assert all(nxt[0] < cur[1] for cur, nxt in zip(spans, spans[1:]))
+
+    def split_count(cuts):
+        return sum(any(x0 < c < x1 for c in cuts) for x0, _, x1, _ in labels)
+
+    seam_cuts = [(cur[1] + nxt[0]) // 2 for cur, nxt in zip(spans, spans[1:])]
+    fixed_cuts = [i * (1024 - 102) + 1024 - 51 for i in range(len(seam_cuts))]
+    assert split_count(seam_cuts) < split_count(fixed_cuts)
+
+def test_seam_slices_respect_strategy_slice_size():
+    from PIL import Image
+    from app.services.intelligent_image_slicer import IntelligentImageSlicer
+
+    slicer = IntelligentImageSlicer.__new__(IntelligentImageSlicer)
+    slicer.max_resolution, slicer.overlap_ratio, slicer.quality = 2048, 0.1, 95
+    slicer.seam_aware, slicer.persist_mode = True, "none"
+    mask, _ = _labelled_sheet()
+    image = Image.fromarray(np.where(mask, 0, 255).astype(np.uint8))
+    slice_width, slice_height = slicer.calculate_optimal_slicing(*image.size)['slice_size']
+    slices = slicer.slice_image(image, "seams")
+    assert all(s.width <= slice_width and s.height <= slice_height for s in slices)
+    assert max(s.x + s.width for s in slices) == 5000 and max(s.y + s.height for s in slices) == 3000
+
+
+def test_spooled_slice_releases_base64_and_reads_back(tmp_path):
+    from app.services.intelligent_image_slicer import SliceInfo
+
+    slice_info = SliceInfo(slice_id="s_00_00", x=0, y=0, width=4, height=4, overlap_left=0, overlap_top=0,
+                           overlap_right=0, overlap_bottom=0, base64_data="iVBORw0KGgo=", file_size_kb=0.1,
+                           slice_path="")
+    path = slice_info.spool(str(tmp_path / "spool"))
+    assert slice_info.base64_data == ""
+    assert slice_info.load_base64() == "iVBORw0KGgo="
+    assert slice_info.spool(str(tmp_path / "other")) == path
+
+
+def test_after_persistence_runs_once_pending_uploads_finish():
+    import threading
+    from concurrent.futures import Future
+    from app.services.intelligent_image_slicer import IntelligentImageSlicer
+
+    slicer = IntelligentImageSlicer.__new__(IntelligentImageSlicer)
+    slicer._persist_lock = threading.Lock()
+    pending = [Future(), Future()]
+    done = Future()
+    done.set_result("s3://done")
+    slicer._persist_futures = {"a": pending[0], "b": pending[1], "c": done}
+
+    calls = []
+    slicer.after_persistence(lambda: calls.append("cleanup"))
+    pending[0].set_result("s3://a")
+    assert calls == []
+    pending[1].set_exception(RuntimeError("upload failed"))
+    assert calls == ["cleanup"]
+
+    slicer.after_persistence(lambda: calls.append("immediate"))
+    assert calls == ["cleanup", "immediate"]
@@ -0,0 +1,124 @@
+import time
+import pytest
+from app.services.llm_client import (
+    ResilientLLMClient, CircuitBreaker, LLMCircuitOpenError, LLMDeadlineExceeded, llm_task_deadline
+)
+
+class _RateLimited(Exception):
+    status_code = 429
+    def __init__(self, retry_after):
+        super().__init__("rate limited")
+        self.response = type("R", (), {"headers": {"retry-after": str(retry_after)}})()
+
+class _BadRequest(Exception):
+    status_code = 400
+
+def test_retry_honours_retry_after():
+    client = ResilientLLMClient(max_retries=2, base_delay=10)
+    calls = []
+    def func(timeout):
+        calls.append(time.monotonic())
+        if len(calls) < 2:
+            raise _RateLimited(0.05)
+        return "ok"
+    assert client.call("site", func) == "ok"
+    assert calls[1] - calls[0] >= 0.05
+    assert client.get_metrics()["call_sites"]["site"]["retries"] == 1
+
+def test_non_retryable_error_raises_immediately():
+    client = ResilientLLMClient(max_retries=3)
+    calls = []
+    def func(timeout):
+        calls.append(1)
+        raise _BadRequest()
+    with pytest.raises(_BadRequest):
+        client.call("site", func)
+    assert len(calls) == 1
+
+def test_circuit_breaker_trips_and_rejects():
+    client = ResilientLLMClient(max_retries=0, breaker=CircuitBreaker(failure_threshold=2, cooldown_seconds=60))
+    def func(timeout):
+        raise TimeoutError()
+    for _ in range(2):
+        with pytest.raises(TimeoutError):
+            client.call("site", func)
+    assert client.is_degraded()
+    with pytest.raises(LLMCircuitOpenError):
+        client.call("site", lambda timeout: "ok")
+
+def test_deadline_limits_attempt_timeout():
+    client = ResilientLLMClient(default_timeout=120, min_attempt_seconds=1)
+    seen = []
+    with llm_task_deadline(10):
+        client.call("site", lambda timeout: seen.append(timeout))
+    assert seen[0] <= 10
+    with llm_task_deadline(0.5):
+        with pytest.raises(LLMDeadlineExceeded):
+            client.call("site", lambda timeout: "ok")
+
+def test_hedge_returns_faster_duplicate():
+    client = ResilientLLMClient(hedge_enabled=True, hedge_min_samples=5)
+    for _ in range(5):
+        client.call("site", lambda timeout: time.sleep(0.01))
+    calls = []
+    def func(timeout):
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(1.0)
+            return "slow"
+        return "fast"
+    assert client.call("site", func) == "fast"
+    stats = client.get_metrics()["call_sites"]["site"]
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+
+def test_concurrency_limiter_shared_per_loop_and_reset():
+    import asyncio
+    client = ResilientLLMClient()
+
+    async def limiters():
+        return client.concurrency_limiter("site", 2), client.concurrency_limiter("site", 5)
+
+    first, second = asyncio.run(limiters())
+    assert first is second
+    # 新的事件循环重建限流器
+    third, _ = asyncio.run(limiters())
+    assert third is not first
+    client.reset_limiters()
+    assert client._limiters == {}
+
+def test_breaker_counts_only_terminal_non_rate_limit_failures():
+    client = ResilientLLMClient(max_retries=2, base_delay=0, breaker=CircuitBreaker(failure_threshold=2))
+    attempts = []
+    def flaky(timeout):
+        attempts.append(timeout)
+        if len(attempts) < 3:
+            raise TimeoutError()
+        return "ok"
+    assert client.call("site", flaky) == "ok"
+    assert client.breaker.consecutive_failures == 0
+
+    def rate_limited(timeout):
+        raise _RateLimited(0)
+    for _ in range(3):
+        with pytest.raises(_RateLimited):
+            client.call("site", rate_limited)
+    assert client.breaker.consecutive_failures == 0
+    assert not client.is_degraded()
+
+    def down(timeout):
+        raise TimeoutError()
+    with pytest.raises(TimeoutError):
+        client.call("site", down)
+    assert client.breaker.consecutive_failures == 1
+
+def test_hedged_attempts_see_task_deadline():
+    client = ResilientLLMClient(hedge_enabled=True, hedge_min_samples=1)
+    client.call("site", lambda timeout: "warmup")
+    seen = []
+    def func(timeout):
+        from app.services.llm_client import remaining_budget
+        seen.append(remaining_budget())
+        return "ok"
+    with llm_task_deadline(30):
+        assert client.call("site", func) == "ok"
+    assert seen and seen[0] is not None and seen[0] <= 30
@@ -0,0 +1,89 @@
+import json
+import time
+
+from app.services.llm_replay_server import Cassette, LLMReplayServer, _build_completion, import_interaction_logs
+from app.services.openai_interaction_logger import OpenAIInteractionLogger
+
+
+def _request(text, model='gpt-4o'):
+    return {
+        'model': model,
+        'messages': [
+            {'role': 'system', 'content': '识别构件'},
+            {'role': 'user', 'content': [
+                {'type': 'text', 'text': text},
+                {'type': 'image_url', 'image_url': {'url': 'data:image/png;base64,AAAA', 'detail': 'high'}},
+            ]},
+        ],
+        'temperature': 0.1,
+    }
+
+
+def _server(mode, cassette, **kwargs):
+    return LLMReplayServer(mode=mode, cassette=cassette, port=0, **kwargs)
+
+
+def test_record_then_replay_round_trip(tmp_path, monkeypatch):
+    path = tmp_path / 'cassette.jsonl'
+    recorder = _server('record', Cassette(str(path)))
+    responses = {'构件A': _build_completion('gpt-4o', '{"id": "A"}'),
+                 '构件B': _build_completion('gpt-4o', '{"id": "B"}')}
+    monkeypatch.setattr(recorder, '_forward_upstream',
+                        lambda body, auth: (200, responses[body['messages'][1]['content'][0]['text']]))
+    try:
+        for text in responses:
+            assert recorder.handle_chat_completion(_request(text), '')['status'] == 200
+    finally:
+        recorder.httpd.server_close()
+    assert recorder.stats['recorded'] == 2
+
+    replayer = _server('replay', Cassette(str(path)))
+    try:
+        for text in ('构件B', '构件A'):
+            result = replayer.handle_chat_completion(_request(text), '')
+            assert result['status'] == 200
+            assert result['body']['choices'][0]['message']['content'] == json.dumps({'id': text[-1]})
+
+        # 同模型但未录制的请求显式未命中，不回放其他请求的录制
+        miss = replayer.handle_chat_completion(_request('构件C'), '')
+        assert miss['status'] == 404 and miss['body']['error']['type'] == 'replay_miss'
+        assert replayer.handle_chat_completion(_request('构件A', model='gpt-4o-mini'), '')['status'] == 404
+    finally:
+        replayer.httpd.server_close()
+    assert replayer.stats['replayed'] == 2
+    assert replayer.stats['misses'] == 2
+
+
+def test_interaction_log_import_replays_original_request(tmp_path):
+    interaction_logger = OpenAIInteractionLogger(None)
+    interaction_logger.start_session(task_id='t1', drawing_id=1)
+    interaction_logger.log_api_call(
+        session_id='t1_Step1', step_name='Step1',
+        request_data=_request('构件A'), response_data={'content': '{"id": "A"}'},
+        duration_seconds=0.5
+    )
+    log_path = tmp_path / 'session.json'
+    log_path.write_text(json.dumps(interaction_logger.interaction_data, ensure_ascii=False), encoding='utf-8')
+
+    cassette = Cassette(str(tmp_path / 'imported.jsonl'))
+    assert import_interaction_logs([str(log_path)], cassette) == 1
+
+    # 交互记录中的图片只保留元信息，回放时仍与携带完整图片的原始请求匹配
+    entry = cassette.match(_request('构件A'))
+    assert entry['response']['choices'][0]['message']['content'] == '{"id": "A"}'
+    assert entry['request']['model'] == 'gpt-4o'
+    assert cassette.match(_request('构件B')) is None
+
+
+def test_strict_replay_miss_stops_server(tmp_path):
+    replayer = _server('replay', Cassette(str(tmp_path / 'empty.jsonl')), strict=True)
+    stopped = []
+    replayer.httpd.shutdown = lambda: stopped.append(True)
+    try:
+        assert replayer.handle_chat_completion(_request('构件A'), '')['status'] == 404
+    finally:
+        replayer.httpd.server_close()
+    deadline = time.time() + 2
+    while not stopped and time.time() < deadline:
+        time.sleep(0.01)
+    assert stopped
@@ -0,0 +1,83 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import ai_analyzer, dual_storage_service, ocr_result_corrector
+from app.services.merged_ocr_store import merged_ocr_store
+from app.tasks import drawing_tasks
+
+
+def _stub_services(monkeypatch, correct):
+    monkeypatch.setattr(ai_analyzer, "AIAnalyzerService", lambda: object())
+    monkeypatch.setattr(dual_storage_service, "DualStorageService", lambda: object())
+    monkeypatch.setattr(ocr_result_corrector.OCRResultCorrector, "__init__", lambda self, **kwargs: None)
+    monkeypatch.setattr(ocr_result_corrector.OCRResultCorrector, "correct_ocr_result", correct)
+
+
+def _correct(key):
+    loop = asyncio.new_event_loop()
+    try:
+        drawing = SimpleNamespace(id=1, filename="a.pdf")
+        return drawing_tasks._correct_merged_ocr(loop, key, drawing, "task", {"size": (100, 100)})
+    finally:
+        loop.close()
+
+
+def test_merged_result_released_when_correction_fails(monkeypatch):
+    async def fail(self, **kwargs):
+        raise RuntimeError("GPT unavailable")
+
+    _stub_services(monkeypatch, fail)
+    merged_ocr_store.put("ocr_results/1/failing.json", {"text_regions": []})
+    with pytest.raises(RuntimeError):
+        _correct("ocr_results/1/failing.json")
+    assert merged_ocr_store.resolve("ocr_results/1/failing.json") is None
+
+
+def test_merged_result_released_after_correction(monkeypatch):
+    async def succeed(self, **kwargs):
+        assert merged_ocr_store.resolve(kwargs["merged_ocr_key"]) is not None
+        return "corrected"
+
+    _stub_services(monkeypatch, succeed)
+    merged_ocr_store.put("ocr_results/1/ok.json", {"text_regions": []})
+    assert _correct("ocr_results/1/ok.json") == "corrected"
+    assert merged_ocr_store.resolve("ocr_results/1/ok.json") is None
+
+
+class _Storage:
+    def __init__(self, success):
+        self.success = success
+
+    def upload_content_sync(self, content, s3_key, content_type):
+        return {"success": self.success}
+
+
+def test_wait_persisted_reports_upload_outcome():
+    from app.services.merged_ocr_store import MergedOCRResultStore
+    store = MergedOCRResultStore()
+    store.persist_async("ok.json", {}, storage_service=_Storage(True), task_id="t1")
+    store.persist_async("bad.json", {}, storage_service=_Storage(False), task_id="t1")
+    assert store.wait_persisted("ok.json") is True
+    assert store.wait_persisted("bad.json") is False
+    assert store.wait_persisted("missing.json") is False
+
+
+def test_wait_pending_only_waits_for_own_task():
+    import threading
+    from app.services.merged_ocr_store import MergedOCRResultStore
+
+    release = threading.Event()
+
+    class _BlockingStorage:
+        def upload_content_sync(self, content, s3_key, content_type):
+            release.wait(5)
+            return {"success": True}
+
+    store = MergedOCRResultStore()
+    store.persist_async("slow.json", {}, storage_service=_BlockingStorage(), task_id="other")
+    store.persist_async("mine.json", {}, storage_service=_Storage(True), task_id="mine")
+    assert store.wait_pending("mine", timeout=5) is True
+    assert store.wait_pending("other", timeout=0.05) is False
+    release.set()
@@ -0,0 +1,71 @@
+import random
+from app.services.ocr_analysis_chunker import OCRAnalysisChunker, merge_chunk_results
+
+def _random_lines(count, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    for i in range(count):
+        x1, y1 = rng.uniform(0, 9000), rng.uniform(0, 6000)
+        lines.append({"text": f"KL{i} 300×600 C30", "x1": x1, "y1": y1, "x2": x1 + 200, "y2": y1 + 30})
+    return lines
+
+def test_partition_respects_budget_and_keeps_all_lines():
+    lines = _random_lines(1500)
+    chunks = OCRAnalysisChunker(token_budget=2000).partition(lines, {"width": 9200, "height": 6030})
+    assert len(chunks) > 1
+    assert sum(c["line_count"] for c in chunks) == len(lines)
+    assert all(c["token_count"] <= 2000 for c in chunks)
+    assert [c["chunk_id"] for c in chunks] == list(range(len(chunks)))
+
+def test_merge_is_deterministic_and_deduplicates():
+    results = [
+        {"_chunk_id": 1, "_region": "body", "component_list": [{"component_id": "KL-1", "material": ""}],
+         "global_notes": [{"content": "梁混凝土C30"}]},
+        {"_chunk_id": 0, "_region": "title_block", "drawing_basic_info": {"scale": "1:100"},
+         "component_list": [{"component_id": "kl1", "material": "C30"}], "global_notes": ["梁混凝土 C30"]},
+    ]
+    merged = merge_chunk_results(results)
+    assert merged == merge_chunk_results(list(reversed(results)))
+    assert merged["drawing_basic_info"] == {"scale": "1:100"}
+    assert len(merged["component_list"]) == 1
+    assert merged["component_list"][0]["material"] == "C30"
+    assert merged["component_list"][0]["source_chunks"] == [0, 1]
+    assert len(merged["global_notes"]) == 1
+
+def test_partition_does_not_mutate_lines():
+    lines = _random_lines(300)
+    OCRAnalysisChunker(token_budget=500).partition(lines)
+    assert all(set(line) == {"text", "x1", "y1", "x2", "y2"} for line in lines)
+
+def test_unparseable_chunk_is_retried_then_failed(monkeypatch, reset_llm_client):
+    import asyncio
+    from app.core.config import settings
+    from app.services.ocr_result_corrector import OCRResultCorrector
+    monkeypatch.setattr(settings, "OCR_GPT_CHUNK_TOKEN_BUDGET", 300, raising=False)
+
+    class FakeAnalyzer:
+        def __init__(self, responses):
+            self.responses = list(responses)
+            self.calls = 0
+
+        async def analyze_text_async(self, prompt, session_id, context_data):
+            self.calls += 1
+            return {"success": True, "response": self.responses.pop(0)}
+
+    lines = [{"text": f"KL{i} 300×600 C30 " * 20, "bbox": [0, i * 40, 600, i * 40 + 30]} for i in range(40)]
+    corrector = OCRResultCorrector.__new__(OCRResultCorrector)
+
+    # 所有块都返回无法解析的内容：每块重试一次后判为失败，不合并降级数据
+    corrector.ai_analyzer = FakeAnalyzer(["不是JSON"] * 100)
+    result = asyncio.run(corrector._apply_gpt_analysis_chunked(lines, {}, "t1", {"width": 600, "height": 1600}))
+    chunk_count = corrector.ai_analyzer.calls // 2
+    assert chunk_count > 1
+    assert result["component_list"] == []
+    assert "chunked_analysis" not in result
+
+    # 第一次解析失败、重试成功的块计入结果
+    corrector.ai_analyzer = FakeAnalyzer(['{"component_list": [{"component_id": "KL1"}]}'] * 100)
+    corrector.ai_analyzer.responses[0] = "截断的{"
+    result = asyncio.run(corrector._apply_gpt_analysis_chunked(lines, {}, "t2", {"width": 600, "height": 1600}))
+    assert result["chunked_analysis"]["failed_chunks"] == 0
+    assert corrector.ai_analyzer.calls == chunk_count + 1
@@ -0,0 +1,86 @@
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+from app.services.image_preprocessor import ImagePreprocessor
+from app.services.page_raster import (
+    PackedBilevel, compact_page_file, load_page_array, measure_page_modes, to_compact, to_model_bgr, to_model_rgb
+)
+
+
+def _drawing(width=203, height=120):
+    gray = np.full((height, width), 255, dtype=np.uint8)
+    gray[20:22, 10:190] = 0
+    gray[30:100, 50:52] = 40
+    return gray
+
+
+def test_packed_bilevel_round_trip():
+    gray = _drawing()
+    packed = PackedBilevel.from_gray(gray, threshold=160)
+
+    assert packed.nbytes == gray.shape[0] * ((gray.shape[1] + 7) // 8)
+    assert np.array_equal(packed.ink_mask(), gray < 160)
+    assert to_model_rgb(packed).mode == "RGB"
+
+
+def test_compact_modes_and_transparent_background():
+    rgba = Image.new("RGBA", (10, 10), (0, 0, 0, 0))
+    assert to_compact(rgba, "gray").getpixel((0, 0)) == 255
+    assert to_compact(rgba, "bilevel").mode == "1"
+    assert to_compact(Image.new("RGB", (4, 4), (255, 0, 0)), "color").mode == "RGB"
+
+
+def test_compact_page_file_shrinks_png(tmp_path):
+    path = str(tmp_path / "page.png")
+    Image.fromarray(_drawing()).convert("RGB").save(path)
+
+    compact_page_file(path, "bilevel")
+    with Image.open(path) as page:
+        assert page.mode == "1"
+
+    stats = measure_page_modes(path)
+    assert stats["memory_reduction"] == {"gray": 3.0, "bilevel_packed": round(203 * 3 / 26, 1)}
+    assert stats["png_bytes"]["bilevel"] < stats["png_bytes"]["rgb"]
+
+
+def test_load_page_array_per_mode_and_model_boundary(tmp_path):
+    path = str(tmp_path / "page.png")
+    gray = _drawing()
+    Image.fromarray(gray).convert("RGB").save(path)
+
+    assert load_page_array(path, "gray").shape == gray.shape
+    packed = load_page_array(path, "bilevel")
+    assert isinstance(packed, PackedBilevel)
+    assert np.array_equal(packed.ink_mask(), gray < settings.RASTER_BILEVEL_THRESHOLD)
+    assert load_page_array(path, "color").shape == gray.shape + (3,)
+
+    bgr = to_model_bgr(packed)
+    assert bgr.shape == gray.shape + (3,) and bgr.flags["C_CONTIGUOUS"]
+    assert bgr[21, 100].tolist() == [0, 0, 0] and bgr[0, 0].tolist() == [255, 255, 255]
+
+
+def test_image_info_reads_color_pages_in_color_mode(tmp_path, monkeypatch):
+    path = str(tmp_path / "page.png")
+    Image.fromarray(_drawing()).convert("RGB").save(path)
+    preprocessor = ImagePreprocessor()
+
+    monkeypatch.setattr(settings, "RASTER_PAGE_MODE", "color")
+    assert preprocessor.get_image_info(path)["channels"] == 3
+    monkeypatch.setattr(settings, "RASTER_PAGE_MODE", "gray")
+    assert preprocessor.get_image_info(path)["channels"] == 1
+
+
+def test_file_preprocessing_runs_in_color_mode(tmp_path, monkeypatch):
+    from app.services.file_processor import FileProcessor
+
+    path = str(tmp_path / "page.png")
+    Image.fromarray(_drawing()).convert("RGB").save(path)
+    processor = FileProcessor()
+    processor.temp_dir = str(tmp_path)
+
+    monkeypatch.setattr(settings, "RASTER_PAGE_MODE", "color")
+    processed = processor._preprocess_image(path)
+    assert processed is not None
+    with Image.open(processed) as image:
+        assert image.size == (int(203 * 1.9), int(120 * 1.9))
@@ -0,0 +1,62 @@
+import fitz
+
+from app.core.config import settings
+from app.services.pdf_raster_planner import plan_page_dpi, probe_text_height_pt
+
+A4 = (595, 842)
+A0 = (2384, 3370)
+
+
+def _text_page(doc, size, fontsize, lines=20):
+    page = doc.new_page(width=size[0], height=size[1])
+    for i in range(lines):
+        page.insert_text((40, 60 + i * fontsize * 2), f"KZ{i} 600x600 C30 HRB400", fontsize=fontsize)
+    return page
+
+
+def test_vector_text_height_drives_dpi():
+    doc = fitz.open()
+    small = plan_page_dpi(_text_page(doc, A4, 8))
+    large = plan_page_dpi(_text_page(doc, A4, 24))
+
+    assert small["text_height_source"] == "vector"
+    assert small["dpi"] == 300  # 小字号受最大DPI限制
+    # 24pt 字形约16.8pt，32px 只需约 138 DPI，受最小DPI约束
+    assert large["dpi"] == 150
+
+
+def test_large_sheet_capped_by_pixel_budget():
+    doc = fitz.open()
+    plan = plan_page_dpi(_text_page(doc, A0, 6))
+
+    assert plan["dpi"] == plan["budget_dpi"] < 300
+    width_px = A0[0] / 72 * plan["dpi"]
+    height_px = A0[1] / 72 * plan["dpi"]
+    assert width_px * height_px <= 64e6
+    assert plan["page_size_mm"] == [841, 1189]
+    # 像素预算下文字达不到最小高度时在选择依据中注明
+    assert "低于最小高度" in plan["reason"]
+
+
+def test_target_text_height_is_separate_from_minimum(monkeypatch):
+    doc = fitz.open()
+    page = _text_page(doc, A4, 24)
+    monkeypatch.setattr(settings, "PADDLE_OCR_MIN_HEIGHT", 8)
+    monkeypatch.setattr(settings, "PADDLE_OCR_TARGET_TEXT_HEIGHT", 48)
+    plan = plan_page_dpi(page)
+    assert plan["dpi"] == plan["text_dpi"] > 150
+    assert "48px" in plan["reason"] and "低于最小高度" not in plan["reason"]
+
+
+def test_probe_estimates_text_height_without_vector_text():
+    source = fitz.open()
+    _text_page(source, A4, 14, lines=30)
+    pixmap = source[0].get_pixmap(dpi=300)
+
+    scanned = fitz.open()
+    page = scanned.new_page(width=A4[0], height=A4[1])
+    page.insert_image(page.rect, pixmap=pixmap)
+
+    height_pt = probe_text_height_pt(page, probe_dpi=72)
+    assert height_pt is not None and 7 <= height_pt <= 14
+    assert plan_page_dpi(page)["text_height_source"] == "probe"
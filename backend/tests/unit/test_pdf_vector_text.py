@@ -0,0 +1,82 @@
+import fitz
+
+from app.services.pdf_vector_text import PDFVectorTextExtractor, compare_with_ocr
+
+
+def _make_pdf(path, rotation=0):
+    doc = fitz.open()
+    page = doc.new_page(width=600, height=400)
+    page.insert_text((72, 100), "KZ1 600x600 C30", fontsize=12)
+    page.insert_text((72, 200), "GL-1 HRB400 4C25", fontsize=12)
+    page.set_rotation(rotation)
+    doc.new_page(width=600, height=400)  # 空白页，视为扫描页
+    doc.save(path)
+    doc.close()
+
+
+def test_vector_page_regions_in_pixel_coordinates(tmp_path):
+    pdf_path = str(tmp_path / "vector.pdf")
+    _make_pdf(pdf_path)
+
+    result = PDFVectorTextExtractor(min_chars=5).extract_document(pdf_path, dpi=300)
+    vector_page, blank_page = result["pages"]
+
+    assert vector_page["mode"] == "vector"
+    assert blank_page["mode"] == "scanned"
+    texts = [r["text"] for r in vector_page["text_regions"]]
+    assert texts == ["KZ1 600x600 C30", "GL-1 HRB400 4C25"]
+
+    x1, y1, x2, y2 = vector_page["text_regions"][0]["bbox"]
+    assert abs(x1 - 300) < 5 and y1 < 100 * 300 / 72 < y2
+    assert result["statistics"]["vector_pages"] == 1 and result["statistics"]["scanned_pages"] == 1
+
+
+def test_rotated_page_matches_rendered_orientation(tmp_path):
+    pdf_path = str(tmp_path / "rotated.pdf")
+    _make_pdf(pdf_path, rotation=90)
+
+    with fitz.open(pdf_path) as doc:
+        page = PDFVectorTextExtractor(min_chars=5).extract_page(doc[0], dpi=72)
+        pixmap = doc[0].get_pixmap(dpi=72, colorspace=fitz.csGRAY)
+
+    # 渲染结果为顺时针旋转后的 400x600，文字区域内应有墨迹
+    assert (pixmap.width, pixmap.height) == (400, 600)
+    x1, y1, x2, y2 = [int(v) for v in page["text_regions"][0]["bbox"]]
+    assert 290 < x1 < x2 < 320 and y2 - y1 > x2 - x1
+    ink = [pixmap.pixel(x, y)[0] < 128 for x in range(x1, x2) for y in range(y1, y2)]
+    assert any(ink)
+
+
+def test_compare_with_ocr_reports_agreement():
+    vector_regions = [{"text": "KZ1 600x600", "bbox": [0, 0, 100, 20]}]
+    ocr_regions = [
+        {"text": "KZ1 600x600", "bbox_xyxy": {"x_min": 2, "y_min": 2, "x_max": 98, "y_max": 18}},
+        {"text": "noise", "bbox": [300, 300, 320, 310]},
+    ]
+    agreement = compare_with_ocr(vector_regions, ocr_regions)
+    assert agreement["located"] == 1 and agreement["agreed"] == 1
+    assert agreement["location_rate"] == 0.5
+
+
+def test_rotated_mixed_page_keeps_image_region(tmp_path):
+    from PIL import Image
+
+    image_path = tmp_path / "stamp.png"
+    Image.new("L", (140, 300), 0).save(image_path)
+    pdf_path = str(tmp_path / "mixed.pdf")
+    doc = fitz.open()
+    page = doc.new_page(width=600, height=400)
+    page.insert_text((72, 100), "KZ1 600x600 C30", fontsize=12)
+    page.insert_image(fitz.Rect(450, 50, 590, 350), filename=str(image_path))
+    page.set_rotation(90)
+    doc.save(pdf_path)
+    doc.close()
+
+    with fitz.open(pdf_path) as doc:
+        result = PDFVectorTextExtractor(min_chars=5).extract_page(doc[0], dpi=72)
+
+    # 旋转后图片位于渲染结果（400x600）的下部
+    assert result["mode"] == "mixed"
+    x1, y1, x2, y2 = result["ocr_regions"][0]
+    assert abs(x1 - 50) < 2 and abs(x2 - 350) < 2
+    assert abs(y1 - 450) < 2 and abs(y2 - 590) < 2
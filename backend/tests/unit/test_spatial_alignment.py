@@ -0,0 +1,94 @@
+from functools import lru_cache
+
+import numpy as np
+
+from app.services.cross_modal_validation_engine import SpatialAlignmentEngine
+from app.services.spatial_alignment import (
+    _hungarian, greedy_alignment, optimal_alignment, synthetic_elements
+)
+
+
+def _best_matching_total(scores):
+    """按位掩码穷举最大权匹配（只用于小规模对照）"""
+    n, m = scores.shape
+
+    @lru_cache(maxsize=None)
+    def best(i, mask):
+        if i == n:
+            return 0.0
+        value = best(i + 1, mask)
+        for j in range(m):
+            if not mask & (1 << j) and scores[i, j] > 0:
+                value = max(value, scores[i, j] + best(i + 1, mask | (1 << j)))
+        return value
+
+    return best(0, 0)
+
+
+def _score_matrix(engine, ocr, vision):
+    scores = np.zeros((len(ocr), len(vision)))
+    for i, ocr_elem in enumerate(ocr):
+        for j, vision_elem in enumerate(vision):
+            overall = (engine._calculate_spatial_similarity(ocr_elem, vision_elem) * 0.7 +
+                       engine._calculate_semantic_similarity(ocr_elem, vision_elem) * 0.3)
+            scores[i, j] = overall if overall > 0.5 else 0.0
+    return scores
+
+
+def test_hungarian_fallback_is_optimal():
+    rng = np.random.default_rng(0)
+    for shape in ((1, 1), (3, 3), (4, 6), (6, 6)):
+        scores = rng.uniform(0, 1, shape) * (rng.uniform(0, 1, shape) > 0.3)
+        rows, cols = _hungarian(-scores)
+        assert len(set(cols.tolist())) == len(cols)
+        assert np.isclose(scores[rows, cols].sum(), _best_matching_total(scores))
+
+
+def test_alignment_is_optimal_on_candidate_components():
+    engine = SpatialAlignmentEngine()
+    for seed in range(4):
+        ocr, vision = synthetic_elements(12, 8, seed=seed)
+        # 压缩到小范围制造冲突，并加入远距离同名元素和缺失坐标
+        for element in ocr:
+            element['coordinates']['x'] = element['coordinates']['x'] / 200
+            element['coordinates']['y'] = element['coordinates']['y'] / 200
+        for element in vision:
+            element['bbox']['x'] = element['bbox']['x'] / 200
+            element['bbox']['y'] = element['bbox']['y'] / 200
+        far = dict(vision[0], bbox=dict(vision[0]['bbox'], x=vision[0]['bbox']['x'] + 5000))
+        ocr.append({'text': vision[0]['label'].upper(), 'coordinates': far['bbox']})
+        ocr.append({'text': 'KZ1', 'coordinates': {}})
+
+        result = optimal_alignment(ocr, vision, engine.coordinate_tolerance,
+                                   engine._calculate_semantic_similarity)
+        scores = _score_matrix(engine, ocr, vision)
+        pairs = result['pairs']
+        assert len({j for _, j, _, _ in pairs}) == len(pairs)
+        for i, j, score, _ in pairs:
+            assert np.isclose(scores[i, j], score)
+        assert np.isclose(sum(score for _, _, score, _ in pairs), _best_matching_total(scores[:, :8]))
+
+        reference = greedy_alignment(ocr, vision, engine._calculate_spatial_similarity,
+                                     engine._calculate_semantic_similarity)
+        assert sum(score for _, _, score, _ in pairs) >= sum(score for _, _, score in reference) - 1e-9
+
+
+def test_engine_alignment_result():
+    engine = SpatialAlignmentEngine()
+    ocr = [
+        {'text': 'KZ1', 'coordinates': {'x': 100, 'y': 100, 'width': 40, 'height': 20}},
+        {'text': 'KZ1', 'coordinates': {'x': 104, 'y': 98, 'width': 40, 'height': 20}},
+        {'text': '说明', 'coordinates': {'x': 900, 'y': 900, 'width': 40, 'height': 20}},
+    ]
+    vision = [
+        {'label': 'KZ1', 'bbox': {'x': 102, 'y': 100, 'width': 40, 'height': 20}},
+        {'label': 'KZ1', 'bbox': {'x': 130, 'y': 100, 'width': 40, 'height': 20}},
+        {'label': 'KL2', 'bbox': {'x': 5000, 'y': 5000, 'width': 40, 'height': 20}},
+    ]
+    alignment = engine.align_ocr_vision_elements(ocr, vision)
+
+    assert [pair['ocr_index'] for pair in alignment.matched_pairs] == [0, 1]
+    assert sorted(pair['vision_index'] for pair in alignment.matched_pairs) == [0, 1]
+    assert alignment.ocr_only_elements == [ocr[2]]
+    assert alignment.vision_only_elements == [vision[2]]
+    assert alignment.alignment_confidence == 2 / 3
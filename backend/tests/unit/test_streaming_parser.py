@@ -0,0 +1,70 @@
+import json
+from app.services.ai_analysis.streaming_parser import IncrementalComponentParser, stream_chat_completion
+
+SAMPLE = {
+    "drawing_info": {"drawing_number": "S-01"},
+    "components": [
+        {"component_id": "KZ1", "position": {"x": [1, 2]}, "note": "含}]符号\"转义"},
+        {"component_id": "L1"},
+        {"component_id": "B1"},
+    ],
+}
+
+class _Obj:
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+class MockClient:
+    def __init__(self, text, finish_reason="stop"):
+        chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+        self.chunks = [
+            _Obj(choices=[_Obj(delta=_Obj(content=c), finish_reason=None)]) for c in chunks
+        ] + [_Obj(choices=[_Obj(delta=_Obj(content=None), finish_reason=finish_reason)])]
+        self.chat = _Obj(completions=_Obj(create=lambda **kw: iter(self.chunks)))
+
+def test_components_emitted_incrementally():
+    text = json.dumps(SAMPLE, ensure_ascii=False)
+    parser = IncrementalComponentParser()
+    emitted = []
+    for i in range(0, len(text), 5):
+        emitted.extend(parser.feed(text[i:i + 5]))
+    assert [c["component_id"] for c in emitted] == ["KZ1", "L1", "B1"]
+    assert parser.finish() == SAMPLE
+
+def test_truncated_response_keeps_closed_components():
+    text = json.dumps(SAMPLE, ensure_ascii=False)
+    cut = text.index('{"component_id": "B1"') + 10
+    parser = IncrementalComponentParser()
+    parser.feed(text[:cut])
+    result = parser.finish()
+    assert result["_truncated"] is True
+    assert [c["component_id"] for c in result["components"]] == ["KZ1", "L1"]
+
+def test_stream_chat_completion_metrics():
+    text = json.dumps(SAMPLE, ensure_ascii=False)
+    received = []
+    result = stream_chat_completion(MockClient(text), call_name="test", on_component=received.append, model="m")
+    assert len(received) == 3
+    assert result["parsed"] == SAMPLE
+    assert result["stream_metrics"]["component_count"] == 3
+    assert result["stream_metrics"]["finish_reason"] == "stop"
+
+def test_vision_step_returns_stream_metrics(monkeypatch):
+    from app.core.config import settings
+    from app.services.ai_analysis.vision_analyzer import VisionAnalyzer
+    monkeypatch.setattr(settings, "OPENAI_STREAM_ENABLED", True, raising=False)
+    analyzer = VisionAnalyzer(MockClient(json.dumps(SAMPLE, ensure_ascii=False)), None, None)
+    result = analyzer._execute_vision_step("Turn1", "system", [{"type": "text", "text": "x"}])
+    assert result["response"] == SAMPLE
+    assert result["stream_metrics"]["component_count"] == 3
+    merged = analyzer._merge_multi_turn_results([result, result])
+    assert len(merged["stream_metrics"]) == 2
+
+def test_component_sink_receives_streamed_components():
+    from app.services.ai_analysis.streaming_parser import stream_component_sink
+    received = []
+    text = json.dumps(SAMPLE, ensure_ascii=False)
+    with stream_component_sink(received.append):
+        stream_chat_completion(MockClient(text), call_name="test", model="m")
+    stream_chat_completion(MockClient(text), call_name="test", model="m")
+    assert [c["component_id"] for c in received] == ["KZ1", "L1", "B1"]
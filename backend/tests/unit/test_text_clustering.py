@@ -0,0 +1,50 @@
+import numpy as np
+
+from app.services.dwg_processing.detectors.text_clustering import (
+    brute_force_greedy_groups, connected_text_groups, greedy_text_groups, synthetic_positions
+)
+from app.services.dwg_processing.detectors.text_parser import TextParser
+
+
+def _brute_force_components(xy, threshold):
+    n = len(xy)
+    labels = list(range(n))
+    for i in range(n):
+        for j in range(n):
+            if np.hypot(*(xy[i] - xy[j])) <= threshold:
+                old, new = max(labels[i], labels[j]), min(labels[i], labels[j])
+                labels = [new if label == old else label for label in labels]
+    groups = {}
+    for i, label in enumerate(labels):
+        groups.setdefault(label, []).append(i)
+    return sorted(groups.values())
+
+
+def test_grid_grouping_matches_pairwise():
+    for seed, threshold in ((0, 100.0), (1, 250.0), (2, 0.0)):
+        xy = synthetic_positions(1500, seed=seed) / 50
+        xy[::97] = xy[1::97]  # 重合点
+        xy[5] = np.nan
+        assert greedy_text_groups(xy, threshold) == brute_force_greedy_groups(xy, threshold)
+
+    xy = synthetic_positions(300, seed=3) / 200
+    assert connected_text_groups(xy, 100.0) == _brute_force_components(xy, 100.0)
+
+
+def test_group_texts_by_proximity_and_title_block():
+    texts = [
+        {'text': '图号: S-03', 'position': (0, 0)},
+        {'text': '比例 1:100', 'position': (80, 0)},
+        {'text': '图名: 二层结构平面图', 'position': (160, 0)},
+        {'text': 'KZ1', 'position': (5000, 5000)},
+        {'text': 'bad', 'position': None},
+    ]
+    parser = TextParser()
+    groups = parser.group_texts_by_proximity(texts)
+    assert [[t['text'] for t in g] for g in groups] == [
+        ['图号: S-03', '比例 1:100'], ['图名: 二层结构平面图'], ['KZ1'], ['bad']
+    ]
+    assert len(parser.group_texts_by_proximity(texts, transitive=True)[0]) == 3
+    title_block = parser.parse_title_block(texts)
+    assert title_block['drawing_number'] == 'S-03' and title_block['scale'] == '1:100'
+    assert title_block['title'] == parser.parse_title(texts)
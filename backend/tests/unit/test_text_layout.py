@@ -0,0 +1,118 @@
+import json
+
+import numpy as np
+
+from app.services.ocr_result_corrector import OCRResultCorrector
+from app.services.result_merger_service import ResultMergerService
+from app.services.result_mergers.enhanced_paddleocr_merger import EnhancedPaddleOCRMerger, EnhancedTextRegion
+from app.services.result_mergers.text_layout import (
+    LAYOUT_KEY, compute_layout, layout_boxes, layout_for, synthetic_regions
+)
+from app.services.table_extractor import TableExtractorService
+
+
+def _regions():
+    return [
+        {'text': '混凝土', 'bbox': [120, 102, 200, 122]},
+        {'text': 'KZ1', 'bbox': [0, 100, 60, 120]},
+        {'text': 'C30', 'bbox': [70, 98, 110, 118]},
+        {'text': '300x600', 'bbox': [600, 101, 700, 121]},   # 同一行但距离远，单独成文本行
+        {'text': '说明', 'bbox': [0, 200, 50, 220]},
+        {'text': '无坐标', 'bbox': None},
+    ]
+
+
+def test_rows_lines_and_reading_order():
+    regions = _regions()
+    layout = compute_layout(layout_boxes(regions))
+    assert layout.reading_order.tolist() == [1, 2, 0, 3, 4, 5]
+    assert layout.rows() == [[1, 2, 0, 3], [4]]
+    assert layout.lines() == [[1, 2, 0], [3], [4]]
+    assert layout.line_boxes[0].tolist() == [0, 98, 200, 122]
+    assert layout.row_texts([r['text'] for r in regions]) == ['KZ1 C30 混凝土 300x600', '说明']
+    assert layout.row_ids[5] == layout.line_ids[5] == layout.column_ids[5] == -1
+
+    # 多边形顶点、xyxy 字典与扁平 bbox 解析为同样的框
+    polygon = {'bbox': [[0, 100], [60, 100], [60, 120], [0, 120]]}
+    xyxy = {'bbox_xyxy': {'x_min': 0, 'y_min': 100, 'x_max': 60, 'y_max': 120}}
+    assert layout_boxes([polygon, xyxy]).tolist() == [[0, 100, 60, 120]] * 2
+
+
+def test_dense_text_does_not_chain_into_one_row():
+    # 纵向间距小于行容差的一列文字不应链式串成一行
+    regions = [{'text': str(i), 'bbox': [0, i * 8, 40, i * 8 + 20]} for i in range(50)]
+    layout = compute_layout(layout_boxes(regions))
+    assert len(layout.rows()) > 5
+    assert layout.reading_order.tolist() == list(range(50))
+
+
+def test_columns_match_original_boundary_rule():
+    regions = synthetic_regions(400, seed=3)
+    boxes = layout_boxes(regions)
+    layout = compute_layout(boxes)
+    centers = (boxes[:, 0] + boxes[:, 2]) / 2
+    unique = sorted(set(centers.tolist()))
+    boundaries = [unique[0] - 1] + [(b + a) / 2 for a, b in zip(unique, unique[1:]) if b - a > 50] + [unique[-1] + 50]
+    expected = np.searchsorted(boundaries, centers, side='right') - 1
+    assert layout.column_ids.tolist() == expected.tolist()
+
+
+def test_layout_cached_on_result_and_json_safe():
+    result = {'text_regions': synthetic_regions(300, seed=1)}
+    first = layout_for(result)
+    cached = result[LAYOUT_KEY]
+    restored = layout_for(json.loads(json.dumps(result)))
+    assert restored.lines() == first.lines()
+    assert layout_for(result).rows() == first.rows()
+    assert result[LAYOUT_KEY] is cached
+
+    # 区域数量变化时重新计算
+    result['text_regions'] = result['text_regions'][:10]
+    assert layout_for(result).region_count == 10
+
+
+def test_consumers_share_layout():
+    regions = _regions()
+    layout = compute_layout(layout_boxes(regions))
+
+    corrector = OCRResultCorrector.__new__(OCRResultCorrector)
+    lines = corrector._merge_regions_into_lines(regions, layout)
+    assert [line['text'] for line in lines] == ['KZ1 C30 混凝土', '300x600', '说明']
+    assert (lines[0]['x1'], lines[0]['y2']) == (0, 122)
+
+    positioned = ResultMergerService()._organize_text_by_position(regions, {'width': 800, 'height': 400}, layout)
+    assert [r['text'] for r in positioned] == ['KZ1', 'C30', '混凝土', '300x600', '说明']
+    assert ResultMergerService()._generate_full_text(positioned) == 'KZ1 C30 混凝土 300x600\n说明'
+
+    table_rows = [{'text': text, 'bbox_xyxy': {'x_min': x, 'y_min': y, 'x_max': x + 40, 'y_max': y + 20}}
+                  for y, row in ((0, ['编号', '截面']), (30, ['KZ1', '500x500']), (60, ['KZ2', '600x600']))
+                  for x, text in zip((0, 200), row)]
+    frames = TableExtractorService(table_rows[::-1]).extract_tables()
+    assert frames[0].values.tolist() == [['编号', '截面'], ['KZ1', '500x500'], ['KZ2', '600x600']]
+
+
+def test_enhanced_merger_orders_and_caches_layout():
+    merger = EnhancedPaddleOCRMerger()
+    regions = [EnhancedTextRegion(text=r['text'], bbox=r['bbox'] or [], confidence=0.9, slice_source={})
+               for r in _regions()]
+    ordered, layout = merger._objective3_correct_reading_order(regions, {'width': 800, 'height': 400})
+    assert [r.text for r in ordered] == ['KZ1', 'C30', '混凝土', '300x600', '说明', '无坐标']
+    assert [r.reading_order for r in ordered] == list(range(6))
+    assert layout.reading_order.tolist() == list(range(6))
+    assert layout.lines() == [[0, 1, 2], [3], [4]]
+
+
+def test_table_columns_ignore_text_outside_table():
+    def region(text, x, y, width=40):
+        return {'text': text, 'bbox_xyxy': {'x_min': x, 'y_min': y, 'x_max': x + width, 'y_max': y + 20}}
+
+    regions = [region('柱表', 45, 0)]
+    regions += [region(text, x, y) for y, row in ((40, ['编号', '截面']), (70, ['KZ1', '500x500']))
+                for x, text in zip((0, 90), row)]
+    # 表格下方的说明文字中点落在两列之间，整页分列时会把两列连成一列
+    regions.append(region('注：尺寸单位mm', 45, 120))
+    assert len(set(compute_layout(layout_boxes(regions)).column_ids.tolist())) == 1
+
+    frames = TableExtractorService(regions).extract_tables()
+    assert len(frames) == 1
+    assert frames[0].values.tolist() == [['编号', '截面'], ['KZ1', '500x500']]
@@ -0,0 +1,53 @@
+import random
+
+from app.services.result_mergers.enhanced_paddleocr_merger import EnhancedPaddleOCRMerger
+from app.services.result_mergers.ocr_slice_merger import OCRSliceMerger
+from app.services.result_mergers.text_similarity import (
+    bounded_edit_distance, cache_statistics, full_levenshtein, synthetic_texts, text_similarity
+)
+
+
+def test_bounded_distance_matches_full_dp():
+    rng = random.Random(0)
+    for _ in range(5000):
+        a = ''.join(rng.choice('abc') for _ in range(rng.randint(0, 14)))
+        b = ''.join(rng.choice('abc') for _ in range(rng.randint(0, 14)))
+        expected = full_levenshtein(a, b)
+        assert bounded_edit_distance(a, b) == expected
+        limit = rng.randint(0, 6)
+        assert bounded_edit_distance(a, b, limit) == (expected if expected <= limit else limit + 1)
+
+    # 超过一个机器字的位向量和字符直方图预筛
+    long_a = '框架梁纵筋锚固长度详见说明' * 6
+    long_b = long_a[::-1]
+    assert bounded_edit_distance(long_a, long_b) == full_levenshtein(long_a, long_b)
+    assert bounded_edit_distance(long_a, 'x' * len(long_a), 5) == 6
+
+
+def test_similarity_threshold_semantics():
+    texts = synthetic_texts(300, seed=1)
+    rng = random.Random(2)
+    for _ in range(3000):
+        a, b = rng.choice(texts), rng.choice(texts)
+        clean_a, clean_b = a.replace(' ', '').upper(), b.replace(' ', '').upper()
+        expected = 1.0 - full_levenshtein(clean_a, clean_b) / max(len(clean_a), len(clean_b))
+        for threshold in (0.0, 0.5, 0.8):
+            value = text_similarity(a, b, threshold)
+            if expected >= threshold:
+                assert abs(value - expected) < 1e-12
+            else:
+                assert value == 0.0
+    assert text_similarity('kz 1', 'KZ1') == 1.0
+    assert text_similarity('', 'KZ1') == 0.0
+    assert cache_statistics()['hits'] > 0
+
+
+def test_mergers_use_shared_similarity():
+    # 字符集合相似度会把 KL12 与 KL21 判为完全相同
+    assert OCRSliceMerger()._calculate_text_similarity('KL12', 'KL21') == 0.5
+    assert OCRSliceMerger()._calculate_text_similarity('KL12', 'KL12 ') == 1.0
+
+    merger = EnhancedPaddleOCRMerger()
+    assert merger._calculate_text_similarity_enhanced('KZ1', 'KZ2') == 0.0
+    assert merger._calculate_text_similarity_enhanced('300x600', '300x650') == 1 - 1 / 7
+    assert merger._calculate_text_similarity_enhanced('300x600', 'C30') == 0.0
@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from app.services.tile_pyramid import TilePyramidStore
+
+
+def test_tile_pyramid_levels_and_region(tmp_path):
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 255, size=(1100, 1300, 3), dtype=np.uint8)
+    image_path = tmp_path / "page.png"
+    Image.fromarray(pixels).save(image_path)
+
+    store = TilePyramidStore(root_dir=str(tmp_path / "pyramids"), tile_size=256, upload_to_s3=False)
+    manifest = store.build(str(image_path))
+
+    assert [lvl["width"] for lvl in manifest["levels"]] == [1300, 650, 325, 162]
+    assert manifest["levels"][0]["cols"] == 6 and manifest["levels"][0]["rows"] == 5
+    assert store.lookup(str(image_path))["content_hash"] == manifest["content_hash"]
+
+    # level 0 区域跨越多个瓦片，应与原图裁剪一致
+    region = store.get_region(manifest["content_hash"], (200, 240, 700, 610), level=0)
+    assert np.array_equal(np.asarray(region), pixels[240:610, 200:700])
+
+    thumbnail = store.get_downscaled(str(image_path), 400)
+    assert max(thumbnail.size) == 400
+
+    assert store.get_manifest("../../etc") is None
+
+
+def test_tile_pyramid_background_build_and_lru_eviction(tmp_path):
+    rng = np.random.default_rng(1)
+    pages = []
+    for i in range(3):
+        path = tmp_path / f"page{i}.png"
+        Image.fromarray(rng.integers(0, 255, size=(600, 600, 3), dtype=np.uint8)).save(path)
+        pages.append(str(path))
+
+    store = TilePyramidStore(root_dir=str(tmp_path / "pyramids"), tile_size=256, upload_to_s3=False)
+    first = store.submit(pages[0])
+    assert store.submit(pages[0]).result() == first.result()
+    page_bytes = first.result()["bytes"]
+    assert page_bytes > 0
+
+    # 容量只够两页：构建第三页时淘汰最久未使用的一页
+    store.max_bytes = page_bytes * 2 + page_bytes // 2
+    second = store.build(pages[1])
+    old = (tmp_path / "pyramids" / first.result()["content_hash"] / "manifest.json")
+    os.utime(old, (1, 1))
+    third = store.build(pages[2])
+
+    remaining = sorted(p.name for p in (tmp_path / "pyramids").iterdir())
+    assert remaining == sorted([second["content_hash"], third["content_hash"]])
+    assert store.lookup(pages[0]) is None
+    assert store.get_manifest(first.result()["content_hash"]) is None
+    assert store.lookup(pages[2])["content_hash"] == third["content_hash"]
+
+
+def test_pixel_limit_lifted_only_during_build(tmp_path, monkeypatch):
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 5000)
+    image_path = tmp_path / "large.png"
+    Image.new("L", (200, 100), 255).save(image_path)
+
+    store = TilePyramidStore(root_dir=str(tmp_path / "pyramids"), tile_size=64, upload_to_s3=False)
+    manifest = store.build(str(image_path))
+
+    assert manifest["width"] == 200
+    assert Image.MAX_IMAGE_PIXELS == 5000
@@ -0,0 +1,81 @@
+import ezdxf
+import numpy as np
+import pytest
+
+from app.services.dwg_processing.processors.component_calculator import ComponentCalculator
+from app.services.dwg_processing.processors.vector_takeoff import (
+    VectorTakeoffEngine, polygon_areas, polyline_lengths
+)
+
+
+def test_batched_shoelace_and_lengths():
+    square = [(0, 0), (10, 0), (10, 10), (0, 10)]
+    triangle = [(0, 0), (4, 0), (0, 3)]
+    vertices = np.array(square + triangle, dtype=float)
+    assert polygon_areas(vertices, np.array([4, 3])).tolist() == [100.0, 6.0]
+    assert polyline_lengths(vertices, np.array([4, 3])).tolist() == [30.0, 9.0]
+
+
+def test_takeoff_from_layers_and_blocks():
+    doc = ezdxf.new()
+    doc.units = ezdxf.units.MM
+    msp = doc.modelspace()
+    for x in (0, 6000, 12000):
+        msp.add_lwpolyline([(x, 0), (x + 400, 0), (x + 400, 500), (x, 500)], close=True,
+                           dxfattribs={'layer': 'COLU'})
+    block = doc.blocks.new('KZ2')
+    block.add_lwpolyline([(-300, -300), (300, -300), (300, 300), (-300, 300)], close=True)
+    for x in (0, 6000):
+        msp.add_blockref('KZ2', (x, 8000), dxfattribs={'layer': '0'})
+    msp.add_line((0, 0), (12000, 0), dxfattribs={'layer': 'WALL-CEN'})
+    msp.add_lwpolyline([(0, 0), (0, 8000), (6000, 8000)], dxfattribs={'layer': 'WALL-CEN'})
+    msp.add_lwpolyline([(0, 0), (12000, 0), (12000, 8000), (0, 8000)], close=True, dxfattribs={'layer': 'SLAB'})
+    hatch = msp.add_hatch(dxfattribs={'layer': '板'})
+    hatch.paths.add_polyline_path([(0, 0), (1000, 0), (1000, 1000), (0, 1000)], is_closed=True, flags=1)
+    hatch.paths.add_polyline_path([(100, 100), (300, 100), (300, 300), (100, 300)], is_closed=True, flags=0)
+    msp.add_linear_dim(base=(0, -1000), p1=(0, 0), p2=(6000, 0)).render()
+
+    result = VectorTakeoffEngine(wall_height=3000).takeoff(doc)
+    by_type = {}
+    for component in result['components']:
+        by_type.setdefault(component.type, []).append(component)
+
+    columns = {c.code: c for c in by_type['柱']}
+    assert columns['KZ 500×400'].quantity == 3
+    assert columns['KZ2'].quantity == 2 and columns['KZ2'].width == pytest.approx(600)
+    (wall,) = by_type['墙']
+    assert wall.length == pytest.approx(26000) and wall.area == pytest.approx(26000 * 3000)
+    assert sorted(c.area for c in by_type['板']) == pytest.approx([1000 * 1000 - 200 * 200, 12000 * 8000])
+    assert result['dimensions']['count'] == 1 and result['dimensions']['values'] == [6000.0]
+
+    metrics = ComponentCalculator().batch_calculate(result['components'])
+    slab_values = sorted(m['value'] for m in metrics if m['component_type'] == '板')
+    assert slab_values == pytest.approx([0.96, 96.0])
+
+
+def test_closed_beam_outlines_count_once_each():
+    doc = ezdxf.new()
+    msp = doc.modelspace()
+    for y in (0, 2000, 4000):
+        msp.add_lwpolyline([(0, y), (6000, y), (6000, y + 300), (0, y + 300)], close=True,
+                           dxfattribs={'layer': 'BEAM'})
+    # 双线梁的两条边线算一根
+    msp.add_line((0, 8000), (6000, 8000), dxfattribs={'layer': 'BEAM'})
+    msp.add_line((0, 8300), (6000, 8300), dxfattribs={'layer': 'BEAM'})
+
+    (beam,) = VectorTakeoffEngine().takeoff(doc)['components']
+    assert beam.type == '梁' and beam.quantity == 4
+
+
+def test_drawing_units_converted_to_mm():
+    doc = ezdxf.new()
+    doc.units = ezdxf.units.M
+    msp = doc.modelspace()
+    msp.add_lwpolyline([(0, 0), (0.4, 0), (0.4, 0.5), (0, 0.5)], close=True, dxfattribs={'layer': 'COLU'})
+    msp.add_line((0, 0), (12, 0), dxfattribs={'layer': 'WALL-CEN'})
+    msp.add_lwpolyline([(0, 0), (12, 0), (12, 8), (0, 8)], close=True, dxfattribs={'layer': 'SLAB'})
+
+    by_type = {c.type: c for c in VectorTakeoffEngine(wall_height=3000).takeoff(doc)['components']}
+    assert by_type['柱'].code == 'KZ 500×400'
+    assert by_type['墙'].length == pytest.approx(12000)
+    assert by_type['板'].area == pytest.approx(12000 * 8000)